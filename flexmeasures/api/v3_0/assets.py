@@ -33,8 +33,12 @@ from flexmeasures.data.schemas.generic_assets import (
     GenericAssetSchema as AssetSchema,
     GenericAssetIdField as AssetIdField,
 )
-from flexmeasures.data.schemas.scheduling import AssetTriggerSchema
+from flexmeasures.data.schemas.scheduling import (
+    AssetBatchTriggerSchema,
+    AssetTriggerSchema,
+)
 from flexmeasures.data.services.scheduling import (
+    create_batch_scheduling_jobs,
     create_sequential_scheduling_job,
     create_simultaneous_scheduling_job,
 )
@@ -1067,6 +1071,90 @@ class AssetAPI(FlaskView):
         d, s = request_processed()
         return dict(**response, **d), s
 
+    @route("/schedules/trigger", methods=["POST"])
+    @use_args(AssetBatchTriggerSchema(), location="json", as_kwargs=True)
+    def trigger_schedules(self, schedules: list[dict], **kwargs):
+        """
+        Trigger FlexMeasures to create schedules for many assets at once.
+
+        .. :quickref: Schedule; Trigger scheduling jobs for many assets
+
+        Each entry describes the scheduling request for one asset, with the same fields as in /assets/<id>/schedules/trigger,
+        plus the asset's ID. Assets and sensors referenced by all entries are looked up at once,
+        and all scheduling jobs are enqueued in one go.
+        The response lists the scheduling job for each asset (in the order of the request),
+        and an ID for the whole batch, which may be used to obtain all resulting schedules at once: see /sensors/schedules.
+        Sequential scheduling is not supported in batches.
+
+        Entries whose flex-model or flex-context is invalid are listed under "errors", by their position in the batch.
+        The other entries are still scheduled.
+
+        **Example request**
+
+        .. code-block:: json
+
+            {
+                "schedules": [
+                    {
+                        "id": 1,
+                        "start": "2015-06-02T10:00:00+00:00",
+                        "flex-model": [{"sensor": 931, "soc-at-start": "12.1 kWh"}],
+                        "flex-context": {"consumption-price": {"sensor": 9}}
+                    },
+                    {
+                        "id": 2,
+                        "start": "2015-06-02T10:00:00+00:00",
+                        "flex-model": [{"sensor": 941, "soc-at-start": "3 kWh"}],
+                        "flex-context": {"consumption-price": {"sensor": 9}}
+                    }
+                ]
+            }
+
+        **Example response**
+
+        .. sourcecode:: json
+
+            {
+                "status": "PROCESSED",
+                "batch": "c3f0a2a6-7e0a-4d6b-9a35-1d2f0d5b8e11",
+                "schedules": [
+                    {"asset": 1, "schedule": "364bfd06-c1fa-430b-8d25-8f5a547651fb"},
+                    {"asset": 2, "schedule": "b2f1d0a4-90de-4b6e-a0c6-6b0e5e1f7c2d"}
+                ],
+                "errors": {},
+                "message": "Request has been processed."
+            }
+
+        :reqheader Authorization: The authentication token
+        :reqheader Content-Type: application/json
+        :resheader Content-Type: application/json
+        :status 200: PROCESSED
+        :status 400: INVALID_DATA
+        :status 401: UNAUTHORIZED
+        :status 403: INVALID_SENDER
+        :status 405: INVALID_METHOD
+        :status 422: UNPROCESSABLE_ENTITY
+        """
+        # Simplification of checking for create-children access on each of the flexible sensors,
+        # which assumes each of the flexible sensors belongs to the given asset.
+        for schedule in schedules:
+            check_access(schedule["asset"], "create-children")
+
+        batch_id, jobs, errors = create_batch_scheduling_jobs(schedules)
+        if len(errors) == len(schedules):
+            return invalid_flex_config(errors)
+
+        response = dict(
+            batch=batch_id,
+            schedules=[
+                dict(asset=schedule["asset"].id, schedule=job.id if job else None)
+                for schedule, job in zip(schedules, jobs)
+            ],
+            errors=errors,
+        )
+        d, s = request_processed()
+        return dict(**response, **d), s
+
     @route("/<id>/kpis", methods=["GET"])
     @use_kwargs(
         {
@@ -25,6 +25,7 @@ from flexmeasures.api.common.responses import (
     unknown_schedule,
     invalid_flex_config,
     fallback_schedule_redirect,
+    required_info_missing,
 )
 from flexmeasures.api.common.utils.validators import (
     optional_duration_accepted,
@@ -54,9 +55,14 @@ from flexmeasures.data.schemas import AssetIdField
 from flexmeasures.api.common.schemas.search import SearchFilterField
 from flexmeasures.api.common.schemas.sensors import UnitField
 from flexmeasures.data.services.sensors import get_sensor_stats
+from flexmeasures.data.queries.sensors import prefetch_sensors
 from flexmeasures.data.services.scheduling import (
     create_scheduling_job,
+    fetch_scheduling_jobs,
+    get_batch_job_ids,
     get_data_source_for_job,
+    get_scheduled_sensor_ids,
+    get_schedules_for_jobs,
 )
 from flexmeasures.utils.time_utils import duration_isoformat
 from flexmeasures.utils.flexmeasures_inflection import join_words_into_a_list
@@ -794,6 +800,100 @@ class SensorAPI(FlaskView):
         d, s = request_processed(scheduler_info_msg)
         return dict(scheduler_info=scheduler_info, **response, **d), s
 
+    @route("/schedules", methods=["GET"])
+    @use_kwargs(
+        {
+            "job_ids": fields.List(fields.Str(), data_key="job", load_default=list),
+            "batch_id": fields.Str(data_key="batch", load_default=None),
+        },
+        location="query",
+    )
+    @optional_duration_accepted(
+        timedelta(hours=6)
+    )  # todo: make this a Marshmallow field
+    def get_schedules(
+        self,
+        job_ids: list[str],
+        batch_id: str | None,
+        duration: timedelta,
+        **kwargs,
+    ):
+        """Get the schedules of many devices from FlexMeasures at once.
+
+        .. :quickref: Schedule; Download schedules for many devices
+
+        Select scheduling jobs by their ID (use the ``job`` query parameter once for each job),
+        and/or select all jobs of a batch created with /assets/schedules/trigger (using the ``batch`` query parameter).
+
+        The response is in columnar form, with one row for each device scheduled by the selected jobs.
+        For each device, it lists the job, the (power) sensor, the job status and, for finished jobs, the schedule
+        (its start, duration, unit and values), like the /sensors/<id>/schedules/<uuid> endpoint does.
+        Failed jobs are replaced by their fallback job, if they have one.
+
+        **Optional fields**
+
+        - "duration" (6 hours by default; can be increased to plan further into the future)
+
+        **Example request**
+
+        .. code-block:: text
+
+            GET /api/v3_0/sensors/schedules?batch=c3f0a2a6-7e0a-4d6b-9a35-1d2f0d5b8e11&duration=PT45M
+
+        **Example response**
+
+        .. sourcecode:: json
+
+            {
+                "schedules": {
+                    "job": ["364bfd06-c1fa-430b-8d25-8f5a547651fb", "b2f1d0a4-90de-4b6e-a0c6-6b0e5e1f7c2d"],
+                    "sensor": [931, 941],
+                    "status": ["FINISHED", "QUEUED"],
+                    "start": ["2015-06-02T10:00:00+00:00", null],
+                    "duration": ["PT45M", null],
+                    "unit": ["MW", null],
+                    "values": [[2.15, 3, 2], null],
+                    "message": ["StorageScheduler was used.", "Scheduling job queued."]
+                },
+                "status": "PROCESSED",
+                "message": "Request has been processed."
+            }
+
+        :reqheader Authorization: The authentication token
+        :reqheader Content-Type: application/json
+        :resheader Content-Type: application/json
+        :status 200: PROCESSED
+        :status 400: REQUIRED_INFO_MISSING
+        :status 401: UNAUTHORIZED
+        :status 403: INVALID_SENDER
+        :status 405: INVALID_METHOD
+        :status 422: UNPROCESSABLE_ENTITY
+        """
+        if batch_id is not None:
+            job_ids = job_ids + get_batch_job_ids(batch_id)
+        if not job_ids:
+            return required_info_missing(
+                ["job", "batch"], "Please select at least one (existing) job or batch."
+            )
+
+        jobs = fetch_scheduling_jobs(job_ids)
+
+        # Load all scheduled sensors at once, and check read access to each of them
+        sensors = prefetch_sensors(
+            {
+                sensor_id
+                for job in jobs
+                if job is not None
+                for sensor_id in get_scheduled_sensor_ids(job)
+            }
+        )
+        for sensor in sensors:
+            check_access(sensor, "read")
+
+        schedules = get_schedules_for_jobs(job_ids, jobs, duration)
+        d, s = request_processed()
+        return dict(schedules=schedules, **d), s
+
     @route("/<id>", methods=["GET"])
     @use_kwargs({"sensor": SensorIdField(data_key="id")}, location="path")
     @permission_required_for_context("read", ctx_arg_name="sensor")
@@ -14,6 +14,7 @@ from flexmeasures.data.models.planning.tests.utils import check_constraints
 from flexmeasures.data.tests.utils import work_on_rq
 from flexmeasures.data.services.scheduling import (
     handle_scheduling_exception,
+    get_batch_job_ids,
     get_data_source_for_job,
 )
 from flexmeasures.data.services.utils import sort_jobs
@@ -287,3 +288,81 @@ def test_asset_trigger_and_get_schedule(
                 sum(power_schedule[cheapest_hour * 4 : (cheapest_hour + 1) * 4]) > 0
             ), "we expect to charge in the cheapest hour"
             assert_almost_equal(power_schedule, expected_uni_schedule)
+
+
+@pytest.mark.parametrize(
+    "requesting_user", ["test_prosumer_user@seita.nl"], indirect=True
+)
+def test_asset_trigger_schedules_in_batch(
+    app,
+    add_market_prices_fresh_db,
+    setup_roles_users_fresh_db,
+    add_charging_station_assets_fresh_db,
+    keep_scheduling_queue_empty,
+    requesting_user,
+):
+    """Trigger schedules for two charging stations at once, and look up their jobs by batch id."""
+    price_sensor_id = add_market_prices_fresh_db["epex_da"].id
+    schedules, resolutions = [], {}
+    for asset_name in (
+        "Test charging station (bidirectional)",
+        "Test charging station",
+    ):
+        charging_station = add_charging_station_assets_fresh_db[asset_name]
+        message = message_for_trigger_schedule()
+        message["id"] = charging_station.id
+        message["flex-model"]["sensor"] = charging_station.sensors[0].id
+        resolutions[charging_station.sensors[0].id] = charging_station.sensors[
+            0
+        ].event_resolution
+        message["flex-model"] = [message["flex-model"]]
+        message["flex-context"] = {
+            "consumption-price": {"sensor": price_sensor_id},
+            "site-power-capacity": "1 TW",
+        }
+        schedules.append(message)
+
+    assert len(app.queues["scheduling"]) == 0
+    with app.test_client() as client:
+        trigger_response = client.post(
+            url_for("AssetAPI:trigger_schedules"),
+            json={"schedules": schedules},
+        )
+        print("Server responded with:\n%s" % trigger_response.json)
+        assert trigger_response.status_code == 200
+    response = trigger_response.json
+    assert response["errors"] == {}
+    assert [s["asset"] for s in response["schedules"]] == [s["id"] for s in schedules]
+    job_ids = [s["schedule"] for s in response["schedules"]]
+
+    # Both jobs are queued, and registered under the batch id
+    assert sorted(app.queues["scheduling"].job_ids) == sorted(job_ids)
+    assert get_batch_job_ids(response["batch"]) == job_ids
+
+    # Before processing, all schedules are reported as queued
+    with app.test_client() as client:
+        get_schedules_response = client.get(
+            url_for("SensorAPI:get_schedules"),
+            query_string={"batch": response["batch"]},
+        )
+    assert get_schedules_response.status_code == 200
+    assert get_schedules_response.json["schedules"]["status"] == ["QUEUED"] * 2
+
+    # After processing, all schedules can be retrieved at once, in columnar form
+    work_on_rq(app.queues["scheduling"], exc_handler=handle_scheduling_exception)
+    with app.test_client() as client:
+        get_schedules_response = client.get(
+            url_for("SensorAPI:get_schedules"),
+            query_string={"batch": response["batch"], "duration": "PT24H"},
+        )
+        print("Server responded with:\n%s" % get_schedules_response.json)
+    assert get_schedules_response.status_code == 200
+    batch_schedules = get_schedules_response.json["schedules"]
+    assert batch_schedules["job"] == job_ids
+    assert batch_schedules["sensor"] == [
+        s["flex-model"][0]["sensor"] for s in schedules
+    ]
+    assert batch_schedules["status"] == ["FINISHED"] * 2
+    assert batch_schedules["duration"] == ["PT24H"] * 2
+    for sensor_id, values in zip(batch_schedules["sensor"], batch_schedules["values"]):
+        assert len(values) == pd.Timedelta("PT24H") / resolutions[sensor_id]
@@ -27,6 +27,7 @@ def create(  # noqa C901
     env: str | None = None,
     path_to_config: str | None = None,
     plugins: list[str] | None = None,
+    data_only: bool = False,
 ) -> Flask:
     """
     Create a Flask app and configure it.
@@ -37,6 +38,10 @@ def create(  # noqa C901
     A path to a config file can be passed in (otherwise a config file will be searched in the home or instance directories).
 
     Also, a list of plugins can be set. Usually this works as a config setting, but this is useful for automated testing.
+
+    Finally, a data-only app can be requested (as the CLI does for its data commands and job workers).
+    Such an app registers the database, auth, redis queues, data generators, the CLI and plugins,
+    but skips everything needed to serve web requests (CORS, HTTPS, request profiling, the API and the UI).
     """
 
     from flexmeasures.utils import config_defaults
@@ -81,7 +86,8 @@ def create(  # noqa C901
 
     app.mail = Mail(app)
     FlaskJSON(app)
-    CORS(app)
+    if not data_only:
+        CORS(app)
 
     # configure Redis (for redis queue)
     if app.testing:
@@ -106,6 +112,7 @@ def create(  # noqa C901
     app.queues = dict(
         forecasting=Queue(connection=redis_conn, name="forecasting"),
         scheduling=Queue(connection=redis_conn, name="scheduling"),
+        maintenance=Queue(connection=redis_conn, name="maintenance"),
         # reporting=Queue(connection=redis_conn, name="reporting"),
         # labelling=Queue(connection=redis_conn, name="labelling"),
         # alerting=Queue(connection=redis_conn, name="alerting"),
@@ -123,12 +130,12 @@ def create(  # noqa C901
         )
     if app.config.get("SECURITY_PASSWORD_SALT", None) is None:
         app.config["SECURITY_PASSWORD_SALT"] = app.config["SECRET_KEY"]
-    if app.config.get("FLEXMEASURES_FORCE_HTTPS", False):
+    if app.config.get("FLEXMEASURES_FORCE_HTTPS", False) and not data_only:
         SSLify(app)
 
     # Prepare profiling, if needed
 
-    if app.config.get("FLEXMEASURES_PROFILE_REQUESTS", False):
+    if app.config.get("FLEXMEASURES_PROFILE_REQUESTS", False) and not data_only:
         Path("profile_reports").mkdir(parents=True, exist_ok=True)
         try:
             import pyinstrument  # noqa F401
@@ -181,6 +188,13 @@ def create(  # noqa C901
 
     register_cli_at(app)
 
+    if data_only:
+        # Plugins can bring their own CLI commands and data generators, so we still load them
+        from flexmeasures.utils.plugin_utils import register_plugins
+
+        register_plugins(app)
+        return app
+
     # Register the API
 
     from flexmeasures.api import register_at as register_api_at
@@ -224,12 +238,16 @@ def create(  # noqa C901
 
     @app.teardown_request
     def teardown_request(exception=None):
-        if app.config.get("FLEXMEASURES_PROFILE_REQUESTS", False):
-            diff = time.time() - g.start
+        # Also write reports for requests sampled for profiling (see FLEXMEASURES_PROFILE_SAMPLE_RATE)
+        if app.config.get("FLEXMEASURES_PROFILE_REQUESTS", False) or hasattr(
+            g, "profiler"
+        ):
             if all([kw not in request.url for kw in ["/static", "favicon.ico"]]):
-                app.logger.info(
-                    f"[PROFILE] {str(round(diff, 2)).rjust(6)} seconds to serve {request.url}."
-                )
+                if hasattr(g, "start"):
+                    diff = time.time() - g.start
+                    app.logger.info(
+                        f"[PROFILE] {str(round(diff, 2)).rjust(6)} seconds to serve {request.url}."
+                    )
                 if not hasattr(g, "profiler"):
                     return app
                 g.profiler.stop()
@@ -248,4 +266,10 @@ def create(  # noqa C901
                 ) as f:
                     f.write(output_html)
 
+    # Collect lightweight performance metrics (if needed)
+
+    from flexmeasures.utils.metrics import register_at as register_metrics_at
+
+    register_metrics_at(app)
+
     return app
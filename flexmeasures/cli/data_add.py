@@ -13,7 +13,7 @@ from pathlib import Path
 from io import TextIOBase
 from string import Template
 
-from marshmallow import validate
+from marshmallow import validate, ValidationError
 import pandas as pd
 import pytz
 from flask import current_app as app
@@ -28,6 +28,7 @@ import timely_beliefs.utils as tb_utils
 from workalendar.registry import registry as workalendar_registry
 
 from flexmeasures.cli.utils import (
+    abort,
     DeprecatedDefaultGroup,
     MsgStyle,
     DeprecatedOption,
@@ -41,7 +42,23 @@ from flexmeasures.data.scripts.data_gen import (
 )
 from flexmeasures.data.services.data_sources import get_or_create_source
 from flexmeasures.data.services.forecasting import create_forecasting_jobs
-from flexmeasures.data.services.scheduling import make_schedule, create_scheduling_job
+from flexmeasures.data.services.ingestion import (
+    ChunkReport,
+    ingest_csv_in_chunks,
+    load_checkpoint,
+    load_checkpoint_rows,
+)
+from flexmeasures.data.services.reporting import (
+    BatchReport,
+    WindowReport,
+    compute_report_in_windows,
+    run_report_batch,
+)
+from flexmeasures.data.services.scheduling import (
+    make_schedule,
+    create_batch_scheduling_jobs,
+    create_scheduling_job,
+)
 from flexmeasures.data.services.users import create_user
 from flexmeasures.data.models.user import Account, AccountRole, RolesAccounts
 from flexmeasures.data.models.time_series import (
@@ -66,6 +83,7 @@ from flexmeasures.data.schemas import (
 )
 from flexmeasures.data.schemas.sources import DataSourceIdField
 from flexmeasures.data.schemas.times import TimeIntervalSchema
+from flexmeasures.data.schemas.scheduling import AssetBatchTriggerSchema
 from flexmeasures.data.schemas.scheduling.storage import EfficiencyField
 from flexmeasures.data.schemas.sensors import SensorSchema
 from flexmeasures.data.schemas.io import Output
@@ -84,7 +102,7 @@ from flexmeasures.utils import flexmeasures_inflection
 from flexmeasures.utils.time_utils import server_now, apply_offset_chain
 from flexmeasures.utils.unit_utils import convert_units, ur
 from flexmeasures.cli.utils import validate_color_cli, validate_url_cli
-from flexmeasures.data.utils import save_to_db
+from flexmeasures.data.utils import save_to_db_in_bulk
 from flexmeasures.data.services.utils import get_asset_or_sensor_ref
 from flexmeasures.data.models.reporting import Reporter
 from flexmeasures.data.models.reporting.profit import ProfitOrLossReporter
@@ -660,6 +678,29 @@ def add_source(name: str, model: str, version: str, source_type: str):
     type=int,
     help="[For xls or xlsx files] Sheet number with the data (0 is 1st sheet)",
 )
+@click.option(
+    "--chunk-size",
+    required=False,
+    type=click.IntRange(min=1),
+    help="[For CSV files] Ingest the file in chunks of this many rows, committing each chunk separately."
+    " Use this for large files."
+    " When resampling, make sure chunk boundaries do not split the sensor's event resolution.",
+)
+@click.option(
+    "--workers",
+    required=False,
+    default=1,
+    type=click.IntRange(min=1),
+    help="[Only with --chunk-size] Number of processes used to parse chunks in parallel, defaults to 1.",
+)
+@click.option(
+    "--checkpoint",
+    "checkpoint_path",
+    required=False,
+    type=click.Path(dir_okay=False),
+    help="[Only with --chunk-size] Keep track of the number of committed rows in this file."
+    " If the import is interrupted, running the same command again resumes after the checkpoint.",
+)
 def add_beliefs(
     file: str,
     sensor: Sensor,
@@ -683,6 +724,9 @@ def add_beliefs(
     decimal: str = ".",
     thousands: str | None = None,
     sheet_number: int | None = None,
+    chunk_size: int | None = None,
+    workers: int = 1,
+    checkpoint_path: str | None = None,
     **kwargs,  # in-code calls to this CLI command can set additional kwargs for use in pandas.read_csv or pandas.read_excel
 ):
     """Add sensor data from a CSV or Excel file.
@@ -702,11 +746,19 @@ def add_beliefs(
 
     In case no --horizon is specified and no beliefcol is specified,
     the moment of executing this CLI command is taken as the time at which the beliefs were recorded.
+
+    Large CSV files can be ingested in chunks (see --chunk-size), which keeps memory use bounded,
+    can use multiple processes for parsing (see --workers) and can be resumed when interrupted (see --checkpoint).
     """
+    is_csv = file.split(".")[-1].lower() == "csv"
+    if chunk_size is None and (workers > 1 or checkpoint_path is not None):
+        abort("The --workers and --checkpoint options require --chunk-size.")
+    if chunk_size is not None and not is_csv:
+        abort("Ingesting in chunks is only supported for CSV files.")
     _source = parse_source(source)
 
     # Set up optional parameters for read_csv
-    if file.split(".")[-1].lower() == "csv":
+    if is_csv:
         kwargs["delimiter"] = delimiter
         kwargs["decimal"] = decimal
         kwargs["thousands"] = thousands
@@ -725,18 +777,43 @@ def add_beliefs(
     filter_by_column = (
         dict(zip(filter_columns, filter_values)) if filter_columns else None
     )
-    bdf = tb.read_csv(
+    usecols = (
+        [datecol, valuecol] if beliefcol is None else [datecol, beliefcol, valuecol]
+    )
+    if chunk_size is not None:
+        _add_beliefs_in_chunks(
+            file,
+            sensor,
+            _source,
+            chunk_size=chunk_size,
+            workers=workers,
+            checkpoint_path=checkpoint_path,
+            skiprows=skiprows,
+            nrows=nrows,
+            unit=unit,
+            allow_overwrite=allow_overwrite,
+            cumulative_probability=cp,
+            resample=resample,
+            usecols=usecols,
+            parse_dates=True,
+            na_values=na_values,
+            keep_default_na=keep_default_na,
+            timezone=timezone,
+            filter_by_column=filter_by_column,
+            **kwargs,
+        )
+        return
+    _add_beliefs_at_once(
         file,
         sensor,
-        source=_source,
+        _source,
+        unit=unit,
+        allow_overwrite=allow_overwrite,
         cumulative_probability=cp,
         resample=resample,
-        header=None,
         skiprows=skiprows,
         nrows=nrows,
-        usecols=(
-            [datecol, valuecol] if beliefcol is None else [datecol, beliefcol, valuecol]
-        ),
+        usecols=usecols,
         parse_dates=True,
         na_values=na_values,
         keep_default_na=keep_default_na,
@@ -744,6 +821,18 @@ def add_beliefs(
         filter_by_column=filter_by_column,
         **kwargs,
     )
+
+
+def _add_beliefs_at_once(
+    file: str,
+    sensor: Sensor,
+    source: DataSource,
+    unit: str | None,
+    allow_overwrite: bool,
+    **kwargs,
+):
+    """Read a CSV or Excel file as a whole, and save its beliefs in one transaction."""
+    bdf = tb.read_csv(file, sensor, source=source, header=None, **kwargs)
     duplicate_rows = bdf.index.duplicated(keep="first")
     if any(duplicate_rows) > 0:
         click.secho(
@@ -781,6 +870,138 @@ def add_beliefs(
             )
 
 
+def _add_beliefs_in_chunks(
+    file: str,
+    sensor: Sensor,
+    source: DataSource,
+    chunk_size: int,
+    workers: int,
+    checkpoint_path: str | None,
+    **kwargs,
+):
+    """Ingest a CSV file chunk by chunk, reporting progress after each chunk."""
+    if checkpoint_path is not None:
+        rows_saved = load_checkpoint_rows(checkpoint_path)
+        if rows_saved:
+            click.secho(
+                f"Resuming from checkpoint: skipping the first {rows_saved} rows, which were saved already.",
+                **MsgStyle.WARN,
+            )
+    start_time = server_now()
+    rows_read = 0
+
+    def report_progress(report: ChunkReport):
+        nonlocal rows_read
+        rows_read += report.rows_read
+        seconds = max((server_now() - start_time).total_seconds(), 1e-3)
+        duplicates = (
+            f" (dropped {report.duplicates_dropped} duplicates)"
+            if report.duplicates_dropped
+            else ""
+        )
+        click.echo(
+            f"Chunk {report.chunk_number + 1}: saved {report.beliefs_saved} beliefs{duplicates}"
+            f" up to event start {report.last_event_start} [{rows_read / seconds:.0f} rows/s]"
+        )
+
+    try:
+        beliefs_saved = ingest_csv_in_chunks(
+            file,
+            sensor,
+            source,
+            chunk_size=chunk_size,
+            workers=workers,
+            checkpoint_path=checkpoint_path,
+            on_chunk_saved=report_progress,
+            **kwargs,
+        )
+    except IntegrityError as e:
+        db.session.rollback()
+        click.secho(
+            f"Failed to create beliefs due to the following error: {e.orig}",
+            **MsgStyle.ERROR,
+        )
+        if checkpoint_path is not None:
+            click.secho(
+                f"Beliefs up to the checkpoint in {checkpoint_path} have been saved.",
+                **MsgStyle.ERROR,
+            )
+        if not kwargs.get("allow_overwrite"):
+            click.secho(
+                "As a possible workaround, use the --allow-overwrite flag.",
+                **MsgStyle.ERROR,
+            )
+        return
+    click.secho(
+        f"Successfully created {beliefs_saved} beliefs from {rows_read} rows.",
+        **MsgStyle.SUCCESS,
+    )
+
+
+@fm_add_data.command("bundle")
+@with_appcontext
+@click.option(
+    "--path",
+    "path",
+    required=True,
+    type=click.Path(exists=True, file_okay=False),
+    help="Directory holding the bundle (see `flexmeasures show bundle`).",
+)
+@click.option(
+    "--account",
+    "account",
+    type=AccountIdField(required=False),
+    required=False,
+    help="Add the assets to this account. Follow up with the account's ID."
+    " If not set, the assets will become public (which makes them accessible to all users).",
+)
+def add_bundle(path: str, account: Account | None = None):
+    """
+    Import sensors and assets, with their beliefs and data sources, from a Parquet bundle.
+
+    New assets and sensors are created, so their IDs differ from those in the bundle.
+    Data sources that already exist are reused. Beliefs are loaded in bulk, and committed per sensor.
+    Requires pyarrow.
+    """
+    try:
+        from flexmeasures.data.services.bundles import BundledSensor, import_bundle
+        import pyarrow  # noqa: F401
+    except ImportError:
+        click.secho(
+            "Importing bundles requires installing pyarrow (e.g. pip install flexmeasures[parquet]).",
+            **MsgStyle.ERROR,
+        )
+        raise click.Abort()
+    if account is None:
+        click.secho(
+            "Creating PUBLIC assets, as no --account is given ...",
+            **MsgStyle.WARN,
+        )
+
+    def report_sensor(bundled: BundledSensor):
+        click.echo(f"Imported {bundled.beliefs} beliefs of sensor {bundled.sensor_id}.")
+
+    try:
+        new_ids = import_bundle(
+            path,
+            account_id=account.id if account is not None else None,
+            on_sensor_done=report_sensor,
+        )
+    except ValueError as e:
+        click.secho(f"Failed to import bundle: {e}", **MsgStyle.ERROR)
+        raise click.Abort()
+    for kind in ("assets", "sensors", "sources"):
+        if new_ids[kind]:
+            click.echo(
+                f"New {kind[:-1]} IDs: "
+                + ", ".join(f"{old} -> {new}" for old, new in new_ids[kind].items())
+            )
+    click.secho(
+        f"Successfully imported {len(new_ids['assets'])} assets and {len(new_ids['sensors'])} sensors.",
+        **MsgStyle.SUCCESS,
+    )
+
+
 @fm_add_data.command("annotation", cls=DeprecatedOptionsCommand)
 @with_appcontext
 @click.option(
@@ -1037,6 +1258,12 @@ def add_holidays(
     help="Whether to queue a forecasting job instead of computing directly. "
     "To process the job, run a worker (on any computer, but configured to the same databases) to process the 'forecasting' queue. Defaults to False.",
 )
+@click.option(
+    "--batch-horizons",
+    is_flag=True,
+    help="[Only with --as-job] Queue one job per sensor for all horizons, rather than one job per horizon,"
+    " so the sensor's data is loaded only once, and the models for the different horizons are trained in parallel.",
+)
 def create_forecasts(
     sensor_ids: list[int],
     from_date_str: str = "2015-02-08",
@@ -1044,6 +1271,7 @@ def create_forecasts(
     horizons_as_hours: list[str] = ["1"],
     resolution: int | None = None,
     as_job: bool = False,
+    batch_horizons: bool = False,
 ):
     """
     Create forecasts.
@@ -1075,16 +1303,17 @@ def create_forecasts(
     if as_job:
         num_jobs = 0
         for sensor_id in sensor_ids:
-            for horizon in horizons:
-                # Note that this time period refers to the period of events we are forecasting, while in create_forecasting_jobs
-                # the time period refers to the period of belief_times, therefore we are subtracting the horizon.
-                jobs = create_forecasting_jobs(
-                    sensor_id=sensor_id,
-                    horizons=[horizon],
-                    start_of_roll=forecast_start - horizon,
-                    end_of_roll=forecast_end - horizon,
-                )
-                num_jobs += len(jobs)
+            # Note that this time period refers to the period of events we are forecasting, while in create_forecasting_jobs
+            # the time period refers to the period of belief_times by default, therefore we are fixing the event period.
+            jobs = create_forecasting_jobs(
+                sensor_id=sensor_id,
+                horizons=horizons,
+                start_of_roll=forecast_start,
+                end_of_roll=forecast_end,
+                batch_horizons=batch_horizons,
+                fixed_event_period=True,
+            )
+            num_jobs += len(jobs)
         click.secho(
             f"{num_jobs} new forecasting job(s) added to the queue.",
             **MsgStyle.SUCCESS,
@@ -1654,6 +1883,53 @@ def add_schedule_process(
             click.secho("New schedule is stored.", **MsgStyle.SUCCESS)
 
 
+@create_schedule.command("for-assets")
+@with_appcontext
+@click.option(
+    "--batch-file",
+    "batch_file",
+    type=click.File("r"),
+    required=True,
+    help="Path to a JSON file with scheduling requests for many assets, in the format of the POST /assets/schedules/trigger endpoint,"
+    ' i.e. {"schedules": [{"id": <asset ID>, "start": <datetime>, "flex-model": [...], "flex-context": {...}}, ...]}.',
+)
+def add_schedules_for_assets(batch_file: TextIOBase):
+    """Queue scheduling jobs for many assets at once.
+
+    All jobs are enqueued in one go, and can be looked up later by the batch ID that is printed.
+    """
+    try:
+        batch = json.load(batch_file)
+    except json.decoder.JSONDecodeError as jde:
+        click.secho(
+            f"Error decoding --batch-file. Please check your JSON: {jde}",
+            **MsgStyle.ERROR,
+        )
+        raise click.Abort()
+    try:
+        schedules = AssetBatchTriggerSchema().load(batch)["schedules"]
+    except ValidationError as err:
+        click.secho(
+            f"Invalid scheduling requests: {err.messages}",
+            **MsgStyle.ERROR,
+        )
+        raise click.Abort()
+
+    batch_id, jobs, errors = create_batch_scheduling_jobs(schedules)
+    for i, error in errors.items():
+        click.secho(
+            f"Skipped scheduling request {i} (asset {schedules[i]['asset'].id}): {error}",
+            **MsgStyle.WARN,
+        )
+    num_jobs = len(schedules) - len(errors)
+    if num_jobs == 0:
+        raise click.Abort()
+    click.secho(
+        f"Added {num_jobs} scheduling job(s) to the queue (batch {batch_id}).",
+        **MsgStyle.SUCCESS,
+    )
+
+
 @fm_add_data.command("report")
 @with_appcontext
 @click.option(
@@ -1761,6 +2037,44 @@ def add_schedule_process(
     is_flag=True,
     help="Add this flag to save the `config` in the attributes of the DataSource for future reference.",
 )
+@click.option(
+    "--window",
+    "window",
+    type=DurationField(),
+    required=False,
+    help="Compute the report in (aligned) windows of this length, saving each window separately."
+    " Use this for long periods, to keep memory use bounded. Follow up with a ISO 8601 duration string, e.g. P1D.",
+)
+@click.option(
+    "--window-overlap",
+    "window_overlap",
+    type=DurationField(),
+    required=False,
+    help="[Only with --window] Include this much data preceding each window in its computation,"
+    " e.g. for rolling transformations. Follow up with a ISO 8601 duration string, e.g. PT1H.",
+)
+@click.option(
+    "--workers",
+    required=False,
+    default=1,
+    type=click.IntRange(min=1),
+    help="[Only with --window] Number of processes used to compute windows in parallel, defaults to 1.",
+)
+@click.option(
+    "--checkpoint",
+    "checkpoint_path",
+    required=False,
+    type=click.Path(dir_okay=False),
+    help="[Only with --window] Keep track of the last saved window in this file."
+    " If the computation is interrupted, running the same command again resumes after the checkpoint.",
+)
+@click.option(
+    "--incremental",
+    "incremental",
+    is_flag=True,
+    help="[Only with --window] Only recompute windows with input data that is new since the previous incremental run."
+    " The last processed belief time of each input sensor is stored on the data source of the report.",
+)
 def add_report(  # noqa: C901
     reporter_class: str,
     source: DataSource | None = None,
@@ -1777,11 +2091,37 @@ def add_report(  # noqa: C901
     edit_parameters: bool = False,
     save_config: bool = False,
     timezone: str | None = None,
+    window: timedelta | None = None,
+    window_overlap: timedelta | None = None,
+    workers: int = 1,
+    checkpoint_path: str | None = None,
+    incremental: bool = False,
 ):
     """
     Create a new report using the Reporter class and save the results
     to the database or export them as CSV or Excel file.
+
+    Reports over long periods can be computed window by window (see --window), which keeps memory use bounded,
+    can use multiple processes (see --workers) and can be resumed when interrupted (see --checkpoint).
+    Reports that are run regularly over a trailing period can be limited to windows with new input data (see --incremental).
     """
+    if window is None and (
+        window_overlap is not None
+        or workers > 1
+        or checkpoint_path is not None
+        or incremental
+    ):
+        click.secho(
+            "The --window-overlap, --workers, --checkpoint and --incremental options require --window.",
+            **MsgStyle.ERROR,
+        )
+        raise click.Abort()
+    if window is not None and output_file_pattern is not None:
+        click.secho(
+            "Exporting the report to a file is not supported when computing it in windows.",
+            **MsgStyle.ERROR,
+        )
+        raise click.Abort()
 
     config = dict()
 
@@ -1922,6 +2262,19 @@ def add_report(  # noqa: C901
     if ("resolution" not in parameters) and (resolution is not None):
         parameters["resolution"] = pd.Timedelta(resolution).isoformat()
 
+    if window is not None:
+        _add_report_in_windows(
+            reporter,
+            parameters,
+            window=window,
+            overlap=window_overlap or timedelta(0),
+            workers=workers,
+            checkpoint_path=checkpoint_path,
+            dry_run=dry_run,
+            incremental=incremental,
+        )
+        return
+
     click.echo("Report computation is running...")
 
     # compute the report
@@ -1943,7 +2296,7 @@ def add_report(  # noqa: C901
         # save the report if it's not running in dry mode
         if not dry_run:
             click.echo(f"Saving report for sensor `{sensor}` to the database...")
-            save_to_db(data)
+            save_to_db_in_bulk(data)
             db.session.commit()
             click.secho(
                 f"Success. The report for sensor `{sensor}` has been saved to the database.",
@@ -1998,6 +2351,203 @@ def add_report(  # noqa: C901
             )
 
 
+def _add_report_in_windows(
+    reporter: Reporter,
+    parameters: dict,
+    window: timedelta,
+    overlap: timedelta,
+    workers: int,
+    checkpoint_path: str | None,
+    dry_run: bool,
+    incremental: bool,
+):
+    """Compute a report window by window, reporting progress after each window."""
+    if checkpoint_path is not None:
+        last_window_start = load_checkpoint(checkpoint_path)
+        if last_window_start is not None:
+            click.secho(
+                f"Resuming from checkpoint: skipping windows up to and including the one starting at {last_window_start}.",
+                **MsgStyle.WARN,
+            )
+    click.echo("Report computation is running...")
+
+    def report_progress(report: WindowReport):
+        action = "computed" if dry_run else "saved"
+        click.echo(
+            f"Window {report.window_number + 1}/{report.window_count} ({report.start} - {report.end}):"
+            f" {action} {report.beliefs_computed} beliefs"
+        )
+
+    beliefs_computed = compute_report_in_windows(
+        reporter,
+        parameters,
+        window=window,
+        overlap=overlap,
+        workers=workers,
+        checkpoint_path=checkpoint_path,
+        save=not dry_run,
+        incremental=incremental,
+        on_window_done=report_progress,
+    )
+    if dry_run:
+        click.echo(
+            f"Not saving {beliefs_computed} computed beliefs to the database (because of --dry-run)."
+        )
+    else:
+        click.secho(
+            f"Success. The report ({beliefs_computed} beliefs) has been saved to the database.",
+            **MsgStyle.SUCCESS,
+        )
+
+
+@fm_add_data.command("reports")
+@with_appcontext
+@click.option(
+    "--batch-file",
+    "batch_file",
+    type=click.File("r"),
+    required=True,
+    help="Path to a JSON or YAML file with many reports, in the format"
+    " {start: <datetime>, end: <datetime>, reports: [{reporter: <class>, config: {...}, parameters: {...}}, ...]}."
+    " Instead of a reporter class and config, a report can refer to the ID of a reporter data source (source: <ID>)."
+    " The start and end apply to reports whose parameters do not set them.",
+)
+@click.option(
+    "--start",
+    "start",
+    type=AwareDateTimeField(),
+    required=False,
+    help="Start of all reports (overrides the batch file). Follow up with a timezone-aware datetime in ISO 6801 format.",
+)
+@click.option(
+    "--end",
+    "end",
+    type=AwareDateTimeField(),
+    required=False,
+    help="End of all reports (overrides the batch file). Follow up with a timezone-aware datetime in ISO 6801 format.",
+)
+@click.option(
+    "--workers",
+    required=False,
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of threads used to compute independent reports in parallel, defaults to 1.",
+)
+@click.option(
+    "--dry-run",
+    "dry_run",
+    is_flag=True,
+    help="Add this flag to avoid saving the results to the database."
+    " Note that reports reading the output of other reports will then not see their results.",
+)
+@click.option(
+    "--save-config",
+    "save_config",
+    is_flag=True,
+    help="Add this flag to save the `config` in the attributes of the DataSources for future reference.",
+)
+def add_reports(
+    batch_file: TextIOBase,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    workers: int = 1,
+    dry_run: bool = False,
+    save_config: bool = False,
+):
+    """
+    Compute many reports at once, sharing their input data.
+
+    Each distinct search for input data is run only once.
+    Reports reading the output of other reports are computed after them,
+    while independent reports can be computed in parallel (see --workers).
+    """
+    batch = yaml.safe_load(batch_file)
+    if not isinstance(batch, dict) or not batch.get("reports"):
+        click.secho(
+            "The batch file should list at least one report under `reports`.",
+            **MsgStyle.ERROR,
+        )
+        raise click.Abort()
+
+    reporters = []
+    parameters = []
+    for i, report in enumerate(batch["reports"]):
+        try:
+            reporters.append(_load_batch_reporter(report, save_config))
+        except (ValueError, NotImplementedError, ValidationError) as e:
+            click.secho(f"Invalid report {i}: {e}", **MsgStyle.ERROR)
+            raise click.Abort()
+        parameters.append(_get_batch_report_parameters(i, report, batch, start, end))
+
+    click.echo(f"Computing {len(reporters)} reports...")
+
+    def report_progress(report: BatchReport):
+        action = "computed" if dry_run else "saved"
+        click.echo(
+            f"Report {report.report_number + 1}/{report.report_count} (stage {report.stage + 1}):"
+            f" {action} {report.beliefs_computed} beliefs"
+        )
+
+    try:
+        input_cache = run_report_batch(
+            reporters,
+            parameters,
+            workers=workers,
+            save=not dry_run,
+            on_report_done=report_progress,
+        )
+    except ValueError as e:
+        click.secho(str(e), **MsgStyle.ERROR)
+        raise click.Abort()
+    click.secho(
+        f"Success. Input data was loaded with {input_cache.misses} searches,"
+        f" and reused {input_cache.hits} times.",
+        **MsgStyle.SUCCESS,
+    )
+
+
+def _load_batch_reporter(report: dict, save_config: bool) -> Reporter:
+    """Load the reporter of a report in a batch file, from a data source or by class name."""
+    if "source" in report:
+        source = db.session.get(DataSource, report["source"])
+        if source is None:
+            raise ValueError(f"Data source {report['source']} not found.")
+        reporter = source.data_generator
+        if not isinstance(reporter, Reporter):
+            raise ValueError(f"Data source {source} is not storing a Reporter.")
+        reporter._save_config = save_config
+        return reporter
+    ReporterClass: Type[Reporter] | None = app.data_generators["reporter"].get(
+        report.get("reporter")
+    )
+    if ReporterClass is None:
+        raise ValueError(f"Reporter class `{report.get('reporter')}` not available.")
+    return ReporterClass(config=report.get("config", {}), save_config=save_config)
+
+
+def _get_batch_report_parameters(
+    i: int,
+    report: dict,
+    batch: dict,
+    start: datetime | None,
+    end: datetime | None,
+) -> dict:
+    """Set the start and end of a report in a batch file, from the CLI options, the batch file or the report itself."""
+    parameters = report.get("parameters", {})
+    for field, value in (("start", start), ("end", end)):
+        if value is not None:
+            parameters[field] = value.isoformat()
+        elif field not in parameters and field in batch:
+            parameters[field] = pd.Timestamp(batch[field]).isoformat()
+        elif field not in parameters:
+            click.secho(
+                f"Invalid report {i}: no {field} set (use --{field}, or set it in the batch file).",
+                **MsgStyle.ERROR,
+            )
+            raise click.Abort()
+    return parameters
+
+
 def launch_editor(filename: str) -> dict:
     """Launch editor to create/edit a json object"""
     click.edit("{\n}", filename=filename)
@@ -5,12 +5,10 @@ CLI commands for removing data
 from __future__ import annotations
 
 from datetime import datetime, timedelta
-from itertools import chain
 
 import click
 from flask import current_app as app
 from flask.cli import with_appcontext
-from timely_beliefs.beliefs.queries import query_unchanged_beliefs
 from sqlalchemy import delete, func, select
 
 
@@ -18,7 +16,19 @@ from flexmeasures.data import db
 from flexmeasures.data.models.user import Account, AccountRole, RolesAccounts, User
 from flexmeasures.data.models.generic_assets import GenericAsset
 from flexmeasures.data.models.time_series import Sensor, TimedBelief
-from flexmeasures.data.schemas import AwareDateTimeField, SensorIdField, AssetIdField
+from flexmeasures.data.schemas import (
+    AwareDateTimeField,
+    DurationField,
+    SensorIdField,
+    AssetIdField,
+)
+from flexmeasures.data.services.compaction import (
+    CompactionChunk,
+    compact_beliefs,
+    create_compaction_job,
+    get_compaction_progress,
+    reset_compaction_progress,
+)
 from flexmeasures.data.services.users import find_user_by_email, delete_user
 from flexmeasures.cli.utils import (
     abort,
@@ -354,67 +364,136 @@ def delete_beliefs(  # noqa: C901
     default=True,
     help="Use the --keep-measurements flag to keep beliefs with a zero or negative belief horizon (measurements, nowcasts and backcasts).",
 )
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help="Maximum number of beliefs to delete per transaction.",
+)
+@click.option(
+    "--chunk",
+    type=DurationField(),
+    required=False,
+    help="Compact beliefs about events in periods of this length, one at a time (defaults to a week)."
+    " Follow up with a ISO 8601 duration string, e.g. P1D.",
+)
+@click.option(
+    "--pause",
+    type=click.FloatRange(min=0),
+    default=0.1,
+    show_default=True,
+    help="Number of seconds to wait between batches, to leave room for other database traffic.",
+)
+@click.option(
+    "--max-duration",
+    type=DurationField(),
+    required=False,
+    help="Stop after this much time (finishing the current chunk). Run the command again to resume."
+    " Follow up with a ISO 8601 duration string, e.g. PT1H.",
+)
+@click.option(
+    "--as-job",
+    is_flag=True,
+    default=False,
+    help="Queue the compaction as a job on the maintenance queue, which requeues itself every 10 minutes (or --max-duration) until done.",
+)
+@click.option(
+    "--continuous",
+    is_flag=True,
+    default=False,
+    help="Keep compacting: once done, queue a new run after an hour (requires --as-job).",
+)
+@click.option(
+    "--restart",
+    is_flag=True,
+    default=False,
+    help="Start from the beginning, rather than resuming an unfinished run.",
+)
 def delete_unchanged_beliefs(
     sensor_id: int | None = None,
     delete_unchanged_forecasts: bool = True,
     delete_unchanged_measurements: bool = True,
+    batch_size: int = 1000,
+    chunk: timedelta | None = None,
+    pause: float = 0.1,
+    max_duration: timedelta | None = None,
+    as_job: bool = False,
+    continuous: bool = False,
+    restart: bool = False,
 ):
-    """Delete unchanged beliefs (i.e. updated beliefs with a later belief time, but with the same event value)."""
-    q = select(TimedBelief)
+    """Delete unchanged beliefs (i.e. updated beliefs with a later belief time, but with the same event value).
+
+    Beliefs are compared sensor by sensor, and chunk by chunk, and deleted in small batches (each in its own transaction),
+    so the database stays available. Progress is saved, so an interrupted run resumes where it left off.
+    """
+    sensor_ids = None
     if sensor_id:
         sensor = db.session.get(Sensor, sensor_id)
         if sensor is None:
             abort(f"Failed to delete any beliefs: no sensor found with id {sensor_id}.")
-        q = q.filter_by(sensor_id=sensor.id)
-    num_beliefs_before = db.session.scalar(select(func.count()).select_from(q))
-    unchanged_queries = []
-    num_forecasts_up_for_deletion = 0
-    num_measurements_up_for_deletion = 0
-    if delete_unchanged_forecasts:
-        q_unchanged_forecasts = query_unchanged_beliefs(
-            db.session,
-            TimedBelief,
-            q.filter(
-                TimedBelief.belief_horizon > timedelta(0),
-            ),
-            include_non_positive_horizons=False,
-        )
-        unchanged_queries.append(q_unchanged_forecasts)
-        num_forecasts_up_for_deletion = db.session.scalar(
-            select(func.count()).select_from(q_unchanged_forecasts)
-        )
-    if delete_unchanged_measurements:
-        q_unchanged_measurements = query_unchanged_beliefs(
-            db.session,
-            TimedBelief,
-            q.filter(
-                TimedBelief.belief_horizon <= timedelta(0),
-            ),
-            include_positive_horizons=False,
-        )
-        unchanged_queries.append(q_unchanged_measurements)
-        num_measurements_up_for_deletion = db.session.scalar(
-            select(func.count()).select_from(q_unchanged_measurements)
+        sensor_ids = [sensor.id]
+    if continuous and not as_job:
+        abort("The --continuous option requires --as-job.")
+    if not delete_unchanged_forecasts and not delete_unchanged_measurements:
+        abort("Nothing to delete when keeping both forecasts and measurements.")
+    for duration in (chunk, max_duration):
+        if duration is not None and not isinstance(duration, timedelta):
+            abort("Durations in months or years are not supported.")
+    if restart:
+        reset_compaction_progress(sensor_ids)
+    progress = get_compaction_progress(sensor_ids)
+    if progress is not None:
+        click.echo(
+            f"Resuming compaction from sensor {progress['sensor_id']} (events from {progress['chunk_start']}),"
+            f" {progress['beliefs_deleted']} beliefs having been deleted since {progress['started_at']}."
         )
 
-    num_beliefs_up_for_deletion = (
-        num_forecasts_up_for_deletion + num_measurements_up_for_deletion
+    kinds = join_words_into_a_list(
+        (["forecasts"] if delete_unchanged_forecasts else [])
+        + (["measurements"] if delete_unchanged_measurements else [])
     )
-    prompt = f"Delete {num_beliefs_up_for_deletion} unchanged beliefs ({num_measurements_up_for_deletion} measurements and {num_forecasts_up_for_deletion} forecasts) out of {num_beliefs_before} beliefs?"
-    click.confirm(prompt, abort=True)
+    target = f"sensor {sensor_id}" if sensor_ids else "all sensors"
+    click.confirm(
+        f"Delete unchanged {kinds} of {target}, in batches of {batch_size}?",
+        abort=True,
+    )
+    compaction_kwargs = dict(
+        sensor_ids=sensor_ids,
+        chunk=chunk if chunk is not None else timedelta(days=7),
+        batch_size=batch_size,
+        pause=pause,
+        forecasts=delete_unchanged_forecasts,
+        measurements=delete_unchanged_measurements,
+    )
+    if as_job:
+        job = create_compaction_job(
+            **compaction_kwargs,
+            max_duration=(
+                max_duration if max_duration is not None else timedelta(minutes=10)
+            ),
+            continuous=continuous,
+        )
+        done(f"Queued belief compaction job {job.id} on the maintenance queue.")
+        return
+
+    def report_chunk(chunk: CompactionChunk):
+        if chunk.beliefs_deleted:
+            click.echo(
+                f"Sensor {chunk.sensor_id} ({chunk.start} - {chunk.end}): deleted {chunk.beliefs_deleted} beliefs"
+                f" ({chunk.beliefs_deleted_per_minute:.0f} per minute)."
+            )
 
-    beliefs_up_for_deletion = list(
-        chain(*[db.session.scalars(q).all() for q in unchanged_queries])
+    finished = compact_beliefs(
+        **compaction_kwargs, max_duration=max_duration, on_chunk_done=report_chunk
     )
-    batch_size = 10000
-    for i, b in enumerate(beliefs_up_for_deletion, start=1):
-        if i % batch_size == 0 or i == num_beliefs_up_for_deletion:
-            click.echo(f"{i} beliefs processed ...")
-        db.session.delete(b)
-    click.secho(f"Removing {num_beliefs_up_for_deletion} beliefs ...")
-    db.session.commit()
-    num_beliefs_after = db.session.scalar(select(func.count()).select_from(q))
-    done(f"{num_beliefs_after} beliefs left.")
+    if not finished:
+        progress = get_compaction_progress(sensor_ids)
+        done(
+            f"Stopped after deleting {progress['beliefs_deleted']} unchanged beliefs. Run this command again to resume."
+        )
+    else:
+        done("Deleted all unchanged beliefs.")
 
 
 @fm_delete_data.command("nan-beliefs", cls=DeprecatedOptionsCommand)
@@ -5,6 +5,7 @@ CLI commands for editing data
 from __future__ import annotations
 
 from datetime import timedelta
+import os
 
 import click
 import pandas as pd
@@ -13,17 +14,23 @@ from flask.cli import with_appcontext
 import json
 from flexmeasures.data.models.user import Account
 from flexmeasures.data.schemas.account import AccountIdField
-from sqlalchemy import delete
 
 from flexmeasures import Sensor, Asset
 from flexmeasures.data import db
+from flexmeasures.data.schemas import DurationField
 from flexmeasures.data.schemas.attributes import validate_special_attributes
 from flexmeasures.data.schemas.generic_assets import GenericAssetIdField
 from flexmeasures.data.schemas.sensors import SensorIdField
 from flexmeasures.data.models.generic_assets import GenericAsset
 from flexmeasures.data.models.audit_log import AssetAuditLog
-from flexmeasures.data.models.time_series import TimedBelief
-from flexmeasures.data.utils import save_to_db
+from flexmeasures.data.services.resampling import (
+    BeliefStatistics,
+    ResamplingChunk,
+    check_resampling,
+    get_belief_statistics,
+    get_resampling_period,
+    resample_beliefs_in_chunks,
+)
 from flexmeasures.cli.utils import MsgStyle, DeprecatedOption, DeprecatedOptionsCommand
 
 
@@ -194,45 +201,94 @@ def edit_attribute(
     required=False,
     help="Resample only data until this datetime. Follow up with a timezone-aware datetime in ISO 6801 format.",
 )
+@click.option(
+    "--chunk",
+    type=DurationField(),
+    required=False,
+    help="Resample data about events in periods of this length, one at a time, each in its own transaction"
+    " (defaults to a week). Should be a multiple of both event resolutions."
+    " Follow up with a ISO 8601 duration string, e.g. P1D.",
+)
+@click.option(
+    "--in-database",
+    is_flag=True,
+    default=False,
+    help="Resample in the database, using time buckets aligned to UTC, rather than in Python."
+    " Downsampled events get the mean value of the beliefs in their bucket with the same belief horizon (and source),"
+    " and upsampled events repeat their original value."
+    " Belief horizons are recomputed using the sensor's knowledge horizon."
+    " Requires one event resolution to be a multiple of the other.",
+)
+@click.option(
+    "--checkpoint",
+    "checkpoint_path",
+    required=False,
+    type=click.Path(dir_okay=False),
+    help="[Only with a single --sensor] Keep track of the last resampled chunk in this file."
+    " If resampling is interrupted, running the same command again resumes after the checkpoint.",
+)
 @click.option(
     "--skip-integrity-check",
     is_flag=True,
     help="Whether to skip checking the resampled time series data for each sensor."
-    " By default, an excerpt and the mean value of the original"
-    " and resampled data will be shown for manual approval.",
+    " By default, summary statistics of the original data"
+    " will be shown for manual approval.",
 )
 def resample_sensor_data(
     sensor_ids: list[int],
     event_resolution_in_minutes: int,
     start_str: str | None = None,
     end_str: str | None = None,
+    chunk: timedelta | None = None,
+    in_database: bool = False,
+    checkpoint_path: str | None = None,
     skip_integrity_check: bool = False,
 ):
-    """Assign a new event resolution to an existing sensor and resample its data accordingly."""
+    """Assign a new event resolution to an existing sensor and resample its data accordingly.
+
+    Data is resampled chunk by chunk, each in its own transaction, so memory use stays bounded.
+    The sensor's event resolution is updated once all of its data is resampled.
+    Until then, it is best not to write data to the sensor.
+    """
     event_resolution = timedelta(minutes=event_resolution_in_minutes)
     event_starts_after = pd.Timestamp(start_str)  # note that "" or None becomes NaT
     event_ends_before = pd.Timestamp(end_str)
+    if chunk is None:
+        chunk = timedelta(days=7)
+    _check_resampling_options(sensor_ids, chunk, checkpoint_path)
     for sensor_id in sensor_ids:
         sensor = db.session.get(Sensor, sensor_id)
         if sensor.event_resolution == event_resolution:
             click.echo(f"{sensor} already has the desired event resolution.")
             continue
-        df_original = sensor.search_beliefs(
-            most_recent_beliefs_only=False,
-            event_starts_after=event_starts_after,
-            event_ends_before=event_ends_before,
-        ).sort_values("event_start")
-        df_resampled = df_original.resample_events(event_resolution).sort_values(
-            "event_start"
+        try:
+            check_resampling(
+                sensor.event_resolution, event_resolution, chunk, in_database
+            )
+        except ValueError as e:
+            click.secho(f"Cannot resample {sensor}: {e}", **MsgStyle.ERROR)
+            raise click.Abort()
+        period = get_resampling_period(
+            sensor,
+            event_starts_after=(
+                event_starts_after if not pd.isnull(event_starts_after) else None
+            ),
+            event_ends_before=(
+                event_ends_before if not pd.isnull(event_ends_before) else None
+            ),
         )
-        if not skip_integrity_check:
-            message = ""
-            if sensor.event_resolution < event_resolution:
-                message += f"Downsampling {sensor} to {event_resolution} will result in a loss of data. "
-            click.confirm(
-                message
-                + f"Data before:\n{df_original}\nData after:\n{df_resampled}\nMean before: {df_original['event_value'].mean()}\nMean after: {df_resampled['event_value'].mean()}\nContinue?",
-                abort=True,
+        if period is not None:
+            first_event_start, last_event_start = period
+            period_end = last_event_start + sensor.event_resolution
+            statistics_before = _resample_period(
+                sensor,
+                event_resolution,
+                first_event_start,
+                last_event_start,
+                chunk=chunk,
+                in_database=in_database,
+                checkpoint_path=checkpoint_path,
+                skip_integrity_check=skip_integrity_check,
             )
 
         AssetAuditLog.add_record(
@@ -243,21 +299,79 @@ def resample_sensor_data(
         # Update sensor
         sensor.event_resolution = event_resolution
         db.session.add(sensor)
-
-        # Update sensor data
-        query = delete(TimedBelief).filter_by(sensor=sensor)
-        if not pd.isnull(event_starts_after):
-            query = query.filter(TimedBelief.event_start >= event_starts_after)
-        if not pd.isnull(event_ends_before):
-            query = query.filter(
-                TimedBelief.event_start + sensor.event_resolution <= event_ends_before
+        db.session.commit()
+        if period is not None:
+            statistics_after = get_belief_statistics(
+                sensor, first_event_start, period_end
+            )
+            click.echo(
+                f"Data before: {statistics_before}.\nData after: {statistics_after}."
             )
-        db.session.execute(query)
-        save_to_db(df_resampled, bulk_save_objects=True)
-    db.session.commit()
     click.secho("Successfully resampled sensor data.", **MsgStyle.SUCCESS)
 
 
+def _check_resampling_options(
+    sensor_ids: list[int], chunk, checkpoint_path: str | None
+):
+    if not isinstance(chunk, timedelta):
+        click.secho("Chunks of months or years are not supported.", **MsgStyle.ERROR)
+        raise click.Abort()
+    if checkpoint_path is not None and len(sensor_ids) > 1:
+        click.secho(
+            "A checkpoint can only be used when resampling a single sensor.",
+            **MsgStyle.ERROR,
+        )
+        raise click.Abort()
+
+
+def _resample_period(
+    sensor: Sensor,
+    event_resolution: timedelta,
+    first_event_start: pd.Timestamp,
+    last_event_start: pd.Timestamp,
+    chunk: timedelta,
+    in_database: bool,
+    checkpoint_path: str | None,
+    skip_integrity_check: bool,
+) -> BeliefStatistics:
+    """Resample the data of a sensor about the given period (after asking for approval), chunk by chunk.
+
+    :returns: statistics of the data before resampling
+    """
+    statistics_before = get_belief_statistics(
+        sensor, first_event_start, last_event_start + sensor.event_resolution
+    )
+    if not skip_integrity_check:
+        message = ""
+        if sensor.event_resolution < event_resolution:
+            message += f"Downsampling {sensor} to {event_resolution} will result in a loss of data. "
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            message += f"Resuming after the checkpoint in {checkpoint_path}. "
+        click.confirm(
+            message + f"Data before: {statistics_before}.\n"
+            f"Resampling from {sensor.event_resolution} to {event_resolution} in chunks of {chunk}. Continue?",
+            abort=True,
+        )
+
+    def report_chunk(resampled: ResamplingChunk):
+        click.echo(
+            f"Resampled {resampled.beliefs_before} beliefs into {resampled.beliefs_after} beliefs"
+            f" about events from {resampled.start} until {resampled.end}."
+        )
+
+    resample_beliefs_in_chunks(
+        sensor,
+        event_resolution,
+        first_event_start,
+        last_event_start,
+        chunk=chunk,
+        in_database=in_database,
+        checkpoint_path=checkpoint_path,
+        on_chunk_done=report_chunk,
+    )
+    return statistics_before
+
+
 @fm_edit_data.command("transfer-ownership")
 @with_appcontext
 @click.option(
@@ -5,6 +5,7 @@ CLI commands for listing database contents and classes
 from __future__ import annotations
 
 from datetime import datetime, timedelta
+import os
 
 import click
 from flask import current_app as app
@@ -778,6 +779,109 @@ def list_items(item_type):
     )
 
 
+@fm_show_data.command("bundle")
+@with_appcontext
+@click.option(
+    "--sensor",
+    "sensors",
+    required=False,
+    multiple=True,
+    callback=validate_unique,
+    type=SensorIdField(),
+    help="Export this sensor (and its asset). Follow up with the sensor's ID. This argument can be given multiple times.",
+)
+@click.option(
+    "--asset",
+    "assets",
+    required=False,
+    multiple=True,
+    callback=validate_unique,
+    type=GenericAssetIdField(),
+    help="Export this asset, its offspring and all of their sensors. Follow up with the asset's ID."
+    " This argument can be given multiple times.",
+)
+@click.option(
+    "--start",
+    "start",
+    type=AwareDateTimeField(),
+    required=False,
+    help="Only export beliefs about events starting at or after this datetime. Follow up with a timezone-aware datetime in ISO 6801 format.",
+)
+@click.option(
+    "--end",
+    "end",
+    type=AwareDateTimeField(),
+    required=False,
+    help="Only export beliefs about events starting before this datetime. Follow up with a timezone-aware datetime in ISO 6801 format.",
+)
+@click.option(
+    "--chunk",
+    type=DurationField(),
+    required=False,
+    help="Export beliefs about events in periods of this length, one at a time (defaults to 30 days)."
+    " Follow up with a ISO 8601 duration string, e.g. P7D.",
+)
+@click.option(
+    "--path",
+    "path",
+    required=True,
+    type=click.Path(file_okay=False),
+    help="Directory to write the bundle to. Should not exist yet, or be empty.",
+)
+def export_bundle(
+    sensors: list[Sensor],
+    assets: list[GenericAsset],
+    path: str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    chunk: timedelta | None = None,
+):
+    """
+    Export sensors and assets, with their beliefs and data sources, to a Parquet bundle.
+
+    Import the bundle (on this or another server) with `flexmeasures add bundle`.
+    Requires pyarrow.
+    """
+    try:
+        from flexmeasures.data.services.bundles import BundledSensor, export_bundle
+        import pyarrow  # noqa: F401
+    except ImportError:
+        click.secho(
+            "Exporting bundles requires installing pyarrow (e.g. pip install flexmeasures[parquet]).",
+            **MsgStyle.ERROR,
+        )
+        raise click.Abort()
+    if not sensors and not assets:
+        click.secho("Please pass at least one --sensor or --asset.", **MsgStyle.ERROR)
+        raise click.Abort()
+    if chunk is None:
+        chunk = timedelta(days=30)
+    elif not isinstance(chunk, timedelta):
+        click.secho("Chunks of months or years are not supported.", **MsgStyle.ERROR)
+        raise click.Abort()
+    if os.path.exists(path) and os.listdir(path):
+        click.secho(f"Directory {path} is not empty.", **MsgStyle.ERROR)
+        raise click.Abort()
+
+    def report_sensor(bundled: BundledSensor):
+        click.echo(f"Exported {bundled.beliefs} beliefs of sensor {bundled.sensor_id}.")
+
+    counts = export_bundle(
+        path,
+        assets=list(assets),
+        sensors=list(sensors),
+        start=start,
+        end=end,
+        chunk=chunk,
+        on_sensor_done=report_sensor,
+    )
+    click.secho(
+        f"Exported {counts['assets']} assets, {counts['sensors']} sensors, {counts['sources']} data sources"
+        f" and {counts['beliefs']} beliefs to {path}.",
+        **MsgStyle.SUCCESS,
+    )
+
+
 @fm_show_data.command("reporters")
 @with_appcontext
 def list_reporters():
@@ -1,14 +1,20 @@
 """CLI commands for saving, resetting, etc of the database"""
 
-from datetime import datetime
+from __future__ import annotations
+
+from datetime import datetime, timedelta
 import subprocess
 
 from flask import current_app as app
 from flask.cli import with_appcontext
 import flask_migrate as migrate
 import click
+from sqlalchemy import select, text
+from tabulate import tabulate
 
 from flexmeasures.cli.utils import MsgStyle
+from flexmeasures.data.models.time_series import Sensor
+from flexmeasures.data.schemas import DurationField, SensorIdField
 
 
 @click.group("db-ops")
@@ -95,4 +101,311 @@ def restore(file: str):
         click.secho("db restore unsuccessful", **MsgStyle.ERROR)
 
 
+@fm_db_ops.command("partition-beliefs")
+@with_appcontext
+@click.option(
+    "--months-ahead",
+    type=click.IntRange(min=0),
+    default=3,
+    show_default=True,
+    help="Number of future months to create partitions for.",
+)
+@click.option(
+    "--drop-unpartitioned",
+    is_flag=True,
+    default=False,
+    help="Drop the original (unpartitioned) table after its data has been copied.",
+)
+def partition_beliefs(months_ahead: int, drop_unpartitioned: bool):
+    """Convert the timed_belief table into a table partitioned by month (optional).
+
+    All data is copied into the partitioned table, in one transaction.
+    Stop all workers and other processes writing beliefs while this runs.
+    Afterwards, new monthly partitions are created automatically when beliefs are saved,
+    or ahead of time with `flexmeasures db-ops create-partitions`.
+    """
+    from flexmeasures.data.services.partitioning import (
+        partition_timed_belief_table,
+        UNPARTITIONED_TABLE,
+    )
+
+    if not app.debug:
+        prompt = (
+            "This copies all beliefs into a new, partitioned table on %s.\nDo you want to continue?"
+            % app.db.engine
+        )
+        if not click.confirm(prompt):
+            click.secho("I did nothing.", **MsgStyle.WARN)
+            raise click.Abort()
+    try:
+        partitions = partition_timed_belief_table(
+            months_ahead=months_ahead,
+            drop_unpartitioned=drop_unpartitioned,
+            on_partition_filled=lambda name, n: click.echo(
+                f"Copied {n} beliefs into {name}."
+            ),
+        )
+    except ValueError as exc:
+        click.secho(str(exc), **MsgStyle.ERROR)
+        raise click.Abort()
+    click.secho(
+        f"Partitioned the timed_belief table into {len(partitions)} monthly partitions.",
+        **MsgStyle.SUCCESS,
+    )
+    if not drop_unpartitioned:
+        click.echo(
+            f"The original table was kept as {UNPARTITIONED_TABLE}. Drop it once you have checked the new table."
+        )
+
+
+@fm_db_ops.command("create-partitions")
+@with_appcontext
+@click.option(
+    "--months-ahead",
+    type=click.IntRange(min=0),
+    default=3,
+    show_default=True,
+    help="Number of future months to create partitions for.",
+)
+def create_partitions(months_ahead: int):
+    """Create monthly partitions of the timed_belief table ahead of time.
+
+    Also moves beliefs out of the default partition, once their partition exists.
+    Partitions are created automatically when beliefs are saved, but running this regularly (e.g. as a cron job)
+    avoids creating them while saving.
+    """
+    import pandas as pd
+
+    from flexmeasures.data.services.partitioning import (
+        create_belief_partitions,
+        is_partitioned,
+        DEFAULT_PARTITION,
+    )
+
+    if not is_partitioned():
+        click.secho(
+            "The timed_belief table is not partitioned. See `flexmeasures db-ops partition-beliefs`.",
+            **MsgStyle.ERROR,
+        )
+        raise click.Abort()
+    # Also cover any beliefs waiting in the default partition
+    now = pd.Timestamp.now(tz="UTC")
+    first_event_start, last_event_start = app.db.session.execute(
+        text(f"SELECT min(event_start), max(event_start) FROM {DEFAULT_PARTITION}")
+    ).one()
+    partitions = create_belief_partitions(
+        start=min(pd.Timestamp(first_event_start or now), now),
+        end=max(
+            pd.Timestamp(last_event_start or now),
+            now + pd.DateOffset(months=months_ahead),
+        ),
+    )
+    if partitions:
+        click.secho(f"Created partitions: {', '.join(partitions)}", **MsgStyle.SUCCESS)
+    else:
+        click.secho("All partitions already exist.", **MsgStyle.SUCCESS)
+
+
+@fm_db_ops.command("archive")
+@with_appcontext
+@click.option(
+    "--sensor",
+    "sensors",
+    required=False,
+    multiple=True,
+    type=SensorIdField(),
+    help="Archive beliefs of this sensor only (defaults to all sensors with a retention period).",
+)
+@click.option(
+    "--full",
+    is_flag=True,
+    default=False,
+    help="Also process months that were archived before (e.g. to archive late corrections).",
+)
+def archive(sensors: list[Sensor], full: bool):
+    """Move old beliefs into the archive, keeping only the most recent beliefs in the database.
+
+    Beliefs about events beyond a sensor's retention period (see FLEXMEASURES_BELIEF_RETENTION_DAYS
+    and the belief_retention_days sensor attribute) are archived in Parquet files
+    (see FLEXMEASURES_BELIEF_ARCHIVE_PATH), except for the most recent belief about each event (from each source).
+    Runs incrementally: by default, months that were archived before are skipped.
+    """
+    from flexmeasures.data.services.archiving import (
+        archive_beliefs,
+        get_retention_period,
+        is_archive_enabled,
+    )
+
+    if not is_archive_enabled():
+        click.secho(
+            "Archiving requires setting FLEXMEASURES_BELIEF_ARCHIVE_PATH and installing pyarrow.",
+            **MsgStyle.ERROR,
+        )
+        raise click.Abort()
+    if not sensors:
+        sensors = [
+            sensor
+            for sensor in app.db.session.scalars(select(Sensor).order_by(Sensor.id))
+            if get_retention_period(sensor) is not None
+        ]
+    total = 0
+    for sensor in sensors:
+        archived = archive_beliefs(sensor, full=full)
+        if archived:
+            n_beliefs = sum(archived.values())
+            total += n_beliefs
+            click.echo(
+                f"Archived {n_beliefs} beliefs of {sensor} ({len(archived)} months processed)."
+            )
+    click.secho(f"Archived {total} beliefs.", **MsgStyle.SUCCESS)
+
+
+@fm_db_ops.command("audit-searches")
+@with_appcontext
+@click.option(
+    "--sensor",
+    "sensor",
+    required=False,
+    type=SensorIdField(),
+    help="Audit searches for this sensor. Follow up with the sensor's ID.",
+)
+@click.option(
+    "--window",
+    type=DurationField(),
+    default="P7D",
+    help="Length of the windows to search, ending at the end of the sensor's last event."
+    " Follow up with a ISO 8601 duration string. Defaults to P7D.",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=3,
+    help="Number of times to run each search (the median duration is reported).",
+)
+@click.option(
+    "--analyze/--no-analyze",
+    default=True,
+    help="Whether to explain with ANALYZE, which runs each statement once more to measure its execution time.",
+)
+@click.option(
+    "--synthetic-days",
+    type=click.IntRange(min=1),
+    required=False,
+    help="Instead of auditing an existing sensor, benchmark on a reproducible synthetic dataset with this many days of data per sensor."
+    " The dataset is deleted afterwards.",
+)
+@click.option(
+    "--synthetic-sensors",
+    type=click.IntRange(min=1),
+    default=10,
+    help="Number of sensors in the synthetic dataset (searches are audited for the first one).",
+)
+@click.option(
+    "--keep-synthetic-data",
+    is_flag=True,
+    default=False,
+    help="Keep the synthetic dataset, e.g. to audit again after running a migration.",
+)
+@click.option(
+    "--verbose",
+    is_flag=True,
+    default=False,
+    help="Show the full query plans.",
+)
+def audit_searches(
+    sensor: Sensor | None,
+    window: timedelta,
+    repeat: int,
+    analyze: bool,
+    synthetic_days: int | None,
+    synthetic_sensors: int,
+    keep_synthetic_data: bool,
+    verbose: bool,
+):
+    """Explain the query plans of representative belief searches, and show which indexes they use.
+
+    Query shapes include the most recent belief, windows of (most recent or all) beliefs, sensor stats and staleness.
+    Plans are also logged. Sequential scans of the timed_belief table are flagged.
+
+    For a reproducible benchmark, use --synthetic-days (with --keep-synthetic-data), and compare the results
+    before and after running `flexmeasures db upgrade` (or `flexmeasures db downgrade`) for the search indexes.
+    """
+    from flexmeasures.data.services.search_audit import (
+        audit_searches,
+        create_synthetic_sensors,
+        delete_synthetic_sensors,
+        get_index_usage,
+    )
+
+    if (sensor is None) == (synthetic_days is None):
+        click.secho(
+            "Please pass either --sensor or --synthetic-days.", **MsgStyle.ERROR
+        )
+        raise click.Abort()
+    if not isinstance(window, timedelta):
+        click.secho("Windows of months or years are not supported.", **MsgStyle.ERROR)
+        raise click.Abort()
+    synthetic_dataset = []
+    if synthetic_days is not None:
+        click.echo(
+            f"Creating a synthetic dataset of {synthetic_sensors} sensors with {synthetic_days} days of data each ..."
+        )
+        synthetic_dataset = create_synthetic_sensors(
+            n_sensors=synthetic_sensors, days=synthetic_days
+        )
+        sensor = synthetic_dataset[0]
+    try:
+        audits = audit_searches(sensor, window=window, analyze=analyze, repeat=repeat)
+    finally:
+        if synthetic_dataset and not keep_synthetic_data:
+            delete_synthetic_sensors(synthetic_dataset)
+        elif synthetic_dataset:
+            click.echo(
+                f"Kept the synthetic dataset (sensors {', '.join(str(s.id) for s in synthetic_dataset)})."
+                f" Audit it again with --sensor {sensor.id}."
+            )
+
+    rows = []
+    for audit in audits:
+        execution_times = [plan.execution_time for plan in audit.plans]
+        rows.append(
+            [
+                audit.name,
+                f"{audit.duration:.1f}",
+                (
+                    f"{sum(execution_times):.1f}"
+                    if execution_times and None not in execution_times
+                    else ""
+                ),
+                "\n".join(scan for plan in audit.plans for scan in plan.scans),
+            ]
+        )
+    click.echo(
+        tabulate(
+            rows,
+            headers=["Search", "Duration (ms)", "Execution (ms)", "Scans"],
+        )
+    )
+    if verbose:
+        for audit in audits:
+            for plan in audit.plans:
+                click.echo(f"\n{audit.name}:\n{plan.format()}")
+    click.echo()
+    click.echo(
+        tabulate(
+            get_index_usage(),
+            headers=["Table", "Index", "Scans", "Size"],
+        )
+    )
+    seq_scans = [
+        audit.name for audit in audits if any(p.seq_scans for p in audit.plans)
+    ]
+    if seq_scans:
+        click.secho(
+            f"Sequential scans of beliefs in: {', '.join(seq_scans)}.", **MsgStyle.WARN
+        )
+    else:
+        click.secho("No sequential scans of beliefs.", **MsgStyle.SUCCESS)
+
+
 app.cli.add_command(fm_db_ops)
@@ -7,6 +7,7 @@ from __future__ import annotations
 import os
 import random
 import string
+import time
 from types import TracebackType
 from typing import Type
 
@@ -32,6 +33,22 @@ from flexmeasures.data.services.scheduling import handle_scheduling_exception
 from flexmeasures.data.services.forecasting import handle_forecasting_exception
 from flexmeasures.cli.utils import MsgStyle
 from flexmeasures.utils.flexmeasures_inflection import join_words_into_a_list
+from flexmeasures.utils.metrics import observe_job_duration
+
+
+class MetricsWorker(Worker):
+    """Worker which records the duration of each job (see FLEXMEASURES_METRICS)."""
+
+    def perform_job(self, job: Job, queue: Queue) -> bool:
+        start = time.perf_counter()
+        success = super().perform_job(job, queue)
+        observe_job_duration(
+            job,
+            queue_name=queue.name,
+            duration=time.perf_counter() - start,
+            status="finished" if success else "failed",
+        )
+        return success
 
 
 REGISTRY_MAP = dict(
@@ -75,7 +92,7 @@ def run_job(job_id: str):
     "--queue",
     default=None,
     required=True,
-    help="State which queue(s) to work on (using '|' as separator), e.g. 'forecasting', 'scheduling' or 'forecasting|scheduling'.",
+    help="State which queue(s) to work on (using '|' as separator), e.g. 'forecasting', 'scheduling', 'maintenance' or 'forecasting|scheduling'.",
 )
 @click.option(
     "--name",
@@ -85,7 +102,7 @@ def run_job(job_id: str):
 )
 def run_worker(queue: str, name: str | None):
     """
-    Start a worker process for forecasting and/or scheduling jobs.
+    Start a worker process for forecasting, scheduling and/or maintenance jobs.
 
     We use the app context to find out which redis queues to use.
     """
@@ -113,7 +130,8 @@ def run_worker(queue: str, name: str | None):
         error_handler = handle_scheduling_exception
     elif queue == "forecasting":
         error_handler = handle_forecasting_exception
-    worker = Worker(
+    worker_class = MetricsWorker if app.config.get("FLEXMEASURES_METRICS") else Worker
+    worker = worker_class(
         q_list,
         connection=connection,
         name=used_name,
@@ -130,7 +148,8 @@ def run_worker(queue: str, name: str | None):
         click.echo("Running against %s on %s" % (q, q.connection))
     click.echo("=========================================================\n")
 
-    worker.work()
+    # The scheduler allows jobs to be queued for later (e.g. continuous belief compaction)
+    worker.work(with_scheduler=True)
 
 
 @fm_jobs.command("show-queues")
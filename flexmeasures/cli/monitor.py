@@ -19,7 +19,7 @@ from tabulate import tabulate
 
 from flexmeasures.data import db
 from flexmeasures.data.models.task_runs import LatestTaskRun
-from flexmeasures.data.models.user import User
+from flexmeasures.data.models.user import User, flush_last_seen
 from flexmeasures.utils.time_utils import server_now
 from flexmeasures.cli.utils import MsgStyle
 
@@ -245,6 +245,7 @@ def monitor_last_seen(
     will work for all filters independently.
     """
     last_seen_delta = timedelta(minutes=maximum_minutes_since_last_seen)
+    flush_last_seen()
     latest_run: LatestTaskRun = db.session.get(LatestTaskRun, task_name)
 
     # find users we haven't seen in the given time window (last_seen_at is naive UTC)
@@ -59,6 +59,7 @@ def test_making_forecasts():
         horizons=[timedelta(hours=6)],
         start_of_roll=as_server_time(datetime(2015, 4, 1)),
         end_of_roll=as_server_time(datetime(2015, 4, 3)),
+        batch_horizons=True,
     )
 
     click.echo("Queue before working: %s" % app.queues["forecasting"].jobs)
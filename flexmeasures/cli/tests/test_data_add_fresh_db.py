@@ -3,13 +3,15 @@ import json
 import yaml
 import os
 from datetime import datetime
+import pandas as pd
 import pytz
 from sqlalchemy import select
 
 from flexmeasures import Asset
 from flexmeasures.cli.tests.utils import to_flags
 from flexmeasures.data.models.user import Account
-from flexmeasures.data.models.time_series import Sensor
+from flexmeasures.data.models.data_sources import DataSource
+from flexmeasures.data.models.time_series import Sensor, TimedBelief
 
 from flexmeasures.cli.tests.utils import check_command_ran_without_error
 from flexmeasures.utils.time_utils import server_now
@@ -250,6 +252,345 @@ def test_add_multiple_output(app, fresh_db, setup_dummy_data):
         assert all(report_sensor_2.search_beliefs() == 0)
 
 
+@pytest.mark.skip_github
+@pytest.mark.parametrize("workers", [1, 2])
+def test_add_beliefs_in_chunks(app, fresh_db, setup_dummy_data, workers):
+    """
+    Ingest a file in chunks of 3 rows, in which a chunk boundary falls between beliefs about the same event,
+    and in which a later chunk holds a belief about an earlier event. All beliefs should be saved.
+    Then resume ingesting the same file from a checkpoint (after the first chunk) into another sensor.
+    """
+    from flexmeasures.cli.data_add import add_beliefs
+    from flexmeasures.data.services.ingestion import save_checkpoint
+
+    sensor1_id, sensor2_id, _, _ = setup_dummy_data
+    rows = [
+        ("2024-01-01T00:00+00:00", "2023-12-31T00:00+00:00", 1),
+        ("2024-01-01T00:00+00:00", "2023-12-31T12:00+00:00", 2),
+        ("2024-01-01T01:00+00:00", "2023-12-31T00:00+00:00", 3),
+        # chunk boundary
+        ("2024-01-01T01:00+00:00", "2023-12-31T12:00+00:00", 4),
+        ("2024-01-01T00:00+00:00", "2023-12-31T18:00+00:00", 5),
+        ("2024-01-01T02:00+00:00", "2023-12-31T00:00+00:00", 6),
+        # chunk boundary
+        ("2024-01-01T02:00+00:00", "2023-12-31T12:00+00:00", 7),
+        ("2024-01-01T03:00+00:00", "2023-12-31T00:00+00:00", 8),
+    ]
+    cli_input = to_flags(
+        {
+            "source": "chunked import",
+            "beliefcol": 1,
+            "valuecol": 2,
+            "chunk-size": 3,
+            "workers": workers,
+            "checkpoint": "import.checkpoint",
+        }
+    ) + ["--do-not-resample"]
+
+    runner = app.test_cli_runner()
+    with runner.isolated_filesystem():
+        with open("beliefs.csv", "w") as f:
+            f.write("event_start,belief_time,value\n")
+            f.writelines(f"{e},{b},{v}\n" for e, b, v in rows)
+
+        result = runner.invoke(
+            add_beliefs, ["beliefs.csv", "--sensor", str(sensor1_id)] + cli_input
+        )
+        check_command_ran_without_error(result)
+        assert "Successfully created 8 beliefs from 8 rows" in result.output
+        assert not os.path.exists("import.checkpoint")
+
+        # Resume after the first chunk
+        save_checkpoint(
+            "import.checkpoint",
+            pd.Timestamp("2024-01-01T01:00+00:00"),
+            beliefs_saved=3,
+            rows_read=3,
+        )
+        result = runner.invoke(
+            add_beliefs, ["beliefs.csv", "--sensor", str(sensor2_id)] + cli_input
+        )
+        check_command_ran_without_error(result)
+        assert "skipping the first 3 rows" in result.output
+        assert "Successfully created 5 beliefs from 5 rows" in result.output
+        assert not os.path.exists("import.checkpoint")
+
+    window = dict(
+        event_starts_after=datetime(2024, 1, 1, tzinfo=pytz.UTC),
+        event_ends_before=datetime(2024, 1, 1, 4, tzinfo=pytz.UTC),
+        most_recent_beliefs_only=False,
+    )
+    beliefs = fresh_db.session.get(Sensor, sensor1_id).search_beliefs(**window)
+    assert sorted(beliefs["event_value"].tolist()) == [1, 2, 3, 4, 5, 6, 7, 8]
+    resumed_beliefs = fresh_db.session.get(Sensor, sensor2_id).search_beliefs(**window)
+    assert sorted(resumed_beliefs["event_value"].tolist()) == [4, 5, 6, 7, 8]
+
+
+@pytest.mark.skip_github
+@pytest.mark.parametrize("workers", [1, 2])
+def test_add_report_in_windows(app, fresh_db, setup_dummy_data, workers):
+    """
+    Compute the same report as in test_add_reporter, but in windows of 4 hours (the last one being 2 hours),
+    using a checkpoint which should be removed afterwards.
+    Then, compute the report for another sensor, resuming from a checkpoint after the first window.
+    """
+
+    from flexmeasures.data.services.ingestion import save_checkpoint
+
+    from flexmeasures.cli.data_add import add_report
+
+    sensor1_id, sensor2_id, report_sensor_id, report_sensor_2_id = setup_dummy_data
+
+    reporter_config = dict(
+        required_input=[{"name": "sensor_1"}, {"name": "sensor_2"}],
+        required_output=[{"name": "df_agg"}],
+        transformations=[
+            dict(
+                df_input="sensor_1",
+                method="add",
+                args=["@sensor_2"],
+                df_output="df_agg",
+            ),
+            dict(method="resample_events", args=["2h"]),
+        ],
+    )
+    parameters = dict(
+        input=[
+            dict(name="sensor_1", sensor=sensor1_id),
+            dict(name="sensor_2", sensor=sensor2_id),
+        ],
+        output=[dict(name="df_agg", sensor=report_sensor_id)],
+    )
+    cli_input = to_flags(
+        {
+            "config": "reporter_config.yaml",
+            "parameters": "parameters.json",
+            "reporter": "PandasReporter",
+            "start": "2023-04-10T00:00:00+00:00",
+            "end": "2023-04-10T10:00:00+00:00",
+            "window": "PT4H",
+            "workers": workers,
+            "checkpoint": "report.checkpoint",
+        }
+    )
+
+    runner = app.test_cli_runner()
+    with runner.isolated_filesystem():
+        with open("reporter_config.yaml", "w") as f:
+            yaml.dump(reporter_config, f)
+        with open("parameters.json", "w") as f:
+            json.dump(parameters, f)
+
+        result = runner.invoke(add_report, cli_input)
+        check_command_ran_without_error(result)
+
+        assert "Window 3/3" in result.output
+        assert not os.path.exists("report.checkpoint")
+
+        # Resume after the first window
+        parameters["output"] = [dict(name="df_agg", sensor=report_sensor_2_id)]
+        with open("parameters.json", "w") as f:
+            json.dump(parameters, f)
+        save_checkpoint(
+            "report.checkpoint",
+            pd.Timestamp("2023-04-10T00:00:00+00:00"),
+            beliefs_saved=2,
+        )
+
+        result = runner.invoke(add_report, cli_input)
+        check_command_ran_without_error(result)
+
+        assert "Resuming from checkpoint" in result.output
+        assert "Window 2/2 (2023-04-10 08:00:00+00:00" in result.output
+        assert not os.path.exists("report.checkpoint")
+
+    report_sensor = fresh_db.session.get(Sensor, report_sensor_id)
+    stored_report = report_sensor.search_beliefs(
+        event_ends_before=datetime(2023, 4, 10, 10, tzinfo=pytz.UTC)
+    )
+    assert (stored_report.values.T == [1, 2 + 3, 4 + 5, 6 + 7, 8 + 9]).all()
+
+    resumed_report_sensor = fresh_db.session.get(Sensor, report_sensor_2_id)
+    resumed_report = resumed_report_sensor.search_beliefs(
+        event_ends_before=datetime(2023, 4, 10, 10, tzinfo=pytz.UTC)
+    )
+    assert (resumed_report.values.T == [4 + 5, 6 + 7, 8 + 9]).all()
+
+
+@pytest.mark.skip_github
+def test_add_report_incrementally(app, fresh_db, setup_dummy_data):
+    """
+    Compute a report in windows of 4 hours, in incremental mode.
+
+    - The first run computes all 3 windows.
+    - The second run finds no new input data, and computes nothing.
+    - After new beliefs about events at 4 and 5 AM, the third run only recomputes the window from 4 AM to 8 AM.
+    """
+
+    from flexmeasures.cli.data_add import add_report
+
+    sensor1_id, sensor2_id, report_sensor_id, _ = setup_dummy_data
+
+    reporter_config = dict(
+        required_input=[{"name": "sensor_1"}, {"name": "sensor_2"}],
+        required_output=[{"name": "df_agg"}],
+        transformations=[
+            dict(
+                df_input="sensor_1",
+                method="add",
+                args=["@sensor_2"],
+                df_output="df_agg",
+            ),
+            dict(method="resample_events", args=["2h"]),
+        ],
+    )
+    parameters = dict(
+        input=[
+            dict(name="sensor_1", sensor=sensor1_id),
+            dict(name="sensor_2", sensor=sensor2_id),
+        ],
+        output=[dict(name="df_agg", sensor=report_sensor_id)],
+    )
+    cli_input = to_flags(
+        {
+            "config": "reporter_config.yaml",
+            "parameters": "parameters.json",
+            "reporter": "PandasReporter",
+            "start": "2023-04-10T00:00:00+00:00",
+            "end": "2023-04-10T10:00:00+00:00",
+            "window": "PT4H",
+        }
+    )
+    cli_input.append("--incremental")
+
+    runner = app.test_cli_runner()
+    with runner.isolated_filesystem():
+        with open("reporter_config.yaml", "w") as f:
+            yaml.dump(reporter_config, f)
+        with open("parameters.json", "w") as f:
+            json.dump(parameters, f)
+
+        result = runner.invoke(add_report, cli_input)
+        check_command_ran_without_error(result)
+        assert "Window 3/3" in result.output
+
+        result = runner.invoke(add_report, cli_input)
+        check_command_ran_without_error(result)
+        assert "Window" not in result.output
+
+        source = fresh_db.session.execute(
+            select(DataSource).filter_by(name="source1")
+        ).scalar_one()
+        # Correct both hourly events of the 2-hourly report event from 4 AM, on both sensors,
+        # so that the beliefs being added up and resampled have the same belief time
+        fresh_db.session.add_all(
+            [
+                TimedBelief(
+                    event_start=datetime(2023, 4, 10, hour, tzinfo=pytz.UTC),
+                    belief_time=datetime(2023, 4, 11, tzinfo=pytz.UTC),
+                    event_value=100,
+                    sensor=fresh_db.session.get(Sensor, sensor_id),
+                    source=source,
+                )
+                for sensor_id in (sensor1_id, sensor2_id)
+                for hour in (4, 5)
+            ]
+        )
+        fresh_db.session.commit()
+
+        result = runner.invoke(add_report, cli_input)
+        check_command_ran_without_error(result)
+        assert "Window 1/1 (2023-04-10 04:00:00+00:00" in result.output
+
+    report_sensor = fresh_db.session.get(Sensor, report_sensor_id)
+    stored_report = report_sensor.search_beliefs(
+        event_ends_before=datetime(2023, 4, 10, 10, tzinfo=pytz.UTC),
+        one_deterministic_belief_per_event=True,
+    )
+    assert (stored_report.values.T == [1, 5, 200, 13, 17]).all()
+
+
+@pytest.mark.skip_github
+def test_add_reports_in_batch(app, fresh_db, setup_dummy_data):
+    """
+    Compute two reports in one batch, where the second report reads the output of the first one.
+
+    Both reports also read sensor 1, which should be loaded only once.
+    """
+
+    from flexmeasures.cli.data_add import add_reports
+
+    sensor1_id, sensor2_id, report_sensor_id, report_sensor_2_id = setup_dummy_data
+
+    batch = dict(
+        start="2023-04-10T00:00:00+00:00",
+        end="2023-04-10T10:00:00+00:00",
+        reports=[
+            dict(
+                reporter="PandasReporter",
+                config=dict(
+                    required_input=[{"name": "sensor_1"}, {"name": "sensor_2"}],
+                    required_output=[{"name": "df_agg"}],
+                    transformations=[
+                        dict(
+                            df_input="sensor_1",
+                            method="add",
+                            args=["@sensor_2"],
+                            df_output="df_agg",
+                        ),
+                        dict(method="resample_events", args=["2h"]),
+                    ],
+                ),
+                parameters=dict(
+                    input=[
+                        dict(name="sensor_1", sensor=sensor1_id),
+                        dict(name="sensor_2", sensor=sensor2_id),
+                    ],
+                    output=[dict(name="df_agg", sensor=report_sensor_id)],
+                ),
+            ),
+            dict(
+                reporter="PandasReporter",
+                config=dict(
+                    required_input=[{"name": "sensor_1"}, {"name": "report"}],
+                    required_output=[{"name": "df_double"}],
+                    transformations=[
+                        dict(
+                            df_input="report",
+                            method="multiply",
+                            args=[2],
+                            df_output="df_double",
+                        ),
+                    ],
+                ),
+                parameters=dict(
+                    input=[
+                        dict(name="sensor_1", sensor=sensor1_id),
+                        dict(name="report", sensor=report_sensor_id, resolution="PT2H"),
+                    ],
+                    output=[dict(name="df_double", sensor=report_sensor_2_id)],
+                ),
+            ),
+        ],
+    )
+
+    runner = app.test_cli_runner()
+    with runner.isolated_filesystem():
+        with open("batch.yaml", "w") as f:
+            yaml.dump(batch, f)
+
+        result = runner.invoke(add_reports, ["--batch-file", "batch.yaml"])
+        check_command_ran_without_error(result)
+
+        assert "Report 1/2 (stage 1)" in result.output
+        assert "Report 2/2 (stage 2)" in result.output
+        assert "reused 1 times" in result.output
+
+    report_sensor_2 = fresh_db.session.get(Sensor, report_sensor_2_id)
+    stored_report = report_sensor_2.search_beliefs()
+    assert (stored_report.values.T == [2, 10, 18, 26, 34]).all()
+
+
 @pytest.mark.skip_github
 @pytest.mark.parametrize("process_type", [("INFLEXIBLE"), ("SHIFTABLE"), ("BREAKABLE")])
 def test_add_process(
@@ -82,10 +82,22 @@ def test_update_one_asset_attribute(app, db, setup_generic_assets):
         ["2021-03-28 15:00:00+00:00", "2021-03-28 16:00:00+00:00"],
     ),
 )
+@pytest.mark.parametrize(
+    "resampling_flags",
+    (
+        [],
+        ["--in-database", "--chunk", "PT6H"],
+    ),
+)
 def test_resample_sensor_data(
-    app, db, setup_beliefs, event_starts_after: str, event_ends_before: str
+    app,
+    db,
+    setup_beliefs,
+    event_starts_after: str,
+    event_ends_before: str,
+    resampling_flags: list[str],
 ):
-    """Check resampling market data from hourly to 30 minute resolution and back."""
+    """Check resampling market data from hourly to 30 minute resolution and back, in pandas or in the database."""
 
     from flexmeasures.cli.data_edit import resample_sensor_data
 
@@ -114,13 +126,15 @@ def test_resample_sensor_data(
         tb.BeliefsDataFrame(all_beliefs_for_given_sensor), beliefs_before
     )
 
+    original_resolution = sensor.event_resolution
     cli_input = {
         "sensor": sensor.id,
-        "event-resolution": sensor.event_resolution.seconds / 60 / 2,
+        "event-resolution": original_resolution.seconds / 60 / 2,
     }
     runner = app.test_cli_runner()
     result = runner.invoke(
-        resample_sensor_data, to_flags(cli_input) + ["--skip-integrity-check"]
+        resample_sensor_data,
+        to_flags(cli_input) + resampling_flags + ["--skip-integrity-check"],
     )
 
     # Check result for success
@@ -145,15 +159,33 @@ def test_resample_sensor_data(
             active_user_id=None,
             active_user_name=None,
         )
-    ).scalar_one_or_none()
+    ).first()  # each test case resamples from 1:00:00 to 0:30:00
 
-    # Resample back to original resolution (on behalf of the next test case)
-    cli_input["event-resolution"] = sensor.event_resolution.seconds / 60
+    # Resample back to the original resolution (on behalf of the next test case)
+    cli_input["event-resolution"] = original_resolution.seconds / 60
     result = runner.invoke(
-        resample_sensor_data, to_flags(cli_input) + ["--skip-integrity-check"]
+        resample_sensor_data,
+        to_flags(cli_input) + resampling_flags + ["--skip-integrity-check"],
     )
     assert "Successfully resampled" in result.output
 
+    if "--in-database" in resampling_flags:
+        # Downsampling in the database restores the original values, and their belief horizons
+        sensor = get_test_sensor(db)
+        beliefs_restored = sensor.search_beliefs(
+            most_recent_beliefs_only=False,
+            event_starts_after=event_starts_after,
+            event_ends_before=event_ends_before,
+        )
+        pd.testing.assert_series_equal(
+            beliefs_restored["event_value"].sort_index(),
+            beliefs_before["event_value"].sort_index(),
+            check_dtype=False,
+        )
+        assert sorted(beliefs_restored.belief_horizons) == sorted(
+            beliefs_before.belief_horizons
+        )
+
 
 def test_cli_help(app):
     """Test that showing help does not throw an error."""
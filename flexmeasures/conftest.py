@@ -24,6 +24,7 @@ from werkzeug.exceptions import (
 from flexmeasures.app import create as create_app
 from flexmeasures.auth.policy import ADMIN_ROLE, ADMIN_READER_ROLE
 from flexmeasures.data.services.users import create_user
+from flexmeasures.data.services.data_sources import clear_data_source_cache
 from flexmeasures.data.models.generic_assets import GenericAssetType, GenericAsset
 from flexmeasures.data.models.data_sources import DataSource
 from flexmeasures.data.models.planning.utils import initialize_index
@@ -97,6 +98,7 @@ def create_test_db(app: Flask):
     with app.app_context():
         _db.drop_all()
         _db.create_all()
+    clear_data_source_cache()
 
     yield _db
 
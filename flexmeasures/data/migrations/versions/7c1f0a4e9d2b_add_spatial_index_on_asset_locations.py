@@ -0,0 +1,34 @@
+"""add spatial index on asset locations
+
+Revision ID: 7c1f0a4e9d2b
+Revises: b8f3cda5e023
+Create Date: 2025-09-01 10:12:45.120384
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "7c1f0a4e9d2b"
+down_revision = "b8f3cda5e023"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    Index asset locations as points on the earth (requires the cube and earthdistance extensions),
+    so searching for the closest sensors within a radius does not need to compute the distance to every asset.
+    """
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS generic_asset_ll_to_earth_idx"
+        " ON generic_asset USING gist (ll_to_earth(latitude, longitude))"
+    )
+
+
+def downgrade():
+    """
+    Drop the spatial index
+    """
+    op.execute("DROP INDEX IF EXISTS generic_asset_ll_to_earth_idx")
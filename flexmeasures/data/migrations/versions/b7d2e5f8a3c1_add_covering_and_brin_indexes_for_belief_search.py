@@ -0,0 +1,82 @@
+"""add covering and BRIN indexes for belief search
+
+Revision ID: b7d2e5f8a3c1
+Revises: e4c8a1b39f72
+Create Date: 2025-09-15 10:12:44.207381
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b7d2e5f8a3c1"
+down_revision = "e4c8a1b39f72"
+branch_labels = None
+depends_on = None
+
+
+def _is_partitioned() -> bool:
+    return (
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt"
+                " JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'timed_belief')"
+            )
+        )
+        .scalar()
+    )
+
+
+def upgrade():
+    """
+    Add indexes for the query shapes of belief searches (see `flexmeasures db-ops audit-searches`):
+
+    - A covering index on sensor, event start, source and belief horizon, which also includes event values.
+      Searches for a window of events of one sensor (including the most recent belief about each event),
+      sensor stats and staleness checks can be answered with index-only scans.
+    - A BRIN index on event start, which is tiny and cheap to maintain for append-mostly data,
+      for range scans over event starts that are not restricted to one sensor.
+
+    The indexes are built concurrently, so the table stays writable
+    (except on a partitioned table, which does not support building indexes concurrently).
+    """
+    concurrently = not _is_partitioned()
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "timed_belief_sensor_event_start_covering_idx",
+            "timed_belief",
+            ["sensor_id", "event_start", "source_id", "belief_horizon"],
+            unique=False,
+            postgresql_include=["cumulative_probability", "event_value"],
+            postgresql_concurrently=concurrently,
+        )
+        op.create_index(
+            "timed_belief_event_start_brin_idx",
+            "timed_belief",
+            ["event_start"],
+            unique=False,
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32},
+            postgresql_concurrently=concurrently,
+        )
+
+
+def downgrade():
+    """
+    Drop the covering and BRIN indexes for belief searches
+    """
+    concurrently = not _is_partitioned()
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "timed_belief_event_start_brin_idx",
+            table_name="timed_belief",
+            postgresql_concurrently=concurrently,
+        )
+        op.drop_index(
+            "timed_belief_sensor_event_start_covering_idx",
+            table_name="timed_belief",
+            postgresql_concurrently=concurrently,
+        )
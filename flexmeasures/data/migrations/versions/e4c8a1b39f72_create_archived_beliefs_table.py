@@ -0,0 +1,46 @@
+"""create archived beliefs table
+
+Revision ID: e4c8a1b39f72
+Revises: 7c1f0a4e9d2b
+Create Date: 2025-09-08 14:31:07.512093
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e4c8a1b39f72"
+down_revision = "7c1f0a4e9d2b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    Log which months of beliefs about each sensor have been processed for archiving to Parquet files.
+    """
+    op.create_table(
+        "archived_beliefs",
+        sa.Column("sensor_id", sa.Integer(), nullable=False),
+        sa.Column("month_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("belief_count", sa.Integer(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["sensor_id"],
+            ["sensor.id"],
+            name=op.f("archived_beliefs_sensor_id_sensor_fkey"),
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint(
+            "sensor_id", "month_start", name=op.f("archived_beliefs_pkey")
+        ),
+    )
+
+
+def downgrade():
+    """
+    Drop the archived beliefs table (the Parquet files are left alone)
+    """
+    op.drop_table("archived_beliefs")
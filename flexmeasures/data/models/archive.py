@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+
+from flexmeasures.data import db
+
+
+class ArchivedBeliefs(db.Model):
+    """
+    Log which months of beliefs about a sensor have been processed for archiving (see flexmeasures db-ops archive).
+    The archived beliefs themselves are stored in Parquet files (see FLEXMEASURES_BELIEF_ARCHIVE_PATH).
+    """
+
+    __tablename__ = "archived_beliefs"
+
+    sensor_id = db.Column(
+        db.Integer(),
+        db.ForeignKey("sensor.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    # Start of the (UTC) month
+    month_start = db.Column(db.DateTime(timezone=True), primary_key=True)
+    belief_count = db.Column(db.Integer(), nullable=False, default=0)
+    archived_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+
+    def __repr__(self) -> str:
+        return "<ArchivedBeliefs sensor %s, month %s: %d beliefs (at %s)>" % (
+            self.sensor_id,
+            self.month_start.strftime("%Y-%m"),
+            self.belief_count,
+            self.archived_at,
+        )
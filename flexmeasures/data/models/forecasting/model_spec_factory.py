@@ -22,6 +22,10 @@ from timetomodel.transforming import (
 import pandas as pd
 
 from flexmeasures.data.models.time_series import Sensor, TimedBelief
+from flexmeasures.data.models.forecasting.series_cache import (
+    SeriesCache,
+    get_series_cache,
+)
 from flexmeasures.data.models.forecasting.utils import (
     create_lags,
     set_training_and_testing_dates,
@@ -44,10 +48,13 @@ class TBSeriesSpecs(SeriesSpecs):
     This implements _load_series such that <time_series_class>.search is called,
     with the parameters in search_params.
     The search function is expected to return a BeliefsDataFrame.
+
+    If a series cache is given, TimedBelief searches are served from (and added to) that cache instead.
     """
 
     time_series_class: Any  # with <search_fnc> method (named "search" by default)
     search_params: dict
+    series_cache: SeriesCache | None
 
     def __init__(
         self,
@@ -60,6 +67,7 @@ class TBSeriesSpecs(SeriesSpecs):
         post_load_processing: Transformation | None = None,
         resampling_config: dict[str, Any] = None,
         interpolation_config: dict[str, Any] = None,
+        series_cache: SeriesCache | None = None,
     ):
         super().__init__(
             name,
@@ -72,15 +80,25 @@ class TBSeriesSpecs(SeriesSpecs):
         self.time_series_class = time_series_class
         self.search_params = search_params
         self.search_fnc = search_fnc
+        self.series_cache = series_cache
 
     def _load_series(self) -> pd.Series:
-        logger.info("Reading %s data from database" % self.time_series_class.__name__)
-
-        bdf: BeliefsDataFrame = getattr(self.time_series_class, self.search_fnc)(
-            **self.search_params
-        )
-        assert isinstance(bdf, BeliefsDataFrame)
-        df = simplify_index(bdf)
+        if (
+            self.series_cache is not None
+            and self.time_series_class is TimedBelief
+            and self.search_fnc == "search"
+        ):
+            logger.info("Reading %s data from series cache" % TimedBelief.__name__)
+            df = self.series_cache.load(**self.search_params)
+        else:
+            logger.info(
+                "Reading %s data from database" % self.time_series_class.__name__
+            )
+            bdf: BeliefsDataFrame = getattr(self.time_series_class, self.search_fnc)(
+                **self.search_params
+            )
+            assert isinstance(bdf, BeliefsDataFrame)
+            df = simplify_index(bdf)
         self.check_data(df)
 
         if self.post_load_processing is not None:
@@ -112,6 +130,99 @@ class TBSeriesSpecs(SeriesSpecs):
             )
 
 
+class SharedTimedBeliefSearch:
+    """Serve the data searches of multiple TBSeriesSpecs from shared queries.
+
+    Model specs for different horizons of the same sensor search the same data, only for different windows.
+    Register these specs (replacing their time series class), then load the data once
+    for the union of all registered windows, per sensor and belief horizon criteria.
+    Each search then slices the requested window from the loaded data.
+    Slicing gives the same result as querying the window directly,
+    because the most recent belief about an event does not depend on the query window.
+
+    Once loaded, searches do not touch the database session, so they can be served from multiple threads.
+    """
+
+    def __init__(self, time_series_class: type = TimedBelief):
+        self.time_series_class = time_series_class
+        self.__name__ = f"{time_series_class.__name__} (shared)"
+        self._windows: dict[tuple, tuple[datetime, datetime]] = {}
+        self._sensors: dict[tuple, Sensor] = {}
+        self._bdfs: dict[tuple, BeliefsDataFrame] = {}
+
+    @staticmethod
+    def _key(
+        sensors: Sensor,
+        horizons_at_least: timedelta | None = None,
+        horizons_at_most: timedelta | None = None,
+        **kwargs,
+    ) -> tuple:
+        return sensors.id, horizons_at_least, horizons_at_most
+
+    def register(self, specs: ModelSpecs):
+        """Let the outcome and regressor series specs use this shared search, if they search TimedBeliefs."""
+        for series_specs in [specs.outcome_var] + list(specs.regressors):
+            if not (
+                isinstance(series_specs, TBSeriesSpecs)
+                and series_specs.time_series_class is self.time_series_class
+                and series_specs.search_fnc == "search"
+                and set(series_specs.search_params.keys())
+                <= {
+                    "sensors",
+                    "event_starts_after",
+                    "event_ends_before",
+                    "horizons_at_least",
+                    "horizons_at_most",
+                }
+            ):
+                continue
+            params = series_specs.search_params
+            key = self._key(**params)
+            start, end = params["event_starts_after"], params["event_ends_before"]
+            if key in self._windows:
+                start = min(start, self._windows[key][0])
+                end = max(end, self._windows[key][1])
+            self._windows[key] = (start, end)
+            self._sensors[key] = params["sensors"]
+            series_specs.time_series_class = self
+
+    def load(self):
+        """Query the data for each registered sensor and horizon criteria, for the union of their windows."""
+        for key, (start, end) in self._windows.items():
+            if key in self._bdfs:
+                continue
+            _, horizons_at_least, horizons_at_most = key
+            self._bdfs[key] = self.time_series_class.search(
+                sensors=self._sensors[key],
+                event_starts_after=start,
+                event_ends_before=end,
+                horizons_at_least=horizons_at_least,
+                horizons_at_most=horizons_at_most,
+            )
+
+    def search(
+        self,
+        sensors: Sensor,
+        event_starts_after: datetime,
+        event_ends_before: datetime,
+        horizons_at_least: timedelta | None = None,
+        horizons_at_most: timedelta | None = None,
+    ) -> BeliefsDataFrame:
+        """Slice the requested window from the shared data (with the same window semantics as TimedBelief.search)."""
+        bdf = self._bdfs[self._key(sensors, horizons_at_least, horizons_at_most)]
+        if bdf.empty:
+            return bdf
+        if bdf.event_resolution == timedelta(0):
+            mask = (bdf.event_ends >= event_starts_after) & (
+                bdf.event_starts <= event_ends_before
+            )
+        else:
+            mask = (bdf.event_ends > event_starts_after) & (
+                bdf.event_starts < event_ends_before
+            )
+        return bdf[mask]
+
+
 def create_initial_model_specs(  # noqa: C901
     sensor: Sensor,
     forecast_start: datetime,  # Start of forecast period
@@ -154,6 +265,7 @@ def create_initial_model_specs(  # noqa: C901
         forecast_start, params["training_and_testing_period"]
     )
     query_window = get_query_window(training_start, forecast_end, lags)
+    series_cache = get_series_cache()
 
     regressor_specs = []
     regressor_transformation = {}
@@ -169,6 +281,7 @@ def create_initial_model_specs(  # noqa: C901
             forecast_horizon,
             regressor_transformation,
             transform_to_normal,
+            series_cache,
         )
 
     if ex_post_horizon is None:
@@ -186,6 +299,7 @@ def create_initial_model_specs(  # noqa: C901
         ),
         feature_transformation=params.get("outcome_var_transformation", None),
         interpolation_config={"method": "time"},
+        series_cache=series_cache,
     )
     # Set defaults if needed
     if params.get("event_resolution", None) is None:
@@ -262,6 +376,7 @@ def configure_regressors_for_nearest_weather_sensor(
     horizon,
     regressor_transformation,  # the regressor transformation can be passed in
     transform_to_normal,  # if not, it a normalization can be applied
+    series_cache: SeriesCache | None = None,
 ) -> list[TBSeriesSpecs]:
     """We use weather data as regressors. Here, we configure them."""
     regressor_specs = []
@@ -308,6 +423,7 @@ def configure_regressors_for_nearest_weather_sensor(
                         ),
                         feature_transformation=regressor_transformation,
                         interpolation_config={"method": "time"},
+                        series_cache=series_cache,
                     )
                 )
 
@@ -0,0 +1,160 @@
+"""
+On-disk cache for the time series data loaded by forecasting model specs.
+
+Rolling forecasts are usually run frequently (e.g. every 15 minutes), for a slowly moving window of training data.
+Rather than loading the whole window from the database on each run, we keep the loaded data on disk,
+per sensor and belief horizon criteria, and only query what is new since the last run:
+
+- beliefs formed after the last known belief time, and
+- events beyond the end of the cached window.
+
+New beliefs about events that are already in the cache are data corrections.
+We can't tell which beliefs they supersede, so in that case we reload the whole window.
+Beliefs recorded with an earlier belief time than the last known one (e.g. backfilled historical data) are not detected;
+call SeriesCache.invalidate after such imports.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import hashlib
+import os
+from pathlib import Path
+
+from flask import current_app
+import pandas as pd
+
+from flexmeasures.data.models.time_series import Sensor, TimedBelief
+from flexmeasures.data.queries.utils import simplify_index
+
+
+class SeriesCache:
+    """Cache series data on disk, with one pickle file per sensor and belief horizon criteria."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        Path(directory).mkdir(parents=True, exist_ok=True)
+
+    def _path(
+        self,
+        sensor: Sensor,
+        horizons_at_least: timedelta | None,
+        horizons_at_most: timedelta | None,
+    ) -> str:
+        criteria = hashlib.md5(
+            f"{horizons_at_least}|{horizons_at_most}".encode()
+        ).hexdigest()[:12]
+        return os.path.join(self.directory, f"sensor_{sensor.id}_{criteria}.pkl")
+
+    def invalidate(self, sensor_id: int):
+        """Remove all cached data for the given sensor."""
+        for path in Path(self.directory).glob(f"sensor_{sensor_id}_*.pkl"):
+            path.unlink(missing_ok=True)
+
+    def load(
+        self,
+        sensors: Sensor,
+        event_starts_after: datetime,
+        event_ends_before: datetime,
+        horizons_at_least: timedelta | None = None,
+        horizons_at_most: timedelta | None = None,
+    ) -> pd.DataFrame:
+        """Load the most recent beliefs about events in the given window, like TimedBelief.search does.
+
+        :returns: DataFrame indexed by event_start, with an event_value column
+        """
+        sensor = sensors
+        path = self._path(sensor, horizons_at_least, horizons_at_most)
+        entry = pd.read_pickle(path) if os.path.exists(path) else None
+        search_kwargs = dict(
+            sensors=sensor,
+            horizons_at_least=horizons_at_least,
+            horizons_at_most=horizons_at_most,
+        )
+
+        if entry is None or event_starts_after < entry["start"]:
+            df = self._search(event_starts_after, event_ends_before, **search_kwargs)
+            start, end = event_starts_after, event_ends_before
+        else:
+            df = entry["data"]
+            start, end = event_starts_after, max(event_ends_before, entry["end"])
+
+            # Look for beliefs formed since our last run, about events in the cached window
+            updates = self._search(
+                event_starts_after,
+                min(event_ends_before, entry["end"]),
+                beliefs_after=entry["watermark"],
+                **search_kwargs,
+            )
+            updates = updates[updates["belief_time"] > entry["watermark"]]
+            if updates.index.isin(df.index).any():
+                current_app.logger.info(
+                    f"Data corrections found for sensor {sensor.id}. Reloading cached forecasting data."
+                )
+                df = self._search(event_starts_after, end, **search_kwargs)
+            else:
+                # Add new events (from within the cached window, and beyond it)
+                tail = (
+                    self._search(entry["end"], event_ends_before, **search_kwargs)
+                    if event_ends_before > entry["end"]
+                    else updates.iloc[0:0]
+                )
+                df = pd.concat([df, updates, tail])
+                df = df[~df.reset_index().duplicated().to_numpy()].sort_index()
+
+        # Drop events that precede the window, to keep the cache bounded
+        df = df[df.index >= start - sensor.event_resolution]
+        watermark = df["belief_time"].max() if not df.empty else None
+        if watermark is not None:
+            self._save(path, dict(start=start, end=end, watermark=watermark, data=df))
+        return self._slice(
+            df, event_starts_after, event_ends_before, sensor.event_resolution
+        )[["event_value"]]
+
+    @staticmethod
+    def _search(
+        event_starts_after: datetime, event_ends_before: datetime, **kwargs
+    ) -> pd.DataFrame:
+        bdf = TimedBelief.search(
+            event_starts_after=event_starts_after,
+            event_ends_before=event_ends_before,
+            **kwargs,
+        )
+        return simplify_index(bdf, index_levels_to_columns=["belief_time"])[
+            ["event_value", "belief_time"]
+        ]
+
+    @staticmethod
+    def _slice(
+        df: pd.DataFrame,
+        event_starts_after: datetime,
+        event_ends_before: datetime,
+        resolution: timedelta,
+    ) -> pd.DataFrame:
+        """Select events in the window, with the same window semantics as TimedBelief.search."""
+        event_starts = df.index
+        event_ends = df.index + resolution
+        if resolution == timedelta(0):
+            mask = (event_ends >= event_starts_after) & (
+                event_starts <= event_ends_before
+            )
+        else:
+            mask = (event_ends > event_starts_after) & (
+                event_starts < event_ends_before
+            )
+        return df[mask]
+
+    @staticmethod
+    def _save(path: str, entry: dict):
+        """Write to a temporary file first, so concurrent readers never see a partially written file."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        pd.to_pickle(entry, tmp_path)
+        os.replace(tmp_path, path)
+
+
+def get_series_cache() -> SeriesCache | None:
+    """Return the forecasting series cache, if one is configured (see FLEXMEASURES_FORECASTING_CACHE_PATH)."""
+    directory = current_app.config.get("FLEXMEASURES_FORECASTING_CACHE_PATH")
+    if not directory:
+        return None
+    return SeriesCache(directory)
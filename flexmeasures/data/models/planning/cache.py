@@ -0,0 +1,162 @@
+"""
+Cache for incremental re-scheduling.
+
+Schedules are often re-triggered frequently (e.g. every 15 minutes) for a window that rolls forward,
+while only the state of charge (and maybe some prices) changed. For such rolled-forward requests,
+we keep two things in Redis (see FLEXMEASURES_SCHEDULING_CACHE_TTL):
+
+- the time series loaded from sensors (e.g. prices and capacities), so that only the new tail of the window is queried, and
+- the previous plan, which serves as a starting point for the solver (if it supports warm starts).
+
+New beliefs (formed since the previous run) about events that are already in the cache are data corrections.
+In that case, we reload the whole window for that sensor.
+Beliefs recorded with an earlier belief time than the previous run (e.g. backfilled historical data) are not detected;
+call clear_scheduling_cache after such imports.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import hashlib
+import pickle
+from typing import Callable
+
+from flask import current_app
+import pandas as pd
+
+from flexmeasures.data.models.time_series import Sensor, TimedBelief
+from flexmeasures.utils.time_utils import server_now
+
+SCHEDULING_CACHE_KEY_PREFIX = "flexmeasures:scheduling-cache"
+
+
+def is_incremental_scheduling_enabled() -> bool:
+    """Incremental scheduling is enabled by setting a positive FLEXMEASURES_SCHEDULING_CACHE_TTL."""
+    return current_app.config.get("FLEXMEASURES_SCHEDULING_CACHE_TTL", 0) > 0
+
+
+def _cache_key(kind: str, *parts) -> str:
+    digest = hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f"{SCHEDULING_CACHE_KEY_PREFIX}:{kind}:{digest}"
+
+
+def _load(key: str) -> dict | None:
+    entry = current_app.redis_connection.get(key)
+    return pickle.loads(entry) if entry is not None else None
+
+
+def _save(key: str, entry: dict):
+    current_app.redis_connection.set(
+        key,
+        pickle.dumps(entry),
+        ex=current_app.config["FLEXMEASURES_SCHEDULING_CACHE_TTL"],
+    )
+
+
+def clear_scheduling_cache() -> int:
+    """Remove all cached scheduling data.
+
+    :returns: the number of removed cache entries
+    """
+    connection = current_app.redis_connection
+    keys = list(connection.scan_iter(f"{SCHEDULING_CACHE_KEY_PREFIX}:*"))
+    if keys:
+        connection.delete(*keys)
+    return len(keys)
+
+
+def _as_plain_series(series: pd.Series) -> pd.Series:
+    """Drop any subclass metadata (e.g. of a BeliefsSeries), which does not survive pickling."""
+    return pd.Series(series.to_numpy(), index=series.index, name=series.name)
+
+
+def load_sensor_series(
+    sensor: Sensor,
+    query_window: tuple[datetime, datetime],
+    resolution: timedelta,
+    beliefs_before: datetime | None,
+    load: Callable[[tuple[datetime, datetime]], pd.Series],
+    cache_criteria: tuple = (),
+) -> pd.Series:
+    """Load a time series derived from a sensor, reusing the series loaded for a previous, overlapping window.
+
+    :param sensor:          the sensor recording the data
+    :param query_window:    the (start, end) of the requested data
+    :param resolution:      the resolution of the requested data
+    :param beliefs_before:  the state of knowledge of interest (defaults to now)
+    :param load:            function to load the series for a given (start, end) window from the database
+    :param cache_criteria:  any other arguments determining the series (e.g. its unit)
+    :returns:               the series, for the requested window
+    """
+    start, end = query_window
+    knowledge_time = beliefs_before if beliefs_before is not None else server_now()
+    key = _cache_key("series", sensor.id, resolution, *cache_criteria)
+    entry = _load(key)
+
+    series = None
+    if (
+        entry is not None
+        and entry["start"] <= start < entry["end"]
+        and entry["knowledge_time"] <= knowledge_time
+    ):
+        # Look for beliefs formed since the previous run, about events in the cached window
+        updates = TimedBelief.search(
+            sensor,
+            event_starts_after=start,
+            event_ends_before=min(end, entry["end"]),
+            beliefs_after=entry["knowledge_time"],
+            beliefs_before=knowledge_time,
+        )
+        updates = updates[updates.belief_times > entry["knowledge_time"]]
+        if not updates.empty:
+            current_app.logger.info(
+                f"Data corrections found for sensor {sensor.id}. Reloading cached scheduling data."
+            )
+        else:
+            series = entry["series"]
+            if end > entry["end"]:
+                # Load the new tail, with a margin to get values near the boundary right
+                margin = max(sensor.event_resolution, resolution)
+                tail = _as_plain_series(load((entry["end"] - margin, end)))
+                series = pd.concat([series, tail[tail.index >= entry["end"]]])
+            series = series[(series.index >= start) & (series.index < end)]
+    if series is None:
+        series = _as_plain_series(load(query_window))
+
+    _save(
+        key,
+        dict(start=start, end=end, knowledge_time=knowledge_time, series=series),
+    )
+    return series
+
+
+def load_previous_plan(
+    sensors: list[Sensor],
+    index: pd.DatetimeIndex,
+    resolution: timedelta,
+) -> list[pd.Series] | None:
+    """Load the previous plan for the given devices, aligned with the given index.
+
+    Time steps not covered by the previous plan are filled in with the last planned value.
+
+    :returns: the planned power per device (in MW), or None if there is no (overlapping) previous plan
+    """
+    entry = _load(_cache_key("plan", *sorted(sensor.id for sensor in sensors)))
+    if entry is None or entry["resolution"] != resolution:
+        return None
+    plan = [entry["plan"][entry["sensor_ids"].index(sensor.id)] for sensor in sensors]
+    if not plan[0].index.isin(index).any():
+        return None
+    return [device_plan.reindex(index).ffill().fillna(0) for device_plan in plan]
+
+
+def save_plan(sensors: list[Sensor], plan: list[pd.Series], resolution: timedelta):
+    """Save the plan for the given devices (power per device, in MW), to warm-start the next run."""
+    _save(
+        _cache_key("plan", *sorted(sensor.id for sensor in sensors)),
+        dict(
+            sensor_ids=[sensor.id for sensor in sensors],
+            resolution=resolution,
+            plan=plan,
+        ),
+    )
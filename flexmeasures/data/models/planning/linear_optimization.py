@@ -29,6 +29,7 @@ from flexmeasures.data.models.planning import (
 )
 from flexmeasures.data.models.planning.utils import initialize_series, initialize_df
 from flexmeasures.utils.calculations import apply_stock_changes_and_losses
+from flexmeasures.utils.metrics import solver_timer
 
 infinity = float("inf")
 
@@ -41,6 +42,7 @@ def device_scheduler(  # noqa C901
     commitment_upwards_deviation_price: list[pd.Series] | list[float] | None = None,
     commitments: list[pd.DataFrame] | list[Commitment] | None = None,
     initial_stock: float | list[float] = 0,
+    initial_power: list[pd.Series] | None = None,
 ) -> tuple[list[pd.Series], float, SolverResults, ConcreteModel]:
     """This generic device scheduler is able to handle an EMS with multiple devices,
     with various types of constraints on the EMS level and on the device level,
@@ -71,6 +73,8 @@ def device_scheduler(  # noqa C901
                                     device:                     0 (corresponds to device d; if not set, commitment is on an EMS level)
     :param initial_stock:       initial stock for each device. Use a list with the same number of devices as device_constraints,
                                 or use a single value to set the initial stock to be the same for all devices.
+    :param initial_power:       optional starting point for the solver, with the (expected) flow for each device,
+                                e.g. the previous plan for an overlapping window. Only used if the solver supports warm starts.
 
     Potentially deprecated arguments:
         commitment_quantities: amounts of flow specified in commitments (both previously ordered and newly requested)
@@ -587,6 +591,18 @@ def device_scheduler(  # noqa C901
     solver_name = current_app.config.get("FLEXMEASURES_LP_SOLVER")
 
     solver = SolverFactory(solver_name)
+    solve_kwargs = {}
+    if (
+        initial_power is not None
+        and getattr(solver, "warm_start_capable", lambda: False)()
+    ):
+        for d in model.d:
+            for j, power in enumerate(initial_power[d].to_numpy()):
+                model.ems_power[d, j].value = float(power)
+                model.device_power_up[d, j].value = max(power, 0)
+                model.device_power_down[d, j].value = min(power, 0)
+                model.device_power_sign[d, j].value = int(power > 0)
+        solve_kwargs["warmstart"] = True
 
     # disable logs for the HiGHS solver in case that LOGGING_LEVEL is INFO
     if current_app.config["LOGGING_LEVEL"] == "INFO" and (
@@ -595,7 +611,8 @@ def device_scheduler(  # noqa C901
         solver.options["output_flag"] = "false"
 
     # load_solutions=False to avoid a RuntimeError exception in appsi solvers when solving an infeasible problem.
-    results = solver.solve(model, load_solutions=False)
+    with solver_timer(solver_name):
+        results = solver.solve(model, load_solutions=False, **solve_kwargs)
 
     # load the results only if a feasible solution has been found
     if len(results.solution) > 0:
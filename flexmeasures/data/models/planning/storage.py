@@ -1,7 +1,5 @@
 from __future__ import annotations
 
-import re
-import copy
 from datetime import datetime, timedelta
 from typing import Type
 
@@ -17,6 +15,11 @@ from flexmeasures.data.models.planning import (
     SchedulerOutputType,
     StockCommitment,
 )
+from flexmeasures.data.models.planning.cache import (
+    is_incremental_scheduling_enabled,
+    load_previous_plan,
+    save_plan,
+)
 from flexmeasures.data.models.planning.linear_optimization import device_scheduler
 from flexmeasures.data.models.planning.utils import (
     add_tiny_price_slope,
@@ -25,7 +28,7 @@ from flexmeasures.data.models.planning.utils import (
     initialize_series,
     initialize_df,
     get_power_values,
-    fallback_charging_policy,
+    fallback_charging_policies,
     get_continuous_series_sensor_or_quantity,
 )
 from flexmeasures.data.models.planning.exceptions import InfeasibleProblemException
@@ -43,6 +46,10 @@ from flexmeasures.utils.time_utils import determine_minimum_resampling_resolutio
 from flexmeasures.utils.unit_utils import ur, convert_units
 
 
+# Number of violations reported per storage constraint, when the input data yields an infeasible problem
+MAX_REPORTED_CONSTRAINT_VIOLATIONS = 5
+
+
 class MetaStorageScheduler(Scheduler):
     """This class defines the constraints of a schedule for a storage device from the
     flex-model, flex-context, and sensor and asset attributes"""
@@ -925,7 +932,7 @@ class MetaStorageScheduler(Scheduler):
 
             # check that storage constraints are fulfilled
             if not skip_validation:
-                constraint_violations = validate_storage_constraints(
+                violations = check_storage_constraints(
                     constraints=device_constraints[d],
                     soc_at_start=soc_at_start[d],
                     soc_min=soc_min[d],
@@ -933,10 +940,23 @@ class MetaStorageScheduler(Scheduler):
                     resolution=resolution,
                 )
 
-                if len(constraint_violations) > 0:
+                if len(violations) > 0:
                     # TODO: include hints from constraint_violations into the error message
+                    constraint_violations = validate_storage_constraints(
+                        constraints=device_constraints[d],
+                        soc_at_start=soc_at_start[d],
+                        soc_min=soc_min[d],
+                        soc_max=soc_max[d],
+                        resolution=resolution,
+                        max_violations_per_condition=MAX_REPORTED_CONSTRAINT_VIOLATIONS,
+                        violations=violations,
+                    )
                     message = create_constraint_violations_message(
-                        constraint_violations
+                        constraint_violations,
+                        violation_counts={
+                            condition: len(violating_times)
+                            for condition, violating_times in violations.items()
+                        },
                     )
                     raise ValueError(
                         "The input data yields an infeasible problem. Constraint validation has found the following issues:\n"
@@ -1208,11 +1228,16 @@ class StorageFallbackScheduler(MetaStorageScheduler):
             commitments,
         ) = self._prepare(skip_validation=skip_validation)
 
-        # Fallback policy if the problem was unsolvable
+        # Fallback policy if the problem was unsolvable, applied to all devices at once
+        index = initialize_index(start, end, resolution)
+        schedules = fallback_charging_policies(
+            device_constraints,
+            is_consumer=[bool(s.get_attribute("is_consumer")) for s in sensors],
+            is_producer=[bool(s.get_attribute("is_producer")) for s in sensors],
+            index=index,
+        )
         storage_schedule = {
-            sensor: fallback_charging_policy(
-                sensor, device_constraints[d], start, end, resolution
-            )
+            sensor: pd.Series(schedules[d], index=index)
             for d, sensor in enumerate(sensors)
         }
 
@@ -1267,6 +1292,14 @@ class StorageScheduler(MetaStorageScheduler):
             commitments,
         ) = self._prepare(skip_validation=skip_validation)
 
+        # Warm-start from the previous plan, if we are re-scheduling a rolled-forward window
+        incremental = is_incremental_scheduling_enabled()
+        initial_power = (
+            load_previous_plan(sensors, device_constraints[0].index, resolution)
+            if incremental
+            else None
+        )
+
         ems_schedule, expected_costs, scheduler_results, model = device_scheduler(
             device_constraints=device_constraints,
             ems_constraints=ems_constraints,
@@ -1279,9 +1312,12 @@ class StorageScheduler(MetaStorageScheduler):
                 )
                 for soc_at_start_d in soc_at_start
             ],
+            initial_power=initial_power,
         )
         if scheduler_results.solver.termination_condition == "infeasible":
             raise InfeasibleProblemException()
+        if incremental:
+            save_plan(sensors, ems_schedule, resolution)
 
         # Obtain the storage schedule from all device schedules within the EMS
         storage_schedule = {sensor: ems_schedule[d] for d, sensor in enumerate(sensors)}
@@ -1375,10 +1411,14 @@ class StorageScheduler(MetaStorageScheduler):
             return storage_schedule[sensors[0]]
 
 
-def create_constraint_violations_message(constraint_violations: list) -> str:
+def create_constraint_violations_message(
+    constraint_violations: list, violation_counts: dict[str, int] | None = None
+) -> str:
     """Create a human-readable message with the constraint_violations.
 
-    :param constraint_violations: list with the constraint violations
+    :param constraint_violations:   list with the constraint violations
+    :param violation_counts:        optionally, the total number of violations per condition,
+                                    to mention violations that are not listed
     :return: human-readable message
     """
     message = ""
@@ -1386,6 +1426,11 @@ def create_constraint_violations_message(constraint_violations: list) -> str:
     for c in constraint_violations:
         message += f"t={c['dt']} | {c['violation']}\n"
 
+    for condition, count in (violation_counts or {}).items():
+        listed = sum(c["condition"] == condition for c in constraint_violations)
+        if count > listed:
+            message += f"... and {count - listed} more violation(s) of {condition}\n"
+
     if len(message) > 1:
         message = message[:-1]
 
@@ -1557,12 +1602,133 @@ def add_storage_constraints(
     return storage_device_constraints
 
 
+# Storage constraint checks, as (condition, left-hand side, right-hand side), see validate_storage_constraints
+STORAGE_CONSTRAINT_CHECKS = (
+    # A. Global validation
+    ("soc_min(t) <= min(t)", ("soc_min(t)",), ("min(t)",)),
+    ("max(t) <= soc_max(t)", ("max(t)",), ("soc_max(t)",)),
+    # B. Validation in the same time frame
+    ("min(t) <= max(t)", ("min(t)",), ("max(t)",)),
+    ("min(t) <= equals(t)", ("min(t)",), ("equals(t)",)),
+    ("equals(t) <= max(t)", ("equals(t)",), ("max(t)",)),
+    # C. Validation in different time frames
+    (
+        "equals(t) - equals(t-1) <= derivative_max(t) * factor_w_wh(t)",
+        ("equals(t)", "-", "equals(t-1)"),
+        ("derivative_max(t)", "*", "factor_w_wh(t)"),
+    ),
+    (
+        "derivative_min(t) * factor_w_wh(t) <= equals(t) - equals(t-1)",
+        ("derivative_min(t)", "*", "factor_w_wh(t)"),
+        ("equals(t)", "-", "equals(t-1)"),
+    ),
+    (
+        "min(t) - max(t-1) <= derivative_max(t) * factor_w_wh(t)",
+        ("min(t)", "-", "max(t-1)"),
+        ("derivative_max(t)", "*", "factor_w_wh(t)"),
+    ),
+    (
+        "derivative_min(t) * factor_w_wh(t) <= max(t) - min(t-1)",
+        ("derivative_min(t)", "*", "factor_w_wh(t)"),
+        ("max(t)", "-", "min(t-1)"),
+    ),
+    (
+        "equals(t) - max(t-1) <= derivative_max(t) * factor_w_wh(t)",
+        ("equals(t)", "-", "max(t-1)"),
+        ("derivative_max(t)", "*", "factor_w_wh(t)"),
+    ),
+    (
+        "derivative_min(t) * factor_w_wh(t) <= equals(t) - min(t-1)",
+        ("derivative_min(t)", "*", "factor_w_wh(t)"),
+        ("equals(t)", "-", "min(t-1)"),
+    ),
+)
+
+
+def _storage_constraint_arrays(
+    constraints: pd.DataFrame,
+    soc_at_start: float,
+    soc_min: float,
+    soc_max: float,
+    resolution: timedelta,
+) -> dict[str, np.ndarray]:
+    """Collect the terms used in the storage constraint checks as NumPy arrays."""
+    n = len(constraints)
+    soc_min = (soc_min - soc_at_start) * timedelta(hours=1) / resolution
+    soc_max = (soc_max - soc_at_start) * timedelta(hours=1) / resolution
+    arrays = {
+        f"{column.replace(' ', '_')}(t)": constraints[column].to_numpy(dtype=float)
+        for column in ("equals", "max", "min", "derivative max", "derivative min")
+    }
+    arrays["soc_min(t)"] = np.full(n, soc_min, dtype=float)
+    arrays["soc_max(t)"] = np.full(n, soc_max, dtype=float)
+    arrays["factor_w_wh(t)"] = np.full(n, resolution / timedelta(hours=1))
+    for column, first_value in (
+        ("min", soc_min),
+        ("equals", soc_at_start),
+        ("max", soc_max),
+    ):
+        arrays[f"{column}(t-1)"] = np.concatenate(
+            [[first_value], arrays[f"{column}(t)"][:-1]]
+        )
+    return arrays
+
+
+def _evaluate_terms(arrays: dict[str, np.ndarray], terms: tuple) -> np.ndarray:
+    """Evaluate a side of a constraint check, e.g. ("equals(t)", "-", "equals(t-1)"), treating NaN as 0."""
+    result = np.nan_to_num(arrays[terms[0]])
+    for operator, term in zip(terms[1::2], terms[2::2]):
+        values = np.nan_to_num(arrays[term])
+        if operator == "-":
+            result = result - values
+        elif operator == "*":
+            result = result * values
+        else:
+            result = result + values
+    return result
+
+
+def check_storage_constraints(
+    constraints: pd.DataFrame,
+    soc_at_start: float,
+    soc_min: float,
+    soc_max: float,
+    resolution: timedelta,
+    round_to_decimals: int = 6,
+) -> dict[str, pd.DatetimeIndex]:
+    """Find the time steps at which the storage constraints are violated (see validate_storage_constraints).
+
+    All checks are evaluated on NumPy arrays, without building messages,
+    which makes this function suitable as a fast pre-check for flex-models.
+    Checks involving a missing (NaN) constraint are skipped for that time step.
+
+    :returns: the violating time steps, per condition (only conditions with violations are included)
+    """
+    arrays = _storage_constraint_arrays(
+        constraints, soc_at_start, soc_min, soc_max, resolution
+    )
+    violations = {}
+    for condition, lhs_terms, rhs_terms in STORAGE_CONSTRAINT_CHECKS:
+        lhs = np.round(_evaluate_terms(arrays, lhs_terms), round_to_decimals)
+        rhs = np.round(_evaluate_terms(arrays, rhs_terms), round_to_decimals)
+        involved = [term for term in lhs_terms + rhs_terms if term in arrays]
+        is_defined = ~np.isnan(np.stack([arrays[term] for term in involved])).any(
+            axis=0
+        )
+        fails = ~(lhs <= rhs) & is_defined
+        if fails.any():
+            violations[condition] = constraints.index[fails]
+    return violations
+
+
 def validate_storage_constraints(
     constraints: pd.DataFrame,
     soc_at_start: float,
     soc_min: float,
     soc_max: float,
     resolution: timedelta,
+    max_violations_per_condition: int | None = None,
+    violations: dict[str, pd.DatetimeIndex] | None = None,
 ) -> list[dict]:
     """Check that the storage constraints are fulfilled, e.g min <= equals <= max.
 
@@ -1581,258 +1747,47 @@ def validate_storage_constraints(
         C.5) equals(t) - max(t-1) <= derivative_max(t)
         C.6) derivative_min(t) <= equals(t) - min(t-1)
 
-    :param constraints:         dataframe containing the constraints of a storage device
-    :param soc_at_start:        State of charge at the start time.
-    :param soc_min:             Minimum state of charge at all times.
-    :param soc_max:             Maximum state of charge at all times.
-    :param resolution:          Constant duration between the start of each time step.
-    :returns:                   List of constraint violations, specifying their time, constraint and violation.
-    """
-
-    # get a copy of the constraints to make sure the dataframe doesn't get updated
-    _constraints = constraints.copy()
-
-    _constraints = _constraints.rename(
-        columns={
-            columns_name: columns_name.replace(" ", "_")
-            + "(t)"  # replace spaces with underscore and add time index
-            for columns_name in _constraints.columns
-        }
-    )
-
-    constraint_violations = []
-
-    ########################
-    # A. Global validation #
-    ########################
-
-    # 1) min >= soc_min
-    soc_min = (soc_min - soc_at_start) * timedelta(hours=1) / resolution
-    _constraints["soc_min(t)"] = soc_min
-    constraint_violations += validate_constraint(
-        _constraints, "soc_min(t)", "<=", "min(t)"
-    )
-
-    # 2) max <= soc_max
-    soc_max = (soc_max - soc_at_start) * timedelta(hours=1) / resolution
-    _constraints["soc_max(t)"] = soc_max
-    constraint_violations += validate_constraint(
-        _constraints, "max(t)", "<=", "soc_max(t)"
-    )
-
-    ########################################
-    # B. Validation in the same time frame #
-    ########################################
-
-    # 1) min <= max
-    constraint_violations += validate_constraint(_constraints, "min(t)", "<=", "max(t)")
-
-    # 2) min <= equals
-    constraint_violations += validate_constraint(
-        _constraints, "min(t)", "<=", "equals(t)"
-    )
-
-    # 3) equals <= max
-    constraint_violations += validate_constraint(
-        _constraints, "equals(t)", "<=", "max(t)"
-    )
-
-    ##########################################
-    # C. Validation in different time frames #
-    ##########################################
-
-    _constraints["factor_w_wh(t)"] = resolution / timedelta(hours=1)
-    _constraints["min(t-1)"] = prepend_series(_constraints["min(t)"], soc_min)
-    _constraints["equals(t-1)"] = prepend_series(
-        _constraints["equals(t)"], soc_at_start
-    )
-    _constraints["max(t-1)"] = prepend_series(_constraints["max(t)"], soc_max)
-
-    # 1) equals(t) - equals(t-1) <= derivative_max(t)
-    constraint_violations += validate_constraint(
-        _constraints,
-        "equals(t) - equals(t-1)",
-        "<=",
-        "derivative_max(t) * factor_w_wh(t)",
-    )
-
-    # 2) derivative_min(t) <= equals(t) - equals(t-1)
-    constraint_violations += validate_constraint(
-        _constraints,
-        "derivative_min(t) * factor_w_wh(t)",
-        "<=",
-        "equals(t) - equals(t-1)",
-    )
-
-    # 3) min(t) - max(t-1) <= derivative_max(t)
-    constraint_violations += validate_constraint(
-        _constraints, "min(t) - max(t-1)", "<=", "derivative_max(t) * factor_w_wh(t)"
-    )
-
-    # 4) max(t) - min(t-1) >= derivative_min(t)
-    constraint_violations += validate_constraint(
-        _constraints, "derivative_min(t) * factor_w_wh(t)", "<=", "max(t) - min(t-1)"
-    )
-
-    # 5) equals(t) - max(t-1) <= derivative_max(t)
-    constraint_violations += validate_constraint(
-        _constraints, "equals(t) - max(t-1)", "<=", "derivative_max(t) * factor_w_wh(t)"
-    )
-
-    # 6) derivative_min(t) <= equals(t) - min(t-1)
-    constraint_violations += validate_constraint(
-        _constraints, "derivative_min(t) * factor_w_wh(t)", "<=", "equals(t) - min(t-1)"
-    )
-
-    return constraint_violations
-
-
-def get_pattern_match_word(word: str) -> str:
-    """Get a regex pattern to match a word
-
-    The conditions to delimit a word are:
-      - start of line
-      - whitespace
-      - end of line
-      - word boundary
-      - arithmetic operations
-
-    :return: regex expression
+    Messages are only built for the reported violations.
+    To just count violations, use check_storage_constraints.
+
+    :param constraints:                     dataframe containing the constraints of a storage device
+    :param soc_at_start:                    State of charge at the start time.
+    :param soc_min:                         Minimum state of charge at all times.
+    :param soc_max:                         Maximum state of charge at all times.
+    :param resolution:                      Constant duration between the start of each time step.
+    :param max_violations_per_condition:    Optionally, only report the first violations of each condition.
+    :param violations:                      Optionally, the result of an earlier call to check_storage_constraints.
+    :returns:                               List of constraint violations, specifying their time, constraint and violation.
     """
-
-    regex = r"(^|\s|$|\b|\+|\-|\*|\/\|\\)"
-
-    return regex + re.escape(word) + regex
-
-
-def sanitize_expression(expression: str, columns: list) -> tuple[str, list]:
-    """Wrap column in commas to accept arbitrary column names (e.g. with spaces).
-
-    :param expression: expression to sanitize
-    :param columns: list with the name of the columns of the input data for the expression.
-    :return: sanitized expression and columns (variables) used in the expression
-    """
-
-    _expression = copy.copy(expression)
-    columns_involved = []
-
-    for column in columns:
-        if re.search(get_pattern_match_word(column), _expression):
-            columns_involved.append(column)
-
-        _expression = re.sub(get_pattern_match_word(column), f"`{column}`", _expression)
-
-    return _expression, columns_involved
-
-
-def validate_constraint(
-    constraints_df: pd.DataFrame,
-    lhs_expression: str,
-    inequality: str,
-    rhs_expression: str,
-    round_to_decimals: int | None = 6,
-) -> list[dict]:
-    """Validate the feasibility of a given set of constraints.
-
-    :param constraints_df:      DataFrame with the constraints
-    :param lhs_expression:      left-hand side of the inequality expression following pd.eval format.
-                                No need to use the syntax `column` to reference
-                                column, just use the column name.
-    :param inequality:          inequality operator, one of ('<=', '<', '>=', '>', '==', '!=').
-    :param rhs_expression:      right-hand side of the inequality expression following pd.eval format.
-                                No need to use the syntax `column` to reference
-                                column, just use the column name.
-    :param round_to_decimals:   Number of decimals to round off to before validating constraints.
-    :return:                    List of constraint violations, specifying their time, constraint and violation.
-    """
-
-    constraint_expression = f"{lhs_expression} {inequality} {rhs_expression}"
-
-    constraints_df_columns = list(constraints_df.columns)
-
-    lhs_expression, columns_lhs = sanitize_expression(
-        lhs_expression, constraints_df_columns
-    )
-    rhs_expression, columns_rhs = sanitize_expression(
-        rhs_expression, constraints_df_columns
-    )
-
-    columns_involved = columns_lhs + columns_rhs
-
-    lhs = (
-        constraints_df.astype(float)
-        .fillna(0)
-        .eval(lhs_expression)
-        .round(round_to_decimals)
-    )
-    rhs = (
-        constraints_df.astype(float)
-        .fillna(0)
-        .eval(rhs_expression)
-        .round(round_to_decimals)
+    if violations is None:
+        violations = check_storage_constraints(
+            constraints, soc_at_start, soc_min, soc_max, resolution
+        )
+    if not violations:
+        return []
+    arrays = _storage_constraint_arrays(
+        constraints, soc_at_start, soc_min, soc_max, resolution
     )
-
-    condition = None
-
-    inequality = inequality.strip()
-
-    if inequality == "<=":
-        condition = lhs <= rhs
-    elif inequality == "<":
-        condition = lhs < rhs
-    elif inequality == ">=":
-        condition = lhs >= rhs
-    elif inequality == ">":
-        condition = lhs > rhs
-    elif inequality == "==":
-        condition = lhs == rhs
-    elif inequality == "!=":
-        condition = lhs != rhs
-    else:
-        raise ValueError(f"Inequality `{inequality} not supported.")
-
-    time_condition_fails = constraints_df.index[
-        ~condition & ~constraints_df[columns_involved].isna().any(axis=1)
-    ]
-
     constraint_violations = []
-
-    for dt in time_condition_fails:
-        value_replaced = copy.copy(constraint_expression)
-
-        for column in constraints_df.columns:
-            value_replaced = re.sub(
-                get_pattern_match_word(column),
-                f"{column} [{constraints_df.loc[dt, column]}] ",
-                value_replaced,
+    for condition, violating_times in violations.items():
+        positions = constraints.index.get_indexer(
+            violating_times[:max_violations_per_condition]
+        )
+        for dt, i in zip(violating_times, positions):
+            violation = " ".join(
+                f"{token} [{arrays[token][i]}]" if token in arrays else token
+                for token in condition.split(" ")
             )
-
-        constraint_violations.append(
-            dict(
-                dt=dt.to_pydatetime(),
-                condition=constraint_expression,
-                violation=value_replaced,
+            constraint_violations.append(
+                dict(
+                    dt=dt.to_pydatetime(),
+                    condition=condition,
+                    violation=violation,
+                )
             )
-        )
-
     return constraint_violations
 
 
-def prepend_series(series: pd.Series, value) -> pd.Series:
-    """Prepend a value to a time series
-
-    :param series: series containing the timed values
-    :param value: value to place in the first position
-    """
-    # extend max
-    series = series.copy()
-    # insert `value` at time `series.index[0] - resolution` which creates a new entry at the end of the series
-    series[series.index[0] - series.index.freq] = value
-    # sort index to keep the time ordering
-    series = series.sort_index()
-    return series.shift(1)
-
-
 #####################
 # TO BE DEPRECATED #
 ####################
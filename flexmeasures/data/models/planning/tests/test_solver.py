@@ -16,6 +16,8 @@ from flexmeasures.data.models.planning.exceptions import InfeasibleProblemExcept
 from flexmeasures.data.models.planning.storage import (
     StorageScheduler,
     add_storage_constraints,
+    check_storage_constraints,
+    create_constraint_violations_message,
     validate_storage_constraints,
     build_device_soc_values,
 )
@@ -1014,6 +1016,46 @@ def test_validate_constraints(
     assert set(expected_constraint_type_violations) == constraint_type_violations_output
 
 
+def test_report_first_constraint_violations():
+    """Check that many violations are counted, while only the first few get a message."""
+    start = datetime(2023, 5, 18, tzinfo=pytz.utc)
+    end = datetime(2023, 5, 19, tzinfo=pytz.utc)
+    resolution = timedelta(minutes=5)
+    columns = ["equals", "max", "min", "derivative max", "derivative min"]
+    storage_device_constraints = initialize_df(columns, start, end, resolution)
+    storage_device_constraints["min"] = 5
+    storage_device_constraints["max"] = 3  # min > max at all 288 time steps
+
+    violations = check_storage_constraints(
+        constraints=storage_device_constraints,
+        soc_at_start=0.0,
+        soc_min=0,
+        soc_max=10,
+        resolution=resolution,
+    )
+    assert list(violations.keys()) == ["min(t) <= max(t)"]
+    assert len(violations["min(t) <= max(t)"]) == 288
+
+    constraint_violations = validate_storage_constraints(
+        constraints=storage_device_constraints,
+        soc_at_start=0.0,
+        soc_min=0,
+        soc_max=10,
+        resolution=resolution,
+        max_violations_per_condition=2,
+    )
+    assert len(constraint_violations) == 2
+    assert constraint_violations[0]["dt"] == start
+    assert constraint_violations[0]["violation"] == "min(t) [5.0] <= max(t) [3.0]"
+    message = create_constraint_violations_message(
+        constraint_violations,
+        violation_counts={
+            condition: len(times) for condition, times in violations.items()
+        },
+    )
+    assert message.endswith("... and 286 more violation(s) of min(t) <= max(t)")
+
+
 def test_infeasible_problem_error(db, add_battery_assets):
     """Try to create a schedule with infeasible constraints. soc-max is 4.5 and soc-target is 8.0"""
 
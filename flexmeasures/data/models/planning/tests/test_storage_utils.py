@@ -1,5 +1,6 @@
 import pytest
 
+import numpy as np
 import pandas as pd
 
 from flexmeasures.data.models.planning.utils import process_time_series_segments
@@ -122,3 +123,69 @@ def test_process_time_series_segments(
         index, variable_quantity, unit, resolution, resolve_overlaps
     )
     pd.testing.assert_series_equal(result, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize("resolve_overlaps", ["first", "mean"])
+def test_process_time_series_segments_across_dst_transition(resolve_overlaps):
+    """Segments may be defined with different UTC offsets, e.g. before and after a DST transition."""
+    index = pd.date_range(
+        "2023-03-26",
+        "2023-03-27",
+        freq="1h",
+        inclusive="left",
+        tz="Europe/Amsterdam",
+    )
+    variable_quantity = [
+        {
+            "value": ur.Quantity(1, "kW"),
+            "start": pd.Timestamp("2023-03-26T00:00+01:00"),
+            "end": pd.Timestamp("2023-03-26T06:00+02:00"),
+        },
+        {
+            "value": ur.Quantity(2, "kW"),
+            "start": pd.Timestamp("2023-03-26T06:00+02:00"),
+            "end": pd.Timestamp("2023-03-27T00:00+02:00"),
+        },
+    ]
+    result = process_time_series_segments(
+        index, variable_quantity, "kW", pd.Timedelta("1h"), resolve_overlaps
+    )
+    # Only 23 hours in this day, 5 of which are before 6 AM
+    expected = pd.Series([1.0] * 5 + [2.0] * 18, index=index, name="event_value")
+    pd.testing.assert_series_equal(result, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize(
+    "resolve_overlaps", ["first", "last", "min", "max", "mean", "sum"]
+)
+def test_process_many_overlapping_time_series_segments(resolve_overlaps):
+    """Compare with resolving overlaps in a dense frame, with one column per segment."""
+    index = pd.date_range("2023-01-01", "2023-01-04", freq="5min", inclusive="left")
+    resolution = pd.Timedelta("5min")
+    rng = np.random.default_rng(seed=42)
+    variable_quantity = []
+    for _ in range(200):
+        start = index[0] + rng.integers(-10, len(index)) * resolution
+        end = start + rng.integers(0, 100) * resolution
+        value = np.nan if rng.random() < 0.1 else float(rng.integers(0, 100))
+        variable_quantity.append(
+            {"value": ur.Quantity(value, "kW"), "start": start, "end": end}
+        )
+    dense = pd.DataFrame(np.nan, index=index, columns=range(len(variable_quantity)))
+    for segment, event in enumerate(variable_quantity):
+        dense.loc[event["start"] : event["end"] - resolution, segment] = (
+            event["value"].to("MW").magnitude
+        )
+    if resolve_overlaps == "first":
+        expected = dense.bfill(axis=1).iloc[:, 0]
+    elif resolve_overlaps == "last":
+        expected = dense.ffill(axis=1).iloc[:, -1]
+    else:
+        expected = getattr(dense, resolve_overlaps)(axis=1)
+
+    result = process_time_series_segments(
+        index, variable_quantity, "MW", resolution, resolve_overlaps
+    )
+    pd.testing.assert_series_equal(
+        result, expected.rename("event_value"), check_dtype=False
+    )
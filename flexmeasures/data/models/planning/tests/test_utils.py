@@ -1,12 +1,19 @@
+import numpy as np
 import pandas as pd
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 from flexmeasures.data.models.generic_assets import GenericAsset, GenericAssetType
 from flexmeasures.data.models.time_series import Sensor, TimedBelief
 from flexmeasures.data.models.data_sources import DataSource
 from flexmeasures.data.services.utils import get_or_create_model
 import timely_beliefs as tb
-from flexmeasures.data.models.planning.utils import get_series_from_quantity_or_sensor
+from flexmeasures.data.models.planning.utils import (
+    fallback_charging_policies,
+    get_series_from_quantity_or_sensor,
+    idle_after_reaching_target,
+    initialize_df,
+    initialize_series,
+)
 
 
 def test_get_series_from_quantity_or_sensor(
@@ -55,3 +62,142 @@ def test_get_series_from_quantity_or_sensor(
         unit="kW",
     )
     assert isinstance(result, pd.Series)
+
+
+def test_get_series_from_sensor_incrementally(app, db, monkeypatch):
+    """Loading a rolled-forward window should reuse cached data, yet pick up new data and corrections."""
+    monkeypatch.setitem(app.config, "FLEXMEASURES_SCHEDULING_CACHE_TTL", 3600)
+    source = get_or_create_model(DataSource, name="test-source")
+    price_type = get_or_create_model(GenericAssetType, name="market")
+    market = get_or_create_model(
+        GenericAsset, name="incremental market", generic_asset_type=price_type
+    )
+    price_sensor = get_or_create_model(
+        Sensor,
+        name="incremental prices",
+        generic_asset=market,
+        event_resolution=timedelta(minutes=15),
+        unit="EUR/MWh",
+    )
+    start = pd.Timestamp("2025-01-01 06:00:00+01:00")
+    belief_time = start - timedelta(hours=1)
+    bdf = tb.BeliefsDataFrame(
+        pd.Series(
+            np.arange(8.0),
+            index=pd.date_range(start, freq="15min", periods=8, name="event_start"),
+            name="event_value",
+        ),
+        belief_time=belief_time,
+        sensor=price_sensor,
+        source=source,
+    )
+    TimedBelief.add(bdf)
+
+    def load(window, beliefs_before):
+        return get_series_from_quantity_or_sensor(
+            variable_quantity=price_sensor,
+            query_window=window,
+            resolution=price_sensor.event_resolution,
+            unit="EUR/MWh",
+            beliefs_before=beliefs_before,
+            as_instantaneous_events=False,
+        )
+
+    first = load((start, start + timedelta(hours=1)), belief_time)
+    assert list(first) == [0, 1, 2, 3]
+
+    # Roll forward: the overlapping part comes from the cache, the new tail from the database
+    rolled_window = (start + timedelta(minutes=30), start + timedelta(hours=2))
+    assert list(load(rolled_window, belief_time)) == [2, 3, 4, 5, 6, 7]
+
+    # A correction about a cached event is picked up
+    correction = tb.BeliefsDataFrame(
+        pd.Series(
+            [10.0],
+            index=pd.DatetimeIndex([start + timedelta(minutes=45)], name="event_start"),
+            name="event_value",
+        ),
+        belief_time=belief_time + timedelta(minutes=15),
+        sensor=price_sensor,
+        source=source,
+    )
+    TimedBelief.add(correction)
+    assert list(load(rolled_window, belief_time + timedelta(minutes=15))) == [
+        2,
+        10,
+        4,
+        5,
+        6,
+        7,
+    ]
+
+
+def _fallback_charging_policy_per_device(
+    device_constraints: pd.DataFrame, is_consumer: bool, is_producer: bool
+) -> pd.Series:
+    """Reference implementation, processing a single device with pandas operations."""
+    index = device_constraints.index
+    max_charge_capacity = (
+        device_constraints[["derivative max", "derivative equals"]].min().min()
+    )
+    max_discharge_capacity = (
+        -device_constraints[["derivative min", "derivative equals"]].max().max()
+    )
+    charge = pd.Series(max_charge_capacity if is_consumer else 0, index=index)
+    discharge = pd.Series(-max_discharge_capacity if is_producer else 0, index=index)
+    for column, sign, schedule in (
+        ("equals", 1, charge),
+        ("equals", -1, discharge),
+        ("max", -1, discharge),
+        ("min", 1, charge),
+    ):
+        first_valid_index = device_constraints[column].first_valid_index()
+        if (
+            first_valid_index is not None
+            and sign * device_constraints[column][first_valid_index] > 0
+        ):
+            return idle_after_reaching_target(
+                schedule.astype(float), device_constraints[column]
+            )
+    return pd.Series(0.0, index=index)
+
+
+def test_fallback_charging_policies():
+    """Check that the fallback policy for many devices at once matches processing them one by one."""
+    start = datetime(2025, 1, 1)
+    end = datetime(2025, 1, 2)
+    resolution = timedelta(minutes=15)
+    columns = [
+        "equals",
+        "max",
+        "min",
+        "derivative max",
+        "derivative min",
+        "derivative equals",
+    ]
+    rng = np.random.default_rng(seed=7)
+    device_constraints = []
+    for _ in range(50):
+        constraints = initialize_df(columns, start, end, resolution).astype(float)
+        constraints["derivative max"] = rng.uniform(0, 2)
+        constraints["derivative min"] = -rng.uniform(0, 2)
+        for column in ("equals", "max", "min"):
+            if rng.random() < 0.5:
+                constraints.loc[
+                    constraints.index[rng.integers(0, len(constraints))], column
+                ] = rng.uniform(-10, 10)
+        device_constraints.append(constraints)
+    is_consumer = list(rng.random(50) < 0.8)
+    is_producer = list(rng.random(50) < 0.8)
+
+    schedules = fallback_charging_policies(
+        device_constraints,
+        is_consumer=is_consumer,
+        is_producer=is_producer,
+        index=initialize_series(None, start, end, resolution).index,
+    )
+    for d, constraints in enumerate(device_constraints):
+        expected = _fallback_charging_policy_per_device(
+            constraints, is_consumer[d], is_producer[d]
+        )
+        np.testing.assert_array_equal(schedules[d], expected.to_numpy())
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from packaging import version
 from datetime import date, datetime, timedelta
+import heapq
 
 from flask import current_app
 import pandas as pd
@@ -9,6 +10,10 @@ from pandas.tseries.frequencies import to_offset
 import numpy as np
 import timely_beliefs as tb
 
+from flexmeasures.data.models.planning.cache import (
+    is_incremental_scheduling_enabled,
+    load_sensor_series,
+)
 from flexmeasures.data.models.planning.exceptions import UnknownPricesException
 from flexmeasures.data.models.time_series import Sensor, TimedBelief
 from flexmeasures import Asset
@@ -217,54 +222,100 @@ def fallback_charging_policy(
     while probably a decent policy for Charge Points,
     should not be considered a robust policy for other asset types.
     """
-    max_charge_capacity = (
-        device_constraints[["derivative max", "derivative equals"]].min().min()
+    index = initialize_index(start, end, resolution)
+    schedules = fallback_charging_policies(
+        [device_constraints],
+        is_consumer=[bool(sensor.get_attribute("is_consumer"))],
+        is_producer=[bool(sensor.get_attribute("is_producer"))],
+        index=index,
     )
-    max_discharge_capacity = (
-        -device_constraints[["derivative min", "derivative equals"]].max().max()
+    return pd.Series(schedules[0], index=index)
+
+
+def _first_valid_values(values: np.ndarray) -> np.ndarray:
+    """Return the first non-NaN value of each row (NaN for rows without any)."""
+    is_valid = ~np.isnan(values)
+    first_valid_values = values[np.arange(len(values)), is_valid.argmax(axis=1)]
+    return np.where(is_valid.any(axis=1), first_valid_values, np.nan)
+
+
+def _nanmin_per_row(values: np.ndarray) -> np.ndarray:
+    """Return the minimum non-NaN value of each row (NaN for rows without any), without warnings."""
+    minima = np.where(np.isnan(values), np.inf, values).min(axis=1)
+    return np.where(np.isnan(values).all(axis=1), np.nan, minima)
+
+
+def fallback_charging_policies(
+    device_constraints: list[pd.DataFrame],
+    is_consumer: list[bool],
+    is_producer: list[bool],
+    index: pd.DatetimeIndex,
+) -> np.ndarray:
+    """Apply the fallback charging policy (see fallback_charging_policy) to many devices at once.
+
+    All devices are processed together as 2D NumPy arrays (devices × time steps),
+    which is much faster than processing them one by one, e.g. for an asset with many devices.
+
+    :param device_constraints:  constraints per device, each indexed by the given index
+    :param is_consumer:         whether each device can consume
+    :param is_producer:         whether each device can produce
+    :param index:               the index of the schedules
+    :returns:                   2D array with the schedule of each device (devices × time steps)
+    """
+    n_devices = len(device_constraints)
+    if n_devices == 0:
+        return np.zeros((0, len(index)))
+
+    def stack(column: str) -> np.ndarray:
+        return np.stack(
+            [
+                constraints[column].reindex(index).to_numpy(dtype=float)
+                for constraints in device_constraints
+            ]
+        )
+
+    equals = stack("equals")
+    maxima = stack("max")
+    minima = stack("min")
+    derivative_equals = stack("derivative equals")
+    max_charge_capacity = _nanmin_per_row(
+        np.hstack([stack("derivative max"), derivative_equals])
     )
-    charge_power = max_charge_capacity if sensor.get_attribute("is_consumer") else 0
-    discharge_power = (
-        -max_discharge_capacity if sensor.get_attribute("is_producer") else 0
+    max_discharge_capacity = _nanmin_per_row(
+        -np.hstack([stack("derivative min"), derivative_equals])
     )
+    charge_power = np.where(is_consumer, max_charge_capacity, 0)
+    discharge_power = np.where(is_producer, -max_discharge_capacity, 0)
+
+    # Decide per device, in order of precedence, whether to charge or discharge, and towards which target
+    first_equals = _first_valid_values(equals)
+    first_max = _first_valid_values(maxima)
+    first_min = _first_valid_values(minima)
+    conditions = [
+        # charge to get as close as possible to the next target
+        first_equals > 0,
+        # discharge to get as close as possible to the next target
+        first_equals < 0,
+        # discharge to try and bring back the soc below the next max constraint
+        first_max < 0,
+        # charge to try and bring back the soc above the next min constraint
+        first_min > 0,
+    ]
+    power = np.select(
+        conditions, [charge_power, discharge_power, discharge_power, charge_power], 0
+    )
+    target = np.select(
+        conditions, [first_equals, first_equals, first_max, first_min], 0
+    )
+    is_idle = ~np.any(conditions, axis=0)
 
-    charge_schedule = initialize_series(charge_power, start, end, resolution)
-    discharge_schedule = initialize_series(discharge_power, start, end, resolution)
-    idle_schedule = initialize_series(0, start, end, resolution)
-    if (
-        device_constraints["equals"].first_valid_index() is not None
-        and device_constraints["equals"][
-            device_constraints["equals"].first_valid_index()
-        ]
-        > 0
-    ):
-        # start charging to get as close as possible to the next target
-        return idle_after_reaching_target(charge_schedule, device_constraints["equals"])
-    if (
-        device_constraints["equals"].first_valid_index() is not None
-        and device_constraints["equals"][
-            device_constraints["equals"].first_valid_index()
-        ]
-        < 0
-    ):
-        # start discharging to get as close as possible to the next target
-        return idle_after_reaching_target(
-            discharge_schedule, device_constraints["equals"]
-        )
-    if (
-        device_constraints["max"].first_valid_index() is not None
-        and device_constraints["max"][device_constraints["max"].first_valid_index()] < 0
-    ):
-        # start discharging to try and bring back the soc below the next max constraint
-        return idle_after_reaching_target(discharge_schedule, device_constraints["max"])
-    if (
-        device_constraints["min"].first_valid_index() is not None
-        and device_constraints["min"][device_constraints["min"].first_valid_index()] > 0
-    ):
-        # start charging to try and bring back the soc above the next min constraint
-        return idle_after_reaching_target(charge_schedule, device_constraints["min"])
-    # stand idle
-    return idle_schedule
+    # Stop (dis)charging after the target is reached (or constraint is met)
+    schedules = np.repeat(power[:, np.newaxis], len(index), axis=1)
+    cumulative = np.cumsum(schedules, axis=1)
+    target = target[:, np.newaxis]
+    target_reached = np.where(target > 0, cumulative > target, cumulative < target)
+    schedules[target_reached | is_idle[:, np.newaxis]] = 0
+    return schedules
 
 
 def idle_after_reaching_target(
@@ -363,19 +414,38 @@ def get_series_from_quantity_or_sensor(
             )
         time_series = pd.Series(magnitude, index=index, name="event_value")
     elif isinstance(variable_quantity, Sensor):
-        bdf: tb.BeliefsDataFrame = TimedBelief.search(
-            variable_quantity,
-            event_starts_after=query_window[0],
-            event_ends_before=query_window[1],
-            resolution=resolution,
-            # frequency=resolution,
-            beliefs_before=beliefs_before,
-            most_recent_beliefs_only=True,
-            one_deterministic_belief_per_event=True,
-        )
-        if as_instantaneous_events:
-            bdf = bdf.resample_events(timedelta(0), boundary_policy=resolve_overlaps)
-        time_series = simplify_index(bdf).reindex(index).squeeze(axis=1)
+
+        def load_sensor_data(window: tuple[datetime, datetime]) -> pd.Series:
+            bdf: tb.BeliefsDataFrame = TimedBelief.search(
+                variable_quantity,
+                event_starts_after=window[0],
+                event_ends_before=window[1],
+                resolution=resolution,
+                # frequency=resolution,
+                beliefs_before=beliefs_before,
+                most_recent_beliefs_only=True,
+                one_deterministic_belief_per_event=True,
+            )
+            if as_instantaneous_events:
+                bdf = bdf.resample_events(
+                    timedelta(0), boundary_policy=resolve_overlaps
+                )
+            window_index = initialize_index(
+                start=window[0], end=window[1], resolution=resolution
+            )
+            return simplify_index(bdf).reindex(window_index).squeeze(axis=1)
+
+        if is_incremental_scheduling_enabled():
+            time_series = load_sensor_series(
+                variable_quantity,
+                query_window=query_window,
+                resolution=resolution,
+                beliefs_before=beliefs_before,
+                load=load_sensor_data,
+                cache_criteria=(as_instantaneous_events, resolve_overlaps),
+            ).reindex(index)
+        else:
+            time_series = load_sensor_data(query_window)
         time_series = convert_units(
             time_series, variable_quantity.unit, unit, resolution
         )
@@ -396,6 +466,90 @@ def get_series_from_quantity_or_sensor(
     return time_series
 
 
+def _sweep_segments(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    values: np.ndarray,
+    length: int,
+    resolve_overlaps: str,
+) -> np.ndarray:
+    """Resolve overlapping segments in one sweep over the segment boundaries, in O((N + S) log S).
+
+    Segments without a value (NaN) are ignored, and positions not covered by any segment are NaN.
+
+    :param starts:              index positions at which each segment starts
+    :param ends:                index positions at which each segment ends (exclusive)
+    :param values:              value of each segment
+    :param length:              length of the index
+    :param resolve_overlaps:    "first" or "last" (by order of the segments), "min" or "max" (by value)
+    :returns:                   the resolved value at each index position
+    """
+    segments = [
+        s for s in range(len(values)) if starts[s] < ends[s] and not np.isnan(values[s])
+    ]
+    if not segments:
+        return np.full(length, np.nan)
+
+    def priority(segment: int):
+        # The active segment with the lowest priority wins
+        if resolve_overlaps == "first":
+            return segment
+        elif resolve_overlaps == "last":
+            return -segment
+        elif resolve_overlaps == "min":
+            return values[segment]
+        return -values[segment]
+
+    boundaries = np.unique(
+        np.concatenate([[0, length], starts[segments], ends[segments]])
+    )
+    segments_by_start = sorted(segments, key=lambda s: starts[s])
+    # Heap of (priority, segment), from which ended segments are removed lazily
+    active: list[tuple] = []
+    interval_values = np.full(len(boundaries), np.nan)
+    i = 0
+    for b, boundary in enumerate(boundaries):
+        while i < len(segments_by_start) and starts[segments_by_start[i]] <= boundary:
+            segment = segments_by_start[i]
+            heapq.heappush(active, (priority(segment), segment))
+            i += 1
+        while active and ends[active[0][1]] <= boundary:
+            heapq.heappop(active)
+        if active:
+            interval_values[b] = values[active[0][1]]
+
+    # Look up the interval in which each index position lies
+    return interval_values[
+        np.searchsorted(boundaries, np.arange(length), side="right") - 1
+    ]
+
+
+def _sum_segments(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    values: np.ndarray,
+    length: int,
+    mean: bool = False,
+) -> np.ndarray:
+    """Sum (or average) overlapping segments using cumulative sums of their boundaries, in O(N + S).
+
+    Segments without a value (NaN) are ignored. Positions not covered by any segment sum to 0 (their mean is NaN).
+    """
+    valid = (starts < ends) & ~np.isnan(values)
+    totals = np.zeros(length + 1)
+    counts = np.zeros(length + 1)
+    np.add.at(totals, starts[valid], values[valid])
+    np.add.at(totals, ends[valid], -values[valid])
+    np.add.at(counts, starts[valid], 1)
+    np.add.at(counts, ends[valid], -1)
+    totals = np.cumsum(totals)[:-1]
+    counts = np.cumsum(counts)[:-1]
+    if not mean:
+        return totals
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+
 def process_time_series_segments(
     index: pd.DatetimeIndex,
     variable_quantity: list[dict],
@@ -420,12 +574,8 @@ def process_time_series_segments(
 
     Returns:                A time series with resolved event values.
     """
-    # Initialize a DataFrame to hold the segments
-    time_series_segments = pd.DataFrame(
-        np.nan, index=index, columns=list(range(len(variable_quantity)))
-    )
-
-    # Fill in the DataFrame with event values
+    # Determine the values and the index positions covered by each segment
+    values = np.full(len(variable_quantity), np.nan)
     for segment, event in enumerate(variable_quantity):
         value = event["value"]
         if isinstance(value, ur.Quantity):
@@ -436,19 +586,41 @@ def process_time_series_segments(
                 value = convert_units(
                     value.magnitude, str(value.units), unit, resolution
                 )
-        start = event["start"]
-        end = event["end"]
-        # Assign the value to the corresponding segment in the DataFrame
-        time_series_segments.loc[start : end - resolution, segment] = value
-
-    # Resolve overlaps using the specified method
-    if resolve_overlaps == "first":
-        # Use backfill to fill NaNs with the first non-NaN value
-        time_series = (
-            time_series_segments.astype(float).fillna(method="bfill", axis=1).iloc[:, 0]
+        values[segment] = np.nan if value is None else value
+    # Each segment covers the index from its start up to and including its end minus the resolution
+    # (segments may have different UTC offsets, e.g. when they span a DST transition)
+    starts = index.searchsorted(
+        pd.to_datetime(
+            [event["start"] for event in variable_quantity], utc=True
+        ).tz_convert(index.tz),
+        side="left",
+    )
+    ends = index.searchsorted(
+        pd.to_datetime(
+            [event["end"] - resolution for event in variable_quantity], utc=True
+        ).tz_convert(index.tz),
+        side="right",
+    )
+
+    if resolve_overlaps in ("first", "last", "min", "max"):
+        time_series = pd.Series(
+            _sweep_segments(starts, ends, values, len(index), resolve_overlaps),
+            index=index,
+        )
+    elif resolve_overlaps in ("sum", "mean"):
+        time_series = pd.Series(
+            _sum_segments(
+                starts, ends, values, len(index), mean=resolve_overlaps == "mean"
+            ),
+            index=index,
         )
     else:
-        # Use the specified method to resolve overlaps (e.g., mean, max)
+        # Fall back to a dense frame with one column per segment, and use the specified method to resolve overlaps
+        time_series_segments = pd.DataFrame(
+            np.nan, index=index, columns=list(range(len(variable_quantity)))
+        )
+        for segment, (start, end) in enumerate(zip(starts, ends)):
+            time_series_segments.iloc[start:end, segment] = values[segment]
         time_series = getattr(time_series_segments, resolve_overlaps)(axis=1)
 
     if fill_sides:
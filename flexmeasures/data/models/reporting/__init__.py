@@ -3,7 +3,12 @@ from __future__ import annotations
 from copy import deepcopy
 
 from typing import List, Dict, Any
+
+import timely_beliefs as tb
+
 from flexmeasures.data.models.data_sources import DataGenerator
+from flexmeasures.data.models.reporting.cache import ReportInputCache
+from flexmeasures.data.models.time_series import Sensor
 
 from flexmeasures.data.schemas.reporting import (
     ReporterParametersSchema,
@@ -21,6 +26,9 @@ class Reporter(DataGenerator):
     _parameters_schema = ReporterParametersSchema()
     _config_schema = ReporterConfigSchema()
 
+    # shared with other reporters in a batch run (see run_report_batch)
+    _input_cache: ReportInputCache | None = None
+
     def _compute(self, check_output_resolution=True, **kwargs) -> List[Dict[str, Any]]:
         """This method triggers the creation of a new report.
 
@@ -51,6 +59,15 @@ class Reporter(DataGenerator):
 
         return results
 
+    def _search_beliefs(self, sensor: Sensor, **search_kwargs) -> tb.BeliefsDataFrame:
+        """Search beliefs of an input sensor, using the shared input cache, if set.
+
+        Reporters should use this method rather than Sensor.search_beliefs to load their input data.
+        """
+        if self._input_cache is not None:
+            return self._input_cache.search(sensor, **search_kwargs)
+        return sensor.search_beliefs(**search_kwargs)
+
     def _compute_report(self, **kwargs) -> List[Dict[str, Any]]:
         """
         Overwrite with the actual computation of your report.
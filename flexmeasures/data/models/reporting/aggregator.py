@@ -61,7 +61,8 @@ class AggregatorReporter(Reporter):
             if source is not None and not isinstance(source, list):
                 source = [source]
 
-            df = sensor.search_beliefs(
+            df = self._search_beliefs(
+                sensor,
                 event_starts_after=start,
                 event_ends_before=end,
                 resolution=resolution,
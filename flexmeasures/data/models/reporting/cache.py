@@ -0,0 +1,67 @@
+"""
+In-memory cache for the input data of a batch of reports.
+
+Reporters computed for the same period often read the same sensors (e.g. meters and prices).
+When they share a ReportInputCache (see Reporter._search_beliefs), each distinct search is run only once.
+The cache is meant to live as long as one batch run, and is safe to share between threads.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+import threading
+
+import timely_beliefs as tb
+
+from flexmeasures.data.models.time_series import Sensor
+
+
+def _freeze(value) -> str:
+    """Represent a search argument in a cache key, identifying database objects by their ID."""
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(_freeze(v) for v in value) + "]"
+    if hasattr(value, "id"):
+        return f"{type(value).__name__}:{value.id}"
+    return repr(value)
+
+
+class ReportInputCache:
+    """Cache search results per sensor and search arguments."""
+
+    def __init__(self):
+        self._data: dict[tuple[int, str], tb.BeliefsDataFrame] = {}
+        self._locks: dict[tuple[int, str], threading.Lock] = defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def search(self, sensor: Sensor, **search_kwargs) -> tb.BeliefsDataFrame:
+        """Search beliefs like Sensor.search_beliefs does, reusing the result of an identical earlier search.
+
+        Concurrent identical searches wait for the first one to finish.
+        A copy is returned, so reporters can transform their input in place.
+        """
+        key = (
+            sensor.id,
+            ",".join(f"{k}={_freeze(v)}" for k, v in sorted(search_kwargs.items())),
+        )
+        with self._lock:
+            key_lock = self._locks[key]
+        with key_lock:
+            bdf = self._data.get(key)
+            is_hit = bdf is not None
+            if not is_hit:
+                bdf = sensor.search_beliefs(**search_kwargs)
+                self._data[key] = bdf
+        with self._lock:
+            if is_hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return bdf.copy()
+
+    def invalidate(self, sensor_id: int):
+        """Remove all cached data for the given sensor, e.g. after saving new data to it."""
+        with self._lock:
+            for key in [key for key in self._data if key[0] == sensor_id]:
+                del self._data[key]
@@ -89,7 +89,8 @@ class PandasReporter(Reporter):
                 "source", _input_search_parameters.pop("sources", None)
             )
 
-            bdf = sensor.search_beliefs(
+            bdf = self._search_beliefs(
+                sensor,
                 event_starts_after=event_starts_after,
                 event_ends_before=event_ends_before,
                 resolution=resolution,
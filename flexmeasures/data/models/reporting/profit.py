@@ -81,7 +81,8 @@ class ProfitOrLossReporter(Reporter):
 
         # get prices
         production_price = simplify_index(
-            production_price_sensor.search_beliefs(
+            self._search_beliefs(
+                production_price_sensor,
                 event_starts_after=start,
                 event_ends_before=end,
                 beliefs_before=belief_time,
@@ -92,7 +93,8 @@ class ProfitOrLossReporter(Reporter):
         )
         production_price = production_price.tz_convert(timezone)
         consumption_price = simplify_index(
-            consumption_price_sensor.search_beliefs(
+            self._search_beliefs(
+                consumption_price_sensor,
                 event_starts_after=start,
                 event_ends_before=end,
                 beliefs_before=belief_time,
@@ -105,7 +107,8 @@ class ProfitOrLossReporter(Reporter):
 
         # get power/energy time series
         power_energy_data = simplify_index(
-            input_sensor.search_beliefs(
+            self._search_beliefs(
+                input_sensor,
                 event_starts_after=start,
                 event_ends_before=end,
                 beliefs_before=belief_time,
@@ -8,7 +8,7 @@ from packaging.version import Version
 from flask import current_app
 
 import pandas as pd
-from sqlalchemy import select
+from sqlalchemy import event, select
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.mutable import MutableDict
 from sqlalchemy.schema import UniqueConstraint
@@ -22,6 +22,12 @@ from flexmeasures.data import db
 from flexmeasures.data.models.data_sources import keep_latest_version
 from flexmeasures.data.models.parsing_utils import parse_source_arg
 from flexmeasures.data.services.annotations import prepare_annotations_for_chart
+from flexmeasures.data.services.archiving import (
+    add_archived_beliefs,
+    needs_archived_beliefs,
+    search_archived_beliefs,
+)
+from flexmeasures.data.services.partitioning import ensure_belief_partitions
 from flexmeasures.data.services.timerange import get_timerange
 from flexmeasures.data.queries.utils import get_source_criteria
 from flexmeasures.data.services.time_series import aggregate_values
@@ -43,7 +49,10 @@ from flexmeasures.data.models.charts import chart_type_to_chart_specs
 from flexmeasures.data.models.data_sources import DataSource
 from flexmeasures.data.models.generic_assets import GenericAsset
 from flexmeasures.data.models.validation_utils import check_required_attributes
-from flexmeasures.data.queries.sensors import query_sensors_by_proximity
+from flexmeasures.data.queries.sensors import (
+    clear_proximity_cache,
+    find_closest_sensor_ids,
+)
 from flexmeasures.utils.geo_utils import parse_lat_lng
 
 
@@ -573,21 +582,32 @@ class Sensor(db.Model, tb.SensorDBMixin, AuthModelMixin):
             sensor = Sensor.find_closest("weather station", "temperature", lat=32, lng=54)
 
         Finally, pass in an account_id parameter if you want to query an account other than your own. This only works for admins. Public assets are always queried.
+
+        Results are cached per process, see find_closest_sensor_ids.
         """
 
         latitude, longitude = parse_lat_lng(kwargs)
         account_id_filter = kwargs["account_id"] if "account_id" in kwargs else None
-        query = query_sensors_by_proximity(
+        search_kwargs = dict(
             latitude=latitude,
             longitude=longitude,
             generic_asset_type_name=generic_asset_type_name,
             sensor_name=sensor_name,
+            n=n,
             account_id=account_id_filter,
         )
+        sensor_ids = find_closest_sensor_ids(**search_kwargs)
+        sensors = [db.session.get(Sensor, sensor_id) for sensor_id in sensor_ids]
+        if None in sensors:
+            # A remembered sensor was deleted (e.g. by another process), so search again
+            clear_proximity_cache()
+            sensor_ids = find_closest_sensor_ids(**search_kwargs)
+            sensors = [db.session.get(Sensor, sensor_id) for sensor_id in sensor_ids]
+            sensors = [sensor for sensor in sensors if sensor is not None]
         if n == 1:
-            return db.session.scalars(query.limit(1)).first()
+            return sensors[0] if sensors else None
         else:
-            return db.session.scalars(query.limit(n)).all()
+            return sensors
 
     def make_hashable(self) -> tuple:
         """Returns a tuple with the properties subject to change
@@ -645,6 +665,22 @@ class Sensor(db.Model, tb.SensorDBMixin, AuthModelMixin):
         return db.session.scalars(q).all()
 
 
+@event.listens_for(Sensor, "after_insert")
+@event.listens_for(Sensor, "after_delete")
+def _clear_proximity_cache_on_new_or_deleted_sensor(mapper, connection, target):
+    clear_proximity_cache()
+
+
+@event.listens_for(Sensor, "after_update")
+def _clear_proximity_cache_on_renamed_or_moved_sensor(mapper, connection, target):
+    state = inspect(target)
+    if (
+        state.attrs.name.history.has_changes()
+        or state.attrs.generic_asset_id.history.has_changes()
+    ):
+        clear_proximity_cache()
+
+
 class TimedBelief(db.Model, tb.TimedBeliefDBMixin):
     """A timed belief holds a precisely timed record of a belief about an event.
 
@@ -690,6 +726,33 @@ class TimedBelief(db.Model, tb.TimedBeliefDBMixin):
         tb_utils.remove_class_init_kwargs(tb.TimedBeliefDBMixin, kwargs)
         db.Model.__init__(self, **kwargs)
 
+    @classmethod
+    def _get_event_start_criteria(
+        cls,
+        sensor: Sensor | int,
+        event_starts_after: datetime_type | None,
+        event_ends_before: datetime_type | None,
+    ) -> list:
+        """Also bound the event start itself, so the query planner can use indexes on it
+        (and skip partitions, if the timed_belief table is partitioned).
+
+        These bounds are looser than the search window, which timely-beliefs applies on top.
+        """
+        criteria = []
+        if not pd.isnull(event_starts_after) and isinstance(sensor, Sensor):
+            event_starts_after = tb_utils.parse_datetime_like(
+                event_starts_after, "event_starts_after"
+            )
+            criteria.append(
+                cls.event_start >= event_starts_after - sensor.event_resolution
+            )
+        if not pd.isnull(event_ends_before):
+            event_ends_before = tb_utils.parse_datetime_like(
+                event_ends_before, "event_ends_before"
+            )
+            criteria.append(cls.event_start <= event_ends_before)
+        return criteria
+
     @classmethod
     def search(
         cls,
@@ -784,6 +847,9 @@ class TimedBelief(db.Model, tb.TimedBeliefDBMixin):
 
         bdf_dict = {}
         for sensor in sensors:
+            event_start_criteria = cls._get_event_start_criteria(
+                sensor, event_starts_after, event_ends_before
+            )
             bdf = cls.search_session(
                 session=db.session,
                 sensor=sensor,
@@ -796,9 +862,33 @@ class TimedBelief(db.Model, tb.TimedBeliefDBMixin):
                 horizons_at_most=horizons_at_most,
                 source=parsed_sources,
                 **most_recent_filters,
-                custom_filter_criteria=source_criteria,
+                custom_filter_criteria=source_criteria + event_start_criteria,
                 custom_join_targets=custom_join_targets,
             )
+            if isinstance(sensor, Sensor) and needs_archived_beliefs(
+                beliefs_before=beliefs_before,
+                horizons_at_least=horizons_at_least,
+                most_recent_beliefs_only=most_recent_beliefs_only,
+                most_recent_events_only=most_recent_events_only,
+                most_recent_only=most_recent_only,
+            ):
+                archived_bdf = search_archived_beliefs(
+                    sensor,
+                    event_starts_after=event_starts_after,
+                    event_ends_before=event_ends_before,
+                    beliefs_after=beliefs_after,
+                    beliefs_before=beliefs_before,
+                    horizons_at_least=horizons_at_least,
+                    horizons_at_most=horizons_at_most,
+                    sources=parsed_sources,
+                    user_source_ids=user_source_ids,
+                    source_types=source_types,
+                    exclude_source_types=exclude_source_types,
+                )
+                if archived_bdf is not None and not archived_bdf.empty:
+                    bdf = add_archived_beliefs(
+                        bdf, archived_bdf, most_recent_beliefs_only
+                    )
             if use_latest_version_per_event:
                 bdf = keep_latest_version(
                     bdf=bdf,
@@ -878,6 +968,7 @@ class TimedBelief(db.Model, tb.TimedBeliefDBMixin):
                                     if False, you can still add other data to the session
                                     and commit it all within an atomic transaction
         """
+        ensure_belief_partitions(bdf.event_starts)
         return cls.add_to_session(
             session=db.session,
             beliefs_data_frame=bdf,
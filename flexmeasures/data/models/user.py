@@ -3,9 +3,10 @@ from __future__ import annotations
 from typing import TYPE_CHECKING
 from datetime import datetime, timezone
 
+from flask import current_app
 from flask_security import UserMixin, RoleMixin
 import pandas as pd
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy import Boolean, DateTime, Column, Integer, String, ForeignKey
 from sqlalchemy.ext.hybrid import hybrid_property
@@ -332,12 +333,58 @@ def remember_login(the_app, user):
     user.login_count = user.login_count + 1
 
 
+LAST_SEEN_BUFFER_KEY = "flexmeasures:last-seen"
+LAST_SEEN_FLUSH_LOCK_KEY = "flexmeasures:last-seen:flush-lock"
+
+
 def remember_last_seen(user):
-    """Update the last_seen field"""
-    if user is not None and user.is_authenticated:
-        user.last_seen_at = datetime.now(timezone.utc)
+    """Update the last_seen field.
+
+    Unless FLEXMEASURES_LAST_SEEN_GRANULARITY is 0, we do not write to the database on each request,
+    but buffer the last seen times in Redis, and flush the buffer to the database
+    at most once per granularity period (from whichever process handles a request once the period has passed).
+    """
+    if user is None or not user.is_authenticated:
+        return
+    now = datetime.now(timezone.utc)
+    granularity = current_app.config.get("FLEXMEASURES_LAST_SEEN_GRANULARITY", 0)
+    if not granularity:
+        user.last_seen_at = now
         db.session.add(user)
         db.session.commit()
+        return
+    redis_connection = current_app.redis_connection
+    redis_connection.hset(LAST_SEEN_BUFFER_KEY, str(user.id), now.isoformat())
+    # Only one process gets to flush per granularity period
+    if redis_connection.set(LAST_SEEN_FLUSH_LOCK_KEY, 1, nx=True, ex=granularity):
+        flush_last_seen()
+
+
+def flush_last_seen() -> int:
+    """Write the buffered last seen times to the database, in one batch.
+
+    :returns: the number of users updated
+    """
+    pipe = current_app.redis_connection.pipeline(transaction=True)
+    pipe.hgetall(LAST_SEEN_BUFFER_KEY)
+    pipe.delete(LAST_SEEN_BUFFER_KEY)
+    buffered, _ = pipe.execute()
+    if not buffered:
+        return 0
+    db.session.execute(
+        update(User),
+        [
+            dict(
+                id=int(user_id),
+                last_seen_at=datetime.fromisoformat(
+                    last_seen.decode() if isinstance(last_seen, bytes) else last_seen
+                ),
+            )
+            for user_id, last_seen in buffered.items()
+        ],
+    )
+    db.session.commit()
+    return len(buffered)
 
 
 def is_user(o) -> bool:
@@ -1,11 +1,25 @@
 from __future__ import annotations
 
-from sqlalchemy import select, Select
+from functools import lru_cache
+import time
 
+from flask_security import current_user
+from sqlalchemy import event, func, inspect, select, Select
+from sqlalchemy.orm import selectinload
+
+from flexmeasures.cli import is_running as running_as_cli
+from flexmeasures.data.config import db
 from flexmeasures.data.models.generic_assets import GenericAsset, GenericAssetType
 from flexmeasures.data.queries.utils import potentially_limit_assets_query_to_account
 
 
+# Search radii (in metres) for finding the closest sensors, tried in this order before searching without a radius
+PROXIMITY_SEARCH_RADII: tuple[float, ...] = (10_000, 100_000, 1_000_000)
+
+# Time (in seconds) for which the closest sensors found for a location are remembered
+PROXIMITY_CACHE_TTL: int = 3600
+
+
 def query_sensor_by_name_and_generic_asset_type_name(
     sensor_name: str | None = None,
     generic_asset_type_names: list[str] | None = None,
@@ -34,14 +48,36 @@ def query_sensor_by_name_and_generic_asset_type_name(
     return query
 
 
+def prefetch_sensors(sensor_ids: set[int] | list[int]) -> list:
+    """Load many sensors (and their assets) in one query.
+
+    As long as the caller holds on to the returned list, looking up these sensors by id
+    (e.g. while deserializing flex-models and flex-contexts) does not hit the database again.
+    """
+    from flexmeasures.data.models.time_series import Sensor
+
+    if not sensor_ids:
+        return []
+    return db.session.scalars(
+        select(Sensor)
+        .where(Sensor.id.in_(sensor_ids))
+        .options(selectinload(Sensor.generic_asset))
+    ).all()
+
+
 def query_sensors_by_proximity(
     latitude: float,
     longitude: float,
     generic_asset_type_name: str | None,
     sensor_name: str | None,
     account_id: int | None = None,
+    max_distance: float | None = None,
 ) -> Select:
-    """Order them by proximity of their asset's location to the target."""
+    """Order them by proximity of their asset's location to the target.
+
+    :param max_distance: if set, only return sensors within this distance (in metres) from the target.
+                         This filter can use the GiST index on the asset locations (requires the cube and earthdistance extensions).
+    """
     from flexmeasures.data.models.time_series import Sensor
 
     closest_sensor_query = (
@@ -58,6 +94,15 @@ def query_sensors_by_proximity(
         )
     if sensor_name is not None:
         closest_sensor_query = closest_sensor_query.filter(Sensor.name == sensor_name)
+    if max_distance is not None:
+        # The bounding box filter matches the index expression, the distance filter removes the corners of the box
+        closest_sensor_query = closest_sensor_query.filter(
+            func.earth_box(func.ll_to_earth(latitude, longitude), max_distance).op(
+                "@>"
+            )(func.ll_to_earth(GenericAsset.latitude, GenericAsset.longitude)),
+            GenericAsset.great_circle_distance(lat=latitude, lng=longitude)
+            <= max_distance,
+        )
     closest_sensor_query = closest_sensor_query.order_by(
         GenericAsset.great_circle_distance(lat=latitude, lng=longitude).asc()
     )
@@ -65,3 +110,109 @@ def query_sensors_by_proximity(
         closest_sensor_query, account_id
     )
     return closest_sensor_query
+
+
+def find_closest_sensor_ids(
+    latitude: float,
+    longitude: float,
+    generic_asset_type_name: str | None,
+    sensor_name: str | None,
+    n: int = 1,
+    account_id: int | None = None,
+) -> list[int]:
+    """Find the ids of the n sensors closest to the target (closest first).
+
+    We first search within increasingly large radii (see PROXIMITY_SEARCH_RADII), which can use a spatial index,
+    and only fall back to ordering all matching sensors by distance if not enough sensors are found that way.
+    Results are remembered per process (see PROXIMITY_CACHE_TTL), until an asset or sensor is added, moved or deleted.
+    Other processes only notice such changes once their remembered results expire,
+    except that callers should skip (or search again for) sensor ids that no longer exist.
+    """
+    if latitude is None or longitude is None:
+        return _find_closest_sensor_ids(
+            latitude, longitude, generic_asset_type_name, sensor_name, n, account_id
+        )
+    user_key = "cli" if running_as_cli() else getattr(current_user, "id", None)
+    return list(
+        _find_closest_sensor_ids_cached(
+            latitude,
+            longitude,
+            generic_asset_type_name,
+            sensor_name,
+            n,
+            account_id,
+            user_key=user_key,
+            ttl_hash=round(time.time() / PROXIMITY_CACHE_TTL),
+        )
+    )
+
+
+def _find_closest_sensor_ids(
+    latitude: float | None,
+    longitude: float | None,
+    generic_asset_type_name: str | None,
+    sensor_name: str | None,
+    n: int,
+    account_id: int | None,
+) -> list[int]:
+    from flexmeasures.data.models.time_series import Sensor
+
+    radii: tuple[float | None, ...] = (None,)
+    if latitude is not None and longitude is not None:
+        radii = PROXIMITY_SEARCH_RADII + radii
+    for radius in radii:
+        query = query_sensors_by_proximity(
+            latitude=latitude,
+            longitude=longitude,
+            generic_asset_type_name=generic_asset_type_name,
+            sensor_name=sensor_name,
+            account_id=account_id,
+            max_distance=radius,
+        )
+        sensor_ids = db.session.scalars(
+            query.with_only_columns(Sensor.id).limit(n)
+        ).all()
+        if len(sensor_ids) == n:
+            break
+    return list(sensor_ids)
+
+
+@lru_cache(maxsize=1024)
+def _find_closest_sensor_ids_cached(
+    latitude: float,
+    longitude: float,
+    generic_asset_type_name: str | None,
+    sensor_name: str | None,
+    n: int,
+    account_id: int | None,
+    user_key: (
+        str | int | None
+    ) = None,  # results may depend on the user's access to accounts
+    ttl_hash: int | None = None,
+) -> tuple[int, ...]:
+    return tuple(
+        _find_closest_sensor_ids(
+            latitude, longitude, generic_asset_type_name, sensor_name, n, account_id
+        )
+    )
+
+
+def clear_proximity_cache():
+    """Forget the closest sensors found so far."""
+    _find_closest_sensor_ids_cached.cache_clear()
+
+
+@event.listens_for(GenericAsset, "after_insert")
+@event.listens_for(GenericAsset, "after_delete")
+def _clear_proximity_cache_on_new_or_deleted_asset(mapper, connection, target):
+    clear_proximity_cache()
+
+
+@event.listens_for(GenericAsset, "after_update")
+def _clear_proximity_cache_on_moved_asset(mapper, connection, target):
+    state = inspect(target)
+    if (
+        state.attrs.latitude.history.has_changes()
+        or state.attrs.longitude.history.has_changes()
+    ):
+        clear_proximity_cache()
@@ -10,7 +10,13 @@ from marshmallow import (
     post_dump,
 )
 
+from flask import g
+from sqlalchemy import select
+
 from flexmeasures import Sensor
+from flexmeasures.data import db
+from flexmeasures.data.models.generic_assets import GenericAsset
+from flexmeasures.data.queries.sensors import prefetch_sensors
 from flexmeasures.data.schemas.generic_assets import GenericAssetIdField
 from flexmeasures.data.schemas.sensors import (
     VariableQuantityField,
@@ -527,3 +533,72 @@ class AssetTriggerSchema(Schema):
                 )
             sensors.append(sensor)
         return data
+
+
+def collect_sensor_ids(config: dict | list) -> set[int]:
+    """Collect the ids of sensors referenced anywhere in a serialized flex-model or flex-context.
+
+    For example, {"sensor": 9}, "consumption-price-sensor": 9 and "inflexible-device-sensors": [13, 14].
+    """
+    sensor_ids = set()
+    if isinstance(config, dict):
+        for key, value in config.items():
+            if (key == "sensor" or key.endswith("-sensor")) and isinstance(value, int):
+                sensor_ids.add(value)
+            elif key.endswith("-sensors") and isinstance(value, list):
+                sensor_ids |= {v for v in value if isinstance(v, int)}
+            else:
+                sensor_ids |= collect_sensor_ids(value)
+    elif isinstance(config, list):
+        for value in config:
+            sensor_ids |= collect_sensor_ids(value)
+    return sensor_ids
+
+
+class AssetBatchTriggerSchema(Schema):
+    """
+    {
+        "schedules": [
+            {
+                "id": 1,
+                "start": "2025-01-21T15:00+01",
+                "flex-model": [{"sensor": 1, "soc-at-start": "10 kWh"}],
+                "flex-context": {"consumption-price": {"sensor": 9}}
+            },
+            {
+                "id": 2,
+                "start": "2025-01-21T15:00+01",
+                "flex-model": [{"sensor": 2, "soc-at-start": "20 kWh"}],
+                "flex-context": {"consumption-price": {"sensor": 9}}
+            }
+        ]
+    }
+    """
+
+    schedules = fields.List(
+        fields.Nested(AssetTriggerSchema(exclude=["sequential"])),
+        required=True,
+        validate=validate.Length(min=1),
+    )
+
+    @pre_load
+    def prefetch_assets_and_sensors(self, data, **kwargs):
+        """Load all referenced assets and sensors in two queries, rather than one query per id.
+
+        The loaded objects are kept for the duration of the request (or CLI command),
+        so that their lookup by id during deserialization is served from the session.
+        """
+        schedules = data.get("schedules", []) if isinstance(data, dict) else []
+        asset_ids = [
+            schedule["id"]
+            for schedule in schedules
+            if isinstance(schedule, dict) and isinstance(schedule.get("id"), int)
+        ]
+        g.prefetched_scheduling_entities = (
+            db.session.scalars(
+                select(GenericAsset).where(GenericAsset.id.in_(asset_ids))
+            ).all()
+            if asset_ids
+            else []
+        ) + prefetch_sensors(collect_sensor_ids(schedules))
+        return data
@@ -0,0 +1,382 @@
+"""
+Logic for archiving old beliefs to Parquet files (tiered retention).
+
+For events further in the past than a sensor's retention period (see get_retention_period),
+only the most recent belief (per event and source) is kept in the database.
+Earlier beliefs about these events are moved to Parquet files, one directory per sensor and (UTC) month,
+on local disk or in an object store (see FLEXMEASURES_BELIEF_ARCHIVE_PATH).
+Searches needing earlier beliefs (e.g. a past state of knowledge) about archived months also read the archive.
+
+Archiving requires pyarrow, which is an optional dependency.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import os
+from typing import TYPE_CHECKING
+from uuid import uuid4
+
+from flask import current_app
+import pandas as pd
+from sqlalchemy import func, or_, select, text
+import timely_beliefs as tb
+import timely_beliefs.utils as tb_utils
+
+from flexmeasures.data import db
+from flexmeasures.data.models.archive import ArchivedBeliefs
+from flexmeasures.data.models.data_sources import DataSource
+from flexmeasures.data.services.partitioning import get_month_starts
+from flexmeasures.utils.time_utils import server_now
+
+if TYPE_CHECKING:
+    from flexmeasures.data.models.time_series import Sensor
+
+ARCHIVE_COLUMNS = [
+    "event_start",
+    "belief_horizon",
+    "cumulative_probability",
+    "event_value",
+    "source_id",
+]
+
+# Move beliefs about one month that are not the most recent belief about their event (from the same source)
+_DELETE_SUPERSEDED_BELIEFS = """
+DELETE FROM timed_belief AS b
+WHERE b.sensor_id = :sensor_id AND b.event_start >= :lower AND b.event_start < :upper
+    AND b.belief_horizon > (
+        SELECT min(k.belief_horizon) FROM timed_belief AS k
+        WHERE k.sensor_id = b.sensor_id AND k.source_id = b.source_id AND k.event_start = b.event_start
+    )
+RETURNING b.event_start, b.belief_horizon, b.cumulative_probability, b.event_value, b.source_id
+"""
+
+_warned_about_pyarrow = False
+
+
+def is_archive_enabled() -> bool:
+    """The archive is enabled by setting FLEXMEASURES_BELIEF_ARCHIVE_PATH, and requires pyarrow."""
+    global _warned_about_pyarrow
+    if not current_app.config.get("FLEXMEASURES_BELIEF_ARCHIVE_PATH"):
+        return False
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        if not _warned_about_pyarrow:
+            current_app.logger.warning(
+                "FLEXMEASURES_BELIEF_ARCHIVE_PATH is set, but pyarrow is not installed ― I cannot read or write archived beliefs."
+            )
+            _warned_about_pyarrow = True
+        return False
+    return True
+
+
+def get_retention_period(sensor: Sensor) -> timedelta | None:
+    """Beyond this period, only the most recent beliefs are kept in the database.
+
+    Set the belief_retention_days attribute on a sensor (or its asset) to override FLEXMEASURES_BELIEF_RETENTION_DAYS.
+    None means that the sensor's beliefs are not archived.
+    """
+    days = sensor.get_attribute(
+        "belief_retention_days",
+        current_app.config.get("FLEXMEASURES_BELIEF_RETENTION_DAYS"),
+    )
+    return timedelta(days=days) if days is not None else None
+
+
+def _get_filesystem():
+    """Return the (pyarrow) filesystem and base path of the archive."""
+    from pyarrow import fs
+
+    path = current_app.config["FLEXMEASURES_BELIEF_ARCHIVE_PATH"]
+    if "://" not in path:
+        path = os.path.abspath(path)
+    return fs.FileSystem.from_uri(path)
+
+
+def _get_month_path(base_path: str, sensor_id: int, month_start: pd.Timestamp) -> str:
+    return f"{base_path}/sensor_id={sensor_id}/month={month_start:%Y-%m}"
+
+
+def archive_beliefs(
+    sensor: Sensor,
+    full: bool = False,
+    now: datetime | None = None,
+) -> dict[pd.Timestamp, int]:
+    """Move the superseded beliefs about events beyond the sensor's retention period to the archive.
+
+    Only whole months are archived, and each month is committed separately.
+    By default, only months that have not been processed before are archived.
+
+    :param sensor:  the sensor whose beliefs to archive
+    :param full:    if True, also process months that were processed before (e.g. to archive late corrections)
+    :param now:     the time with respect to which the retention period is counted (defaults to now)
+    :returns:       the number of archived beliefs per (processed) month
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    retention_period = get_retention_period(sensor)
+    if retention_period is None:
+        return {}
+    now = now if now is not None else server_now()
+    cutoff = get_month_starts(now - retention_period, now - retention_period)[0]
+    last_month_start = db.session.execute(
+        select(func.max(ArchivedBeliefs.month_start)).filter(
+            ArchivedBeliefs.sensor_id == sensor.id
+        )
+    ).scalar()
+    if full or last_month_start is None:
+        start = db.session.execute(
+            text("SELECT min(event_start) FROM timed_belief WHERE sensor_id = :id"),
+            dict(id=sensor.id),
+        ).scalar()
+    else:
+        start = pd.Timestamp(last_month_start) + pd.DateOffset(months=1)
+    if start is None or pd.Timestamp(start) >= cutoff:
+        return {}
+
+    filesystem, base_path = _get_filesystem()
+    archived = {}
+    for month_start in get_month_starts(start, cutoff - timedelta(microseconds=1)):
+        rows = db.session.execute(
+            text(_DELETE_SUPERSEDED_BELIEFS),
+            dict(
+                sensor_id=sensor.id,
+                lower=month_start.to_pydatetime(),
+                upper=(month_start + pd.DateOffset(months=1)).to_pydatetime(),
+            ),
+        ).all()
+        if rows:
+            month_path = _get_month_path(base_path, sensor.id, month_start)
+            filesystem.create_dir(month_path, recursive=True)
+            pq.write_table(
+                pa.Table.from_pandas(
+                    pd.DataFrame(rows, columns=ARCHIVE_COLUMNS), preserve_index=False
+                ),
+                f"{month_path}/{uuid4().hex}.parquet",
+                filesystem=filesystem,
+                compression="zstd",
+            )
+        record = db.session.get(ArchivedBeliefs, (sensor.id, month_start))
+        if record is None:
+            record = ArchivedBeliefs(
+                sensor_id=sensor.id, month_start=month_start, belief_count=0
+            )
+            db.session.add(record)
+        record.belief_count += len(rows)
+        record.archived_at = server_now()
+        db.session.commit()
+        archived[month_start] = len(rows)
+    return archived
+
+
+def needs_archived_beliefs(
+    beliefs_before: datetime | None,
+    horizons_at_least: timedelta | None,
+    most_recent_beliefs_only: bool,
+    most_recent_events_only: bool,
+    most_recent_only: bool,
+) -> bool:
+    """Check whether a search may need archived beliefs, which are never the most recent belief about their event."""
+    if most_recent_only or most_recent_events_only or not is_archive_enabled():
+        return False
+    return (
+        not most_recent_beliefs_only
+        or beliefs_before is not None
+        or horizons_at_least is not None
+    )
+
+
+def _get_archived_month_starts(
+    sensor: Sensor,
+    event_starts_after: datetime | None,
+    event_ends_before: datetime | None,
+) -> list[datetime]:
+    """Find the archived months (with beliefs) overlapping with the search window."""
+    query = select(ArchivedBeliefs.month_start).filter(
+        ArchivedBeliefs.sensor_id == sensor.id, ArchivedBeliefs.belief_count > 0
+    )
+    if event_starts_after is not None:
+        query = query.filter(
+            ArchivedBeliefs.month_start
+            >= get_month_starts(
+                event_starts_after - sensor.event_resolution,
+                event_starts_after - sensor.event_resolution,
+            )[0]
+        )
+    if event_ends_before is not None:
+        query = query.filter(ArchivedBeliefs.month_start <= event_ends_before)
+    return db.session.scalars(query).all()
+
+
+def _read_archived_months(sensor: Sensor, month_starts: list[datetime]) -> pd.DataFrame:
+    import pyarrow.parquet as pq
+
+    filesystem, base_path = _get_filesystem()
+    df = pd.concat(
+        [
+            pq.read_table(
+                _get_month_path(base_path, sensor.id, pd.Timestamp(month_start)),
+                filesystem=filesystem,
+            ).to_pandas()
+            for month_start in month_starts
+        ]
+    )
+    # An interrupted archiving run may have archived the same beliefs twice
+    return df.drop_duplicates(subset=[c for c in ARCHIVE_COLUMNS if c != "event_value"])
+
+
+def _filter_archived_events(
+    df: pd.DataFrame,
+    sensor: Sensor,
+    event_starts_after: datetime | None,
+    event_ends_before: datetime | None,
+) -> pd.DataFrame:
+    """Select events within the search window, like timely-beliefs does in the database.
+
+    Events must end after event_starts_after and start before event_ends_before (both exclusive),
+    except for instantaneous events, which may also lie on the window's edges.
+    """
+    resolution = sensor.event_resolution
+    if resolution == timedelta(0):
+        if event_starts_after is not None:
+            df = df[df["event_start"] >= event_starts_after]
+        if event_ends_before is not None:
+            df = df[df["event_start"] <= event_ends_before]
+        return df
+    if event_starts_after is not None:
+        df = df[df["event_start"] + resolution > event_starts_after]
+    if event_ends_before is not None:
+        df = df[df["event_start"] < event_ends_before]
+    return df
+
+
+def _get_archived_sources(
+    source_ids: list[int],
+    sources: list[DataSource] | None,
+    user_source_ids: int | list[int] | None,
+    source_types: list[str] | None,
+    exclude_source_types: list[str] | None,
+) -> dict[int, DataSource]:
+    """Look up the sources of archived beliefs, keeping only those matching the source criteria."""
+    source_query = select(DataSource).filter(DataSource.id.in_(source_ids))
+    if sources:
+        source_query = source_query.filter(
+            DataSource.id.in_([source.id for source in sources])
+        )
+    if user_source_ids is not None:
+        if not isinstance(user_source_ids, list):
+            user_source_ids = [user_source_ids]
+        source_query = source_query.filter(
+            or_(DataSource.type != "user", DataSource.id.in_(user_source_ids))
+        )
+    if source_types is not None:
+        source_query = source_query.filter(DataSource.type.in_(source_types))
+    if exclude_source_types is not None:
+        source_query = source_query.filter(DataSource.type.not_in(exclude_source_types))
+    return {source.id: source for source in db.session.scalars(source_query)}
+
+
+def search_archived_beliefs(
+    sensor: Sensor,
+    event_starts_after: datetime | None = None,
+    event_ends_before: datetime | None = None,
+    beliefs_after: datetime | None = None,
+    beliefs_before: datetime | None = None,
+    horizons_at_least: timedelta | None = None,
+    horizons_at_most: timedelta | None = None,
+    sources: list[DataSource] | None = None,
+    user_source_ids: int | list[int] | None = None,
+    source_types: list[str] | None = None,
+    exclude_source_types: list[str] | None = None,
+) -> tb.BeliefsDataFrame | None:
+    """Search the archive, reading only the months overlapping with the search window.
+
+    Takes the same search criteria as TimedBelief.search.
+
+    :returns: the archived beliefs (indexed by belief time), or None if no archived months overlap with the search window
+    """
+    # Like timely-beliefs, treat NaT as no bound
+    event_starts_after = (
+        tb_utils.parse_datetime_like(event_starts_after, "event_starts_after")
+        if not pd.isnull(event_starts_after)
+        else None
+    )
+    event_ends_before = (
+        tb_utils.parse_datetime_like(event_ends_before, "event_ends_before")
+        if not pd.isnull(event_ends_before)
+        else None
+    )
+    month_starts = _get_archived_month_starts(
+        sensor, event_starts_after, event_ends_before
+    )
+    if not month_starts:
+        return None
+    df = _read_archived_months(sensor, month_starts)
+
+    # Filter by event and horizon
+    df = _filter_archived_events(df, sensor, event_starts_after, event_ends_before)
+    if horizons_at_least is not None:
+        df = df[df["belief_horizon"] >= horizons_at_least]
+    if horizons_at_most is not None:
+        df = df[df["belief_horizon"] <= horizons_at_most]
+
+    # Filter by source
+    sources_by_id = _get_archived_sources(
+        df["source_id"].unique().tolist(),
+        sources,
+        user_source_ids,
+        source_types,
+        exclude_source_types,
+    )
+    df = df[df["source_id"].isin(sources_by_id.keys())]
+
+    bdf = tb.BeliefsDataFrame(
+        df.assign(source=df["source_id"].map(sources_by_id)).drop(columns="source_id"),
+        sensor=sensor,
+    ).convert_index_from_belief_horizon_to_time()
+
+    # Filter by belief time
+    if beliefs_after is not None:
+        bdf = bdf[bdf.belief_times >= beliefs_after]
+    if beliefs_before is not None:
+        bdf = bdf[bdf.belief_times <= beliefs_before]
+    return bdf
+
+
+def _get_belief_keys(bdf: tb.BeliefsDataFrame) -> pd.MultiIndex:
+    """Identify beliefs by their index, with sources identified by their ID."""
+    keys = bdf.index.to_frame(index=False)
+    keys["source"] = keys["source"].map(lambda source: source.id)
+    return pd.MultiIndex.from_frame(keys)
+
+
+def add_archived_beliefs(
+    bdf: tb.BeliefsDataFrame,
+    archived_bdf: tb.BeliefsDataFrame,
+    most_recent_beliefs_only: bool,
+) -> tb.BeliefsDataFrame:
+    """Combine beliefs found in the database with archived beliefs.
+
+    :param bdf:                         beliefs from the database
+    :param archived_bdf:                beliefs from the archive (indexed by belief time)
+    :param most_recent_beliefs_only:    if True, keep only the most recent beliefs for each event from each source
+    """
+    if "belief_horizon" in bdf.index.names:
+        archived_bdf = archived_bdf.convert_index_from_belief_time_to_horizon()
+    # Beliefs are written to the archive before they are deleted from the database,
+    # so after an interrupted run, beliefs can be found in both places
+    archived_bdf = archived_bdf[
+        ~_get_belief_keys(archived_bdf).isin(_get_belief_keys(bdf))
+    ]
+    df = pd.concat([pd.DataFrame(bdf), pd.DataFrame(archived_bdf)]).reset_index()
+    combined_bdf = tb.BeliefsDataFrame(df, sensor=bdf.sensor).sort_index()
+    if most_recent_beliefs_only:
+        belief_times = pd.Series(combined_bdf.belief_times.values)
+        keys = combined_bdf.index.to_frame(index=False)
+        latest = belief_times.groupby([keys["event_start"], keys["source"]]).transform(
+            "max"
+        )
+        combined_bdf = combined_bdf[(belief_times == latest).values]
+    return combined_bdf
@@ -0,0 +1,537 @@
+"""
+Logic for exporting sensors (with their assets, data sources and beliefs) to Parquet bundles, and importing them again.
+
+A bundle is a directory holding one Parquet file per kind of record, and one Parquet file with the beliefs of each sensor:
+
+    manifest.json
+    asset_types.parquet
+    assets.parquet
+    sensors.parquet
+    sources.parquet
+    beliefs/sensor_id=<id>.parquet
+
+Beliefs are exported chunk by chunk (of event starts), so memory use is bounded, and imported in bulk (batch by batch).
+On import, new assets and sensors are created (with new IDs), while asset types and data sources are reused if they exist.
+References to sensors in asset attributes, flex-contexts and sensors to show are updated to the new sensor IDs.
+Users and accounts are not part of a bundle (sources of users are imported as sources not linked to any user).
+
+Bundles require pyarrow, which is an optional dependency.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import json
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+from sqlalchemy import select, text
+
+from flexmeasures import __version__ as flexmeasures_version
+from flexmeasures.data import db
+from flexmeasures.data.models.data_sources import DataSource
+from flexmeasures.data.models.generic_assets import GenericAsset, GenericAssetType
+from flexmeasures.data.models.time_series import Sensor
+from flexmeasures.data.utils import BULK_INSERT_CHUNK_SIZE, insert_beliefs_in_bulk
+from flexmeasures.utils.time_utils import server_now
+
+BUNDLE_FORMAT_VERSION = 1
+
+# Type of the data sources of users (who are not part of a bundle), once imported
+IMPORTED_USER_SOURCE_TYPE = "imported user"
+
+BELIEF_COLUMNS = [
+    "event_start",
+    "horizon_seconds",
+    "cumulative_probability",
+    "event_value",
+    "source_id",
+]
+
+_SELECT_BELIEFS = """
+SELECT event_start, CAST(extract(epoch FROM belief_horizon) AS float8) AS horizon_seconds,
+    cumulative_probability, event_value, source_id
+FROM timed_belief
+WHERE sensor_id = :sensor_id AND event_start >= :lower AND event_start < :upper
+ORDER BY event_start, belief_horizon DESC
+"""
+
+
+@dataclass
+class BundledSensor:
+    """Progress information about the beliefs of one exported or imported sensor."""
+
+    sensor_id: int
+    beliefs: int
+
+
+def _get_belief_schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("event_start", pa.timestamp("us", tz="UTC")),
+            ("horizon_seconds", pa.float64()),
+            ("cumulative_probability", pa.float64()),
+            ("event_value", pa.float64()),
+            ("source_id", pa.int64()),
+        ]
+    )
+
+
+def _write_records(path: Path, records: list[dict]):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    pq.write_table(pa.Table.from_pylist(records), path, compression="zstd")
+
+
+def _read_records(path: Path) -> list[dict]:
+    import pyarrow.parquet as pq
+
+    return pq.read_table(path).to_pylist()
+
+
+def get_bundle_assets_and_sensors(
+    assets: list[GenericAsset], sensors: list[Sensor]
+) -> tuple[list[GenericAsset], list[Sensor]]:
+    """Select the assets (including their offspring) and sensors (including those of selected assets) to export."""
+    selected_assets: dict[int, GenericAsset] = {}
+
+    def add_asset(asset: GenericAsset):
+        selected_assets[asset.id] = asset
+        for child in asset.child_assets:
+            add_asset(child)
+
+    for asset in assets:
+        add_asset(asset)
+    selected_sensors = {sensor.id: sensor for sensor in sensors}
+    for asset in list(selected_assets.values()):
+        selected_sensors.update({sensor.id: sensor for sensor in asset.sensors})
+    for sensor in sensors:
+        selected_assets[sensor.generic_asset_id] = sensor.generic_asset
+    return (
+        sorted(selected_assets.values(), key=lambda a: a.id),
+        sorted(selected_sensors.values(), key=lambda s: s.id),
+    )
+
+
+def export_sensor_beliefs(
+    sensor: Sensor,
+    path: Path,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    chunk: timedelta = timedelta(days=30),
+) -> tuple[int, set[int]]:
+    """Stream the beliefs of a sensor into a Parquet file, writing one row group per chunk of event starts.
+
+    :param sensor:  the sensor whose beliefs to export
+    :param path:    the Parquet file to write to
+    :param start:   only export beliefs about events starting at or after this datetime
+    :param end:     only export beliefs about events starting before this datetime
+    :param chunk:   length of the periods (of event starts) to export one at a time
+    :returns:       the number of exported beliefs, and the IDs of their data sources
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    query = "SELECT min(event_start), max(event_start) FROM timed_belief WHERE sensor_id = :sensor_id"
+    params: dict[str, Any] = dict(sensor_id=sensor.id)
+    if start is not None:
+        query += " AND event_start >= :lower"
+        params["lower"] = start
+    if end is not None:
+        query += " AND event_start < :upper"
+        params["upper"] = end
+    first_event_start, last_event_start = db.session.execute(text(query), params).one()
+
+    schema = _get_belief_schema()
+    n_beliefs = 0
+    source_ids: set[int] = set()
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        if first_event_start is None:
+            return n_beliefs, source_ids
+        chunk_start = pd.Timestamp(first_event_start).tz_convert("UTC").floor(chunk)
+        while chunk_start <= last_event_start:
+            chunk_end = chunk_start + chunk
+            rows = db.session.execute(
+                text(_SELECT_BELIEFS),
+                dict(
+                    sensor_id=sensor.id,
+                    lower=max(
+                        chunk_start, pd.Timestamp(start or chunk_start)
+                    ).to_pydatetime(),
+                    upper=min(
+                        chunk_end, pd.Timestamp(end or chunk_end)
+                    ).to_pydatetime(),
+                ),
+            ).all()
+            if rows:
+                df = pd.DataFrame(rows, columns=BELIEF_COLUMNS)
+                df["event_start"] = pd.to_datetime(df["event_start"], utc=True)
+                writer.write_table(
+                    pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+                )
+                n_beliefs += len(df)
+                source_ids.update(df["source_id"].unique().tolist())
+            chunk_start = chunk_end
+    return n_beliefs, source_ids
+
+
+def export_bundle(
+    path: str | Path,
+    assets: list[GenericAsset],
+    sensors: list[Sensor],
+    start: datetime | None = None,
+    end: datetime | None = None,
+    chunk: timedelta = timedelta(days=30),
+    on_sensor_done: Callable[[BundledSensor], None] | None = None,
+) -> dict[str, int]:
+    """Export assets (including their offspring) and sensors, with their beliefs and data sources, to a bundle.
+
+    :param path:            directory to write the bundle to (created if needed)
+    :param assets:          assets to export, with their offspring and all their sensors
+    :param sensors:         sensors to export, with their assets
+    :param start:           only export beliefs about events starting at or after this datetime
+    :param end:             only export beliefs about events starting before this datetime
+    :param chunk:           length of the periods (of event starts) to export one at a time
+    :param on_sensor_done:  optional callback to report progress after the beliefs of each sensor are exported
+    :returns:               the number of exported records of each kind
+    """
+    path = Path(path)
+    (path / "beliefs").mkdir(parents=True, exist_ok=True)
+    assets, sensors = get_bundle_assets_and_sensors(assets, sensors)
+
+    n_beliefs = 0
+    source_ids: set[int] = set()
+    for sensor in sensors:
+        n, ids = export_sensor_beliefs(
+            sensor,
+            path / "beliefs" / f"sensor_id={sensor.id}.parquet",
+            start=start,
+            end=end,
+            chunk=chunk,
+        )
+        n_beliefs += n
+        source_ids |= ids
+        if on_sensor_done is not None:
+            on_sensor_done(BundledSensor(sensor_id=sensor.id, beliefs=n))
+
+    asset_types = {asset.generic_asset_type for asset in assets}
+    _write_records(
+        path / "asset_types.parquet",
+        [
+            dict(
+                id=asset_type.id,
+                name=asset_type.name,
+                description=asset_type.description,
+            )
+            for asset_type in sorted(asset_types, key=lambda t: t.id)
+        ],
+    )
+    asset_ids = {asset.id for asset in assets}
+    _write_records(
+        path / "assets.parquet",
+        [
+            dict(
+                id=asset.id,
+                name=asset.name,
+                latitude=asset.latitude,
+                longitude=asset.longitude,
+                generic_asset_type_id=asset.generic_asset_type_id,
+                parent_asset_id=(
+                    asset.parent_asset_id
+                    if asset.parent_asset_id in asset_ids
+                    else None
+                ),
+                attributes=json.dumps(asset.attributes),
+                sensors_to_show=json.dumps(asset.sensors_to_show),
+                flex_context=json.dumps(asset.flex_context),
+                sensors_to_show_as_kpis=json.dumps(asset.sensors_to_show_as_kpis),
+            )
+            for asset in assets
+        ],
+    )
+    _write_records(
+        path / "sensors.parquet",
+        [
+            dict(
+                id=sensor.id,
+                name=sensor.name,
+                unit=sensor.unit,
+                timezone=sensor.timezone,
+                event_resolution_seconds=sensor.event_resolution.total_seconds(),
+                knowledge_horizon_fnc=sensor.knowledge_horizon_fnc,
+                knowledge_horizon_par=json.dumps(sensor.knowledge_horizon_par),
+                attributes=json.dumps(sensor.attributes),
+                generic_asset_id=sensor.generic_asset_id,
+            )
+            for sensor in sensors
+        ],
+    )
+    sources = db.session.scalars(
+        select(DataSource).filter(DataSource.id.in_(source_ids)).order_by(DataSource.id)
+    ).all()
+    _write_records(
+        path / "sources.parquet",
+        [
+            dict(
+                id=source.id,
+                name=source.name,
+                type=source.type,
+                model=source.model,
+                version=source.version,
+                attributes=json.dumps(source.attributes),
+                attributes_hash=source.attributes_hash,
+            )
+            for source in sources
+        ],
+    )
+    counts = dict(
+        asset_types=len(asset_types),
+        assets=len(assets),
+        sensors=len(sensors),
+        sources=len(sources),
+        beliefs=n_beliefs,
+    )
+    with open(path / "manifest.json", "w") as f:
+        json.dump(
+            dict(
+                format_version=BUNDLE_FORMAT_VERSION,
+                flexmeasures_version=flexmeasures_version,
+                created_at=server_now().isoformat(),
+                start=pd.Timestamp(start).isoformat() if start is not None else None,
+                end=pd.Timestamp(end).isoformat() if end is not None else None,
+                counts=counts,
+            ),
+            f,
+            indent=2,
+        )
+    return counts
+
+
+def _remap_sensor_ids(value, sensor_ids: dict[int, int], is_sensor_list: bool = False):
+    """Replace sensor IDs in JSON, i.e. values of "sensor" keys and items of "sensors" lists (or of a sensor list)."""
+    if isinstance(value, dict):
+        return {
+            k: (
+                sensor_ids.get(v, v)
+                if k == "sensor" and type(v) is int
+                else _remap_sensor_ids(v, sensor_ids, is_sensor_list=k == "sensors")
+            )
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [
+            (
+                sensor_ids.get(v, v)
+                if is_sensor_list and type(v) is int
+                else _remap_sensor_ids(v, sensor_ids, is_sensor_list=is_sensor_list)
+            )
+            for v in value
+        ]
+    return value
+
+
+def _import_asset_types(path: Path) -> dict[int, int]:
+    """Reuse asset types with the same name, or create them."""
+    asset_type_ids = {}
+    for record in _read_records(path / "asset_types.parquet"):
+        asset_type = db.session.execute(
+            select(GenericAssetType).filter_by(name=record["name"])
+        ).scalar_one_or_none()
+        if asset_type is None:
+            asset_type = GenericAssetType(
+                name=record["name"], description=record["description"]
+            )
+            db.session.add(asset_type)
+            db.session.flush()
+        asset_type_ids[record["id"]] = asset_type.id
+    return asset_type_ids
+
+
+def _import_assets(
+    asset_records: list[dict],
+    asset_type_ids: dict[int, int],
+    account_id: int | None,
+) -> dict[int, GenericAsset]:
+    """Create assets, parents first."""
+    new_assets: dict[int, GenericAsset] = {}
+    while len(new_assets) < len(asset_records):
+        n_assets = len(new_assets)
+        for record in asset_records:
+            parent_id = record["parent_asset_id"]
+            if record["id"] in new_assets or (
+                parent_id is not None and parent_id not in new_assets
+            ):
+                continue
+            asset = GenericAsset(
+                name=record["name"],
+                latitude=record["latitude"],
+                longitude=record["longitude"],
+                generic_asset_type_id=asset_type_ids[record["generic_asset_type_id"]],
+                parent_asset_id=(
+                    new_assets[parent_id].id if parent_id is not None else None
+                ),
+                account_id=account_id,
+            )
+            db.session.add(asset)
+            db.session.flush()
+            new_assets[record["id"]] = asset
+        if len(new_assets) == n_assets:
+            raise ValueError("Bundle contains assets whose parent asset is missing.")
+    return new_assets
+
+
+def _import_sensors(
+    sensor_records: list[dict], new_assets: dict[int, GenericAsset]
+) -> dict[int, Sensor]:
+    new_sensors: dict[int, Sensor] = {}
+    for record in sensor_records:
+        sensor = Sensor(
+            name=record["name"],
+            generic_asset_id=new_assets[record["generic_asset_id"]].id,
+            unit=record["unit"],
+            timezone=record["timezone"],
+            event_resolution=timedelta(seconds=record["event_resolution_seconds"]),
+        )
+        sensor.knowledge_horizon_fnc = record["knowledge_horizon_fnc"]
+        sensor.knowledge_horizon_par = json.loads(record["knowledge_horizon_par"])
+        db.session.add(sensor)
+        db.session.flush()
+        new_sensors[record["id"]] = sensor
+    return new_sensors
+
+
+def _set_json_fields(
+    asset_records: list[dict],
+    sensor_records: list[dict],
+    new_assets: dict[int, GenericAsset],
+    new_sensors: dict[int, Sensor],
+    sensor_ids: dict[int, int],
+):
+    """Set JSON fields, now that sensor references can be updated."""
+    for record in asset_records:
+        asset = new_assets[record["id"]]
+        for field in (
+            "attributes",
+            "sensors_to_show",
+            "flex_context",
+            "sensors_to_show_as_kpis",
+        ):
+            setattr(
+                asset,
+                field,
+                _remap_sensor_ids(
+                    json.loads(record[field]),
+                    sensor_ids,
+                    is_sensor_list=field == "sensors_to_show",
+                ),
+            )
+    for record in sensor_records:
+        new_sensors[record["id"]].attributes = _remap_sensor_ids(
+            json.loads(record["attributes"]), sensor_ids
+        )
+
+
+def _import_sources(path: Path) -> dict[int, int]:
+    """Reuse data sources with the same name, type, model, version and attributes (hash), or create them.
+
+    Users are not part of a bundle, so sources of users are imported under the name of the user,
+    as sources of type IMPORTED_USER_SOURCE_TYPE, which are not linked to any user.
+    """
+    source_ids = {}
+    for record in _read_records(path / "sources.parquet"):
+        source_type = record["type"]
+        if source_type == "user":
+            source_type = IMPORTED_USER_SOURCE_TYPE
+        # Sources without (hashed) attributes have no attributes hash, so we match on the exported hash, even if it is None
+        source = db.session.scalars(
+            select(DataSource)
+            .filter_by(
+                name=record["name"],
+                type=source_type,
+                model=record["model"],
+                version=record["version"],
+                attributes_hash=record["attributes_hash"],
+            )
+            .order_by(DataSource.id)
+        ).first()
+        if source is None:
+            source = DataSource(
+                name=record["name"],
+                type=source_type,
+                model=record["model"],
+                version=record["version"],
+            )
+            source.attributes = json.loads(record["attributes"])
+            source.attributes_hash = record["attributes_hash"]
+            db.session.add(source)
+            db.session.flush()
+        source_ids[record["id"]] = source.id
+    return source_ids
+
+
+def _import_beliefs(
+    path: Path,
+    new_sensors: dict[int, Sensor],
+    source_ids: dict[int, int],
+    on_sensor_done: Callable[[BundledSensor], None] | None = None,
+):
+    """Bulk load beliefs, committing per sensor."""
+    import pyarrow.parquet as pq
+
+    for old_id, sensor in new_sensors.items():
+        n_beliefs = 0
+        belief_file = pq.ParquetFile(path / "beliefs" / f"sensor_id={old_id}.parquet")
+        for batch in belief_file.iter_batches(batch_size=BULK_INSERT_CHUNK_SIZE):
+            df = batch.to_pandas()
+            df["source_id"] = df["source_id"].map(source_ids)
+            df["sensor_id"] = sensor.id
+            n_beliefs += insert_beliefs_in_bulk(df, save_changed_beliefs_only=False)
+        db.session.commit()
+        if on_sensor_done is not None:
+            on_sensor_done(BundledSensor(sensor_id=sensor.id, beliefs=n_beliefs))
+
+
+def import_bundle(
+    path: str | Path,
+    account_id: int | None = None,
+    on_sensor_done: Callable[[BundledSensor], None] | None = None,
+) -> dict[str, dict[int, int]]:
+    """Import a bundle, creating new assets and sensors, and bulk loading their beliefs.
+
+    The new assets, sensors and data sources are committed first, and then the beliefs of each sensor.
+    An interrupted import can be undone by deleting the new top-level assets.
+
+    :param path:            directory holding the bundle
+    :param account_id:      account to own the new assets (if None, they become public)
+    :param on_sensor_done:  optional callback to report progress after the beliefs of each sensor are committed
+    :returns:               a mapping from bundled IDs to new IDs, for assets, sensors and sources
+    """
+    path = Path(path)
+    with open(path / "manifest.json") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported bundle format version: {manifest.get('format_version')}."
+        )
+
+    asset_type_ids = _import_asset_types(path)
+    asset_records = _read_records(path / "assets.parquet")
+    new_assets = _import_assets(asset_records, asset_type_ids, account_id)
+    sensor_records = _read_records(path / "sensors.parquet")
+    new_sensors = _import_sensors(sensor_records, new_assets)
+    sensor_ids = {old_id: sensor.id for old_id, sensor in new_sensors.items()}
+    _set_json_fields(asset_records, sensor_records, new_assets, new_sensors, sensor_ids)
+    source_ids = _import_sources(path)
+    db.session.commit()
+
+    _import_beliefs(path, new_sensors, source_ids, on_sensor_done)
+    return dict(
+        assets={old_id: asset.id for old_id, asset in new_assets.items()},
+        sensors=sensor_ids,
+        sources=source_ids,
+    )
@@ -0,0 +1,328 @@
+"""
+Logic for compacting the timed_belief table, by deleting unchanged beliefs incrementally.
+
+An unchanged belief has the same event value(s) as the most recent earlier belief about the same event, from the same source
+(ex-ante beliefs and ex-post beliefs are compared separately, like when saving beliefs with save_to_db_in_bulk).
+Compaction walks over sensors and over periods (chunks) of their events, and deletes unchanged beliefs in bounded batches,
+committing each batch and pausing in between, so it never holds locks (or accumulates WAL) for long.
+Progress is kept in Redis, so an interrupted run resumes where it left off.
+Compaction can run continuously, as a (self-requeueing) job on the maintenance queue.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import time
+from typing import Callable
+
+from flask import current_app
+import pandas as pd
+from rq.job import Job
+from sqlalchemy import select, text
+
+from flexmeasures.data import db
+from flexmeasures.data.models.time_series import Sensor
+from flexmeasures.utils.metrics import COMPACTED_BELIEFS, metrics_enabled
+from flexmeasures.utils.time_utils import server_now
+
+COMPACTION_PROGRESS_KEY_PREFIX = "flexmeasures:belief-compaction"
+
+# Delete a batch of unchanged beliefs about events in one chunk of time.
+# A probabilistic belief is deleted as a whole, if all of its cumulative probabilities are unchanged.
+_DELETE_UNCHANGED_BELIEFS = """
+WITH compared AS (
+    SELECT event_start, belief_horizon, source_id,
+        event_value = lag(event_value) OVER (
+            PARTITION BY source_id, event_start, cumulative_probability, belief_horizon > interval '0'
+            ORDER BY belief_horizon DESC
+        ) AS unchanged
+    FROM timed_belief
+    WHERE sensor_id = :sensor_id AND event_start >= :lower AND event_start < :upper
+        AND ((:forecasts AND belief_horizon > interval '0') OR (:measurements AND belief_horizon <= interval '0'))
+), unchanged_beliefs AS (
+    SELECT event_start, belief_horizon, source_id FROM compared
+    GROUP BY event_start, belief_horizon, source_id
+    HAVING bool_and(coalesce(unchanged, false))
+    LIMIT :batch_size
+)
+DELETE FROM timed_belief AS b
+USING unchanged_beliefs AS u
+WHERE b.sensor_id = :sensor_id AND b.event_start = u.event_start
+    AND b.belief_horizon = u.belief_horizon AND b.source_id = u.source_id
+"""
+
+
+@dataclass
+class CompactionChunk:
+    """Summary of compacting the beliefs about one chunk of time, for one sensor."""
+
+    sensor_id: int
+    start: datetime
+    end: datetime
+    beliefs_deleted: int
+    # Totals since the start of the (possibly resumed) run
+    total_beliefs_deleted: int
+    started_at: datetime
+
+    @property
+    def beliefs_deleted_per_minute(self) -> float:
+        minutes = (server_now() - self.started_at).total_seconds() / 60
+        return self.total_beliefs_deleted / minutes if minutes > 0 else 0
+
+
+def _get_progress_key(sensor_ids: list[int] | None) -> str:
+    if sensor_ids is None:
+        return f"{COMPACTION_PROGRESS_KEY_PREFIX}:all"
+    return f"{COMPACTION_PROGRESS_KEY_PREFIX}:{','.join(str(i) for i in sorted(sensor_ids))}"
+
+
+def get_compaction_progress(sensor_ids: list[int] | None = None) -> dict | None:
+    """Return the progress of an unfinished compaction run (over the given sensors, or over all sensors)."""
+    fields = current_app.redis_connection.hgetall(_get_progress_key(sensor_ids))
+    if not fields:
+        return None
+    fields = {
+        (k.decode() if isinstance(k, bytes) else k): (
+            v.decode() if isinstance(v, bytes) else v
+        )
+        for k, v in fields.items()
+    }
+    return dict(
+        sensor_id=int(fields["sensor_id"]),
+        chunk_start=pd.Timestamp(fields["chunk_start"]),
+        beliefs_deleted=int(fields["beliefs_deleted"]),
+        started_at=pd.Timestamp(fields["started_at"]),
+    )
+
+
+def reset_compaction_progress(sensor_ids: list[int] | None = None):
+    """Forget the progress of an unfinished compaction run, so the next run starts from the beginning."""
+    current_app.redis_connection.delete(_get_progress_key(sensor_ids))
+
+
+def _save_compaction_progress(
+    sensor_ids: list[int] | None,
+    sensor_id: int,
+    chunk_start: datetime,
+    beliefs_deleted: int,
+    started_at: datetime,
+):
+    current_app.redis_connection.hset(
+        _get_progress_key(sensor_ids),
+        mapping=dict(
+            sensor_id=sensor_id,
+            chunk_start=pd.Timestamp(chunk_start).isoformat(),
+            beliefs_deleted=beliefs_deleted,
+            started_at=pd.Timestamp(started_at).isoformat(),
+        ),
+    )
+
+
+def delete_unchanged_beliefs_in_batches(
+    sensor_id: int,
+    start: datetime,
+    end: datetime,
+    batch_size: int = 1000,
+    pause: float = 0.1,
+    forecasts: bool = True,
+    measurements: bool = True,
+) -> int:
+    """Delete the unchanged beliefs about events in the given period, committing each batch.
+
+    :param sensor_id:       the sensor whose beliefs to compact
+    :param start:           only compact beliefs about events starting at or after this datetime
+    :param end:             only compact beliefs about events starting before this datetime
+    :param batch_size:      maximum number of beliefs to delete per transaction
+    :param pause:           number of seconds to wait between batches
+    :param forecasts:       if True, delete unchanged beliefs with a positive belief horizon
+    :param measurements:    if True, delete unchanged beliefs with a zero or negative belief horizon
+    :returns:               the number of deleted rows
+    """
+    beliefs_deleted = 0
+    while True:
+        result = db.session.execute(
+            text(_DELETE_UNCHANGED_BELIEFS),
+            dict(
+                sensor_id=sensor_id,
+                lower=start,
+                upper=end,
+                batch_size=batch_size,
+                forecasts=forecasts,
+                measurements=measurements,
+            ),
+        )
+        db.session.commit()
+        if result.rowcount == 0:
+            return beliefs_deleted
+        beliefs_deleted += result.rowcount
+        if metrics_enabled():
+            COMPACTED_BELIEFS.inc(result.rowcount)
+        time.sleep(pause)
+
+
+def compact_beliefs(
+    sensor_ids: list[int] | None = None,
+    chunk: timedelta = timedelta(days=7),
+    batch_size: int = 1000,
+    pause: float = 0.1,
+    forecasts: bool = True,
+    measurements: bool = True,
+    max_duration: timedelta | None = None,
+    on_chunk_done: Callable[[CompactionChunk], None] | None = None,
+) -> bool:
+    """Delete unchanged beliefs, sensor by sensor and chunk by chunk, resuming an unfinished run if there is one.
+
+    :param sensor_ids:      compact beliefs of these sensors only (defaults to all sensors)
+    :param chunk:           length of the periods (of event starts) to compact one at a time
+    :param batch_size:      maximum number of beliefs to delete per transaction
+    :param pause:           number of seconds to wait between batches
+    :param forecasts:       if True, delete unchanged beliefs with a positive belief horizon
+    :param measurements:    if True, delete unchanged beliefs with a zero or negative belief horizon
+    :param max_duration:    optionally, stop (after finishing a chunk) once this much time has passed
+    :param on_chunk_done:   optional callback to report progress after each chunk
+    :returns:               True if all sensors were compacted, False if the run stopped early (and can be resumed)
+    """
+    if chunk <= timedelta(0):
+        raise ValueError("Chunk length should be positive.")
+    run_started_at = server_now()
+    progress = get_compaction_progress(sensor_ids)
+    if progress is None:
+        progress = dict(
+            sensor_id=0, chunk_start=None, beliefs_deleted=0, started_at=run_started_at
+        )
+    total_beliefs_deleted = progress["beliefs_deleted"]
+
+    query = select(Sensor.id).filter(Sensor.id >= progress["sensor_id"])
+    if sensor_ids is not None:
+        query = query.filter(Sensor.id.in_(sensor_ids))
+    for sensor_id in db.session.scalars(query.order_by(Sensor.id)).all():
+        first_event_start, last_event_start = db.session.execute(
+            text(
+                "SELECT min(event_start), max(event_start) FROM timed_belief WHERE sensor_id = :id"
+            ),
+            dict(id=sensor_id),
+        ).one()
+        if first_event_start is None:
+            continue
+        chunk_start = pd.Timestamp(first_event_start).tz_convert("UTC").floor(chunk)
+        if sensor_id == progress["sensor_id"] and progress["chunk_start"] is not None:
+            chunk_start = max(chunk_start, progress["chunk_start"])
+        while chunk_start <= last_event_start:
+            chunk_end = chunk_start + chunk
+            beliefs_deleted = delete_unchanged_beliefs_in_batches(
+                sensor_id,
+                chunk_start,
+                chunk_end,
+                batch_size=batch_size,
+                pause=pause,
+                forecasts=forecasts,
+                measurements=measurements,
+            )
+            total_beliefs_deleted += beliefs_deleted
+            _save_compaction_progress(
+                sensor_ids,
+                sensor_id,
+                chunk_end,
+                total_beliefs_deleted,
+                progress["started_at"],
+            )
+            if on_chunk_done is not None:
+                on_chunk_done(
+                    CompactionChunk(
+                        sensor_id=sensor_id,
+                        start=chunk_start,
+                        end=chunk_end,
+                        beliefs_deleted=beliefs_deleted,
+                        total_beliefs_deleted=total_beliefs_deleted,
+                        started_at=progress["started_at"],
+                    )
+                )
+            chunk_start = chunk_end
+            if (
+                max_duration is not None
+                and server_now() - run_started_at >= max_duration
+            ):
+                return False
+    reset_compaction_progress(sensor_ids)
+    current_app.logger.info(
+        f"Belief compaction finished: deleted {total_beliefs_deleted} unchanged beliefs."
+    )
+    return True
+
+
+def compact_beliefs_job(
+    sensor_ids: list[int] | None = None,
+    chunk: timedelta = timedelta(days=7),
+    batch_size: int = 1000,
+    pause: float = 0.1,
+    forecasts: bool = True,
+    measurements: bool = True,
+    max_duration: timedelta | None = timedelta(minutes=10),
+    continuous: bool = False,
+    interval: timedelta = timedelta(hours=1),
+) -> bool:
+    """Compact beliefs in an RQ job, for a limited time, after which the job requeues itself to continue.
+
+    :param continuous:  if True, a new run is started (after the interval) once all sensors were compacted
+    :param interval:    time to wait between continuous runs
+    :returns:           True if all sensors were compacted
+    """
+
+    def log_progress(chunk: CompactionChunk):
+        current_app.logger.info(
+            f"Compacted beliefs of sensor {chunk.sensor_id} from {chunk.start} until {chunk.end}: "
+            f"deleted {chunk.beliefs_deleted} unchanged beliefs "
+            f"({chunk.beliefs_deleted_per_minute:.0f} per minute since the start of the run)."
+        )
+
+    job_kwargs = dict(
+        sensor_ids=sensor_ids,
+        chunk=chunk,
+        batch_size=batch_size,
+        pause=pause,
+        forecasts=forecasts,
+        measurements=measurements,
+        max_duration=max_duration,
+        continuous=continuous,
+        interval=interval,
+    )
+    finished = compact_beliefs(
+        sensor_ids=sensor_ids,
+        chunk=chunk,
+        batch_size=batch_size,
+        pause=pause,
+        forecasts=forecasts,
+        measurements=measurements,
+        max_duration=max_duration,
+        on_chunk_done=log_progress,
+    )
+    queue = current_app.queues["maintenance"]
+    if not finished:
+        queue.enqueue(
+            compact_beliefs_job,
+            **job_kwargs,
+            job_timeout=_get_job_timeout(max_duration),
+        )
+    elif continuous:
+        queue.enqueue_in(
+            interval,
+            compact_beliefs_job,
+            **job_kwargs,
+            job_timeout=_get_job_timeout(max_duration),
+        )
+    return finished
+
+
+def _get_job_timeout(max_duration: timedelta | None) -> int:
+    """Allow jobs to finish their last chunk after their maximum duration."""
+    return int(2 * (max_duration or timedelta(hours=12)).total_seconds())
+
+
+def create_compaction_job(**kwargs) -> Job:
+    """Queue a belief compaction job on the maintenance queue (see compact_beliefs_job for the arguments)."""
+    return current_app.queues["maintenance"].enqueue(
+        compact_beliefs_job,
+        **kwargs,
+        job_timeout=_get_job_timeout(kwargs.get("max_duration", timedelta(minutes=10))),
+    )
@@ -1,24 +1,105 @@
 from __future__ import annotations
 
+import hashlib
+import threading
+
 from flask import current_app
-from sqlalchemy import select
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from flexmeasures import User
 from flexmeasures.data import db
 from flexmeasures.data.models.data_sources import DataSource
 from flexmeasures.data.models.user import is_user
 
+# Identity of data sources found so far in this process, by lookup key.
+# Only the columns identifying a data source are kept; its attributes are loaded when accessed.
+_source_cache: dict[tuple, dict] = {}
+_source_cache_lock = threading.Lock()
+_PENDING_SOURCES_KEY = "flexmeasures_data_sources_to_cache"
 
-def get_or_create_source(
+
+def clear_data_source_cache():
+    """Forget the data sources found so far."""
+    with _source_cache_lock:
+        _source_cache.clear()
+
+
+def get_cached_source(key: tuple) -> DataSource | None:
+    """Return the data source found earlier for this lookup key, without querying the database."""
+    with _source_cache_lock:
+        identity = _source_cache.get(key)
+    if identity is None:
+        return None
+    source = DataSource(
+        name=identity["name"],
+        type=identity["type"],
+        model=identity["model"],
+        version=identity["version"],
+    )
+    source.id = identity["id"]
+    source.attributes_hash = identity["attributes_hash"]
+    make_transient_to_detached(source)
+    return db.session.merge(source, load=False)
+
+
+def remember_source(key: tuple, source: DataSource):
+    """Cache the data source under this lookup key, once the current transaction is committed.
+
+    That way, we never cache a data source that is rolled back.
+    """
+    if source.id is None:
+        return
+    identity = dict(
+        id=source.id,
+        name=source.name,
+        type=source.type,
+        model=source.model,
+        version=source.version,
+        attributes_hash=source.attributes_hash,
+    )
+    db.session.info.setdefault(_PENDING_SOURCES_KEY, {})[key] = identity
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_committed_sources(session):
+    pending = session.info.pop(_PENDING_SOURCES_KEY, None)
+    if pending:
+        with _source_cache_lock:
+            _source_cache.update(pending)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back_sources(session, previous_transaction):
+    session.info.pop(_PENDING_SOURCES_KEY, None)
+
+
+@event.listens_for(DataSource, "after_update")
+@event.listens_for(DataSource, "after_delete")
+def _forget_changed_source(mapper, connection, target):
+    with _source_cache_lock:
+        for key in [k for k, v in _source_cache.items() if v["id"] == target.id]:
+            del _source_cache[key]
+
+
+def lock_source_creation(key: tuple):
+    """Serialize the creation of data sources with the same lookup key, until the end of the transaction.
+
+    A unique constraint cannot do this for us, as it treats NULL values (e.g. no model or version) as distinct.
+    """
+    lock_id = int.from_bytes(
+        hashlib.md5(repr(key).encode()).digest()[:8], "big", signed=True
+    )
+    db.session.execute(select(func.pg_advisory_xact_lock(lock_id)))
+
+
+def _get_source_query(
     source: User | str,
-    source_type: str | None = None,
-    model: str | None = None,
-    version: str | None = None,
-    attributes: dict | None = None,
-    flush: bool = True,
-) -> DataSource:
-    if is_user(source):
-        source_type = "user"
+    source_type: str | None,
+    model: str | None,
+    version: str | None,
+    attributes: dict | None,
+):
     query = select(DataSource).filter(DataSource.type == source_type)
     if model is not None:
         query = query.filter(DataSource.model == model)
@@ -34,25 +115,67 @@ def get_or_create_source(
         query = query.filter(DataSource.name == source)
     else:
         raise TypeError("source should be of type User or str")
+    return query
+
+
+def _create_source(
+    source: User | str,
+    source_type: str | None,
+    model: str | None,
+    version: str | None,
+    attributes: dict | None,
+) -> DataSource:
+    if is_user(source):
+        return DataSource(user=source, model=model, version=version)
+    if source_type is None:
+        raise TypeError("Please specify a source type")
+    return DataSource(
+        name=source,
+        model=model,
+        version=version,
+        type=source_type,
+        attributes=attributes,
+    )
+
+
+def get_or_create_source(
+    source: User | str,
+    source_type: str | None = None,
+    model: str | None = None,
+    version: str | None = None,
+    attributes: dict | None = None,
+    flush: bool = True,
+) -> DataSource:
+    key = None
+    if is_user(source):
+        source_type = "user"
+    elif isinstance(source, str):
+        key = (
+            "get_or_create_source",
+            source,
+            source_type,
+            model,
+            version,
+            DataSource.hash_attributes(attributes) if attributes is not None else None,
+        )
+        _source = get_cached_source(key)
+        if _source is not None:
+            return _source
+    query = _get_source_query(source, source_type, model, version, attributes)
     _source = db.session.execute(query).scalar_one_or_none()
+    if not _source and key is not None:
+        # Look again, after waiting for any concurrent creation of the same source
+        lock_source_creation(key)
+        _source = db.session.execute(query).scalar_one_or_none()
     if not _source:
-        if is_user(source):
-            _source = DataSource(user=source, model=model, version=version)
-        else:
-            if source_type is None:
-                raise TypeError("Please specify a source type")
-            _source = DataSource(
-                name=source,
-                model=model,
-                version=version,
-                type=source_type,
-                attributes=attributes,
-            )
+        _source = _create_source(source, source_type, model, version, attributes)
         current_app.logger.info(f"Setting up {_source} as new data source...")
         db.session.add(_source)
         if flush:
             # assigns id so that we can reference the new object in the current db session
             db.session.flush()
+    if key is not None:
+        remember_source(key, _source)
     return _source
 
 
@@ -4,24 +4,35 @@ Logic around scheduling (jobs)
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 from flask import current_app
 import click
 from rq import get_current_job
 from rq.job import Job
+from timetomodel import ModelSpecs
 from timetomodel.forecasting import make_rolling_forecasts
+import pandas as pd
 import timely_beliefs as tb
 
 from flexmeasures.data import db
 from flexmeasures.data.models.forecasting import lookup_model_specs_configurator
 from flexmeasures.data.models.forecasting.exceptions import InvalidHorizonException
+from flexmeasures.data.models.forecasting.model_spec_factory import (
+    SharedTimedBeliefSearch,
+)
+from flexmeasures.data.models.data_sources import DataSource
 from flexmeasures.data.models.time_series import Sensor, TimedBelief
 from flexmeasures.data.models.forecasting.utils import (
     get_query_window,
     check_data_availability,
 )
-from flexmeasures.data.utils import get_data_source, save_to_db
+from flexmeasures.data.utils import (
+    get_data_source,
+    make_beliefs_frame,
+    save_to_db_in_bulk,
+)
 from flexmeasures.utils.time_utils import (
     as_server_time,
     server_now,
@@ -33,6 +44,7 @@ from flexmeasures.utils.time_utils import (
 The life cycle of a forecasting job:
 1. A forecasting job is born in create_forecasting_jobs.
 2. It is run in make_rolling_viewpoint_forecasts or make_fixed_viewpoint_forecasts, which write results to the db.
+   A batch job for multiple horizons is run in make_rolling_viewpoint_forecasts_for_horizons, which loads shared data once.
    This is also where model specs are configured and a possible fallback model is stored for step 3.
 3. If an error occurs (and the worker is configured accordingly), handle_forecasting_exception comes in.
    This might re-enqueue the job or try a different model (which creates a new job).
@@ -56,6 +68,8 @@ def create_forecasting_jobs(
     model_search_term="linear-OLS",
     custom_model_params: dict = None,
     enqueue: bool = True,
+    batch_horizons: bool = False,
+    fixed_event_period: bool = False,
 ) -> list[Job]:
     """Create forecasting jobs by rolling through a time window, for a number of given forecast horizons.
     Start and end of the forecasting jobs are equal to the time window (start_of_roll, end_of_roll) plus the horizon.
@@ -84,6 +98,12 @@ def create_forecasting_jobs(
 
     if enqueue is True (default), the jobs are put on the redis queue.
 
+    If batch_horizons is True, a single job is created for all horizons, which loads the training data once
+    and trains the models for the different horizons in parallel (see make_rolling_viewpoint_forecasts_for_horizons).
+
+    If fixed_event_period is True, the time window (start_of_roll, end_of_roll) is instead the period of events to forecast,
+    for each horizon, so the forecasts for all horizons are about the same events.
+
     Returns the redis-queue forecasting jobs which were created.
     """
     if horizons is None:
@@ -92,17 +112,37 @@ def create_forecasting_jobs(
                 "Cannot create forecasting jobs - set either horizons or resolution."
             )
         horizons = forecast_horizons_for(resolution)
-    jobs: list[Job] = []
-    for horizon in horizons:
-        job = Job.create(
-            make_rolling_viewpoint_forecasts,
-            kwargs=dict(
+    if batch_horizons:
+        job_kwargs = [
+            dict(
+                sensor_id=sensor_id,
+                horizons=horizons,
+                start_of_roll=start_of_roll,
+                end_of_roll=end_of_roll,
+                custom_model_params=custom_model_params,
+                fixed_event_period=fixed_event_period,
+            )
+        ]
+    else:
+        job_kwargs = [
+            dict(
                 sensor_id=sensor_id,
                 horizon=horizon,
-                start=start_of_roll + horizon,
-                end=end_of_roll + horizon,
+                start=start_of_roll if fixed_event_period else start_of_roll + horizon,
+                end=end_of_roll if fixed_event_period else end_of_roll + horizon,
                 custom_model_params=custom_model_params,
+            )
+            for horizon in horizons
+        ]
+    jobs: list[Job] = []
+    for kwargs in job_kwargs:
+        job = Job.create(
+            (
+                make_rolling_viewpoint_forecasts_for_horizons
+                if batch_horizons
+                else make_rolling_viewpoint_forecasts
             ),
+            kwargs=kwargs,
             connection=current_app.queues["forecasting"].connection,
             ttl=int(
                 current_app.config.get(
@@ -184,6 +224,154 @@ def make_rolling_viewpoint_forecasts(
         % (rq_job.id, sensor, horizon, model_search_term, start, end)
     )
 
+    model_specs = _configure_model_specs(
+        rq_job,
+        sensor,
+        model_search_term,
+        horizon,
+        start,
+        end,
+        custom_model_params,
+    )
+
+    data_source = get_data_source(
+        data_source_name="Seita (%s)"
+        % rq_job.meta.get("model_identifier", "unknown model"),
+        data_source_type="forecasting script",
+    )
+
+    forecasts, model_state = make_rolling_forecasts(
+        start=as_server_time(start),
+        end=as_server_time(end),
+        model_specs=model_specs,
+    )
+    click.echo("Job %s made %d forecasts." % (rq_job.id, len(forecasts)))
+
+    save_to_db_in_bulk(_forecasts_to_beliefs(forecasts, sensor, horizon, data_source))
+    db.session.commit()
+
+    return len(forecasts)
+
+
+def make_rolling_viewpoint_forecasts_for_horizons(
+    sensor_id: int,
+    horizons: list[timedelta],
+    start_of_roll: datetime,
+    end_of_roll: datetime,
+    custom_model_params: dict = None,
+    max_workers: int | None = None,
+    fixed_event_period: bool = False,
+) -> int:
+    """Make rolling-viewpoint forecasts for multiple horizons at once, and save the forecasts made.
+
+    Like make_rolling_viewpoint_forecasts, with the forecast period for each horizon being the roll window plus that horizon
+    (or, if fixed_event_period is True, the roll window itself).
+    Model specs are built for each horizon, but they share their data:
+    the training data of the sensor is queried only once, for the union of the query windows of all horizons
+    (regressors are queried once per horizon, as their data depends on the horizon).
+    Then, the models for the different horizons are trained and used for forecasting in parallel threads.
+
+    :param sensor_id:           to identify which sensor to forecast
+    :param horizons:            the forecast horizons
+    :param start_of_roll:       start of the roll window (the first forecast period starts at the start of the roll plus its horizon)
+    :param end_of_roll:         end of the roll window
+    :param custom_model_params: passed to the model specs configurator (only advisable to be used for testing)
+    :param max_workers:         maximum number of threads to use (defaults to one per horizon, bounded by Python's default)
+    :param fixed_event_period:  if True, forecast the events within the roll window for each horizon
+    :returns:                   the number of forecasts made
+    """
+    # https://docs.sqlalchemy.org/en/13/faq/connections.html#how-do-i-use-engines-connections-sessions-with-python-multiprocessing-or-os-fork
+    db.engine.dispose()
+
+    rq_job = get_current_job()
+    model_search_term = rq_job.meta.get("model_search_term", "linear-OLS")
+    sensor = db.session.get(Sensor, sensor_id)
+
+    click.echo(
+        "Running Forecasting Job %s: %s for %s on model '%s', rolling from %s to %s"
+        % (
+            rq_job.id,
+            sensor,
+            ", ".join(str(h) for h in horizons),
+            model_search_term,
+            start_of_roll,
+            end_of_roll,
+        )
+    )
+
+    # Forecast period per horizon
+    periods = {
+        horizon: (
+            (start_of_roll, end_of_roll)
+            if fixed_event_period
+            else (start_of_roll + horizon, end_of_roll + horizon)
+        )
+        for horizon in horizons
+    }
+
+    # Configure model specs per horizon, and let them share their data
+    shared_search = SharedTimedBeliefSearch()
+    model_specs_per_horizon: dict[timedelta, ModelSpecs] = {}
+    for horizon in horizons:
+        model_specs = _configure_model_specs(
+            rq_job,
+            sensor,
+            model_search_term,
+            horizon,
+            *periods[horizon],
+            custom_model_params,
+        )
+        shared_search.register(model_specs)
+        model_specs_per_horizon[horizon] = model_specs
+    shared_search.load()  # the only place where this job queries time series data
+
+    data_source = get_data_source(
+        data_source_name="Seita (%s)"
+        % rq_job.meta.get("model_identifier", "unknown model"),
+        data_source_type="forecasting script",
+    )
+
+    # Worker threads need their own app context (e.g. for the server timezone and logging)
+    app = current_app._get_current_object()
+
+    def forecast(horizon: timedelta) -> pd.Series:
+        with app.app_context():
+            start, end = periods[horizon]
+            forecasts, _ = make_rolling_forecasts(
+                start=as_server_time(start),
+                end=as_server_time(end),
+                model_specs=model_specs_per_horizon[horizon],
+            )
+        return forecasts
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        forecasts_per_horizon = dict(zip(horizons, executor.map(forecast, horizons)))
+
+    bdfs = [
+        _forecasts_to_beliefs(forecasts, sensor, horizon, data_source)
+        for horizon, forecasts in forecasts_per_horizon.items()
+    ]
+    num_forecasts_made = sum(len(f) for f in forecasts_per_horizon.values())
+    click.echo("Job %s made %d forecasts." % (rq_job.id, num_forecasts_made))
+    save_to_db_in_bulk(bdfs)
+    db.session.commit()
+
+    return num_forecasts_made
+
+
+def _configure_model_specs(
+    rq_job: Job,
+    sensor: Sensor,
+    model_search_term: str,
+    horizon: timedelta,
+    start: datetime,
+    end: datetime,
+    custom_model_params: dict | None,
+) -> ModelSpecs:
+    """Build model specs for one horizon, and check if the horizon is okay and enough data is available.
+
+    Also stores the model identifier and fallback model on the job.
+    """
     if hasattr(sensor, "market_type"):
         ex_post_horizon = None  # Todo: until we sorted out the ex_post_horizon, use all available price data
     else:
@@ -224,35 +412,18 @@ def make_rolling_viewpoint_forecasts(
         query_window,
         horizon,
     )
+    return model_specs
 
-    data_source = get_data_source(
-        data_source_name="Seita (%s)"
-        % rq_job.meta.get("model_identifier", "unknown model"),
-        data_source_type="forecasting script",
-    )
 
-    forecasts, model_state = make_rolling_forecasts(
-        start=as_server_time(start),
-        end=as_server_time(end),
-        model_specs=model_specs,
+def _forecasts_to_beliefs(
+    forecasts: pd.Series,
+    sensor: Sensor,
+    horizon: timedelta,
+    data_source: DataSource,
+) -> tb.BeliefsDataFrame:
+    return make_beliefs_frame(
+        forecasts, sensor=sensor, source=data_source, belief_horizon=horizon
     )
-    click.echo("Job %s made %d forecasts." % (rq_job.id, len(forecasts)))
-
-    ts_value_forecasts = [
-        TimedBelief(
-            event_start=dt,
-            belief_horizon=horizon,
-            event_value=value,
-            sensor=sensor,
-            source=data_source,
-        )
-        for dt, value in forecasts.items()
-    ]
-    bdf = tb.BeliefsDataFrame(ts_value_forecasts)
-    save_to_db(bdf)
-    db.session.commit()
-
-    return len(forecasts)
 
 
 def handle_forecasting_exception(job, exc_type, exc_value, traceback):
@@ -281,7 +452,7 @@ def handle_forecasting_exception(job, exc_type, exc_value, traceback):
     if "fallback_model_search_term" in job.meta:
         if job.meta["fallback_model_search_term"] is not None:
             new_job = Job.create(
-                make_rolling_viewpoint_forecasts,
+                job.func,
                 args=job.args,
                 kwargs=job.kwargs,
                 connection=current_app.queues["forecasting"].connection,
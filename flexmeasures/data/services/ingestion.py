@@ -0,0 +1,307 @@
+"""
+Logic for ingesting large files of beliefs in chunks, with bounded memory.
+
+The file is split into chunk files (one pass over the raw lines), which are parsed (and unit-converted)
+in a process pool. Parsed chunks are saved in file order, each in its own transaction,
+and a checkpoint keeps track of the number of committed rows, so an interrupted import can be resumed.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, Future
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+import tempfile
+from typing import Callable, Iterator
+
+import pandas as pd
+import timely_beliefs as tb
+
+from flexmeasures.data import db
+from flexmeasures.data.models.data_sources import DataSource
+from flexmeasures.data.models.time_series import Sensor, TimedBelief
+from flexmeasures.utils.unit_utils import convert_units
+
+
+@dataclass
+class ChunkReport:
+    """Progress information about one ingested chunk."""
+
+    chunk_number: int
+    rows_read: int
+    beliefs_saved: int
+    duplicates_dropped: int
+    last_event_start: pd.Timestamp | None
+
+
+def split_csv_file(
+    path: str,
+    chunk_size: int,
+    directory: str,
+    skiprows: int = 0,
+    nrows: int | None = None,
+    offset: int = 0,
+) -> Iterator[str]:
+    """Split a CSV file into chunk files with at most `chunk_size` rows each.
+
+    Header rows (the first `skiprows` lines) are left out of the chunk files.
+    Only one chunk is kept in memory at a time.
+    Note that quoted fields containing line breaks are not supported.
+
+    :param path:        path to the CSV file
+    :param chunk_size:  maximum number of rows per chunk file
+    :param directory:   directory in which to write the chunk files
+    :param skiprows:    number of lines to skip at the start of the file
+    :param nrows:       maximum total number of rows to read (after skipping)
+    :param offset:      number of rows to leave out (after skipping), e.g. rows that were already ingested
+    :returns:           paths to the chunk files, yielded as soon as each chunk file is written
+    """
+    if chunk_size < 1:
+        raise ValueError("Chunk size should be a positive number of rows.")
+    rows_read = 0
+    chunk_number = 0
+    lines: list[str] = []
+
+    def write_chunk() -> str:
+        chunk_path = os.path.join(directory, f"chunk_{chunk_number:06d}.csv")
+        with open(chunk_path, "w") as chunk_file:
+            chunk_file.writelines(lines)
+        return chunk_path
+
+    with open(path, "r") as f:
+        for i, line in enumerate(f):
+            if i < skiprows or not line.strip():
+                continue
+            if nrows is not None and rows_read >= nrows:
+                break
+            rows_read += 1
+            if rows_read <= offset:
+                continue
+            lines.append(line if line.endswith("\n") else line + "\n")
+            if len(lines) == chunk_size:
+                yield write_chunk()
+                chunk_number += 1
+                lines = []
+    if lines:
+        yield write_chunk()
+
+
+def read_belief_chunk(
+    path: str,
+    sensor: Sensor,
+    source: DataSource,
+    unit: str | None = None,
+    **read_kwargs,
+) -> pd.DataFrame:
+    """Parse one chunk file into beliefs, converting units if needed.
+
+    Meant to be run in a worker process. The beliefs are returned as a flat frame without sources,
+    so the main process can attach its own (session-bound) sensor and source.
+    """
+    bdf = tb.read_csv(path, sensor, source=source, header=None, **read_kwargs)
+    if unit is not None:
+        bdf["event_value"] = convert_units(
+            bdf["event_value"],
+            from_unit=unit,
+            to_unit=sensor.unit,
+            event_resolution=sensor.event_resolution,
+        )
+    return pd.DataFrame(bdf.reset_index().drop(columns="source"))
+
+
+def _read_checkpoint(checkpoint_path: str) -> dict:
+    if not os.path.exists(checkpoint_path):
+        return {}
+    with open(checkpoint_path, "r") as f:
+        return json.load(f)
+
+
+def load_checkpoint(checkpoint_path: str) -> pd.Timestamp | None:
+    """Load the last committed event start from a checkpoint file, if it exists."""
+    last_event_start = _read_checkpoint(checkpoint_path).get("last_event_start")
+    return pd.Timestamp(last_event_start) if last_event_start is not None else None
+
+
+def load_checkpoint_rows(checkpoint_path: str) -> int:
+    """Load the number of committed rows from a checkpoint file (0 if it does not exist)."""
+    return _read_checkpoint(checkpoint_path).get("rows_read", 0)
+
+
+def save_checkpoint(
+    checkpoint_path: str,
+    last_event_start: pd.Timestamp,
+    beliefs_saved: int,
+    rows_read: int | None = None,
+):
+    """Save the last committed event start (and optionally the number of committed rows) to a checkpoint file.
+
+    We write to a temporary file first, so an interruption never leaves a corrupt checkpoint behind.
+    """
+    checkpoint = dict(
+        last_event_start=last_event_start.isoformat(),
+        beliefs_saved=beliefs_saved,
+    )
+    if rows_read is not None:
+        checkpoint["rows_read"] = rows_read
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def _count_rows(path: str) -> int:
+    with open(path, "r") as f:
+        return sum(1 for _ in f)
+
+
+def _read_belief_chunk_with(
+    executor: Executor | None, path: str, *args, **kwargs
+) -> Future | pd.DataFrame:
+    """Read a chunk in this process if no executor is given, or submit reading it to the executor."""
+    if executor is None:
+        return read_belief_chunk(path, *args, **kwargs)
+    return executor.submit(read_belief_chunk, path, *args, **kwargs)
+
+
+def save_belief_chunk(
+    df: pd.DataFrame,
+    sensor: Sensor,
+    source: DataSource,
+    allow_overwrite: bool = False,
+) -> tuple[tb.BeliefsDataFrame, int]:
+    """Save the beliefs of a parsed chunk in one transaction, dropping duplicates.
+
+    :returns: the saved beliefs, and the number of dropped duplicates
+    """
+    bdf = tb.BeliefsDataFrame(df, sensor=sensor, source=source)
+    duplicate_rows = bdf.index.duplicated(keep="first")
+    bdf = bdf[~duplicate_rows]
+    if not bdf.empty:
+        TimedBelief.add(
+            bdf,
+            expunge_session=True,
+            allow_overwrite=allow_overwrite,
+            bulk_save_objects=True,
+            commit_transaction=True,
+        )
+    return bdf, int(duplicate_rows.sum())
+
+
+def ingest_csv_in_chunks(
+    path: str,
+    sensor: Sensor,
+    source: DataSource,
+    chunk_size: int,
+    workers: int = 1,
+    checkpoint_path: str | None = None,
+    skiprows: int = 0,
+    nrows: int | None = None,
+    unit: str | None = None,
+    allow_overwrite: bool = False,
+    on_chunk_saved: Callable[[ChunkReport], None] | None = None,
+    **read_kwargs,
+) -> int:
+    """Ingest a CSV file of beliefs chunk by chunk.
+
+    Chunks are parsed in a pool of `workers` processes, while saving happens in file order in this process,
+    committing one transaction per chunk. At most two chunks per worker are in flight at any time, which bounds memory use.
+
+    If a checkpoint path is given, the number of committed rows is stored there after each chunk.
+    When resuming an import using an existing checkpoint, these rows are skipped.
+    This assumes the same file (and the same skiprows) is used again.
+    The checkpoint is removed once the whole file is ingested.
+
+    :param path:            path to the CSV file
+    :param sensor:          sensor to which the beliefs belong
+    :param source:          data source of the beliefs (should already be flushed to the database)
+    :param chunk_size:      number of rows per chunk
+    :param workers:         number of worker processes (1 means parsing happens in this process)
+    :param checkpoint_path: optional path to a checkpoint file, to make the import resumable
+    :param skiprows:        number of header lines to skip
+    :param nrows:           maximum number of rows to read
+    :param unit:            unit of the data, in case it needs to be converted to the unit of the sensor
+    :param allow_overwrite: if True, existing beliefs are overwritten
+    :param on_chunk_saved:  optional callback to report progress after each chunk is committed
+    :param read_kwargs:     additional keyword arguments for timely_beliefs.read_csv
+    :returns:               total number of beliefs saved
+    """
+    rows_read = (
+        load_checkpoint_rows(checkpoint_path) if checkpoint_path is not None else 0
+    )
+    last_event_start = None
+    beliefs_saved = 0
+    executor: Executor | None = (
+        ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    )
+    # Chunks being parsed, with their number of rows
+    in_flight: deque[tuple[int, Future | pd.DataFrame]] = deque()
+
+    def save_chunk(chunk_number: int, chunk_rows: int, df: pd.DataFrame):
+        nonlocal rows_read, last_event_start, beliefs_saved
+        bdf, duplicates_dropped = save_belief_chunk(df, sensor, source, allow_overwrite)
+        rows_read += chunk_rows
+        beliefs_saved += len(bdf)
+        if not bdf.empty:
+            chunk_end = bdf.index.get_level_values("event_start").max()
+            if last_event_start is None or chunk_end > last_event_start:
+                last_event_start = chunk_end
+        if checkpoint_path is not None and last_event_start is not None:
+            save_checkpoint(
+                checkpoint_path, last_event_start, beliefs_saved, rows_read=rows_read
+            )
+        if on_chunk_saved is not None:
+            on_chunk_saved(
+                ChunkReport(
+                    chunk_number=chunk_number,
+                    rows_read=chunk_rows,
+                    beliefs_saved=len(bdf),
+                    duplicates_dropped=duplicates_dropped,
+                    last_event_start=last_event_start,
+                )
+            )
+
+    def save_oldest_chunk(chunk_number: int) -> int:
+        chunk_rows, result = in_flight.popleft()
+        df = result.result() if isinstance(result, Future) else result
+        save_chunk(chunk_number, chunk_rows, df)
+        return chunk_number + 1
+
+    # Make sure the source has an id, as the session gets expunged after saving each chunk
+    db.session.flush()
+    next_chunk_to_save = 0
+    try:
+        with tempfile.TemporaryDirectory(prefix="fm-ingestion-") as tmp_dir:
+            for chunk_path in split_csv_file(
+                path,
+                chunk_size,
+                tmp_dir,
+                skiprows=skiprows,
+                nrows=nrows,
+                offset=rows_read,
+            ):
+                in_flight.append(
+                    (
+                        _count_rows(chunk_path),
+                        _read_belief_chunk_with(
+                            executor,
+                            chunk_path,
+                            sensor,
+                            source,
+                            unit=unit,
+                            **read_kwargs,
+                        ),
+                    )
+                )
+                while len(in_flight) >= 2 * workers:
+                    next_chunk_to_save = save_oldest_chunk(next_chunk_to_save)
+            while in_flight:
+                next_chunk_to_save = save_oldest_chunk(next_chunk_to_save)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    if checkpoint_path is not None and Path(checkpoint_path).exists():
+        os.remove(checkpoint_path)
+    return beliefs_saved
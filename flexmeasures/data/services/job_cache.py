@@ -46,9 +46,14 @@ class JobCache:
         job_id: str,
         queue: str = None,
         asset_or_sensor_type: str = None,
+        pipeline: redis.client.Pipeline | None = None,
     ):
-        self._check_redis_connection()
+        """Add a job to the cache, optionally as part of a pipeline (which the caller executes)."""
         cache_key = self._get_cache_key(asset_or_sensor_id, queue, asset_or_sensor_type)
+        if pipeline is not None:
+            pipeline.sadd(cache_key, job_id)
+            return
+        self._check_redis_connection()
         self.connection.sadd(cache_key, job_id)
 
     def _get_job(self, job_id: str) -> Job:
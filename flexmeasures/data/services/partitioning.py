@@ -0,0 +1,298 @@
+"""
+Logic for (optionally) storing timed beliefs in monthly partitions.
+
+With native Postgres range partitioning on event_start, maintenance (vacuuming, re-indexing, deleting old data)
+can be done per month, and queries over a time window only touch the partitions overlapping with it.
+Converting the timed_belief table is a one-off operation (see partition_timed_belief_table),
+which requires downtime, as it copies all data into a new table.
+
+Afterwards, partitions are created automatically before beliefs are saved (see ensure_belief_partitions),
+and a default partition catches beliefs saved in other ways, until their partition is created.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+import hashlib
+import re
+import time
+from typing import Callable
+
+from flask import current_app
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from flexmeasures.data import db
+
+TABLE = "timed_belief"
+DEFAULT_PARTITION = f"{TABLE}_default"
+UNPARTITIONED_TABLE = f"{TABLE}_unpartitioned"
+
+# Partitioning state as found in this process (None means not looked up yet).
+# Another process may partition the table, so whether it is partitioned is looked up again after a while.
+PARTITIONING_STATE_TTL = 60  # seconds
+_is_partitioned: bool | None = None
+_is_partitioned_checked_at: float = 0.0
+_known_partitions: set[str] = set()
+# Partitions that could not be created (e.g. due to a lock timeout), with the time of the last attempt,
+# so that saving beliefs does not wait for the lock again until PARTITIONING_STATE_TTL has passed.
+_failed_partitions: dict[str, float] = {}
+
+
+def clear_partition_cache():
+    """Forget the partitioning state found so far."""
+    global _is_partitioned
+    _is_partitioned = None
+    _known_partitions.clear()
+    _failed_partitions.clear()
+
+
+def get_partition_name(month_start: pd.Timestamp) -> str:
+    return f"{TABLE}_y{month_start.year}m{month_start.month:02d}"
+
+
+def get_month_starts(start: datetime, end: datetime) -> pd.DatetimeIndex:
+    """Return the (UTC) starts of the months overlapping with the given period (inclusive)."""
+    first = pd.Timestamp(start).tz_convert("UTC").normalize().replace(day=1)
+    return pd.date_range(first, pd.Timestamp(end).tz_convert("UTC"), freq="MS")
+
+
+def is_partitioned() -> bool:
+    """Check whether the timed_belief table is partitioned (looked up at most once per PARTITIONING_STATE_TTL)."""
+    global _is_partitioned, _is_partitioned_checked_at
+    now = time.monotonic()
+    if (
+        _is_partitioned is None
+        or now - _is_partitioned_checked_at > PARTITIONING_STATE_TTL
+    ):
+        _is_partitioned = db.session.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt"
+                " JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table)"
+            ),
+            dict(table=TABLE),
+        ).scalar()
+        _is_partitioned_checked_at = now
+        if not _is_partitioned:
+            _known_partitions.clear()
+    return _is_partitioned
+
+
+def get_belief_partitions(connection=None) -> set[str]:
+    """Return the names of the partitions of the timed_belief table."""
+    return set(
+        (connection or db.session)
+        .execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i"
+                " JOIN pg_class c ON c.oid = i.inhrelid"
+                " JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :table"
+            ),
+            dict(table=TABLE),
+        )
+        .scalars()
+    )
+
+
+def _create_partition(connection, month_start: pd.Timestamp, table: str = TABLE):
+    """Create the partition for one month, moving any of its beliefs out of the default partition."""
+    name = get_partition_name(month_start)
+    bounds = dict(
+        lower=month_start.to_pydatetime(),
+        upper=(month_start + pd.offsets.MonthBegin(1)).to_pydatetime(),
+    )
+    connection.execute(
+        text(
+            f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+    )
+    connection.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION}"
+            " WHERE event_start >= :lower AND event_start < :upper RETURNING *)"
+            f" INSERT INTO {name} SELECT * FROM moved"
+        ),
+        bounds,
+    )
+    connection.execute(
+        text(
+            f"ALTER TABLE {table} ATTACH PARTITION {name}"
+            " FOR VALUES FROM (:lower) TO (:upper)"
+        ),
+        bounds,
+    )
+
+
+def create_belief_partitions(start: datetime, end: datetime) -> list[str]:
+    """Create any missing monthly partitions for the given period, in a separate transaction.
+
+    Concurrent calls are serialized with an advisory lock.
+
+    :returns: the names of the created partitions
+    """
+    created = []
+    with db.engine.begin() as connection:
+        connection.execute(text("SET LOCAL lock_timeout = '2s'"))
+        lock_id = int.from_bytes(
+            hashlib.md5(TABLE.encode()).digest()[:8], "big", signed=True
+        )
+        connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), dict(id=lock_id))
+        existing = get_belief_partitions(connection)
+        for month_start in get_month_starts(start, end):
+            if get_partition_name(month_start) not in existing:
+                _create_partition(connection, month_start)
+                created.append(get_partition_name(month_start))
+    _known_partitions.update(existing, created)
+    return created
+
+
+def ensure_belief_partitions(event_starts: pd.DatetimeIndex):
+    """Make sure partitions exist for the given event starts, if the timed_belief table is partitioned.
+
+    Meant to be called before saving beliefs. Failing to create a partition (e.g. due to a lock timeout) is not fatal,
+    as the beliefs then end up in the default partition, from where they are moved once their partition is created.
+    Creating a partition that failed is only tried again after PARTITIONING_STATE_TTL.
+    """
+    if len(event_starts) == 0 or not is_partitioned():
+        return
+    month_starts = get_month_starts(event_starts.min(), event_starts.max())
+    missing = {get_partition_name(m) for m in month_starts} - _known_partitions
+    now = time.monotonic()
+    recently_failed = {
+        name
+        for name, failed_at in _failed_partitions.items()
+        if now - failed_at < PARTITIONING_STATE_TTL
+    }
+    if missing <= recently_failed:
+        return
+    try:
+        created = create_belief_partitions(month_starts[0], month_starts[-1])
+    except DBAPIError as exc:
+        current_app.logger.warning(f"Could not create belief partitions: {exc}")
+        _failed_partitions.update({name: now for name in missing})
+        return
+    for name in missing:
+        _failed_partitions.pop(name, None)
+    if created:
+        current_app.logger.info(f"Created belief partitions: {', '.join(created)}")
+
+
+def partition_timed_belief_table(
+    months_ahead: int = 3,
+    drop_unpartitioned: bool = False,
+    on_partition_filled: Callable[[str, int], None] | None = None,
+) -> list[str]:
+    """Convert the timed_belief table into a table partitioned by month (of event start).
+
+    All constraints and indexes of the current table are recreated on the partitioned table.
+    The data is copied month by month, all in one transaction, so an interrupted conversion leaves nothing behind.
+    Stop anything writing beliefs while this runs, or their beliefs may not be copied.
+    The original table is kept as timed_belief_unpartitioned, unless drop_unpartitioned is set.
+
+    :param months_ahead:        number of months (after the current month or the last event, whichever is later) to create partitions for
+    :param drop_unpartitioned:  if True, the original table is dropped after its data is copied
+    :param on_partition_filled: optional callback to report progress, receiving the partition name and the number of copied beliefs
+    :returns:                   the names of the created partitions
+    """
+    global _is_partitioned, _is_partitioned_checked_at
+    if is_partitioned():
+        raise ValueError(f"Table {TABLE} is already partitioned.")
+    session = db.session
+    new_table = f"{TABLE}_new"
+    first_event_start, last_event_start = session.execute(
+        text(f"SELECT min(event_start), max(event_start) FROM {TABLE}")
+    ).one()
+    now = pd.Timestamp.now(tz="UTC")
+    month_starts = get_month_starts(
+        first_event_start or now,
+        max(pd.Timestamp(last_event_start or now), now)
+        + pd.DateOffset(months=months_ahead),
+    )
+
+    # Create the partitioned table, with the same constraints and indexes
+    session.execute(
+        text(
+            f"CREATE TABLE {new_table} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            " PARTITION BY RANGE (event_start)"
+        )
+    )
+    constraints = session.execute(
+        text(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint"
+            " WHERE conrelid = CAST(:table AS regclass) AND contype IN ('p', 'f', 'u')"
+        ),
+        dict(table=TABLE),
+    ).all()
+    for name, definition in constraints:
+        session.execute(
+            text(f"ALTER TABLE {new_table} ADD CONSTRAINT {name}_new {definition}")
+        )
+    indexes = session.execute(
+        text(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = :table"
+            " AND indexname NOT IN (SELECT conname FROM pg_constraint"
+            " WHERE conrelid = CAST(:table AS regclass))"
+        ),
+        dict(table=TABLE),
+    ).all()
+    for name, definition in indexes:
+        definition = re.sub(
+            rf"INDEX {name} ON (\S+\.)?{TABLE} ",
+            f"INDEX {name}_new ON {new_table} ",
+            definition,
+        )
+        session.execute(text(definition))
+
+    # Create the partitions and copy the data
+    session.execute(
+        text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {new_table} DEFAULT")
+    )
+    partitions = []
+    for month_start in month_starts:
+        name = get_partition_name(month_start)
+        bounds = dict(
+            lower=month_start.to_pydatetime(),
+            upper=(month_start + pd.offsets.MonthBegin(1)).to_pydatetime(),
+        )
+        session.execute(
+            text(
+                f"CREATE TABLE {name} PARTITION OF {new_table}"
+                " FOR VALUES FROM (:lower) TO (:upper)"
+            ),
+            bounds,
+        )
+        result = session.execute(
+            text(
+                f"INSERT INTO {name} SELECT * FROM {TABLE}"
+                " WHERE event_start >= :lower AND event_start < :upper"
+            ),
+            bounds,
+        )
+        partitions.append(name)
+        if on_partition_filled is not None:
+            on_partition_filled(name, result.rowcount)
+
+    # Swap the tables
+    session.execute(text(f"ALTER TABLE {TABLE} RENAME TO {UNPARTITIONED_TABLE}"))
+    for name, _ in constraints:
+        session.execute(
+            text(
+                f"ALTER TABLE {UNPARTITIONED_TABLE} RENAME CONSTRAINT {name} TO {name}_unpartitioned"
+            )
+        )
+        session.execute(
+            text(f"ALTER TABLE {new_table} RENAME CONSTRAINT {name}_new TO {name}")
+        )
+    for name, _ in indexes:
+        session.execute(text(f"ALTER INDEX {name} RENAME TO {name}_unpartitioned"))
+        session.execute(text(f"ALTER INDEX {name}_new RENAME TO {name}"))
+    session.execute(text(f"ALTER TABLE {new_table} RENAME TO {TABLE}"))
+    if drop_unpartitioned:
+        session.execute(text(f"DROP TABLE {UNPARTITIONED_TABLE}"))
+    session.commit()
+
+    _is_partitioned = True
+    _is_partitioned_checked_at = time.monotonic()
+    _known_partitions.update(partitions)
+    return partitions
@@ -0,0 +1,493 @@
+"""
+Logic for computing reports over long periods, window by window.
+
+The report period is split into aligned windows, which are computed in a process pool.
+Each window can be extended backwards with some overlap, for transformations that need preceding data
+(e.g. rolling windows), after which the result is trimmed to the window itself.
+Results are saved in window order, each window in its own transaction,
+and a checkpoint keeps track of the last committed window, so an interrupted computation can be resumed.
+
+In incremental mode, only windows affected by new input data are recomputed.
+To that end, the report's data source keeps track of the last processed belief time of each input sensor (its watermark).
+Beliefs recorded with an earlier belief time than the watermark (e.g. backfilled historical data) are not detected;
+run the report without incremental mode after such imports.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    Future,
+)
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import os
+from pathlib import Path
+from typing import Callable
+
+from flask import current_app
+import numpy as np
+import pandas as pd
+import timely_beliefs as tb
+
+from flexmeasures.data import db
+from flexmeasures.data.models.data_sources import DataSource
+from flexmeasures.data.models.reporting import Reporter
+from flexmeasures.data.models.reporting.cache import ReportInputCache
+from flexmeasures.data.models.time_series import Sensor, TimedBelief
+from flexmeasures.data.services.ingestion import load_checkpoint, save_checkpoint
+from flexmeasures.data.utils import save_to_db_in_bulk
+from flexmeasures.utils.time_utils import server_now
+
+
+@dataclass
+class WindowReport:
+    """Progress information about one computed window."""
+
+    window_number: int
+    window_count: int
+    start: pd.Timestamp
+    end: pd.Timestamp
+    beliefs_computed: int
+
+
+@dataclass
+class BatchReport:
+    """Progress information about one computed report in a batch."""
+
+    report_number: int
+    report_count: int
+    stage: int
+    beliefs_computed: int
+
+
+def get_report_windows(
+    start: datetime, end: datetime, window: timedelta
+) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+    """Split the report period into windows of the given length.
+
+    Window boundaries are aligned to multiples of the window length (in local time),
+    so only the first and last window may be shorter.
+    For example, daily windows start at midnight.
+    """
+    if window <= timedelta(0):
+        raise ValueError("Window length should be a positive duration.")
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    boundaries = [start]
+    boundary = start.floor(window, nonexistent="shift_forward") + window
+    while boundary < end:
+        boundaries.append(boundary)
+        boundary += window
+    boundaries.append(end)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+WATERMARKS_ATTRIBUTE = "report_watermarks"
+
+
+def get_input_sensor_ids(config: dict, parameters: dict) -> list[int]:
+    """Collect the IDs of the sensors a (serialized) report reads from.
+
+    Besides the sensors listed as input, this includes sensors referenced in the config,
+    such as the price sensors of the ProfitOrLossReporter.
+    """
+    sensor_ids = [_input["sensor"] for _input in parameters["input"]]
+    for key, value in config.items():
+        if key.replace("-", "_").endswith("_sensor") and isinstance(value, int):
+            sensor_ids.append(value)
+    return list(dict.fromkeys(sensor_ids))
+
+
+def _get_watermarks_key(parameters: dict) -> str:
+    """Watermarks are kept per set of output sensors, as one data source may be used for several reports."""
+    return ",".join(sorted(str(output["sensor"]) for output in parameters["output"]))
+
+
+def get_changed_report_windows(
+    source: DataSource,
+    config: dict,
+    parameters: dict,
+    windows: list[tuple[pd.Timestamp, pd.Timestamp]],
+    overlap: timedelta = timedelta(0),
+) -> tuple[list[tuple[pd.Timestamp, pd.Timestamp]], dict[str, str]]:
+    """Select the windows affected by beliefs formed after the watermark of each input sensor.
+
+    Only the new beliefs are loaded. Inputs without a watermark affect all windows.
+
+    :returns: the affected windows, and the updated watermarks (to be saved after the windows are computed)
+    """
+    if not windows:
+        return windows, {}
+    watermarks = source.get_attribute(WATERMARKS_ATTRIBUTE, {}).get(
+        _get_watermarks_key(parameters), {}
+    )
+    window_starts = pd.DatetimeIndex([w[0] for w in windows]) - overlap
+    window_ends = pd.DatetimeIndex([w[1] for w in windows])
+    changed = np.zeros(len(windows), dtype=bool)
+    new_watermarks = {}
+    checked_at = server_now()
+    for sensor_id in get_input_sensor_ids(config, parameters):
+        sensor = db.session.get(Sensor, sensor_id)
+        watermark = watermarks.get(str(sensor_id))
+        if watermark is not None:
+            watermark = pd.Timestamp(watermark)
+        bdf = TimedBelief.search(
+            sensor,
+            event_starts_after=window_starts[0],
+            event_ends_before=window_ends[-1],
+            beliefs_after=watermark,
+            beliefs_before=checked_at,
+        )
+        if watermark is not None:
+            bdf = bdf[bdf.belief_times > watermark]
+        else:
+            changed[:] = True
+        if bdf.empty:
+            new_watermarks[str(sensor_id)] = (
+                watermark if watermark is not None else checked_at
+            ).isoformat()
+            continue
+        new_watermarks[str(sensor_id)] = bdf.belief_times.max().isoformat()
+
+        # A window is affected if any new event overlaps with the data used to compute it
+        event_starts = bdf.event_starts.unique().sort_values()
+        event_ends = event_starts + sensor.event_resolution
+        side = "left" if sensor.event_resolution == timedelta(0) else "right"
+        first_overlapping_event = event_ends.searchsorted(window_starts, side=side)
+        has_overlapping_event = first_overlapping_event < len(event_starts)
+        changed[has_overlapping_event] |= (
+            event_starts[first_overlapping_event[has_overlapping_event]]
+            < window_ends[has_overlapping_event]
+        )
+    return [w for w, c in zip(windows, changed) if c], new_watermarks
+
+
+def save_report_watermarks(source: DataSource, parameters: dict, watermarks: dict):
+    """Store the watermarks of the report's input sensors on its data source (does not commit)."""
+    all_watermarks = dict(source.get_attribute(WATERMARKS_ATTRIBUTE, {}))
+    all_watermarks[_get_watermarks_key(parameters)] = watermarks
+    source.set_attribute(WATERMARKS_ATTRIBUTE, all_watermarks)
+
+
+def _init_worker(env: str):
+    """Give each worker process its own app (and thereby its own database connections)."""
+    from flexmeasures.app import create as create_app
+
+    app = create_app(env=env, data_only=True)
+    app.app_context().push()
+
+
+def compute_report_window(
+    reporter_class: str,
+    config: dict,
+    source_id: int,
+    parameters: dict,
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    overlap: timedelta = timedelta(0),
+    input_cache: ReportInputCache | None = None,
+) -> list[tuple[int, pd.DataFrame]]:
+    """Compute the report for one window.
+
+    Meant to be run in a worker process (or thread). The results are returned as flat frames without sources,
+    so the main process can attach its own (session-bound) sensors and source.
+
+    :returns: list of (output sensor ID, report data) tuples
+    """
+    reporter = current_app.data_generators["reporter"][reporter_class](config=config)
+    reporter._data_source = db.session.get(DataSource, source_id)
+    reporter._input_cache = input_cache
+    results = reporter.compute(
+        parameters={
+            **parameters,
+            "start": (start - overlap).isoformat(),
+            "end": end.isoformat(),
+        }
+    )
+    frames = []
+    for result in results:
+        data = result["data"]
+        event_starts = data.index.get_level_values("event_start")
+        data = data[(event_starts >= start) & (event_starts < end)]
+        if data.empty:
+            continue
+        df = pd.DataFrame(data.reset_index().drop(columns="source"))
+        frames.append((result["sensor"].id, df))
+    return frames
+
+
+def _compute_report_windows_in_order(
+    window_args: list[tuple],
+    workers: int,
+    on_window_computed: Callable[[int, list[tuple[int, pd.DataFrame]]], None],
+):
+    """Compute report windows (see compute_report_window) in a pool of `workers` processes, handling results in window order.
+
+    At most two windows per worker are in flight at any time, which bounds memory use.
+
+    :param window_args:         the arguments to compute_report_window, for each window
+    :param workers:             number of worker processes (1 means computing happens in this process)
+    :param on_window_computed:  called with the window number and the results of each window, in window order
+    """
+    executor: Executor | None = (
+        ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(current_app.config["FLEXMEASURES_ENV"],),
+        )
+        if workers > 1
+        else None
+    )
+    in_flight: deque[Future | list[tuple[int, pd.DataFrame]]] = deque()
+    next_window = 0
+
+    def handle_oldest_window():
+        nonlocal next_window
+        result = in_flight.popleft()
+        on_window_computed(
+            next_window, result.result() if isinstance(result, Future) else result
+        )
+        next_window += 1
+
+    try:
+        for args in window_args:
+            if executor is None:
+                in_flight.append(compute_report_window(*args))
+            else:
+                in_flight.append(executor.submit(compute_report_window, *args))
+            while len(in_flight) >= 2 * workers:
+                handle_oldest_window()
+        while in_flight:
+            handle_oldest_window()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def save_report_window(
+    frames: list[tuple[int, pd.DataFrame]], source: DataSource, save: bool = True
+) -> int:
+    """Save the results of one report window (per output sensor) in bulk, and commit them.
+
+    :param frames:  the results of compute_report_window
+    :param source:  the data source of the report
+    :param save:    if False, nothing is saved (i.e. a dry run)
+    :returns:       the number of computed beliefs
+    """
+    bdfs = [
+        tb.BeliefsDataFrame(df, sensor=db.session.get(Sensor, sensor_id), source=source)
+        for sensor_id, df in frames
+    ]
+    if save and bdfs:
+        save_to_db_in_bulk(bdfs)
+        db.session.commit()
+    return sum(len(bdf) for bdf in bdfs)
+
+
+def compute_report_in_windows(
+    reporter: Reporter,
+    parameters: dict,
+    window: timedelta,
+    overlap: timedelta = timedelta(0),
+    workers: int = 1,
+    checkpoint_path: str | None = None,
+    save: bool = True,
+    incremental: bool = False,
+    on_window_done: Callable[[WindowReport], None] | None = None,
+) -> int:
+    """Compute a report window by window, saving the results of each window in a separate transaction.
+
+    Windows are computed in a pool of `workers` processes, while saving happens in window order in this process.
+    At most two windows per worker are in flight at any time, which bounds memory use.
+
+    If a checkpoint path is given, the start of the last committed window is stored there after each window.
+    When resuming using an existing checkpoint, windows up to and including the checkpointed window are skipped.
+    The checkpoint is removed once the whole period is computed.
+
+    In incremental mode, only windows affected by beliefs formed since the previous (incremental) run are computed.
+
+    :param reporter:        the reporter, whose data source is used for all results
+    :param parameters:      serialized report parameters, including the start and end of the whole period
+    :param window:          length of each window
+    :param overlap:         how much data preceding each window to include in its computation
+    :param workers:         number of worker processes (1 means computing happens in this process)
+    :param checkpoint_path: optional path to a checkpoint file, to make the computation resumable
+    :param save:            if False, results are computed but not saved (i.e. a dry run)
+    :param incremental:     if True, only windows with new input data are computed
+    :param on_window_done:  optional callback to report progress after each window is committed
+    :returns:               total number of beliefs computed
+    """
+    windows = get_report_windows(
+        pd.Timestamp(parameters["start"]), pd.Timestamp(parameters["end"]), window
+    )
+    last_window_start = (
+        load_checkpoint(checkpoint_path) if checkpoint_path is not None else None
+    )
+    if last_window_start is not None:
+        windows = [w for w in windows if w[0] > last_window_start]
+
+    # Workers look up the data source by ID, so make sure it is committed
+    source = reporter.data_source
+    if workers > 1:
+        db.session.commit()
+    else:
+        db.session.flush()
+    reporter_class = reporter.__class__.__name__
+    config = reporter._config_schema.dump(reporter._config)
+    parameters = {**(reporter._parameters or {}), **parameters}
+    if incremental:
+        windows, watermarks = get_changed_report_windows(
+            source, config, parameters, windows, overlap
+        )
+
+    beliefs_computed = 0
+    window_count = len(windows)
+
+    def save_window(window_number: int, frames: list[tuple[int, pd.DataFrame]]):
+        nonlocal beliefs_computed
+        start, end = windows[window_number]
+        n_beliefs = save_report_window(frames, source, save=save)
+        beliefs_computed += n_beliefs
+        if save and checkpoint_path is not None:
+            save_checkpoint(checkpoint_path, start, beliefs_computed)
+        if on_window_done is not None:
+            on_window_done(
+                WindowReport(
+                    window_number=window_number,
+                    window_count=window_count,
+                    start=start,
+                    end=end,
+                    beliefs_computed=n_beliefs,
+                )
+            )
+
+    _compute_report_windows_in_order(
+        [
+            (reporter_class, config, source.id, parameters, start, end, overlap)
+            for start, end in windows
+        ],
+        workers=workers,
+        on_window_computed=save_window,
+    )
+    if save and incremental:
+        save_report_watermarks(source, parameters, watermarks)
+        db.session.commit()
+    if save and checkpoint_path is not None and Path(checkpoint_path).exists():
+        os.remove(checkpoint_path)
+    return beliefs_computed
+
+
+def get_report_stages(configs: list[dict], parameters: list[dict]) -> list[list[int]]:
+    """Order (serialized) reports into stages, such that reports reading the output of other reports come in a later stage.
+
+    Reports within the same stage are independent of each other.
+
+    :returns: the indices of the reports in each stage
+    """
+    outputs = [{output["sensor"] for output in p["output"]} for p in parameters]
+    inputs = [set(get_input_sensor_ids(c, p)) for c, p in zip(configs, parameters)]
+    dependencies = {
+        i: {j for j in range(len(outputs)) if j != i and outputs[j] & inputs[i]}
+        for i in range(len(inputs))
+    }
+    stages = []
+    done = set()
+    while len(done) < len(dependencies):
+        stage = [
+            i
+            for i, depends_on in dependencies.items()
+            if i not in done and depends_on <= done
+        ]
+        if not stage:
+            raise ValueError(
+                f"Reports {sorted(set(dependencies) - done)} depend on each other in a cycle."
+            )
+        stages.append(stage)
+        done |= set(stage)
+    return stages
+
+
+def run_report_batch(
+    reporters: list[Reporter],
+    parameters: list[dict],
+    workers: int = 1,
+    save: bool = True,
+    on_report_done: Callable[[BatchReport], None] | None = None,
+) -> ReportInputCache:
+    """Compute many reports, sharing their input data.
+
+    Reports are ordered into stages (see get_report_stages), and the reports within one stage are computed
+    in a pool of `workers` threads. All reports share one input cache, so each distinct search for input data
+    (i.e. per sensor, source filter, resolution, etc.) is run once. Results are saved per report,
+    after which the output sensors are removed from the cache, so that later stages read the new data.
+
+    Unless set, the belief time of all reports is pinned to the start of the batch run,
+    so that reporters searching for the same input data make identical searches.
+
+    :param reporters:       the reporters, each with its own data source
+    :param parameters:      serialized report parameters, for each reporter
+    :param workers:         number of threads (1 means computing happens in this thread)
+    :param save:            if False, results are computed but not saved (i.e. a dry run)
+    :param on_report_done:  optional callback to report progress after each report is committed
+    :returns:               the input cache, for inspection (e.g. of its hit rate)
+    """
+    belief_time = server_now().isoformat()
+    report_count = len(reporters)
+
+    # Threads look up the data sources by ID, so make sure they are committed
+    sources = [reporter.data_source for reporter in reporters]
+    if workers > 1:
+        db.session.commit()
+    else:
+        db.session.flush()
+    jobs = []
+    for reporter, source, _parameters in zip(reporters, sources, parameters):
+        _parameters = {
+            "belief_time": belief_time,
+            **(reporter._parameters or {}),
+            **_parameters,
+        }
+        jobs.append(
+            (
+                reporter.__class__.__name__,
+                reporter._config_schema.dump(reporter._config),
+                source.id,
+                _parameters,
+                pd.Timestamp(_parameters["start"]),
+                pd.Timestamp(_parameters["end"]),
+            )
+        )
+    stages = get_report_stages([job[1] for job in jobs], [job[3] for job in jobs])
+
+    input_cache = ReportInputCache()
+    app = current_app._get_current_object()
+
+    def compute(i: int) -> list[tuple[int, pd.DataFrame]]:
+        if workers == 1:
+            return compute_report_window(*jobs[i], input_cache=input_cache)
+        with app.app_context():
+            return compute_report_window(*jobs[i], input_cache=input_cache)
+
+    for stage_number, stage in enumerate(stages):
+        if workers > 1 and len(stage) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                stage_results = list(executor.map(compute, stage))
+        else:
+            stage_results = [compute(i) for i in stage]
+        for i, frames in zip(stage, stage_results):
+            beliefs_computed = save_report_window(frames, sources[i], save=save)
+            for sensor_id, _ in frames:
+                input_cache.invalidate(sensor_id)
+            if on_report_done is not None:
+                on_report_done(
+                    BatchReport(
+                        report_number=i,
+                        report_count=report_count,
+                        stage=stage_number,
+                        beliefs_computed=beliefs_computed,
+                    )
+                )
+    return input_cache
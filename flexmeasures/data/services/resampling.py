@@ -0,0 +1,350 @@
+"""
+Logic for resampling the beliefs of a sensor to a new event resolution, chunk by chunk.
+
+Beliefs are processed in chunks of time (of event starts), each in its own transaction,
+so memory use is bounded and no long-running transaction is needed, even for sensors with years of data.
+Resampling happens either in pandas (using timely-beliefs), or in the database (using time bucketing).
+A checkpoint keeps track of the last committed chunk, so an interrupted run can be resumed.
+
+The sensor's event resolution is only updated once all chunks are resampled.
+Until then, the sensor holds data in both resolutions, so it is best to pause writing data to the sensor.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import os
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+from sqlalchemy import delete, text
+
+from flexmeasures.data import db
+from flexmeasures.data.models.time_series import Sensor, TimedBelief
+from flexmeasures.data.services.ingestion import load_checkpoint, save_checkpoint
+from flexmeasures.data.utils import save_to_db
+
+# Each original event start is mapped to the event start(s) after resampling, along with the knowledge times of both events,
+# which depend on the sensor's knowledge horizon function (see _map_event_starts).
+# Belief times (knowledge time minus belief horizon) are kept, and belief horizons are recomputed for the new knowledge times.
+_RESAMPLED_EVENTS = """WITH resampled_events AS (
+    SELECT * FROM unnest(
+        CAST(:event_starts AS timestamptz[]), CAST(:knowledge_times AS timestamptz[]),
+        CAST(:new_event_starts AS timestamptz[]), CAST(:new_knowledge_times AS timestamptz[])
+    ) AS resampled_events(event_start, knowledge_time, new_event_start, new_knowledge_time)
+)"""
+
+# Downsampled beliefs get the mean value of the beliefs in their bucket (from the same source) with the same belief horizon,
+# i.e. beliefs formed equally long before their event could be known, and the belief time of the most recent of these beliefs.
+_DOWNSAMPLE_BELIEFS = f"""
+CREATE TEMPORARY TABLE resampled_beliefs ON COMMIT DROP AS
+{_RESAMPLED_EVENTS}
+SELECT new_event_start AS event_start, new_knowledge_time - max(knowledge_time - belief_horizon) AS belief_horizon,
+    cumulative_probability, avg(event_value) AS event_value, source_id
+FROM timed_belief JOIN resampled_events USING (event_start)
+WHERE sensor_id = :sensor_id AND event_start >= :lower AND event_start < :upper AND event_start <= :last_event_start
+GROUP BY new_event_start, new_knowledge_time, timed_belief.belief_horizon, cumulative_probability, source_id
+"""
+
+# Upsampled beliefs repeat the value of the original belief (from the same source, with the same belief time).
+_UPSAMPLE_BELIEFS = f"""
+CREATE TEMPORARY TABLE resampled_beliefs ON COMMIT DROP AS
+{_RESAMPLED_EVENTS}
+SELECT new_event_start AS event_start, new_knowledge_time - (knowledge_time - belief_horizon) AS belief_horizon,
+    cumulative_probability, event_value, source_id
+FROM timed_belief JOIN resampled_events USING (event_start)
+WHERE sensor_id = :sensor_id AND event_start >= :lower AND event_start < :upper AND event_start <= :last_event_start
+"""
+
+_EVENT_STARTS = """
+SELECT DISTINCT event_start FROM timed_belief
+WHERE sensor_id = :sensor_id AND event_start >= :lower AND event_start < :upper AND event_start <= :last_event_start
+"""
+
+_COUNT_BELIEFS = """
+SELECT (
+    SELECT count(*) FROM timed_belief
+    WHERE sensor_id = :sensor_id AND event_start >= :lower AND event_start < :upper AND event_start <= :last_event_start
+), (SELECT count(*) FROM resampled_beliefs)
+"""
+
+_INSERT_RESAMPLED_BELIEFS = """
+INSERT INTO timed_belief (event_start, belief_horizon, cumulative_probability, event_value, sensor_id, source_id)
+SELECT event_start, belief_horizon, cumulative_probability, event_value, :sensor_id, source_id
+FROM resampled_beliefs
+"""
+
+_BELIEF_STATISTICS = """
+SELECT count(*), min(event_start), max(event_start), avg(event_value), min(event_value), max(event_value)
+FROM timed_belief
+WHERE sensor_id = :sensor_id AND event_start >= :lower AND event_start < :upper
+"""
+
+
+@dataclass
+class BeliefStatistics:
+    """Summary statistics of the beliefs about a period, to check resampling results without loading them."""
+
+    count: int
+    first_event_start: datetime | None
+    last_event_start: datetime | None
+    mean: float | None
+    min: float | None
+    max: float | None
+
+    def __str__(self) -> str:
+        if self.count == 0:
+            return "no beliefs"
+        return (
+            f"{self.count} beliefs about events from {self.first_event_start} until {self.last_event_start}"
+            f" (mean: {self.mean}, min: {self.min}, max: {self.max})"
+        )
+
+
+@dataclass
+class ResamplingChunk:
+    """Progress information about one resampled chunk."""
+
+    start: datetime
+    end: datetime
+    beliefs_before: int
+    beliefs_after: int
+
+
+def get_belief_statistics(
+    sensor: Sensor, lower: datetime, upper: datetime
+) -> BeliefStatistics:
+    """Compute summary statistics (in the database) of the beliefs about events starting within [lower, upper)."""
+    row = db.session.execute(
+        text(_BELIEF_STATISTICS),
+        dict(sensor_id=sensor.id, lower=lower, upper=upper),
+    ).one()
+    return BeliefStatistics(*row)
+
+
+def get_resampling_period(
+    sensor: Sensor,
+    event_starts_after: datetime | None = None,
+    event_ends_before: datetime | None = None,
+) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+    """Find the first and last event start of the beliefs to be resampled, or None if there are no such beliefs.
+
+    Only events that start after event_starts_after (inclusive) and end before event_ends_before (inclusive) are resampled.
+    """
+    query = "SELECT min(event_start), max(event_start) FROM timed_belief WHERE sensor_id = :sensor_id"
+    params = dict(sensor_id=sensor.id)
+    if event_starts_after is not None:
+        query += " AND event_start >= :lower"
+        params["lower"] = event_starts_after
+    if event_ends_before is not None:
+        query += " AND event_start <= :last_event_start"
+        params["last_event_start"] = event_ends_before - sensor.event_resolution
+    first_event_start, last_event_start = db.session.execute(text(query), params).one()
+    if first_event_start is None:
+        return None
+    return (
+        pd.Timestamp(first_event_start).tz_convert("UTC"),
+        pd.Timestamp(last_event_start).tz_convert("UTC"),
+    )
+
+
+def check_resampling(
+    old_resolution: timedelta,
+    new_resolution: timedelta,
+    chunk: timedelta,
+    in_database: bool = False,
+):
+    """Check that chunks hold whole events in both resolutions, and that in-database resampling is possible.
+
+    :raises ValueError: describing the problem
+    """
+    if chunk <= timedelta(0):
+        raise ValueError("Chunk length should be positive.")
+    for resolution in (old_resolution, new_resolution):
+        if resolution > timedelta(0) and chunk % resolution:
+            raise ValueError(
+                f"Chunk length {chunk} should be a multiple of the event resolution {resolution}."
+            )
+    if in_database:
+        if old_resolution == timedelta(0) or new_resolution == timedelta(0):
+            raise ValueError(
+                "Resampling instantaneous sensor data in the database is not supported."
+            )
+        if max(old_resolution, new_resolution) % min(
+            old_resolution, new_resolution
+        ) != timedelta(0):
+            raise ValueError(
+                f"Resampling in the database requires one resolution to be a multiple of the other, but {old_resolution} and {new_resolution} are not."
+            )
+
+
+def _delete_chunk(params: dict):
+    return delete(TimedBelief).filter(
+        TimedBelief.sensor_id == params["sensor_id"],
+        TimedBelief.event_start >= params["lower"],
+        TimedBelief.event_start < params["upper"],
+        TimedBelief.event_start <= params["last_event_start"],
+    )
+
+
+def _map_event_starts(
+    sensor: Sensor, params: dict, event_resolution: timedelta
+) -> dict | None:
+    """Map the event starts in one chunk to the event starts after resampling, or return None if there are no beliefs.
+
+    Buckets of downsampled events are aligned to the Unix epoch (so to UTC), like the chunks.
+    Knowledge times are computed with the sensor's knowledge horizon function,
+    for the original event resolution and for the new event resolution, respectively.
+    """
+    event_starts = pd.DatetimeIndex(
+        db.session.scalars(text(_EVENT_STARTS), params).all()
+    )
+    if event_starts.empty:
+        return None
+    event_starts = event_starts.tz_convert("UTC").sort_values()
+    old_resolution = sensor.event_resolution
+    if event_resolution > old_resolution:
+        new_event_starts = event_starts.floor(event_resolution)
+    else:
+        factor = old_resolution // event_resolution
+        event_starts = event_starts.repeat(factor)
+        new_event_starts = event_starts + pd.TimedeltaIndex(
+            [k * event_resolution for k in range(factor)]
+            * (len(event_starts) // factor)
+        )
+    knowledge_times = sensor.knowledge_time(event_starts, old_resolution)
+    new_knowledge_times = sensor.knowledge_time(new_event_starts, event_resolution)
+    return dict(
+        event_starts=list(event_starts.to_pydatetime()),
+        knowledge_times=list(pd.DatetimeIndex(knowledge_times).to_pydatetime()),
+        new_event_starts=list(new_event_starts.to_pydatetime()),
+        new_knowledge_times=list(pd.DatetimeIndex(new_knowledge_times).to_pydatetime()),
+    )
+
+
+def _resample_chunk_in_database(
+    sensor: Sensor, params: dict, event_resolution: timedelta
+) -> tuple[int, int]:
+    """Replace the beliefs in one chunk by resampled beliefs, using time bucketing in the database.
+
+    :returns: the number of beliefs before and after resampling
+    """
+    resampled_events = _map_event_starts(sensor, params, event_resolution)
+    if resampled_events is None:
+        return 0, 0
+    db.session.execute(
+        text(
+            _DOWNSAMPLE_BELIEFS
+            if event_resolution > sensor.event_resolution
+            else _UPSAMPLE_BELIEFS
+        ),
+        dict(**params, **resampled_events),
+    )
+    beliefs_before, beliefs_after = db.session.execute(
+        text(_COUNT_BELIEFS), params
+    ).one()
+    db.session.execute(_delete_chunk(params))
+    db.session.execute(text(_INSERT_RESAMPLED_BELIEFS), params)
+    return beliefs_before, beliefs_after
+
+
+def _resample_chunk_in_pandas(
+    sensor: Sensor, params: dict, event_resolution: timedelta
+) -> tuple[int, int]:
+    """Replace the beliefs in one chunk by resampled beliefs, using timely-beliefs.
+
+    :returns: the number of beliefs before and after resampling
+    """
+    bdf = sensor.search_beliefs(
+        most_recent_beliefs_only=False,
+        event_starts_after=params["lower"],
+        event_ends_before=params["upper"] + sensor.event_resolution,
+    )
+    event_starts = bdf.event_starts
+    bdf = bdf[
+        (event_starts < params["upper"]) & (event_starts <= params["last_event_start"])
+    ]
+    if bdf.empty:
+        return 0, 0
+    bdf_resampled = bdf.resample_events(event_resolution)
+    db.session.execute(_delete_chunk(params))
+    # All beliefs in the chunk are replaced, so none of the resampled beliefs should be skipped
+    # (the sensor still has its original resolution, so comparing them to stored beliefs would not work anyway)
+    save_to_db(bdf_resampled, bulk_save_objects=True, save_changed_beliefs_only=False)
+    return len(bdf), len(bdf_resampled)
+
+
+def resample_beliefs_in_chunks(
+    sensor: Sensor,
+    event_resolution: timedelta,
+    first_event_start: datetime,
+    last_event_start: datetime,
+    chunk: timedelta = timedelta(days=7),
+    in_database: bool = False,
+    checkpoint_path: str | None = None,
+    on_chunk_done: Callable[[ResamplingChunk], None] | None = None,
+) -> int:
+    """Resample the beliefs about events starting from first_event_start until last_event_start (inclusive).
+
+    Each chunk is committed separately. The sensor's event resolution is not updated (see the module docstring).
+
+    If a checkpoint path is given, the start of the last committed chunk is stored there after each chunk.
+    When resuming using an existing checkpoint, chunks up to and including the checkpointed chunk are skipped.
+    The checkpoint is removed once all chunks are resampled.
+
+    :param sensor:              the sensor whose beliefs to resample (still set to the original event resolution)
+    :param event_resolution:    the new event resolution
+    :param first_event_start:   resample beliefs about events starting at or after this datetime
+    :param last_event_start:    resample beliefs about events starting at or before this datetime
+    :param chunk:               length of the periods (of event starts) to resample one at a time
+    :param in_database:         if True, resample using time bucketing in the database, rather than in pandas
+    :param checkpoint_path:     optional path to a checkpoint file, to make resampling resumable
+    :param on_chunk_done:       optional callback to report progress after each chunk is committed
+    :returns:                   the number of resampled beliefs saved
+    """
+    old_resolution = sensor.event_resolution
+    check_resampling(old_resolution, event_resolution, chunk, in_database)
+    last_chunk_start = (
+        load_checkpoint(checkpoint_path) if checkpoint_path is not None else None
+    )
+    first_event_start = pd.Timestamp(first_event_start)
+    chunk_start = first_event_start.floor(chunk)
+    if last_chunk_start is not None:
+        chunk_start = max(chunk_start, last_chunk_start + chunk)
+
+    beliefs_saved = 0
+    while chunk_start <= last_event_start:
+        chunk_end = chunk_start + chunk
+        params = dict(
+            sensor_id=sensor.id,
+            lower=max(chunk_start, first_event_start).to_pydatetime(),
+            upper=chunk_end.to_pydatetime(),
+            last_event_start=pd.Timestamp(last_event_start).to_pydatetime(),
+        )
+        if in_database:
+            beliefs_before, beliefs_after = _resample_chunk_in_database(
+                sensor, params, event_resolution
+            )
+        else:
+            beliefs_before, beliefs_after = _resample_chunk_in_pandas(
+                sensor, params, event_resolution
+            )
+        db.session.commit()
+        beliefs_saved += beliefs_after
+        if checkpoint_path is not None:
+            save_checkpoint(checkpoint_path, chunk_start, beliefs_saved)
+        if on_chunk_done is not None:
+            on_chunk_done(
+                ResamplingChunk(
+                    start=params["lower"],
+                    end=min(chunk_end, pd.Timestamp(last_event_start) + old_resolution),
+                    beliefs_before=beliefs_before,
+                    beliefs_after=beliefs_after,
+                )
+            )
+        chunk_start = chunk_end
+    if checkpoint_path is not None and Path(checkpoint_path).exists():
+        os.remove(checkpoint_path)
+    return beliefs_saved
@@ -13,17 +13,21 @@ from typing import Callable, Type
 import inspect
 from copy import deepcopy
 from traceback import print_tb
+import uuid
 
 
 import click
 from flask import current_app
+import isodate
 from isodate import duration_isoformat
 from rq import get_current_job, Callback
 from rq.exceptions import InvalidJobOperation
-from rq.job import Job
+from rq.job import Job, JobStatus
+from marshmallow import ValidationError
 import timely_beliefs as tb
+import numpy as np
 import pandas as pd
-from sqlalchemy import select
+from sqlalchemy import func, select, tuple_
 
 from flexmeasures.data import db
 from flexmeasures.data.models.planning import Scheduler, SchedulerOutputType
@@ -34,7 +38,11 @@ from flexmeasures.data.models.time_series import Sensor, TimedBelief
 from flexmeasures.data.models.generic_assets import GenericAsset as Asset
 from flexmeasures.data.models.data_sources import DataSource
 from flexmeasures.data.schemas.scheduling import MultiSensorFlexModelSchema
-from flexmeasures.data.utils import get_data_source, save_to_db
+from flexmeasures.data.utils import (
+    get_data_source,
+    make_beliefs_frame,
+    save_to_db_in_bulk,
+)
 from flexmeasures.utils.time_utils import server_now
 from flexmeasures.data.services.utils import (
     job_cache,
@@ -499,6 +507,337 @@ def create_simultaneous_scheduling_job(
     return job
 
 
+def _get_batch_key(batch_id: str) -> str:
+    return f"scheduling:batch:{batch_id}"
+
+
+def create_batch_scheduling_jobs(
+    schedule_requests: list[dict],
+    batch_id: str | None = None,
+) -> tuple[str, list[Job | None], dict[int, str | dict]]:
+    """Create one simultaneous scheduling job per asset, and enqueue all new jobs in one go.
+
+    Deserializing the requests with AssetBatchTriggerSchema loads all referenced assets and sensors at once.
+    New jobs are enqueued in one Redis pipeline, which also registers them in the job cache
+    and under the batch id, so all results can be looked up later (see get_batch_job_ids).
+    Requests with an invalid flex-model or flex-context do not stop the other jobs from being enqueued.
+
+    :param schedule_requests:   list of deserialized scheduling requests (see AssetTriggerSchema),
+                                each with an asset, start_of_schedule, duration and optionally a belief_time,
+                                flex_model and flex_context
+    :param batch_id:            optionally, set the batch id explicitly
+    :returns:                   the batch id, the scheduling jobs (in the order of the requests, None for invalid requests)
+                                and the error messages for invalid requests (by their position in the batch)
+    """
+    batch_id = batch_id or str(uuid.uuid4())
+    jobs, new_jobs, errors = [], [], {}
+    for i, schedule_request in enumerate(schedule_requests):
+        asset = schedule_request["asset"]
+        start = schedule_request["start_of_schedule"]
+        try:
+            job = create_simultaneous_scheduling_job(
+                asset=asset,
+                enqueue=False,
+                start=start,
+                end=start + schedule_request["duration"],
+                belief_time=schedule_request.get("belief_time"),
+                flex_model=schedule_request.get("flex_model"),
+                flex_context=schedule_request.get("flex_context"),
+            )
+        except ValidationError as err:
+            errors[i] = err.messages
+            jobs.append(None)
+            continue
+        except ValueError as err:
+            errors[i] = str(err)
+            jobs.append(None)
+            continue
+        jobs.append(job)
+        # Only fresh jobs have no status yet (jobs found in the job cache have been fetched with their status)
+        if not job.get_status(refresh=False):
+            new_jobs.append((asset, job))
+
+    connection = current_app.queues["scheduling"].connection
+    batch_key = _get_batch_key(batch_id)
+    with connection.pipeline() as pipeline:
+        for asset, job in new_jobs:
+            current_app.queues["scheduling"].enqueue_job(job, pipeline=pipeline)
+            current_app.job_cache.add(
+                asset.id,
+                job.id,
+                queue="scheduling",
+                asset_or_sensor_type="asset",
+                pipeline=pipeline,
+            )
+        job_ids = [job.id for job in jobs if job is not None]
+        if job_ids:
+            pipeline.rpush(batch_key, *job_ids)
+            ttl = int(
+                current_app.config.get(
+                    "FLEXMEASURES_PLANNING_TTL", timedelta(-1)
+                ).total_seconds()
+            )
+            if ttl > 0:
+                pipeline.expire(batch_key, ttl)
+        pipeline.execute()
+    return batch_id, jobs, errors
+
+
+def get_batch_job_ids(batch_id: str) -> list[str]:
+    """Look up the ids of the scheduling jobs created for a batch (see create_batch_scheduling_jobs)."""
+    connection = current_app.queues["scheduling"].connection
+    return [
+        job_id.decode() if isinstance(job_id, bytes) else job_id
+        for job_id in connection.lrange(_get_batch_key(batch_id), 0, -1)
+    ]
+
+
+def fetch_scheduling_jobs(job_ids: list[str]) -> list[Job | None]:
+    """Fetch many scheduling jobs with pipelined Redis calls.
+
+    Failed jobs that have a fallback job are replaced by their fallback job.
+
+    :returns: the jobs (in the order of the given ids), with None for jobs that could not be found
+    """
+    connection = current_app.queues["scheduling"].connection
+    jobs = Job.fetch_many(job_ids, connection=connection)
+    fallback_job_ids = {
+        i: job.meta["fallback_job_id"]
+        for i, job in enumerate(jobs)
+        if job is not None
+        and job.get_status(refresh=False) == JobStatus.FAILED
+        and job.meta.get("fallback_job_id") is not None
+    }
+    if fallback_job_ids:
+        fallback_jobs = Job.fetch_many(
+            list(fallback_job_ids.values()), connection=connection
+        )
+        for i, fallback_job in zip(fallback_job_ids.keys(), fallback_jobs):
+            if fallback_job is not None:
+                jobs[i] = fallback_job
+    return jobs
+
+
+def get_scheduled_sensor_ids(job: Job) -> list[int]:
+    """List the ids of the (power) sensors scheduled by a scheduling job."""
+    flex_model = job.kwargs.get("flex_model")
+    if isinstance(flex_model, list):
+        return [
+            sensor_flex_model["sensor"]
+            for sensor_flex_model in flex_model
+            if isinstance(sensor_flex_model.get("sensor"), int)
+        ]
+    return [job.kwargs["asset_or_sensor"]["id"]]
+
+
+SCHEDULE_COLUMNS = ("job", "sensor", "status", "start", "duration", "unit", "values")
+
+
+def _add_schedule_row(
+    schedules: dict[str, list],
+    job_id: str,
+    sensor_id: int | None = None,
+    status: str | None = None,
+    message: str = "",
+    **values,
+):
+    """Add a row to the columnar schedules (see get_schedules_for_jobs)."""
+    schedules["job"].append(job_id)
+    schedules["sensor"].append(sensor_id)
+    schedules["status"].append(status)
+    schedules["message"].append(message)
+    for column in ("start", "duration", "unit", "values"):
+        schedules[column].append(values.get(column))
+
+
+def _find_finished_jobs(
+    job_ids: list[str], jobs: list[Job | None], schedules: dict[str, list]
+) -> list[tuple[str, Job, DataSource, datetime]]:
+    """Add a row for each device of each job that did not (or not yet) result in a schedule.
+
+    :returns: the requested job id, the job, its data source and the start of its schedule, for each finished job
+    """
+    finished = []
+    for job_id, job in zip(job_ids, jobs):
+        if job is None:
+            _add_schedule_row(
+                schedules, job_id, status="UNKNOWN", message="Scheduling job not found."
+            )
+            continue
+        status = job.get_status(refresh=False)
+        status = status.value if status is not None else "unknown"
+        if status != JobStatus.FINISHED.value:
+            for sensor_id in get_scheduled_sensor_ids(job):
+                _add_schedule_row(
+                    schedules,
+                    job_id,
+                    sensor_id,
+                    status.upper(),
+                    f"Scheduling job {status}.",
+                )
+            continue
+        data_source = get_data_source_for_job(job)
+        if data_source is None:
+            for sensor_id in get_scheduled_sensor_ids(job):
+                _add_schedule_row(
+                    schedules,
+                    job_id,
+                    sensor_id,
+                    "UNKNOWN",
+                    "No data source could be found for the scheduling job.",
+                )
+            continue
+        start = job.kwargs["start"]
+        if isinstance(start, str):
+            start = pd.Timestamp(start)
+        finished.append((job_id, job, data_source, start))
+    return finished
+
+
+def _in_schedule_window(
+    event_starts: pd.DatetimeIndex,
+    start: datetime,
+    end: datetime,
+    resolution: timedelta,
+) -> np.ndarray:
+    """Select events within the window, like searching beliefs with event_starts_after=start and event_ends_before=end."""
+    if resolution == timedelta(0):
+        return (event_starts >= start) & (event_starts <= end)
+    return (event_starts > start - resolution) & (event_starts < end)
+
+
+def _load_scheduled_values(
+    finished: list[tuple[str, Job, DataSource, datetime]],
+    sensors: dict[int, Sensor],
+    planning_horizon: timedelta,
+) -> dict[tuple[int, int], pd.Series]:
+    """Load the most recent scheduled values of all devices of the finished jobs, in one query.
+
+    :returns: the scheduled values per sensor and data source, indexed by event start
+    """
+    pairs = {
+        (sensor_id, data_source.id)
+        for _, job, data_source, _ in finished
+        for sensor_id in get_scheduled_sensor_ids(job)
+    }
+    max_resolution = max(sensor.event_resolution for sensor in sensors.values())
+    window_start = min(start for *_, start in finished) - max_resolution
+    window_end = max(start for *_, start in finished) + planning_horizon
+    query = (
+        select(
+            TimedBelief.sensor_id,
+            TimedBelief.source_id,
+            TimedBelief.event_start,
+            TimedBelief.event_value,
+        )
+        .where(
+            tuple_(TimedBelief.sensor_id, TimedBelief.source_id).in_(pairs),
+            TimedBelief.event_start >= window_start,
+            TimedBelief.event_start <= window_end,
+        )
+        .distinct(TimedBelief.sensor_id, TimedBelief.source_id, TimedBelief.event_start)
+        .order_by(
+            TimedBelief.sensor_id,
+            TimedBelief.source_id,
+            TimedBelief.event_start,
+            TimedBelief.belief_horizon,
+            func.abs(TimedBelief.cumulative_probability - 0.5),
+        )
+    )
+    df = pd.DataFrame(
+        db.session.execute(query).all(),
+        columns=["sensor_id", "source_id", "event_start", "event_value"],
+    )
+    return {
+        pair: group.set_index("event_start")["event_value"]
+        for pair, group in df.groupby(["sensor_id", "source_id"])
+    }
+
+
+def get_schedules_for_jobs(
+    job_ids: list[str],
+    jobs: list[Job | None],
+    duration: timedelta,
+) -> dict[str, list]:
+    """Look up the schedules computed by many scheduling jobs, in columnar form.
+
+    The scheduled values for all devices are loaded in one query.
+    Like the GET /sensors/<id>/schedules/<uuid> endpoint, for each device we return the most recent
+    scheduled values, with positive values denoting consumption.
+    Rows always refer to the requested job id, also for jobs that were replaced by their fallback job.
+
+    :param job_ids:     the requested job ids
+    :param jobs:        the corresponding jobs (see fetch_scheduling_jobs)
+    :param duration:    the duration of the schedules to return (limited by FLEXMEASURES_PLANNING_HORIZON)
+    :returns:           dict with one list per column (job, sensor, status, start, duration, unit, values and message),
+                        with one row per scheduled device
+    """
+    planning_horizon = min(
+        duration, current_app.config.get("FLEXMEASURES_PLANNING_HORIZON")
+    )
+    schedules = {column: [] for column in SCHEDULE_COLUMNS + ("message",)}
+    finished = _find_finished_jobs(job_ids, jobs, schedules)
+    if not finished:
+        return schedules
+
+    sensors = {
+        sensor_id: db.session.get(Sensor, sensor_id)
+        for _, job, _, _ in finished
+        for sensor_id in get_scheduled_sensor_ids(job)
+    }
+    scheduled_values = _load_scheduled_values(finished, sensors, planning_horizon)
+    for job_id, job, data_source, start in finished:
+        for sensor_id in get_scheduled_sensor_ids(job):
+            sensor = sensors[sensor_id]
+            resolution = sensor.event_resolution
+            values = scheduled_values.get(
+                (sensor_id, data_source.id), pd.Series(dtype=float)
+            )
+            values = values[
+                _in_schedule_window(
+                    values.index, start, start + planning_horizon, resolution
+                )
+            ]
+            if values.empty:
+                _add_schedule_row(
+                    schedules,
+                    job_id,
+                    sensor_id,
+                    "UNKNOWN",
+                    "The schedule was not found in the database.",
+                )
+                continue
+
+            # For consumption schedules, positive values denote consumption. For the db, consumption is negative
+            sign = 1
+            if sensor.measures_power and sensor.get_attribute(
+                "consumption_is_positive", True
+            ):
+                sign = -1
+
+            # Return consecutive values from the first scheduled event onwards
+            schedule_start = values.index[0]
+            schedule_duration = min(
+                planning_horizon, values.index[-1] + resolution - schedule_start
+            )
+            values = values[
+                schedule_start : schedule_start + schedule_duration - resolution
+            ]
+            scheduler_info = job.meta.get("scheduler_info", dict(scheduler=""))
+            _add_schedule_row(
+                schedules,
+                job_id,
+                sensor_id,
+                "FINISHED",
+                f"{scheduler_info['scheduler']} was used.",
+                start=isodate.datetime_isoformat(schedule_start),
+                duration=duration_isoformat(schedule_duration),
+                unit=sensor.unit,
+                values=(sign * values).tolist(),
+            )
+    return schedules
+
+
 def make_schedule(
     sensor_id: int | None = None,
     start: datetime | None = None,
@@ -608,7 +947,26 @@ def make_schedule(
         rq_job.save_meta()
 
     # Save any result that specifies a sensor to save it to
-    for result in consumption_schedule:
+    save_to_db_in_bulk(
+        schedules_to_beliefs(consumption_schedule, belief_time, data_source)
+    )
+
+    scheduler.persist_flex_model()
+    db.session.commit()
+
+    return True
+
+
+def schedules_to_beliefs(
+    schedules: list[dict], belief_time: datetime, data_source: DataSource
+) -> list[tb.BeliefsDataFrame]:
+    """Turn scheduler results into beliefs, so that all of them can be saved at once.
+
+    Results that do not specify a sensor to save them to are skipped.
+    For consumption schedules, positive values denote consumption. For the db, consumption is negative.
+    """
+    bdfs = []
+    for result in schedules:
         if "sensor" not in result:
             continue
 
@@ -619,23 +977,15 @@ def make_schedule(
         ):
             sign = -1
 
-        ts_value_schedule = [
-            TimedBelief(
-                event_start=dt,
-                belief_time=belief_time,
-                event_value=sign * value,
+        bdfs.append(
+            make_beliefs_frame(
+                sign * result["data"],
                 sensor=result["sensor"],
                 source=data_source,
+                belief_time=belief_time,
             )
-            for dt, value in result["data"].items()
-        ]  # For consumption schedules, positive values denote consumption. For the db, consumption is negative
-        bdf = tb.BeliefsDataFrame(ts_value_schedule)
-        save_to_db(bdf)
-
-    scheduler.persist_flex_model()
-    db.session.commit()
-
-    return True
+        )
+    return bdfs
 
 
 def find_scheduler_class(asset_or_sensor: Asset | Sensor) -> type:
@@ -0,0 +1,301 @@
+"""
+Logic for auditing the query plans of representative belief searches, to check which indexes they use.
+
+Each query shape (e.g. the most recent belief, a window of beliefs, sensor stats or staleness) is run for one sensor,
+while capturing the SQL statements that touch the timed_belief table. Each captured statement is then explained
+(optionally with ANALYZE, which runs it once more), and the plan is logged and summarized by the scans it uses.
+
+To measure the effect of indexes reproducibly, the audit can run on a synthetic dataset (see create_synthetic_sensors),
+for example before and after the migration adding the covering and BRIN indexes.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import statistics
+import time
+from typing import Any, Callable, Iterator
+
+from flask import current_app
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, event, select, text
+
+from flexmeasures.data import db
+from flexmeasures.data.models.generic_assets import GenericAsset, GenericAssetType
+from flexmeasures.data.models.time_series import Sensor, TimedBelief
+from flexmeasures.data.services.data_sources import get_or_create_source
+from flexmeasures.data.services.sensors import _get_sensor_stats, get_stalenesses
+from flexmeasures.data.utils import insert_beliefs_in_bulk
+
+SYNTHETIC_ASSET_NAME = "search benchmark"
+SYNTHETIC_DATA_END = pd.Timestamp("2025-01-01", tz="UTC")
+
+
+@dataclass
+class PlanSummary:
+    """The plan of one SQL statement, with the scans of the timed_belief table (or its partitions) it uses."""
+
+    statement: str
+    plan: dict
+    scans: list[str] = field(default_factory=list)
+
+    @property
+    def planning_time(self) -> float | None:
+        """Planning time in ms."""
+        return self.plan.get("Planning Time")
+
+    @property
+    def execution_time(self) -> float | None:
+        """Execution time in ms (only if the statement was explained with ANALYZE)."""
+        return self.plan.get("Execution Time")
+
+    @property
+    def seq_scans(self) -> list[str]:
+        return [scan for scan in self.scans if scan.startswith("Seq Scan")]
+
+    def format(self) -> str:
+        """Render the plan as an indented tree, like the text format of EXPLAIN."""
+        return "\n".join(_format_plan_node(self.plan["Plan"]))
+
+
+@dataclass
+class SearchAudit:
+    """The duration (median over repeats, in ms) and the plans of one query shape."""
+
+    name: str
+    duration: float
+    plans: list[PlanSummary]
+
+
+def _format_plan_node(node: dict, depth: int = 0) -> list[str]:
+    line = "  " * depth + "-> " + node["Node Type"]
+    if "Index Name" in node:
+        line += f" using {node['Index Name']}"
+    if "Relation Name" in node:
+        line += f" on {node['Relation Name']}"
+    if "Actual Total Time" in node:
+        line += f" (actual time={node['Actual Total Time']:.3f} ms, rows={node['Actual Rows']}, loops={node['Actual Loops']})"
+    else:
+        line += f" (cost={node['Total Cost']}, rows={node['Plan Rows']})"
+    lines = [line]
+    for child in node.get("Plans", []):
+        lines += _format_plan_node(child, depth + 1)
+    return lines
+
+
+def _get_belief_scans(node: dict) -> list[str]:
+    scans = []
+    relation = node.get("Relation Name", "")
+    if relation.startswith(TimedBelief.__tablename__):
+        scan = node["Node Type"]
+        if "Index Name" in node:
+            scan += f" using {node['Index Name']}"
+        scans.append(f"{scan} on {relation}")
+    for child in node.get("Plans", []):
+        scans += _get_belief_scans(child)
+    return scans
+
+
+@contextmanager
+def capture_belief_statements() -> Iterator[list[tuple[str, Any]]]:
+    """Capture the (driver-level) SQL statements and parameters of queries on the timed_belief table."""
+    statements: list[tuple[str, Any]] = []
+
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        if (
+            TimedBelief.__tablename__ in statement
+            and statement.lstrip().upper().startswith(("SELECT", "WITH"))
+        ):
+            statements.append((statement, parameters))
+
+    engine = db.session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def explain_statement(
+    statement: str, parameters: Any, analyze: bool = True
+) -> PlanSummary:
+    """Explain a captured statement. With ANALYZE, the statement is executed (so only pass read-only statements)."""
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    result = (
+        db.session.connection()
+        .exec_driver_sql(f"EXPLAIN ({options}) {statement}", parameters)
+        .scalar()
+    )
+    plan = result[0]
+    return PlanSummary(
+        statement=statement, plan=plan, scans=_get_belief_scans(plan["Plan"])
+    )
+
+
+def get_search_shapes(
+    sensor: Sensor, start: datetime, end: datetime
+) -> dict[str, Callable[[], Any]]:
+    """Representative belief searches for a sensor, with windows of data between start and end."""
+    window = dict(sensors=sensor, event_starts_after=start, event_ends_before=end)
+    return {
+        "most recent belief": lambda: TimedBelief.search(sensor, most_recent_only=True),
+        "window": lambda: TimedBelief.search(**window),
+        "window, all beliefs": lambda: TimedBelief.search(
+            **window, most_recent_beliefs_only=False
+        ),
+        "window, beliefs before": lambda: TimedBelief.search(
+            **window, beliefs_before=start + (end - start) / 2
+        ),
+        "window, ex-ante beliefs": lambda: TimedBelief.search(
+            **window, horizons_at_least=timedelta(0)
+        ),
+        # Bypass the cache of the stats
+        "stats": lambda: _get_sensor_stats.__wrapped__(
+            sensor, end.isoformat(), start.isoformat(), True
+        ),
+        "staleness": lambda: get_stalenesses(sensor, staleness_search={}, now=end),
+    }
+
+
+def audit_searches(
+    sensor: Sensor,
+    window: timedelta = timedelta(days=7),
+    analyze: bool = True,
+    repeat: int = 3,
+) -> list[SearchAudit]:
+    """Time representative searches for a sensor, and explain the statements they run.
+
+    The windows end at the end of the sensor's last event. Plans are logged at info level.
+
+    :param sensor:  the sensor to search
+    :param window:  length of the windows to search
+    :param analyze: if True, explain with ANALYZE (which reruns each statement, to measure its execution time)
+    :param repeat:  number of times to run each search (the median duration is reported)
+    :returns:       an audit per query shape
+    """
+    last_event_start = db.session.execute(
+        select(TimedBelief.event_start)
+        .filter(TimedBelief.sensor_id == sensor.id)
+        .order_by(TimedBelief.event_start.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+    if last_event_start is None:
+        raise ValueError(f"{sensor} has no beliefs to search.")
+    end = pd.Timestamp(last_event_start).tz_convert("UTC") + sensor.event_resolution
+
+    audits = []
+    for name, search in get_search_shapes(sensor, end - window, end).items():
+        durations = []
+        for _ in range(repeat):
+            with capture_belief_statements() as statements:
+                started = time.perf_counter()
+                search()
+                durations.append((time.perf_counter() - started) * 1000)
+        plans = [
+            explain_statement(statement, parameters, analyze=analyze)
+            for statement, parameters in statements
+        ]
+        for plan in plans:
+            current_app.logger.info(
+                f"Query plan for search '{name}' on sensor {sensor.id}:\n{plan.format()}"
+            )
+        audits.append(
+            SearchAudit(name=name, duration=statistics.median(durations), plans=plans)
+        )
+    return audits
+
+
+def get_index_usage() -> list[tuple[str, str, int, str]]:
+    """Return the number of scans and the size of each index on the timed_belief table (and its partitions)."""
+    return db.session.execute(
+        text(
+            "SELECT relname, indexrelname, idx_scan, pg_size_pretty(pg_relation_size(indexrelid))"
+            " FROM pg_stat_user_indexes WHERE relname LIKE :table"
+            " ORDER BY relname, indexrelname"
+        ),
+        dict(table=f"{TimedBelief.__tablename__}%"),
+    ).all()
+
+
+def create_synthetic_sensors(
+    n_sensors: int = 10,
+    days: int = 365,
+    resolution: timedelta = timedelta(minutes=15),
+    horizons: tuple[timedelta, ...] = (
+        timedelta(days=1),
+        timedelta(hours=1),
+        timedelta(0),
+    ),
+    seed: int = 42,
+) -> list[Sensor]:
+    """Create sensors with a reproducible synthetic dataset, for benchmarking searches.
+
+    Each sensor gets a random walk of event values, with forecasts (at each given horizon) that get better
+    as the horizon shrinks. The data ends at a fixed date (SYNTHETIC_DATA_END), and is committed per sensor.
+    Remove the dataset with delete_synthetic_sensors.
+    """
+    asset_type = db.session.execute(
+        select(GenericAssetType).filter_by(name="benchmark")
+    ).scalar_one_or_none()
+    if asset_type is None:
+        asset_type = GenericAssetType(
+            name="benchmark", description="Holds synthetic data."
+        )
+        db.session.add(asset_type)
+    asset = GenericAsset(name=SYNTHETIC_ASSET_NAME, generic_asset_type=asset_type)
+    db.session.add(asset)
+    source = get_or_create_source("FlexMeasures benchmark", source_type="demo script")
+    db.session.flush()
+
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(
+        SYNTHETIC_DATA_END - timedelta(days=days),
+        SYNTHETIC_DATA_END,
+        freq=resolution,
+        inclusive="left",
+    )
+    sensors = []
+    for i in range(n_sensors):
+        sensor = Sensor(
+            name=f"synthetic power {i}",
+            generic_asset=asset,
+            unit="kW",
+            event_resolution=resolution,
+        )
+        db.session.add(sensor)
+        db.session.flush()
+        values = np.cumsum(rng.normal(size=len(index)))
+        for horizon in horizons:
+            noise = rng.normal(size=len(index)) * horizon / timedelta(hours=1)
+            insert_beliefs_in_bulk(
+                pd.DataFrame(
+                    dict(
+                        event_start=index,
+                        horizon_seconds=horizon.total_seconds(),
+                        cumulative_probability=0.5,
+                        event_value=values + noise,
+                        sensor_id=sensor.id,
+                        source_id=source.id,
+                    )
+                ),
+                save_changed_beliefs_only=False,
+            )
+        db.session.commit()
+        sensors.append(sensor)
+
+    # Update the planner statistics, so plans reflect the new data
+    db.session.execute(text(f"ANALYZE {TimedBelief.__tablename__}"))
+    db.session.commit()
+    return sensors
+
+
+def delete_synthetic_sensors(sensors: list[Sensor]):
+    """Delete the synthetic dataset (the asset, its sensors and their beliefs)."""
+    asset_ids = {sensor.generic_asset_id for sensor in sensors}
+    db.session.execute(delete(GenericAsset).filter(GenericAsset.id.in_(asset_ids)))
+    db.session.commit()
@@ -0,0 +1,106 @@
+from datetime import timedelta
+import shutil
+
+import pandas as pd
+import pytest
+
+from flexmeasures.data.models.archive import ArchivedBeliefs
+from flexmeasures.data.services.archiving import archive_beliefs
+from flexmeasures.data.utils import make_beliefs_frame, save_to_db_in_bulk
+
+
+def test_archive_beliefs(
+    app, fresh_db, add_market_prices_fresh_db, setup_sources_fresh_db, tmp_path
+):
+    """Earlier beliefs about old events move to the archive, but are still found by searches that need them."""
+    pytest.importorskip("pyarrow")
+    sensor = add_market_prices_fresh_db["epex_da"]
+    start = pd.Timestamp("2015-01-01", tz="Europe/Amsterdam")
+    end = pd.Timestamp("2015-01-02", tz="Europe/Amsterdam")
+    most_recent_beliefs = sensor.search_beliefs(
+        event_starts_after=start, event_ends_before=end
+    )
+
+    # Add earlier beliefs (with a longer horizon) about the same events
+    save_to_db_in_bulk(
+        make_beliefs_frame(
+            most_recent_beliefs["event_value"].droplevel(
+                ["belief_time", "source", "cumulative_probability"]
+            )
+            + 1,
+            sensor=sensor,
+            source=setup_sources_fresh_db["Seita"],
+            belief_horizon=timedelta(days=1),
+        )
+    )
+    fresh_db.session.commit()
+    all_beliefs = sensor.search_beliefs(
+        event_starts_after=start, event_ends_before=end, most_recent_beliefs_only=False
+    )
+    assert len(all_beliefs) == 2 * len(most_recent_beliefs)
+
+    app.config["FLEXMEASURES_BELIEF_ARCHIVE_PATH"] = str(tmp_path)
+    sensor.attributes["belief_retention_days"] = 90
+    try:
+        archived = archive_beliefs(sensor)
+        assert sum(archived.values()) == len(most_recent_beliefs)
+        assert list(tmp_path.glob(f"sensor_id={sensor.id}/month=2015-01/*.parquet"))
+
+        # Nothing new to archive on the next (incremental) run
+        assert archive_beliefs(sensor) == {}
+        assert fresh_db.session.get(
+            ArchivedBeliefs, (sensor.id, pd.Timestamp("2015-01-01", tz="UTC"))
+        )
+
+        # Searches for the most recent beliefs are unaffected, and other searches include archived beliefs
+        pd.testing.assert_frame_equal(
+            sensor.search_beliefs(event_starts_after=start, event_ends_before=end),
+            most_recent_beliefs,
+        )
+        pd.testing.assert_frame_equal(
+            sensor.search_beliefs(
+                event_starts_after=start,
+                event_ends_before=end,
+                most_recent_beliefs_only=False,
+            ),
+            all_beliefs,
+        )
+        earlier_beliefs = sensor.search_beliefs(
+            event_starts_after=start,
+            event_ends_before=end,
+            horizons_at_least=timedelta(hours=1),
+        )
+        assert len(earlier_beliefs) == len(most_recent_beliefs)
+        assert (
+            earlier_beliefs["event_value"].values
+            == most_recent_beliefs["event_value"].values + 1
+        ).all()
+
+        # Archived events are only found if they end after the window starts and start before the window ends
+        edge_beliefs = sensor.search_beliefs(
+            event_starts_after=start + timedelta(hours=1),
+            event_ends_before=start + timedelta(hours=3),
+            horizons_at_least=timedelta(hours=1),
+        )
+        assert edge_beliefs.event_starts.tolist() == [
+            start + timedelta(hours=1),
+            start + timedelta(hours=2),
+        ]
+
+        # Simulate interrupted runs, which wrote the archive twice, but did not delete the archived beliefs
+        month_path = tmp_path / f"sensor_id={sensor.id}" / "month=2015-01"
+        archive_file = next(month_path.glob("*.parquet"))
+        shutil.copy(archive_file, month_path / f"copy-{archive_file.name}")
+        save_to_db_in_bulk(earlier_beliefs, save_changed_beliefs_only=False)
+        fresh_db.session.commit()
+        pd.testing.assert_frame_equal(
+            sensor.search_beliefs(
+                event_starts_after=start,
+                event_ends_before=end,
+                most_recent_beliefs_only=False,
+                use_latest_version_per_event=False,
+            ),
+            all_beliefs,
+        )
+    finally:
+        app.config["FLEXMEASURES_BELIEF_ARCHIVE_PATH"] = None
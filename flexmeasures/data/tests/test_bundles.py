@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+from flexmeasures import User
+from flexmeasures.data.models.data_sources import DataSource
+from flexmeasures.data.models.time_series import Sensor
+from flexmeasures.data.services.bundles import (
+    IMPORTED_USER_SOURCE_TYPE,
+    export_bundle,
+    import_bundle,
+)
+from flexmeasures.data.services.data_sources import get_or_create_source
+from flexmeasures.data.utils import make_beliefs_frame, save_to_db_in_bulk
+
+
+def test_export_and_import_bundle(
+    fresh_db, add_market_prices_fresh_db, setup_sources_fresh_db, tmp_path
+):
+    """Beliefs of an exported sensor are imported under a new sensor, on a new asset."""
+    pytest.importorskip("pyarrow")
+    sensor = add_market_prices_fresh_db["epex_da"]
+    start = pd.Timestamp("2015-01-01", tz="Europe/Amsterdam")
+    end = pd.Timestamp("2015-01-03", tz="Europe/Amsterdam")
+    beliefs = sensor.search_beliefs(
+        event_starts_after=start, event_ends_before=end, most_recent_beliefs_only=False
+    )
+
+    counts = export_bundle(tmp_path, assets=[], sensors=[sensor], start=start, end=end)
+    assert counts["sensors"] == 1
+    assert counts["beliefs"] == len(beliefs)
+
+    n_sources = len(fresh_db.session.scalars(select(DataSource)).all())
+    new_ids = import_bundle(tmp_path)
+    new_sensor = fresh_db.session.get(Sensor, new_ids["sensors"][sensor.id])
+    assert new_sensor.id != sensor.id
+
+    # Existing sources (without attributes) are reused
+    assert new_ids["sources"]
+    assert all(new_id == old_id for old_id, new_id in new_ids["sources"].items())
+    assert len(fresh_db.session.scalars(select(DataSource)).all()) == n_sources
+    assert new_sensor.generic_asset_id == new_ids["assets"][sensor.generic_asset_id]
+    assert new_sensor.event_resolution == sensor.event_resolution
+    imported_beliefs = new_sensor.search_beliefs(
+        event_starts_after=start, event_ends_before=end, most_recent_beliefs_only=False
+    )
+    pd.testing.assert_series_equal(
+        imported_beliefs["event_value"].reset_index(drop=True),
+        beliefs["event_value"].reset_index(drop=True),
+    )
+    assert (
+        imported_beliefs.index.get_level_values("belief_time")
+        == beliefs.index.get_level_values("belief_time")
+    ).all()
+
+
+def test_import_bundle_with_user_source(
+    fresh_db, add_market_prices_fresh_db, setup_roles_users_fresh_db, tmp_path
+):
+    """Beliefs from users are imported from a source named after the user, which is not linked to any user."""
+    pytest.importorskip("pyarrow")
+    sensor = add_market_prices_fresh_db["epex_da"]
+    user = fresh_db.session.get(User, setup_roles_users_fresh_db["Test Prosumer User"])
+    source = get_or_create_source(user)
+    start = pd.Timestamp("2016-02-01", tz="UTC")
+    save_to_db_in_bulk(
+        make_beliefs_frame(
+            [1.0, 2.0],
+            sensor=sensor,
+            source=source,
+            belief_horizon=timedelta(0),
+            index=pd.date_range(start, periods=2, freq="1h"),
+        )
+    )
+    fresh_db.session.commit()
+
+    export_bundle(
+        tmp_path,
+        assets=[],
+        sensors=[sensor],
+        start=start,
+        end=start + timedelta(hours=2),
+    )
+    new_ids = import_bundle(tmp_path)
+    imported_source = fresh_db.session.get(DataSource, new_ids["sources"][source.id])
+    assert imported_source.id != source.id
+    assert imported_source.type == IMPORTED_USER_SOURCE_TYPE
+    assert imported_source.name == source.name
+    assert imported_source.user is None
+    new_sensor = fresh_db.session.get(Sensor, new_ids["sensors"][sensor.id])
+    imported_beliefs = new_sensor.search_beliefs(
+        event_starts_after=start,
+        event_ends_before=start + timedelta(hours=2),
+        source=imported_source,
+    )
+    assert imported_beliefs["event_value"].tolist() == [1.0, 2.0]
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+import pandas as pd
+
+from flexmeasures.data.models.time_series import TimedBelief
+from flexmeasures.data.services.compaction import (
+    compact_beliefs,
+    get_compaction_progress,
+)
+from flexmeasures.data.utils import make_beliefs_frame, save_to_db_in_bulk
+
+
+def test_compact_beliefs(fresh_db, add_market_prices_fresh_db, setup_sources_fresh_db):
+    """Repeated beliefs are deleted in batches, keeping the first of each repetition."""
+    sensor = add_market_prices_fresh_db["epex_da"]
+    # A period without prices from the fixture (which adds measurements about the first days of 2016)
+    index = pd.date_range("2016-02-01", periods=48, freq="1h", tz="UTC")
+    for horizon, value in [(3, 5.0), (2, 5.0), (1, 6.0), (-1, 6.0)]:
+        save_to_db_in_bulk(
+            make_beliefs_frame(
+                [value] * len(index),
+                sensor=sensor,
+                source=setup_sources_fresh_db["Seita"],
+                belief_horizon=timedelta(hours=horizon),
+                index=index,
+            ),
+            save_changed_beliefs_only=False,
+        )
+    fresh_db.session.commit()
+
+    chunks = []
+    assert compact_beliefs(
+        sensor_ids=[sensor.id],
+        chunk=timedelta(days=1),
+        batch_size=10,
+        pause=0,
+        on_chunk_done=chunks.append,
+    )
+    assert sum(chunk.beliefs_deleted for chunk in chunks) == len(index)
+    assert get_compaction_progress([sensor.id]) is None
+
+    # Only the repeated forecast was deleted (the measurement is compared to earlier measurements only)
+    bdf = TimedBelief.search(
+        sensor,
+        event_starts_after=index[0],
+        event_ends_before=index[-1] + timedelta(hours=1),
+        most_recent_beliefs_only=False,
+    )
+    assert sorted(bdf.belief_horizons.unique()) == [
+        timedelta(hours=-1),
+        timedelta(hours=1),
+        timedelta(hours=3),
+    ]
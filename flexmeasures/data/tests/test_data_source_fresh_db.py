@@ -0,0 +1,37 @@
+from sqlalchemy import event
+
+from flexmeasures.data.services.data_sources import get_cached_source
+from flexmeasures.data.utils import get_data_source
+
+
+def test_data_source_cache(fresh_db):
+    """Data sources are remembered once committed, and forgotten when rolled back or deleted."""
+    key = ("get_data_source", "cached script", None, None, "script")
+    source = get_data_source("cached script")
+    assert get_cached_source(key) is None  # not committed yet
+    fresh_db.session.rollback()
+    assert get_cached_source(key) is None
+
+    source = get_data_source("cached script")
+    fresh_db.session.commit()
+    source_id = source.id
+    fresh_db.session.expunge_all()
+
+    # Look up the data source again, without querying the database
+    statements = []
+
+    def count_statement(*args):
+        statements.append(args)
+
+    event.listen(fresh_db.engine, "before_cursor_execute", count_statement)
+    try:
+        cached_source = get_data_source("cached script")
+    finally:
+        event.remove(fresh_db.engine, "before_cursor_execute", count_statement)
+    assert cached_source.id == source_id
+    assert cached_source.name == "cached script"
+    assert statements == []
+
+    fresh_db.session.delete(cached_source)
+    fresh_db.session.commit()
+    assert get_cached_source(key) is None
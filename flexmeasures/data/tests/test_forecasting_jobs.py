@@ -92,6 +92,75 @@ def test_forecasting_an_hour_of_wind(db, run_as_cli, app, setup_test_data):
     check_aggregate(4, horizon, wind_device_1.id)
 
 
+def test_forecasting_multiple_horizons_in_one_batch_job(
+    db, run_as_cli, app, setup_test_data
+):
+    """Test one batch job for two horizons: one job, which makes forecasts for both horizons."""
+    wind_device_2: Sensor = setup_test_data["wind-asset-2"].sensors[0]
+
+    # Remove each seasonality, so we don't query test data that isn't there
+    wind_device_2.set_attribute("daily_seasonality", False)
+    wind_device_2.set_attribute("weekly_seasonality", False)
+    wind_device_2.set_attribute("yearly_seasonality", False)
+
+    horizons = [timedelta(hours=1), timedelta(hours=6)]
+    jobs = create_forecasting_jobs(
+        start_of_roll=as_server_time(datetime(2015, 1, 1, 6)),
+        end_of_roll=as_server_time(datetime(2015, 1, 1, 7)),
+        horizons=horizons,
+        sensor_id=wind_device_2.id,
+        custom_model_params=custom_model_params(),
+        batch_horizons=True,
+    )
+    assert len(jobs) == 1
+
+    work_on_rq(app.queues["forecasting"], exc_handler=handle_forecasting_exception)
+
+    assert jobs[0].get_status() == "finished"
+    for horizon in horizons:
+        check_aggregate(4, horizon, wind_device_2.id)
+
+
+def test_forecasting_the_same_events_for_multiple_horizons_in_one_batch_job(
+    db, run_as_cli, app, setup_test_data
+):
+    """Test one batch job for two horizons, which makes forecasts about the same events for both horizons."""
+    wind_device_2: Sensor = setup_test_data["wind-asset-2"].sensors[0]
+
+    # Remove each seasonality, so we don't query test data that isn't there
+    wind_device_2.set_attribute("daily_seasonality", False)
+    wind_device_2.set_attribute("weekly_seasonality", False)
+    wind_device_2.set_attribute("yearly_seasonality", False)
+
+    horizons = [timedelta(hours=1), timedelta(hours=6)]
+    start = as_server_time(datetime(2015, 1, 1, 14))
+    end = as_server_time(datetime(2015, 1, 1, 15))
+    jobs = create_forecasting_jobs(
+        start_of_roll=start,
+        end_of_roll=end,
+        horizons=horizons,
+        sensor_id=wind_device_2.id,
+        custom_model_params=custom_model_params(),
+        batch_horizons=True,
+        fixed_event_period=True,
+    )
+    assert len(jobs) == 1
+
+    work_on_rq(app.queues["forecasting"], exc_handler=handle_forecasting_exception)
+
+    assert jobs[0].get_status() == "finished"
+    for horizon in horizons:
+        forecasts = (
+            TimedBelief.query.filter(TimedBelief.sensor_id == wind_device_2.id)
+            .filter(TimedBelief.belief_horizon == horizon)
+            .filter(
+                (TimedBelief.event_start >= start) & (TimedBelief.event_start < end)
+            )
+            .all()
+        )
+        assert len(forecasts) == 4
+
+
 def test_forecasting_two_hours_of_solar_at_edge_of_data_set(
     db, run_as_cli, app, setup_test_data
 ):
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from flexmeasures.data.models.forecasting.series_cache import SeriesCache
+from flexmeasures.data.models.time_series import Sensor, TimedBelief
+from flexmeasures.data.queries.utils import simplify_index
+from flexmeasures.utils.time_utils import as_server_time
+
+
+def test_series_cache_rolls_forward_like_search(db, app, setup_test_data, tmp_path):
+    """Loading a rolling window through the cache gives the same data as searching it directly."""
+    solar_device_1: Sensor = setup_test_data["solar-asset-1"].sensors[0]
+    cache = SeriesCache(str(tmp_path))
+    start = as_server_time(datetime(2015, 1, 1, 0))
+    end = as_server_time(datetime(2015, 1, 1, 12))
+    search_kwargs = dict(
+        sensors=solar_device_1, horizons_at_least=None, horizons_at_most=timedelta(0)
+    )
+
+    for shift in (timedelta(0), timedelta(hours=1)):  # the 2nd run extends the cache
+        df = cache.load(
+            event_starts_after=start + shift,
+            event_ends_before=end + shift,
+            **search_kwargs,
+        )
+        expected = simplify_index(
+            TimedBelief.search(
+                event_starts_after=start + shift,
+                event_ends_before=end + shift,
+                **search_kwargs,
+            )
+        )
+        assert not df.empty
+        assert (df.index == expected.index).all()
+        assert np.allclose(df["event_value"], expected["event_value"])
+
+    assert len(list(tmp_path.glob(f"sensor_{solar_device_1.id}_*.pkl"))) == 1
+    cache.invalidate(solar_device_1.id)
+    assert len(list(tmp_path.glob(f"sensor_{solar_device_1.id}_*.pkl"))) == 0
@@ -0,0 +1,45 @@
+import pandas as pd
+
+from flexmeasures.data.services.ingestion import (
+    load_checkpoint,
+    load_checkpoint_rows,
+    save_checkpoint,
+    split_csv_file,
+)
+
+
+def test_split_csv_file(tmp_path):
+    """Split 10 data rows (after a header) into chunks of at most 4 rows."""
+    csv_path = tmp_path / "data.csv"
+    lines = ["datetime,value"] + [f"2025-01-01T{h:02d}:00+00,{h}" for h in range(10)]
+    csv_path.write_text("\n".join(lines))  # no trailing newline
+    chunk_dir = tmp_path / "chunks"
+    chunk_dir.mkdir()
+
+    chunk_paths = list(split_csv_file(str(csv_path), 4, str(chunk_dir), skiprows=1))
+    chunks = [open(p).read().splitlines() for p in chunk_paths]
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert sum(chunks, []) == lines[1:]
+
+    # Respect the maximum number of rows
+    chunk_paths = list(
+        split_csv_file(str(csv_path), 4, str(chunk_dir), skiprows=1, nrows=5)
+    )
+    assert [len(open(p).read().splitlines()) for p in chunk_paths] == [4, 1]
+
+    # Leave out rows that were already ingested (they still count towards the maximum number of rows)
+    chunk_paths = list(
+        split_csv_file(str(csv_path), 4, str(chunk_dir), skiprows=1, nrows=9, offset=3)
+    )
+    chunks = [open(p).read().splitlines() for p in chunk_paths]
+    assert sum(chunks, []) == lines[4:10]
+
+
+def test_checkpoint_round_trip(tmp_path):
+    checkpoint_path = str(tmp_path / "import.checkpoint")
+    assert load_checkpoint(checkpoint_path) is None
+    last_event_start = pd.Timestamp("2025-01-01T09:00+01:00")
+    assert load_checkpoint_rows(checkpoint_path) == 0
+    save_checkpoint(checkpoint_path, last_event_start, beliefs_saved=10, rows_read=12)
+    assert load_checkpoint(checkpoint_path) == last_event_start
+    assert load_checkpoint_rows(checkpoint_path) == 12
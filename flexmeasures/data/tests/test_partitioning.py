@@ -0,0 +1,116 @@
+from datetime import timedelta
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from flexmeasures.data.models.time_series import TimedBelief
+from flexmeasures.data.services import partitioning
+from flexmeasures.data.services.partitioning import (
+    clear_partition_cache,
+    ensure_belief_partitions,
+    get_belief_partitions,
+    get_month_starts,
+    partition_timed_belief_table,
+)
+from flexmeasures.data.utils import make_beliefs_frame, save_to_db_in_bulk
+
+
+def test_get_month_starts():
+    """Months are in UTC, so a local new year's day starts in the last month of the previous year."""
+    month_starts = get_month_starts(
+        pd.Timestamp("2015-01-01", tz="Europe/Amsterdam"),
+        pd.Timestamp("2015-03-01T00:00", tz="UTC"),
+    )
+    assert month_starts.tolist() == [
+        pd.Timestamp("2014-12-01", tz="UTC"),
+        pd.Timestamp("2015-01-01", tz="UTC"),
+        pd.Timestamp("2015-02-01", tz="UTC"),
+        pd.Timestamp("2015-03-01", tz="UTC"),
+    ]
+
+
+def test_partition_timed_belief_table(
+    fresh_db, add_market_prices_fresh_db, setup_sources_fresh_db
+):
+    sensor = add_market_prices_fresh_db["epex_da"]
+    start = pd.Timestamp("2015-01-01", tz="Europe/Amsterdam")
+    end = pd.Timestamp("2015-01-04", tz="Europe/Amsterdam")
+    bdf_before = TimedBelief.search(
+        sensor, event_starts_after=start, event_ends_before=end
+    )
+    # The window may also be given as ISO strings
+    pd.testing.assert_frame_equal(
+        TimedBelief.search(
+            sensor,
+            event_starts_after=start.isoformat(),
+            event_ends_before=end.isoformat(),
+        ),
+        bdf_before,
+    )
+    try:
+        partitions = partition_timed_belief_table(
+            months_ahead=0, drop_unpartitioned=True
+        )
+        assert "timed_belief_y2014m12" in partitions
+        assert "timed_belief_y2015m01" in partitions
+
+        # Saving beliefs about a month without a partition creates it
+        event_start = pd.Timestamp("2035-06-15T12:00", tz="UTC")
+        save_to_db_in_bulk(
+            make_beliefs_frame(
+                [1.0],
+                sensor=sensor,
+                source=setup_sources_fresh_db["Seita"],
+                belief_horizon=timedelta(0),
+                index=pd.DatetimeIndex([event_start]),
+            )
+        )
+        fresh_db.session.commit()
+        assert "timed_belief_y2035m06" in get_belief_partitions()
+        assert (
+            fresh_db.session.execute(
+                text("SELECT count(*) FROM timed_belief_default")
+            ).scalar()
+            == 0
+        )
+
+        # Searches find the same beliefs as before
+        bdf_after = TimedBelief.search(
+            sensor, event_starts_after=start, event_ends_before=end
+        )
+        pd.testing.assert_frame_equal(bdf_after, bdf_before)
+        assert len(TimedBelief.search(sensor, event_starts_after=event_start)) == 1
+    finally:
+        clear_partition_cache()
+
+
+def test_failed_partition_creation_is_remembered(app, monkeypatch):
+    """After failing to create a partition, saving beliefs does not wait for its creation again for a while."""
+    attempts = []
+
+    def create_belief_partitions(start, end):
+        attempts.append(start)
+        raise DBAPIError("CREATE TABLE", {}, Exception("lock timeout"))
+
+    monkeypatch.setattr(partitioning, "is_partitioned", lambda: True)
+    monkeypatch.setattr(
+        partitioning, "create_belief_partitions", create_belief_partitions
+    )
+    june = pd.DatetimeIndex([pd.Timestamp("2035-06-15T12:00", tz="UTC")])
+    july = pd.DatetimeIndex([pd.Timestamp("2035-07-15T12:00", tz="UTC")])
+    try:
+        ensure_belief_partitions(june)
+        ensure_belief_partitions(june)
+        assert len(attempts) == 1
+
+        # Other partitions are still attempted
+        ensure_belief_partitions(july)
+        assert len(attempts) == 2
+
+        # Attempt again once the partitioning state expires
+        monkeypatch.setattr(partitioning, "PARTITIONING_STATE_TTL", 0)
+        ensure_belief_partitions(june)
+        assert len(attempts) == 3
+    finally:
+        clear_partition_cache()
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from flexmeasures.data.services.reporting import (
+    get_report_stages,
+    get_report_windows,
+)
+
+
+def test_get_report_windows():
+    """Windows are aligned to local midnight, so only the first and last window are shorter."""
+    start = pd.Timestamp("2025-01-01T18:00", tz="Europe/Amsterdam")
+    end = pd.Timestamp("2025-01-03T06:00", tz="Europe/Amsterdam")
+    windows = get_report_windows(start, end, timedelta(days=1))
+    assert windows == [
+        (start, pd.Timestamp("2025-01-02T00:00", tz="Europe/Amsterdam")),
+        (
+            pd.Timestamp("2025-01-02T00:00", tz="Europe/Amsterdam"),
+            pd.Timestamp("2025-01-03T00:00", tz="Europe/Amsterdam"),
+        ),
+        (pd.Timestamp("2025-01-03T00:00", tz="Europe/Amsterdam"), end),
+    ]
+
+    # A period within a single window
+    assert get_report_windows(start, start + timedelta(hours=1), timedelta(days=1)) == [
+        (start, start + timedelta(hours=1))
+    ]
+
+    with pytest.raises(ValueError):
+        get_report_windows(start, end, timedelta(0))
+
+
+def test_get_report_stages():
+    """Report 1 reads the output of report 0, so it comes in a later stage than reports 0 and 2."""
+    configs = [{}, {}, {"consumption_price_sensor": 3}]
+    parameters = [
+        dict(input=[dict(sensor=1), dict(sensor=2)], output=[dict(sensor=10)]),
+        dict(input=[dict(sensor=10)], output=[dict(sensor=11)]),
+        dict(input=[dict(sensor=1)], output=[dict(sensor=12)]),
+    ]
+    assert get_report_stages(configs, parameters) == [[0, 2], [1]]
+
+    # A report whose price sensor is the output of another report
+    configs[2]["consumption_price_sensor"] = 11
+    assert get_report_stages(configs, parameters) == [[0], [1], [2]]
+
+    # Reports reading each other's output
+    parameters[0]["input"].append(dict(sensor=11))
+    with pytest.raises(ValueError):
+        get_report_stages(configs, parameters)
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from flexmeasures.data.models.time_series import Sensor
+from flexmeasures.data.services.search_audit import (
+    audit_searches,
+    create_synthetic_sensors,
+    delete_synthetic_sensors,
+)
+
+
+def test_audit_searches_on_synthetic_data(fresh_db):
+    """Each query shape is timed, and the statements it runs on the timed_belief table are explained."""
+    sensors = create_synthetic_sensors(n_sensors=2, days=3)
+    sensor_ids = [sensor.id for sensor in sensors]
+    assert len(sensors[0].search_beliefs(most_recent_beliefs_only=False)) == 3 * 96 * 3
+
+    audits = audit_searches(sensors[0], window=timedelta(days=1), repeat=1)
+    assert [audit.name for audit in audits] == [
+        "most recent belief",
+        "window",
+        "window, all beliefs",
+        "window, beliefs before",
+        "window, ex-ante beliefs",
+        "stats",
+        "staleness",
+    ]
+    for audit in audits:
+        assert audit.plans
+        assert all(plan.execution_time is not None for plan in audit.plans)
+        assert any(plan.scans for plan in audit.plans)
+
+    delete_synthetic_sensors(sensors)
+    assert not fresh_db.session.scalars(
+        select(Sensor).filter(Sensor.id.in_(sensor_ids))
+    ).all()
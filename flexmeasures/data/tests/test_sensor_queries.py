@@ -1,6 +1,8 @@
 import pytest
+from sqlalchemy import delete
 
 from flexmeasures.data.models.time_series import Sensor
+from flexmeasures.data.queries.sensors import query_sensors_by_proximity
 
 
 @pytest.mark.parametrize("n", [1, 3])
@@ -41,3 +43,67 @@ def test_closest_sensor(run_as_cli, add_nearby_weather_sensors, n):
                 sensor.generic_asset.generic_asset_type.name
                 == wind_sensor.generic_asset.generic_asset_type.name
             )
+
+
+def test_closest_sensor_after_moving_asset(db, run_as_cli, add_nearby_weather_sensors):
+    """Check that the remembered closest sensor is forgotten once another asset moves closer."""
+    wind_sensor = add_nearby_weather_sensors["wind"]
+    farther_sensor = add_nearby_weather_sensors["farther_temperature"]
+    search_kwargs = dict(
+        generic_asset_type_name=wind_sensor.generic_asset.generic_asset_type.name,
+        sensor_name="temperature",
+        latitude=wind_sensor.generic_asset.latitude,
+        longitude=wind_sensor.generic_asset.longitude,
+    )
+    closest_sensor = Sensor.find_closest(**search_kwargs)
+    assert closest_sensor != farther_sensor
+
+    # Move the farther asset to the exact location of the wind asset, and the closest one away
+    closest_sensor.generic_asset.latitude += 1
+    farther_sensor.generic_asset.latitude = wind_sensor.generic_asset.latitude
+    farther_sensor.generic_asset.longitude = wind_sensor.generic_asset.longitude
+    db.session.flush()
+    assert Sensor.find_closest(**search_kwargs) == farther_sensor
+
+
+def test_sensors_by_proximity_within_max_distance(
+    db, run_as_cli, add_nearby_weather_sensors
+):
+    """Check that a maximum distance excludes sensors that are farther away."""
+    wind_sensor = add_nearby_weather_sensors["wind"]
+    query = query_sensors_by_proximity(
+        latitude=wind_sensor.generic_asset.latitude,
+        longitude=wind_sensor.generic_asset.longitude,
+        generic_asset_type_name=wind_sensor.generic_asset.generic_asset_type.name,
+        sensor_name="temperature",
+        max_distance=1,  # metres
+    )
+    sensors = db.session.scalars(query).all()
+    assert len(sensors) == 1
+    assert sensors[0].location == wind_sensor.generic_asset.location
+
+
+def test_closest_sensors_after_deleting_sensors(
+    db, run_as_cli, add_nearby_weather_sensors
+):
+    """Check that deleted sensors are no longer found, also if the remembered closest sensors were not forgotten."""
+    wind_sensor = add_nearby_weather_sensors["wind"]
+    farther_sensor = add_nearby_weather_sensors["farther_temperature"]
+    even_farther_sensor = add_nearby_weather_sensors["even_farther_temperature"]
+    search_kwargs = dict(
+        generic_asset_type_name=wind_sensor.generic_asset.generic_asset_type.name,
+        sensor_name="temperature",
+        n=3,
+        latitude=wind_sensor.generic_asset.latitude,
+        longitude=wind_sensor.generic_asset.longitude,
+    )
+    assert even_farther_sensor in Sensor.find_closest(**search_kwargs)
+    db.session.delete(even_farther_sensor)
+    db.session.flush()
+    assert even_farther_sensor not in Sensor.find_closest(**search_kwargs)
+
+    # Deleting in bulk skips the ORM events, like deleting the sensor from another process would
+    db.session.execute(delete(Sensor).filter_by(id=farther_sensor.id))
+    closest_sensors = Sensor.find_closest(**search_kwargs)
+    assert None not in closest_sensors
+    assert farther_sensor not in closest_sensors
@@ -1,7 +1,11 @@
 import pandas as pd
 from timely_beliefs import utils as tb_utils
 
-from flexmeasures.data.utils import save_to_db
+from flexmeasures.data.utils import (
+    make_beliefs_frame,
+    save_to_db,
+    save_to_db_in_bulk,
+)
 from flexmeasures.data.models.data_sources import DataSource
 from flexmeasures.tests.utils import get_test_sensor
 
@@ -37,6 +41,41 @@ def test_drop_unchanged_beliefs(setup_beliefs, db):
     assert list(bdf.belief_times) == list(belief_times_before)
 
 
+def test_save_to_db_in_bulk_drops_unchanged_beliefs(setup_beliefs, db):
+    """Saving beliefs in bulk should skip unchanged beliefs in the database, just like save_to_db."""
+
+    sensor = get_test_sensor(db)
+    bdf = sensor.search_beliefs(most_recent_beliefs_only=False)
+    num_beliefs_before = len(bdf)
+    belief_times_before = bdf.belief_times
+
+    # Storing all existing beliefs verbatim, or with their belief time updated, should save nothing new
+    assert save_to_db_in_bulk(bdf) == "success_but_nothing_new"
+    bdf = tb_utils.replace_multi_index_level(
+        bdf, "belief_time", bdf.belief_times + pd.Timedelta("1h")
+    )
+    assert save_to_db_in_bulk(bdf) == "success_but_nothing_new"
+    bdf = sensor.search_beliefs(most_recent_beliefs_only=False)
+    assert len(bdf) == num_beliefs_before
+    assert list(bdf.belief_times) == list(belief_times_before)
+
+    # Storing new values from an array should save all of them
+    source = DataSource(name="Seita", type="scheduler")
+    event_starts = pd.date_range(
+        "2021-03-29 00:00+00:00", periods=4, freq=sensor.event_resolution
+    )
+    new_bdf = make_beliefs_frame(
+        [1.0, 2.0, 3.0, 4.0],
+        sensor=sensor,
+        source=source,
+        belief_time=pd.Timestamp("2021-03-28 00:00+00:00"),
+        index=event_starts,
+    )
+    assert save_to_db_in_bulk(new_bdf) == "success"
+    bdf = sensor.search_beliefs(most_recent_beliefs_only=False)
+    assert len(bdf) == num_beliefs_before + 4
+
+
 def test_do_not_drop_beliefs_copied_by_another_source(setup_beliefs, db):
     """Trying to copy beliefs from one source to another should double the number of beliefs."""
 
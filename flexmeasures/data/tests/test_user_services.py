@@ -2,7 +2,13 @@ import pytest
 from sqlalchemy import select, func
 
 from flexmeasures.data.models.audit_log import AuditLog
-from flexmeasures.data.models.user import User, Role
+from flexmeasures.data.models.user import (
+    User,
+    Role,
+    remember_last_seen,
+    flush_last_seen,
+    LAST_SEEN_FLUSH_LOCK_KEY,
+)
 from flexmeasures.data.services.users import (
     create_user,
     find_user_by_email,
@@ -190,3 +196,33 @@ def test_delete_user(fresh_db, setup_roles_users_fresh_db, setup_assets_fresh_db
 
     fresh_db.session.refresh(user_creation_audit_log)
     assert user_creation_audit_log.affected_user_id is None
+
+
+def test_last_seen_is_buffered(fresh_db, app, setup_roles_users_fresh_db):
+    """Check that last seen times are written to the database in batches."""
+    user = fresh_db.session.get(User, setup_roles_users_fresh_db["Test Prosumer User"])
+    other_user = fresh_db.session.get(
+        User, setup_roles_users_fresh_db["Test Prosumer User 2"]
+    )
+    user.last_seen_at = None
+    other_user.last_seen_at = None
+    fresh_db.session.flush()
+
+    # The first request in a granularity period flushes the buffer
+    app.redis_connection.delete(LAST_SEEN_FLUSH_LOCK_KEY)
+    remember_last_seen(user)
+    assert user.last_seen_at is not None
+    first_seen = user.last_seen_at
+
+    # Later requests in the same period are only buffered
+    remember_last_seen(user)
+    remember_last_seen(other_user)
+    assert user.last_seen_at == first_seen
+    assert other_user.last_seen_at is None
+
+    assert flush_last_seen() == 2
+    fresh_db.session.refresh(user)
+    fresh_db.session.refresh(other_user)
+    assert user.last_seen_at > first_seen
+    assert other_user.last_seen_at is not None
+    assert flush_last_seen() == 0
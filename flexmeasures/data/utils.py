@@ -4,13 +4,23 @@ Utils around the data models and db sessions
 
 from __future__ import annotations
 
+from datetime import datetime, timedelta
+
 from flask import current_app
+import numpy as np
+import pandas as pd
 from timely_beliefs import BeliefsDataFrame, BeliefsSeries
-from sqlalchemy import select
+from sqlalchemy import select, text
 
 from flexmeasures.data import db
 from flexmeasures.data.models.data_sources import DataSource
 from flexmeasures.data.models.time_series import TimedBelief, Sensor
+from flexmeasures.data.services.data_sources import (
+    get_cached_source,
+    lock_source_creation,
+    remember_source,
+)
+from flexmeasures.data.services.partitioning import ensure_belief_partitions
 from flexmeasures.data.services.time_series import drop_unchanged_beliefs
 
 
@@ -31,16 +41,31 @@ def get_data_source(
 ) -> DataSource:
     """Make sure we have a data source. Create one if it doesn't exist, and add to session.
     Meant for scripts that may run for the first time.
+
+    Data sources found before are remembered for the lifetime of the process (see get_cached_source).
     """
+    key = (
+        "get_data_source",
+        data_source_name,
+        data_source_model,
+        data_source_version,
+        data_source_type,
+    )
+    data_source = get_cached_source(key)
+    if data_source is not None:
+        return data_source
 
-    data_source = db.session.execute(
-        select(DataSource).filter_by(
-            name=data_source_name,
-            model=data_source_model,
-            version=data_source_version,
-            type=data_source_type,
-        )
-    ).scalar_one_or_none()
+    query = select(DataSource).filter_by(
+        name=data_source_name,
+        model=data_source_model,
+        version=data_source_version,
+        type=data_source_type,
+    )
+    data_source = db.session.execute(query).scalar_one_or_none()
+    if data_source is None:
+        # Look again, after waiting for any concurrent creation of the same source
+        lock_source_creation(key)
+        data_source = db.session.execute(query).scalar_one_or_none()
     if data_source is None:
         data_source = DataSource(
             name=data_source_name,
@@ -53,6 +78,7 @@ def get_data_source(
         current_app.logger.info(
             f'Session updated with new {data_source_type} data source "{data_source.__repr__()}".'
         )
+    remember_source(key, data_source)
     return data_source
 
 
@@ -133,6 +159,7 @@ def save_to_db(
                 continue
 
         current_app.logger.info("SAVING TO DB...")
+        ensure_belief_partitions(timed_values.event_starts)
         TimedBelief.add_to_session(
             session=db.session,
             beliefs_data_frame=timed_values,
@@ -150,6 +177,217 @@ def save_to_db(
     return status
 
 
+# Maximum number of beliefs inserted per statement by save_to_db_in_bulk
+BULK_INSERT_CHUNK_SIZE = 10_000
+
+# Insert beliefs from arrays, skipping (unless :changed_only is false) beliefs whose values equal
+# those of the most recent earlier (or simultaneous) belief about the same event from the same source.
+# For the same event, an earlier belief time means a larger belief horizon.
+# A belief that is saved again (same belief time) is therefore skipped if its value is unchanged.
+# Ex-ante beliefs (positive horizon) and ex-post beliefs are compared separately.
+# A probabilistic belief is saved as a whole if any of its cumulative probabilities changed.
+_BULK_INSERT_BELIEFS = """
+WITH new AS (
+    SELECT u.event_start, make_interval(secs => u.horizon_seconds) AS belief_horizon,
+        u.cumulative_probability, u.event_value, u.sensor_id, u.source_id
+    FROM unnest(
+        CAST(:event_starts AS timestamptz[]),
+        CAST(:horizon_seconds AS float8[]),
+        CAST(:cumulative_probabilities AS float8[]),
+        CAST(:event_values AS float8[]),
+        CAST(:sensor_ids AS integer[]),
+        CAST(:source_ids AS integer[])
+    ) AS u(event_start, horizon_seconds, cumulative_probability, event_value, sensor_id, source_id)
+), flagged AS (
+    SELECT new.*, :changed_only AND EXISTS (
+        SELECT 1 FROM timed_belief AS old
+        WHERE old.sensor_id = new.sensor_id
+            AND old.source_id = new.source_id
+            AND old.event_start = new.event_start
+            AND old.cumulative_probability = new.cumulative_probability
+            AND old.event_value = new.event_value
+            AND old.belief_horizon = (
+                SELECT min(prev.belief_horizon) FROM timed_belief AS prev
+                WHERE prev.sensor_id = new.sensor_id
+                    AND prev.source_id = new.source_id
+                    AND prev.event_start = new.event_start
+                    AND prev.belief_horizon >= new.belief_horizon
+                    AND (prev.belief_horizon > interval '0') = (new.belief_horizon > interval '0')
+            )
+    ) AS unchanged
+    FROM new
+)
+INSERT INTO timed_belief (event_start, belief_horizon, cumulative_probability, event_value, sensor_id, source_id)
+SELECT event_start, belief_horizon, cumulative_probability, event_value, sensor_id, source_id
+FROM (
+    SELECT flagged.*, bool_and(unchanged) OVER (
+        PARTITION BY sensor_id, source_id, event_start, belief_horizon
+    ) AS belief_unchanged
+    FROM flagged
+) AS candidates
+WHERE NOT belief_unchanged
+"""
+_ON_CONFLICT_OVERWRITE = """
+ON CONFLICT (event_start, belief_horizon, cumulative_probability, sensor_id, source_id)
+DO UPDATE SET event_value = EXCLUDED.event_value
+"""
+
+
+def make_beliefs_frame(
+    values: pd.Series | np.ndarray | list[float],
+    sensor: Sensor,
+    source: DataSource,
+    belief_time: datetime | None = None,
+    belief_horizon: timedelta | None = None,
+    index: pd.DatetimeIndex | None = None,
+) -> BeliefsDataFrame:
+    """Create a BeliefsDataFrame directly from an array of values, without creating TimedBelief objects.
+
+    :param values:          event values, either as a Series indexed by event start, or as an array (then also pass an index)
+    :param sensor:          sensor to which the beliefs belong
+    :param source:          source of the beliefs
+    :param belief_time:     time at which all beliefs were formed (pass either this or a belief horizon)
+    :param belief_horizon:  belief horizon of all beliefs
+    :param index:           event starts (only needed if the values are not a Series)
+    """
+    if isinstance(values, pd.Series):
+        # Drop any metadata, e.g. of a BeliefsSeries, which BeliefsDataFrame would not accept
+        values = pd.Series(values.to_numpy(), index=values.index)
+    else:
+        values = pd.Series(values, index=index)
+    values = values.rename("event_value").rename_axis("event_start")
+    belief_timing = (
+        dict(belief_time=belief_time)
+        if belief_time is not None
+        else dict(belief_horizon=belief_horizon)
+    )
+    return BeliefsDataFrame(values, sensor=sensor, source=source, **belief_timing)
+
+
+def save_to_db_in_bulk(
+    data: BeliefsDataFrame | BeliefsSeries | list[BeliefsDataFrame | BeliefsSeries],
+    save_changed_beliefs_only: bool = True,
+) -> str:
+    """Save the timed beliefs to the database, with a bulk insert from arrays.
+
+    Meant for data generator outputs (schedules, forecasts and reports), this is a faster alternative to save_to_db,
+    as no TimedBelief objects are created, and unchanged beliefs are filtered out in the database itself.
+    Unlike save_to_db, each belief is compared to the most recent earlier belief about the same event, from the same source.
+
+    Note: This function does not commit.
+
+    :param data:                        BeliefsDataFrame (or a list thereof) to be saved
+    :param save_changed_beliefs_only:   if True, unchanged beliefs are skipped
+    :returns: status string, one of 'success', 'success_with_unchanged_beliefs_skipped' or 'success_but_nothing_new'
+    """
+    if not isinstance(data, list):
+        data = [data]
+
+    # Make sure sources (and any other pending objects) have been flushed
+    for bdf in data:
+        for source in bdf.index.get_level_values("source").unique():
+            if source.id is None:
+                db.session.add(source)
+    db.session.flush()
+
+    frames = []
+    for bdf in data:
+        if isinstance(bdf, BeliefsSeries):
+            bdf = bdf.rename("event_value").to_frame()
+        bdf = bdf.dropna(subset=["event_value"])
+        if bdf.empty:
+            continue
+        if "belief_time" in bdf.index.names:
+            bdf = bdf.convert_index_from_belief_time_to_horizon()
+        df = pd.DataFrame(bdf.reset_index())
+        frames.append(
+            pd.DataFrame(
+                dict(
+                    event_start=pd.DatetimeIndex(df["event_start"]).tz_convert("UTC"),
+                    horizon_seconds=pd.to_timedelta(
+                        df["belief_horizon"]
+                    ).dt.total_seconds(),
+                    cumulative_probability=df["cumulative_probability"].astype(float),
+                    event_value=df["event_value"].astype(float),
+                    sensor_id=bdf.sensor.id,
+                    source_id=[source.id for source in df["source"]],
+                )
+            )
+        )
+    if not frames:
+        return "success_but_nothing_new"
+    df = pd.concat(frames, ignore_index=True)
+    n_beliefs = len(df)
+
+    if save_changed_beliefs_only:
+        # Remove unchanged beliefs from within the new data itself (keeping the earliest belief)
+        df = df.sort_values("horizon_seconds", ascending=False)
+        is_repeated = df.assign(is_ex_ante=df["horizon_seconds"] > 0).duplicated(
+            [
+                "event_start",
+                "sensor_id",
+                "source_id",
+                "cumulative_probability",
+                "event_value",
+                "is_ex_ante",
+            ]
+        )
+        is_unchanged_belief = is_repeated.groupby(
+            [
+                df["event_start"],
+                df["sensor_id"],
+                df["source_id"],
+                df["horizon_seconds"],
+            ]
+        ).transform("all")
+        df = df[~is_unchanged_belief]
+
+    values_saved = insert_beliefs_in_bulk(df, save_changed_beliefs_only)
+    if values_saved == 0:
+        return "success_but_nothing_new"
+    elif values_saved < n_beliefs:
+        return "success_with_unchanged_beliefs_skipped"
+    return "success"
+
+
+def insert_beliefs_in_bulk(
+    df: pd.DataFrame, save_changed_beliefs_only: bool = True
+) -> int:
+    """Insert beliefs from a frame with the columns of the timed_belief table, in chunks of BULK_INSERT_CHUNK_SIZE.
+
+    Belief horizons are given in seconds (column horizon_seconds), and event starts should be timezone-aware.
+
+    Note: This function does not commit.
+
+    :param df:                          frame with columns event_start, horizon_seconds, cumulative_probability,
+                                        event_value, sensor_id and source_id
+    :param save_changed_beliefs_only:   if True, beliefs that are unchanged with respect to the database are skipped
+    :returns:                           the number of inserted (or, if overwriting data is allowed, updated) beliefs
+    """
+    ensure_belief_partitions(pd.DatetimeIndex(df["event_start"]))
+    statement = _BULK_INSERT_BELIEFS
+    if current_app.config.get("FLEXMEASURES_ALLOW_DATA_OVERWRITE", False):
+        statement += _ON_CONFLICT_OVERWRITE
+    statement = text(statement)
+    values_saved = 0
+    for i in range(0, len(df), BULK_INSERT_CHUNK_SIZE):
+        chunk = df.iloc[i : i + BULK_INSERT_CHUNK_SIZE]
+        result = db.session.execute(
+            statement,
+            dict(
+                event_starts=list(chunk["event_start"].dt.to_pydatetime()),
+                horizon_seconds=chunk["horizon_seconds"].tolist(),
+                cumulative_probabilities=chunk["cumulative_probability"].tolist(),
+                event_values=chunk["event_value"].tolist(),
+                sensor_ids=chunk["sensor_id"].tolist(),
+                source_ids=chunk["source_id"].tolist(),
+                changed_only=save_changed_beliefs_only,
+            ),
+        )
+        values_saved += result.rowcount
+    return values_saved
+
+
 def get_downsample_function_and_value(
     kpi: dict, sensor: Sensor, sensor_stats: dict
 ) -> tuple:
@@ -19,8 +19,55 @@ from pkg_resources import get_distribution
 
 from flexmeasures.app import create as create_app
 
+# CLI command groups which only work with data (and job queues), and therefore do not need the web stack
+DATA_ONLY_CLI_GROUPS = (
+    "add",
+    "db",
+    "db-ops",
+    "delete",
+    "edit",
+    "jobs",
+    "monitor",
+    "show",
+)
+# options of the Flask CLI which take a value (which should not be mistaken for a command)
+FLASK_CLI_OPTIONS_WITH_VALUE = ("-e", "--env-file", "-A", "--app")
+
+
+def is_data_only_cli_command(argv: list[str] | None = None) -> bool:
+    """
+    True if the given command line (by default, the current one) invokes a data-only CLI command group,
+    like `flexmeasures add beliefs` or `flexmeasures jobs run-worker`.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    skip_next = False
+    for arg in argv:
+        if skip_next:
+            skip_next = False
+            continue
+        if arg in FLASK_CLI_OPTIONS_WITH_VALUE:
+            skip_next = True
+            continue
+        if arg.startswith("-"):
+            continue
+        # the first argument which is not an option is the command group
+        return arg in DATA_ONLY_CLI_GROUPS
+    return False
+
+
+def create_cli_app() -> Flask:
+    """
+    Create the app for the FlexMeasures CLI.
+
+    Data-only commands (which are often run from cron, or as long-running workers) get a data-only app,
+    which starts faster and takes less memory. Other commands (e.g. `flexmeasures run` or `flexmeasures routes`)
+    get the full app.
+    """
+    return create_app(data_only=is_data_only_cli_command())
+
 
-@click.group(cls=FlaskGroup, create_app=create_app)
+@click.group(cls=FlaskGroup, create_app=create_cli_app)
 @with_appcontext
 def flexmeasures_cli():
     """
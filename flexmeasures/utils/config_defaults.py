@@ -102,6 +102,9 @@ class Config(object):
     # you probably want to adjust this.
     FLEXMEASURES_SENTRY_CONFIG: dict = dict(traces_sample_rate=0.33)
     FLEXMEASURES_MONITORING_MAIL_RECIPIENTS: list[str] = []
+    FLEXMEASURES_LAST_SEEN_GRANULARITY: int = (
+        60  # in seconds, 0 means last seen times are written on every request
+    )
 
     FLEXMEASURES_PLATFORM_NAME: str | list[str | tuple[str, list[str]]] = "FlexMeasures"
     FLEXMEASURES_MODE: str = ""
@@ -115,6 +118,11 @@ class Config(object):
     FLEXMEASURES_HOSTS_AND_AUTH_START: dict[str, str] = {"flexmeasures.io": "2021-01"}
     FLEXMEASURES_PLUGINS: list[str] | str = []  # str will be checked for commas
     FLEXMEASURES_PROFILE_REQUESTS: bool = False
+    FLEXMEASURES_PROFILE_SAMPLE_RATE: float = (
+        0  # fraction of requests to profile (requires pyinstrument)
+    )
+    FLEXMEASURES_METRICS: bool = False
+    FLEXMEASURES_METRICS_AUTH_TOKEN: str | None = None
     FLEXMEASURES_DB_BACKUP_PATH: str = "migrations/dumps"
     FLEXMEASURES_MENU_LOGO_PATH: str = ""
     FLEXMEASURES_EXTRA_CSS_PATH: str = ""
@@ -129,6 +137,18 @@ class Config(object):
         "EVSE": ["one-way_evse", "two-way_evse"],
     }  # how to group assets by asset types
     FLEXMEASURES_LP_SOLVER: str = "appsi_highs"
+    FLEXMEASURES_FORECASTING_CACHE_PATH: str | None = (
+        None  # directory for caching forecasting data between runs, e.g. "forecasting_cache"
+    )
+    FLEXMEASURES_SCHEDULING_CACHE_TTL: int = (
+        0  # seconds to keep scheduling inputs and plans cached for incremental re-scheduling (0 disables it)
+    )
+    FLEXMEASURES_BELIEF_ARCHIVE_PATH: str | None = (
+        None  # directory or object store URI for archiving old beliefs, e.g. "belief_archive" or "s3://bucket/belief_archive"
+    )
+    FLEXMEASURES_BELIEF_RETENTION_DAYS: int | None = (
+        None  # beyond this many days, only the most recent beliefs are kept in the database (None disables archiving)
+    )
     FLEXMEASURES_JOB_TTL: timedelta = timedelta(days=1)
     FLEXMEASURES_PLANNING_HORIZON: timedelta = timedelta(days=2)
     FLEXMEASURES_MAX_PLANNING_HORIZON: timedelta | int | None = (
@@ -0,0 +1,416 @@
+"""
+Lightweight performance metrics, exposed in the Prometheus text format on the /metrics endpoint.
+
+Request metrics (latency, database queries and Redis round trips) are collected in-process.
+With several web server processes, each process reports its own metrics, so let Prometheus scrape each of them.
+Metrics about work done in job workers (job and solver durations) are aggregated in Redis,
+so every web server process reports them for all workers.
+
+Collection is switched on with the FLEXMEASURES_METRICS setting.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import defaultdict
+import json
+import random
+import threading
+import time
+from typing import Iterator
+
+from flask import (
+    Flask,
+    Response,
+    current_app,
+    g,
+    has_app_context,
+    has_request_context,
+    request,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from flexmeasures.auth.error_handling import UNAUTH_STATUS_CODE, FORBIDDEN_STATUS_CODE
+
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    300,
+    900,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = {
+        k: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for k, v in labels.items()
+    }
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped.items()) + "}"
+
+
+class Metric:
+    """Base class for metrics with a fixed set of label names."""
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+
+    def _label_values(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label_name, "")) for label_name in self.label_names)
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Counter kept in memory of the current process."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.label_names, key)), value
+
+
+class Histogram(Metric):
+    """Histogram kept in memory of the current process."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple = (),
+        buckets: tuple = DEFAULT_LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: counts per bucket (the last one being +Inf, not cumulative), sum and count
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = self._label_values(labels)
+        bucket_index = bisect_left(self.buckets, value)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            bucket_counts, _, _ = entry = self._values[key]
+            bucket_counts[bucket_index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _collect(self) -> dict[tuple, list]:
+        with self._lock:
+            return {
+                key: [list(bucket_counts), total, count]
+                for key, (bucket_counts, total, count) in self._values.items()
+            }
+
+    def samples(self):
+        for key, (bucket_counts, total, count) in sorted(self._collect().items()):
+            labels = dict(zip(self.label_names, key))
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip(
+                self.buckets + ("+Inf",), bucket_counts
+            ):
+                cumulative_count += bucket_count
+                le = upper_bound if upper_bound == "+Inf" else f"{upper_bound:g}"
+                yield f"{self.name}_bucket", {**labels, "le": le}, cumulative_count
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class RedisHistogram(Histogram):
+    """Histogram aggregated in Redis, for observations made in (short-lived) worker processes."""
+
+    def _key(self) -> str:
+        return f"flexmeasures:metrics:{self.name}"
+
+    def observe(self, value: float, **labels):
+        label_field = json.dumps(self._label_values(labels))
+        bucket_index = bisect_left(self.buckets, value)
+        pipe = current_app.redis_connection.pipeline(transaction=False)
+        pipe.hincrby(self._key(), f"{label_field}|bucket|{bucket_index}", 1)
+        pipe.hincrbyfloat(self._key(), f"{label_field}|sum", value)
+        pipe.hincrby(self._key(), f"{label_field}|count", 1)
+        pipe.execute()
+
+    def _collect(self) -> dict[tuple, list]:
+        values: dict[tuple, list] = {}
+        fields = current_app.redis_connection.hgetall(self._key())
+        for field, value in fields.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            label_field, kind, *bucket_index = field.split("|")
+            key = tuple(json.loads(label_field))
+            if key not in values:
+                values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            if kind == "bucket":
+                values[key][0][int(bucket_index[0])] = int(value)
+            elif kind == "sum":
+                values[key][1] = float(value)
+            else:
+                values[key][2] = int(value)
+        return values
+
+
+class RedisCounter(Counter):
+    """Counter aggregated in Redis, for counts made in (short-lived) worker processes."""
+
+    def _key(self) -> str:
+        return f"flexmeasures:metrics:{self.name}"
+
+    def inc(self, amount: float = 1, **labels):
+        current_app.redis_connection.hincrbyfloat(
+            self._key(), json.dumps(self._label_values(labels)), amount
+        )
+
+    def samples(self):
+        fields = current_app.redis_connection.hgetall(self._key())
+        values = {
+            tuple(json.loads(field)): float(value) for field, value in fields.items()
+        }
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.label_names, key)), value
+
+
+REQUEST_DURATION = Histogram(
+    "flexmeasures_request_duration_seconds",
+    "Time spent serving requests.",
+    ("endpoint", "method", "status"),
+)
+REQUEST_DB_QUERIES = Histogram(
+    "flexmeasures_request_db_queries",
+    "Number of database queries per request.",
+    ("endpoint",),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    "flexmeasures_request_db_duration_seconds",
+    "Time spent on database queries per request.",
+    ("endpoint",),
+)
+REQUEST_REDIS_CALLS = Histogram(
+    "flexmeasures_request_redis_round_trips",
+    "Number of Redis round trips per request (a pipeline counts as one).",
+    ("endpoint",),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+PROFILED_REQUESTS = Counter(
+    "flexmeasures_profiled_requests_total",
+    "Number of requests for which a profiling report was made.",
+    ("endpoint",),
+)
+JOB_DURATION = RedisHistogram(
+    "flexmeasures_job_duration_seconds",
+    "Time spent performing jobs, per queue, job function and scheduler (or other data generator).",
+    ("queue", "function", "scheduler", "status"),
+)
+SOLVER_DURATION = RedisHistogram(
+    "flexmeasures_solver_duration_seconds",
+    "Time spent by the LP/MILP solver.",
+    ("solver",),
+)
+COMPACTED_BELIEFS = RedisCounter(
+    "flexmeasures_compacted_beliefs_total",
+    "Number of unchanged beliefs deleted by belief compaction.",
+)
+
+REQUEST_METRICS = (
+    REQUEST_DURATION,
+    REQUEST_DB_QUERIES,
+    REQUEST_DB_DURATION,
+    REQUEST_REDIS_CALLS,
+    PROFILED_REQUESTS,
+)
+WORKER_METRICS = (JOB_DURATION, SOLVER_DURATION, COMPACTED_BELIEFS)
+
+
+def metrics_enabled() -> bool:
+    return has_app_context() and current_app.config.get("FLEXMEASURES_METRICS", False)
+
+
+def render_metrics() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    return (
+        "\n".join(metric.render() for metric in REQUEST_METRICS + WORKER_METRICS) + "\n"
+    )
+
+
+def observe_job_duration(job, queue_name: str, duration: float, status: str):
+    """Record how long an RQ job took."""
+    data_source_info = job.meta.get("data_source_info") or {}
+    JOB_DURATION.observe(
+        duration,
+        queue=queue_name,
+        function=job.func_name,
+        scheduler=data_source_info.get("model", ""),
+        status=status,
+    )
+
+
+class solver_timer:
+    """Context manager to record the time spent solving, if metrics are enabled."""
+
+    def __init__(self, solver_name: str):
+        self.solver_name = solver_name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if metrics_enabled():
+            SOLVER_DURATION.observe(
+                time.perf_counter() - self.start, solver=self.solver_name
+            )
+
+
+def _count_redis_round_trip():
+    if has_request_context() and "metrics_redis_calls" in g:
+        g.metrics_redis_calls += 1
+
+
+def instrument_redis_connection(redis_connection):
+    """Count the round trips made with this Redis connection, including those of its pipelines."""
+    execute_command = redis_connection.execute_command
+    pipeline = redis_connection.pipeline
+
+    def counted_execute_command(*args, **kwargs):
+        _count_redis_round_trip()
+        return execute_command(*args, **kwargs)
+
+    def counted_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        pipe_execute = pipe.execute
+
+        def counted_execute(*execute_args, **execute_kwargs):
+            _count_redis_round_trip()
+            return pipe_execute(*execute_args, **execute_kwargs)
+
+        pipe.execute = counted_execute
+        return pipe
+
+    redis_connection.execute_command = counted_execute_command
+    redis_connection.pipeline = counted_pipeline
+    return redis_connection
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "metrics_db_queries" in g:
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "metrics_db_queries" in g:
+        query_starts = conn.info.get("metrics_query_start")
+        if query_starts:
+            g.metrics_db_duration += time.perf_counter() - query_starts.pop()
+        g.metrics_db_queries += 1
+
+
+def metrics_view():
+    """Serve all metrics, if the request carries the right token (in case one is configured)."""
+    token = current_app.config.get("FLEXMEASURES_METRICS_AUTH_TOKEN")
+    if token:
+        token_name = current_app.config.get("SECURITY_TOKEN_AUTHENTICATION_HEADER")
+        if token_name not in request.headers:
+            return Response("Not authenticated.", status=UNAUTH_STATUS_CODE)
+        if request.headers.get(token_name) != token:
+            return Response("Not authorized.", status=FORBIDDEN_STATUS_CODE)
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+def register_at(app: Flask):
+    """Collect request metrics, sample requests for profiling, and serve metrics on /metrics."""
+    if not app.config.get("FLEXMEASURES_METRICS", False):
+        return
+
+    instrument_redis_connection(app.redis_connection)
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    app.add_url_rule("/metrics", view_func=metrics_view)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        g.metrics_db_queries = 0
+        g.metrics_db_duration = 0.0
+        g.metrics_redis_calls = 0
+        sample_rate = app.config.get("FLEXMEASURES_PROFILE_SAMPLE_RATE", 0)
+        if (
+            sample_rate
+            and "profiler" not in g
+            and random.random() < sample_rate
+            and request.endpoint not in (None, "static", "metrics_view")
+        ):
+            try:
+                import pyinstrument
+
+                g.profiler = pyinstrument.Profiler(async_mode="disabled")
+                g.profiler.start()
+                PROFILED_REQUESTS.inc(endpoint=request.endpoint)
+            except ImportError:
+                pass
+
+    @app.after_request
+    def record_request_metrics(response):
+        if "metrics_start" not in g or request.endpoint in (
+            "static",
+            "metrics_view",
+        ):
+            return response
+        endpoint = request.endpoint or "unknown"
+        REQUEST_DURATION.observe(
+            time.perf_counter() - g.metrics_start,
+            endpoint=endpoint,
+            method=request.method,
+            status=response.status_code,
+        )
+        REQUEST_DB_QUERIES.observe(g.metrics_db_queries, endpoint=endpoint)
+        REQUEST_DB_DURATION.observe(g.metrics_db_duration, endpoint=endpoint)
+        REQUEST_REDIS_CALLS.observe(g.metrics_redis_calls, endpoint=endpoint)
+        return response
@@ -0,0 +1,21 @@
+import pytest
+
+from flexmeasures.utils.app_utils import is_data_only_cli_command
+
+
+@pytest.mark.parametrize(
+    "argv, expected",
+    [
+        (["add", "beliefs", "--sensor", "1", "data.csv"], True),
+        (["jobs", "run-worker", "--queue", "scheduling"], True),
+        (["monitor", "last-seen"], True),
+        (["--env-file", "show", "add", "account"], True),
+        (["-A", "jobs", "run", "--port", "5000"], False),
+        (["run"], False),
+        (["routes"], False),
+        (["--help"], False),
+        ([], False),
+    ],
+)
+def test_is_data_only_cli_command(argv, expected):
+    assert is_data_only_cli_command(argv) is expected
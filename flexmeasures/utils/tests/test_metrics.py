@@ -0,0 +1,193 @@
+from fakeredis import FakeStrictRedis
+from flask import Flask, g
+import pytest
+from sqlalchemy import create_engine, text
+
+from flexmeasures.utils.metrics import (
+    PROFILED_REQUESTS,
+    REQUEST_DB_QUERIES,
+    REQUEST_DURATION,
+    REQUEST_REDIS_CALLS,
+    Counter,
+    Histogram,
+    RedisHistogram,
+    register_at,
+)
+
+
+@pytest.fixture
+def metrics_app():
+    """A minimal app with metrics switched on, and an endpoint making one database query and two Redis round trips."""
+    metrics_app = Flask("test_metrics")
+    metrics_app.config.update(
+        FLEXMEASURES_METRICS=True,
+        FLEXMEASURES_METRICS_AUTH_TOKEN="metrics-token",
+        SECURITY_TOKEN_AUTHENTICATION_HEADER="Authorization",
+    )
+    metrics_app.redis_connection = FakeStrictRedis()
+    engine = create_engine("sqlite://")
+
+    @metrics_app.route("/ping")
+    def ping():
+        metrics_app.redis_connection.get("key")
+        pipe = metrics_app.redis_connection.pipeline()
+        pipe.set("key", 1)
+        pipe.get("key")
+        pipe.execute()
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        return "pong"
+
+    register_at(metrics_app)
+    return metrics_app
+
+
+def test_histogram_render():
+    histogram = Histogram(
+        "test_duration_seconds", "Test durations.", ("endpoint",), buckets=(0.1, 1)
+    )
+    histogram.observe(0.05, endpoint="a")
+    histogram.observe(0.5, endpoint="a")
+    histogram.observe(5, endpoint="a")
+    histogram.observe(1, endpoint="b")
+    lines = histogram.render().split("\n")
+    assert lines[:2] == [
+        "# HELP test_duration_seconds Test durations.",
+        "# TYPE test_duration_seconds histogram",
+    ]
+    assert 'test_duration_seconds_bucket{endpoint="a",le="0.1"} 1' in lines
+    assert 'test_duration_seconds_bucket{endpoint="a",le="1"} 2' in lines
+    assert 'test_duration_seconds_bucket{endpoint="a",le="+Inf"} 3' in lines
+    assert 'test_duration_seconds_sum{endpoint="a"} 5.55' in lines
+    assert 'test_duration_seconds_count{endpoint="a"} 3' in lines
+    # upper bounds are inclusive
+    assert 'test_duration_seconds_bucket{endpoint="b",le="1"} 1' in lines
+
+
+def test_counter_render():
+    counter = Counter("test_total", "Test counts.", ("endpoint",))
+    counter.inc(endpoint='with "quotes"')
+    counter.inc(2, endpoint='with "quotes"')
+    assert 'test_total{endpoint="with \\"quotes\\""} 3' in counter.render()
+
+
+def test_redis_histogram(app):
+    histogram = RedisHistogram(
+        "test_job_duration_seconds", "Test job durations.", ("queue",), buckets=(1,)
+    )
+    app.redis_connection.delete(histogram._key())
+    histogram.observe(0.5, queue="scheduling")
+    histogram.observe(2, queue="scheduling")
+    lines = histogram.render().split("\n")
+    assert 'test_job_duration_seconds_bucket{queue="scheduling",le="1"} 1' in lines
+    assert 'test_job_duration_seconds_bucket{queue="scheduling",le="+Inf"} 2' in lines
+    assert 'test_job_duration_seconds_sum{queue="scheduling"} 2.5' in lines
+
+
+def test_metrics_endpoint_requires_token(metrics_app):
+    client = metrics_app.test_client()
+    assert client.get("/metrics").status_code == 401
+    assert (
+        client.get("/metrics", headers={"Authorization": "wrong-token"}).status_code
+        == 403
+    )
+    response = client.get("/metrics", headers={"Authorization": "metrics-token"})
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert (
+        "# TYPE flexmeasures_request_duration_seconds histogram"
+        in response.get_data(as_text=True)
+    )
+
+
+def test_metrics_endpoint_without_token(metrics_app):
+    metrics_app.config["FLEXMEASURES_METRICS_AUTH_TOKEN"] = None
+    assert metrics_app.test_client().get("/metrics").status_code == 200
+
+
+def _get_sample_value(metric, sample_name: str, **labels) -> float:
+    for name, sample_labels, value in metric.samples():
+        if name == sample_name and sample_labels == labels:
+            return value
+    return 0
+
+
+def test_request_metrics(metrics_app):
+    """Requests are timed, and their database queries and Redis round trips are counted (but not those for /metrics)."""
+    duration_labels = dict(endpoint="ping", method="GET", status="200")
+    counts_before = (
+        _get_sample_value(
+            REQUEST_DURATION,
+            "flexmeasures_request_duration_seconds_count",
+            **duration_labels,
+        ),
+        _get_sample_value(
+            REQUEST_REDIS_CALLS,
+            "flexmeasures_request_redis_round_trips_sum",
+            endpoint="ping",
+        ),
+        _get_sample_value(
+            REQUEST_DB_QUERIES, "flexmeasures_request_db_queries_sum", endpoint="ping"
+        ),
+    )
+    client = metrics_app.test_client()
+    client.get("/ping")
+    client.get("/ping")
+    client.get("/metrics", headers={"Authorization": "metrics-token"})
+
+    assert (
+        _get_sample_value(
+            REQUEST_DURATION,
+            "flexmeasures_request_duration_seconds_count",
+            **duration_labels,
+        )
+        == counts_before[0] + 2
+    )
+    assert not any(
+        labels.get("endpoint") == "metrics_view"
+        for _, labels, _ in REQUEST_DURATION.samples()
+    )
+    # a pipeline counts as a single round trip
+    assert (
+        _get_sample_value(
+            REQUEST_REDIS_CALLS,
+            "flexmeasures_request_redis_round_trips_sum",
+            endpoint="ping",
+        )
+        == counts_before[1] + 4
+    )
+    assert (
+        _get_sample_value(
+            REQUEST_DB_QUERIES, "flexmeasures_request_db_queries_sum", endpoint="ping"
+        )
+        == counts_before[2] + 2
+    )
+
+
+def test_request_metrics_without_setting():
+    """Without the FLEXMEASURES_METRICS setting, no hooks and no /metrics endpoint are registered."""
+    app_without_metrics = Flask("test_no_metrics")
+    register_at(app_without_metrics)
+    assert not app_without_metrics.before_request_funcs
+    assert app_without_metrics.test_client().get("/metrics").status_code == 404
+
+
+def test_sampled_request_profiling(metrics_app):
+    pytest.importorskip("pyinstrument")
+    metrics_app.config["FLEXMEASURES_PROFILE_SAMPLE_RATE"] = 1
+
+    @metrics_app.teardown_request
+    def stop_profiler(exception=None):
+        assert "profiler" in g
+        g.profiler.stop()
+
+    profiled_before = _get_sample_value(
+        PROFILED_REQUESTS, "flexmeasures_profiled_requests_total", endpoint="ping"
+    )
+    metrics_app.test_client().get("/ping")
+    assert (
+        _get_sample_value(
+            PROFILED_REQUESTS, "flexmeasures_profiled_requests_total", endpoint="ping"
+        )
+        == profiled_before + 1
+    )
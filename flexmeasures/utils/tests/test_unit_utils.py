@@ -7,6 +7,7 @@ import pandas as pd
 import timely_beliefs as tb
 
 from flexmeasures.utils.unit_utils import (
+    _get_conversion_plan,
     convert_units,
     determine_flow_unit,
     determine_stock_unit,
@@ -65,6 +66,22 @@ def test_convert_unit(
     pd.testing.assert_series_equal(converted_data, expected_data)
 
 
+def test_conversion_plan_is_cached():
+    """Check that units are parsed once per conversion, and that offset units are converted correctly."""
+    _get_conversion_plan.cache_clear()
+    data = pd.Series([-40.0, 32, 212])
+    for _ in range(3):
+        converted_data = convert_units(data, from_unit="°F", to_unit="°C")
+    pd.testing.assert_series_equal(converted_data, pd.Series([-40.0, 0, 100]))
+    assert _get_conversion_plan.cache_info().misses == 1
+    assert _get_conversion_plan.cache_info().hits == 2
+
+    # A different resolution gets its own plan
+    for resolution in (timedelta(hours=1), timedelta(minutes=15)):
+        convert_units(data, from_unit="kWh", to_unit="kW", event_resolution=resolution)
+    assert _get_conversion_plan.cache_info().misses == 3
+
+
 @pytest.mark.parametrize(
     "from_unit, to_unit, timezone, input_values, expected_values",
     [
@@ -12,6 +12,7 @@ Percentages can be converted to units of some physical capacity if a capacity is
 from __future__ import annotations
 
 from datetime import timedelta
+from functools import lru_cache
 
 from moneyed import list_all_currencies, Currency
 import numpy as np
@@ -136,11 +137,14 @@ def find_smallest_common_unit(units: list[str]) -> tuple[str, dict[str, float]]:
         return "a.u.", {unit: 1.0 for unit in units}
 
 
+@lru_cache(maxsize=1024)
 def determine_unit_conversion_multiplier(
     from_unit: str, to_unit: str, duration: timedelta | None = None
 ):
     """Determine the value multiplier for a given unit conversion.
     If needed, requires a duration to convert from units of stock change to units of flow, or vice versa.
+
+    Results are cached, so units are parsed only once per process.
     """
     if from_unit == "":
         from_unit = "dimensionless"
@@ -405,6 +409,73 @@ def _convert_time_units(
         return data / pd.Timedelta(to_unit)
 
 
+def _convert_magnitudes(
+    from_magnitudes: np.ndarray,
+    from_unit: str,
+    to_unit: str,
+    event_resolution: timedelta | None = None,
+    capacity: str | None = None,
+) -> np.ndarray:
+    """Convert magnitudes using pint, which parses the units on each call."""
+    try:
+        from_quantities = ur.Quantity(from_magnitudes, from_unit)
+    except ValueError as e:
+        # Catch units like "-W" and "100km"
+        if str(e) == "Unit expression cannot have a scaling factor.":
+            from_quantities = ur.Quantity(from_unit) * from_magnitudes
+        else:
+            raise e  # reraise
+    try:
+        to_magnitudes = from_quantities.to(ur.Quantity(to_unit)).magnitude
+    except pint.errors.DimensionalityError as e:
+        # Catch multiplicative conversions that rely on a capacity, like "%" to "kWh" and vice versa
+        if "from 'percent'" in str(e):
+            to_magnitudes = (
+                (from_quantities * ur.Quantity(capacity))
+                .to(ur.Quantity(to_unit))
+                .magnitude
+            )
+        elif "to 'percent'" in str(e):
+            to_magnitudes = (
+                (from_quantities / ur.Quantity(capacity))
+                .to(ur.Quantity(to_unit))
+                .magnitude
+            )
+        else:
+            # Catch multiplicative conversions that use the resolution, like "kWh/15min" to "kW"
+            multiplier = determine_unit_conversion_multiplier(
+                from_unit, to_unit, event_resolution
+            )
+            to_magnitudes = from_magnitudes * multiplier
+    return to_magnitudes
+
+
+@lru_cache(maxsize=1024)
+def _get_conversion_plan(
+    from_unit: str,
+    to_unit: str,
+    event_resolution: timedelta | None = None,
+    capacity: str | None = None,
+) -> tuple[float, float] | None:
+    """Determine the multiplier and offset of a unit conversion, by converting a few probe values with pint.
+
+    All conversions between units in FlexMeasures are affine (e.g. "kW" to "MW", or "°C" to "K"),
+    so the plan can be applied directly to arrays of magnitudes, and units are parsed only once per process.
+    For conversions that turn out not to be affine (e.g. for logarithmic units), we return None,
+    in which case each conversion should go through pint.
+    """
+    probes = np.array([0.0, 1.0, 1000.0])
+    converted = np.asarray(
+        _convert_magnitudes(probes, from_unit, to_unit, event_resolution, capacity),
+        dtype=float,
+    )
+    offset = converted[0]
+    multiplier = converted[1] - offset
+    if not np.isclose(converted[2], probes[2] * multiplier + offset, rtol=1e-12):
+        return None
+    return float(multiplier), float(offset)
+
+
 def convert_units(
     data: tb.BeliefsSeries | pd.Series | list[int | float] | int | float,
     from_unit: str,
@@ -428,38 +499,16 @@ def convert_units(
             if isinstance(data, pd.Series)
             else np.asarray(data) if isinstance(data, list) else np.array([data])
         )
-        try:
-            from_quantities = ur.Quantity(from_magnitudes, from_unit)
-        except ValueError as e:
-            # Catch units like "-W" and "100km"
-            if str(e) == "Unit expression cannot have a scaling factor.":
-                from_quantities = ur.Quantity(from_unit) * from_magnitudes
-            else:
-                raise e  # reraise
-        try:
-            to_magnitudes = from_quantities.to(ur.Quantity(to_unit)).magnitude
-        except pint.errors.DimensionalityError as e:
-            # Catch multiplicative conversions that rely on a capacity, like "%" to "kWh" and vice versa
-            if "from 'percent'" in str(e):
-                to_magnitudes = (
-                    (from_quantities * ur.Quantity(capacity))
-                    .to(ur.Quantity(to_unit))
-                    .magnitude
-                )
-            elif "to 'percent'" in str(e):
-                to_magnitudes = (
-                    (from_quantities / ur.Quantity(capacity))
-                    .to(ur.Quantity(to_unit))
-                    .magnitude
-                )
-            else:
-                # Catch multiplicative conversions that use the resolution, like "kWh/15min" to "kW"
-                if event_resolution is None and isinstance(data, tb.BeliefsSeries):
-                    event_resolution = data.event_resolution
-                multiplier = determine_unit_conversion_multiplier(
-                    from_unit, to_unit, event_resolution
-                )
-                to_magnitudes = from_magnitudes * multiplier
+        if event_resolution is None and isinstance(data, tb.BeliefsSeries):
+            event_resolution = data.event_resolution
+        plan = _get_conversion_plan(from_unit, to_unit, event_resolution, capacity)
+        if plan is not None:
+            multiplier, offset = plan
+            to_magnitudes = from_magnitudes * multiplier + offset
+        else:
+            to_magnitudes = _convert_magnitudes(
+                from_magnitudes, from_unit, to_unit, event_resolution, capacity
+            )
 
         # Output type should match input type
         if isinstance(data, pd.Series):